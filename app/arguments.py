@@ -18,6 +18,12 @@ def parse(args):
                         help='Remove profiles')
     parser.add_argument('--region',
                         help='Overwrite region')
+    parser.add_argument('--set-default', metavar='PROFILE',
+                        help='use the given profile as default profile')
+    parser.add_argument('--status', action='store_true',
+                        help='show the active group and profiles of the running daemon')
+    parser.add_argument('--verify', action='store_true',
+                        help='verify the profiles of the running daemon')
     parser.add_argument('--set-access-key', action='store_true',
                         help='start dialog to set access key')
     parser.add_argument('--rotate-access-key', metavar='KEY_NAME',
@@ -28,23 +34,69 @@ def parse(args):
                         help='list assumable roles for the given profile')
     parser.add_argument('--set-service-roles', nargs=3, metavar=('GROUP', 'PROFILE', 'ROLE'),
                         help='set service role for the given profile')
+    parser.add_argument('--discover-accounts', metavar='SSO_SESSION', nargs='?', const='',
+                        help='list the accounts and roles of the sso session (default session if omitted) '
+                             'into the catalog that groups can select profiles from')
     parser.add_argument('--toggle', nargs=2, metavar=('TOGGLE', 'VALUE'),
                         help='set given toggle to either true or false. Toggles: script')
     parser.add_argument('-o', '--oneshot', action='store_true',
                         help='When used in combination with --login, the program will finish after login instead of running an infinite refresh loop')
+
+    subparsers = parser.add_subparsers(dest='command', metavar='COMMAND')
+    credential_process_parser = subparsers.add_parser(
+        'credential-process',
+        help='print credentials of a profile of the active group for the aws credential_process setting')
+    credential_process_parser.add_argument('--profile', required=True,
+                                           help='profile to print the credentials for')
+    subparsers.add_parser('daemon',
+                          help='run logsmith without gui, the cli sends login, logout, region, set-default, '
+                               'status and verify to it')
     return parser.parse_args(args)
 
 
+def use_credential_process(args):
+    return args.command == 'credential-process'
+
+
+def use_daemon(args):
+    return args.command == 'daemon'
+
+
+def use_daemon_client(args):
+    # these commands are sent to a running daemon, all others always run in the cli process
+    return any([
+        args.login,
+        args.logout,
+        args.region,
+        args.set_default,
+        args.status,
+        args.verify,
+    ]) and not any([
+        args.list,
+        args.rotate_access_key,
+        args.set_access_key,
+        args.set_sso_session,
+        args.list_service_roles,
+        args.set_service_roles,
+        args.discover_accounts is not None,
+        args.toggle,
+    ])
+
+
 def use_cli(args):
     return any([
         args.list,
         args.login,
         args.logout,
         args.region,
+        args.set_default,
+        args.status,
+        args.verify,
         args.rotate_access_key,
         args.set_access_key,
         args.set_sso_session,
         args.list_service_roles,
         args.set_service_roles,
+        args.discover_accounts is not None,
         args.toggle,
     ])
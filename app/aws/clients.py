@@ -0,0 +1,190 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import boto3
+    from botocore.config import Config
+
+logger = logging.getLogger("logsmith")
+
+# Sessions and clients are pooled per profile for the lifetime of the process.
+# boto3 sessions are not thread safe, so creation is guarded by a lock. Clients are thread safe once created.
+# The pool must be invalidated whenever logsmith rewrites ~/.aws/credentials or ~/.aws/config,
+# because sessions cache the credentials and profile configuration they were created with.
+# Changes by other processes, e.g. a cli refresh loop or aws configure, are noticed by the mtime, size and inode
+# of both files, which are compared on every lookup.
+# Clients for temporary credentials are keyed by their access key id, which changes on every role refresh.
+# Only the most recently used of them are kept, so a long running gui or daemon does not collect one per refresh.
+# boto3 is imported on the first session creation, it takes longer to import than the rest of logsmith together.
+max_secrets_clients = 16
+
+_lock = threading.RLock()
+_loader = None
+_sessions: dict = {}
+_clients: dict = {}
+_secrets_clients: OrderedDict = OrderedDict()
+_stats = {"sessions": 0, "clients": 0}
+_file_signature: Optional[tuple] = None
+
+
+def _get_loader():
+    global _loader
+    if _loader is None:
+        from botocore.loaders import create_loader
+        _loader = create_loader()
+    return _loader
+
+
+def _get_aws_file_paths() -> tuple:
+    # the same files botocore reads the profiles from
+    aws_path = os.path.join(str(Path.home()), ".aws")
+    return (os.environ.get("AWS_SHARED_CREDENTIALS_FILE", os.path.join(aws_path, "credentials")),
+            os.environ.get("AWS_CONFIG_FILE", os.path.join(aws_path, "config")))
+
+
+def _get_file_signature() -> tuple:
+    signature = []
+    for path in _get_aws_file_paths():
+        try:
+            file_stat = os.stat(os.path.expanduser(path))
+        except OSError:
+            signature.append(None)
+            continue
+        signature.append((file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino))
+    return tuple(signature)
+
+
+def _check_files() -> None:
+    global _file_signature
+    signature = _get_file_signature()
+    if signature != _file_signature:
+        if _file_signature is not None:
+            logger.debug("aws files changed on disk")
+        invalidate()
+        _file_signature = signature
+
+
+def _create_session(**kwargs) -> "boto3.Session":
+    import boto3
+    import botocore.session
+
+    # share one data loader across all sessions, so botocore service models are parsed only once per process
+    loader = _get_loader()
+    botocore_session = botocore.session.get_session()
+    botocore_session.register_component("data_loader", loader)
+    session = boto3.Session(botocore_session=botocore_session, **kwargs)
+    # boto3 appends its own data path to the loader on every session creation
+    loader.search_paths[:] = list(dict.fromkeys(loader.search_paths))
+    _stats["sessions"] += 1
+    return session
+
+
+def _create_client_config(timeout: Optional[int], retries: Optional[int],
+                          read_timeout: Optional[int] = None) -> Optional["Config"]:
+    config_dict = {}
+    if timeout is not None:
+        config_dict["connect_timeout"] = timeout
+    if read_timeout is not None:
+        config_dict["read_timeout"] = read_timeout
+    if retries is not None:
+        config_dict["retries"] = {"total_max_attempts": retries}
+    if not config_dict:
+        return None
+    from botocore.config import Config
+    return Config(**config_dict)
+
+
+def get_session(profile_name: str) -> "boto3.Session":
+    with _lock:
+        _check_files()
+        session = _sessions.get(profile_name)
+        if session is None:
+            logger.debug(f"create session for {profile_name}")
+            session = _create_session(profile_name=profile_name)
+            _sessions[profile_name] = session
+        return session
+
+
+def get_client(profile_name: str, service: str, timeout: Optional[int] = None, retries: Optional[int] = None,
+               read_timeout: Optional[int] = None):
+    client_key = (profile_name, service, timeout, retries, read_timeout)
+    with _lock:
+        _check_files()
+        client = _clients.get(client_key)
+        if client is None:
+            session = get_session(profile_name)
+            config = _create_client_config(timeout, retries, read_timeout)
+            if config is None:
+                client = session.client(service)
+            else:
+                client = session.client(service, config=config)
+            _stats["clients"] += 1
+            _clients[client_key] = client
+        return client
+
+
+def get_secrets_client(secrets: dict, service: str, timeout: Optional[int] = None, retries: Optional[int] = None,
+                       read_timeout: Optional[int] = None):
+    client_key = (secrets["AccessKeyId"], service, timeout, retries, read_timeout)
+    with _lock:
+        client = _secrets_clients.get(client_key)
+        if client is not None:
+            _secrets_clients.move_to_end(client_key)
+        else:
+            session = _create_session(aws_access_key_id=secrets["AccessKeyId"],
+                                      aws_secret_access_key=secrets["SecretAccessKey"],
+                                      aws_session_token=secrets.get("SessionToken"))
+            config = _create_client_config(timeout, retries, read_timeout)
+            if config is None:
+                client = session.client(service)
+            else:
+                client = session.client(service, config=config)
+            _stats["clients"] += 1
+            _secrets_clients[client_key] = client
+            while len(_secrets_clients) > max_secrets_clients:
+                _secrets_clients.popitem(last=False)
+        return client
+
+
+def get_unsigned_client(service: str, region: str, timeout: Optional[int] = None, retries: Optional[int] = None):
+    # for apis that authenticate with a token instead of aws credentials, e.g. the sso portal
+    client_key = (None, service, region, timeout, retries)
+    with _lock:
+        client = _clients.get(client_key)
+        if client is None:
+            from botocore import UNSIGNED
+            from botocore.config import Config
+            config = Config(signature_version=UNSIGNED)
+            timeout_config = _create_client_config(timeout, retries)
+            if timeout_config is not None:
+                config = config.merge(timeout_config)
+            client = _create_session().client(service, region_name=region, config=config)
+            _stats["clients"] += 1
+            _clients[client_key] = client
+        return client
+
+
+def invalidate() -> None:
+    global _file_signature
+    with _lock:
+        if _sessions or _clients or _secrets_clients:
+            logger.debug("invalidate session pool")
+        _sessions.clear()
+        _clients.clear()
+        _secrets_clients.clear()
+        # the files are compared again on the next lookup
+        _file_signature = None
+
+
+def get_stats() -> dict:
+    with _lock:
+        return {
+            "sessions": _stats["sessions"],
+            "clients": _stats["clients"],
+            "pooled_sessions": len(_sessions),
+            "pooled_clients": len(_clients) + len(_secrets_clients),
+        }
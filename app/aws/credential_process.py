@@ -0,0 +1,136 @@
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from app.aws import iam, key
+from app.core import files
+from app.core.config import Config
+from app.core.profile import Profile
+from app.core.profile_group import ProfileGroup
+from app.core.refresh_schedule import to_datetime
+from app.util import util
+
+logger = logging.getLogger("logsmith")
+
+cache_dir_name = "credential_process"
+# credentials closer to their expiration are fetched again, so that sdks never receive already expired credentials
+min_remaining_seconds = 300
+
+
+def get_cache_path() -> str:
+    return os.path.join(files.get_app_path(), cache_dir_name)
+
+
+def _get_cache_file_path(profile_name: str) -> str:
+    return os.path.join(get_cache_path(), f"{profile_name}.json")
+
+
+def load_cached_credentials(profile_name: str) -> Optional[dict]:
+    try:
+        with open(_get_cache_file_path(profile_name), "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def store_credentials(profile_name: str, secrets: dict) -> None:
+    os.makedirs(get_cache_path(), mode=0o700, exist_ok=True)
+    expiration = to_datetime(secrets.get("Expiration"))
+    process_credentials = {
+        "Version": 1,
+        "AccessKeyId": secrets["AccessKeyId"],
+        "SecretAccessKey": secrets["SecretAccessKey"],
+        "SessionToken": secrets.get("SessionToken"),
+    }
+    if expiration:
+        process_credentials["Expiration"] = expiration.isoformat()
+    files.write_atomic(_get_cache_file_path(profile_name), json.dumps(process_credentials))
+
+
+def store_fetched_credentials(profile_list: List[Profile], secrets: Dict[str, dict],
+                              default_override: str | None) -> None:
+    for profile in profile_list:
+        if profile.profile not in secrets:
+            continue
+        store_credentials(profile.profile, secrets[profile.profile])
+        if util.use_as_default(profile, default_override):
+            store_credentials("default", secrets[profile.profile])
+
+
+def clear_cache() -> None:
+    cache_path = get_cache_path()
+    if not os.path.isdir(cache_path):
+        return
+    for file_name in os.listdir(cache_path):
+        if file_name.endswith(".json"):
+            os.remove(os.path.join(cache_path, file_name))
+
+
+def is_fresh(process_credentials: Optional[dict], now: Optional[datetime] = None) -> bool:
+    if not process_credentials:
+        return False
+    expiration = to_datetime(process_credentials.get("Expiration"))
+    if expiration is None:
+        return True
+    now = now or datetime.now(timezone.utc)
+    return (expiration - now).total_seconds() > min_remaining_seconds
+
+
+def get_credentials(profile_group: ProfileGroup, profile_name: str) -> dict:
+    process_credentials = load_cached_credentials(profile_name)
+    if is_fresh(process_credentials):
+        return process_credentials
+
+    # only one process fetches, the others wait and read the result from the cache
+    with files.write_lock():
+        process_credentials = load_cached_credentials(profile_name)
+        if is_fresh(process_credentials):
+            return process_credentials
+
+        profile = _find_profile(profile_group, profile_name)
+        if profile is None:
+            raise ValueError(f"profile {profile_name} is not part of group {profile_group.name}")
+        secrets = _fetch(profile_group, profile)
+        store_credentials(profile_name, secrets)
+        return load_cached_credentials(profile_name)
+
+
+def _find_profile(profile_group: ProfileGroup, profile_name: str) -> Optional[Profile]:
+    if profile_name == "default":
+        return profile_group.get_default_profile()
+    if profile_group.service_profile and profile_group.service_profile.profile == profile_name:
+        return profile_group.service_profile
+    return profile_group.get_profile(profile_name)
+
+
+def _fetch(profile_group: ProfileGroup, profile: Profile) -> dict:
+    logger.info(f"fetch {profile.profile} for credential process")
+    session_token_profile_name = util.generate_session_name(profile_group.get_access_key())
+    # the user is read from the session token section, sts is only asked when the login did not record it
+    session_name = key.get_user_name(profile_group.get_access_key())
+    if profile.source:
+        source_credentials = get_credentials(profile_group, profile.source)
+        return iam.assume_role_with_secrets(source_credentials, session_name, profile.account, profile.role)
+    return iam.assume_role(session_token_profile_name, session_name, profile.account, profile.role)
+
+
+def run(profile_name: str) -> int:
+    # the sdks read stdout, so every other output has to go to stderr
+    config = Config()
+    config.initialize()
+    group_name = files.load_active_group()
+    profile_group = config.get_group(group_name) if group_name else None
+    if profile_group is None:
+        print("logsmith: no active group, please login first", file=sys.stderr)
+        return 1
+
+    try:
+        process_credentials = get_credentials(profile_group, profile_name)
+    except Exception as error:
+        print(f"logsmith: could not fetch credentials for {profile_name}: {error}", file=sys.stderr)
+        return 1
+    print(json.dumps(process_credentials))
+    return 0
@@ -0,0 +1,164 @@
+import hmac
+import json
+import logging
+import os
+import secrets as token_generator
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from app.core import files
+from app.core.profile import Profile
+from app.core.refresh_schedule import to_datetime
+from app.util import util
+
+logger = logging.getLogger("logsmith")
+
+# only loopback addresses are accepted by the sdks for plain http container credentials
+server_host = "127.0.0.1"
+token_file_name = "credential_server.token"
+credentials_path_prefix = "/credentials"
+
+
+def get_token_path() -> str:
+    return os.path.join(files.get_app_path(), token_file_name)
+
+
+def load_or_create_token() -> str:
+    # the token is kept in a file, so containers can mount it and use AWS_CONTAINER_AUTHORIZATION_TOKEN_FILE
+    token_path = get_token_path()
+    try:
+        with open(token_path, "r") as file:
+            token = file.read().strip()
+        if token:
+            return token
+    except OSError:
+        pass
+    token = token_generator.token_urlsafe(32)
+    # new files are created with mode 0600
+    files.write_atomic(token_path, token)
+    return token
+
+
+def to_container_credentials(secrets: dict) -> dict:
+    container_credentials = {
+        "AccessKeyId": secrets["AccessKeyId"],
+        "SecretAccessKey": secrets["SecretAccessKey"],
+        "Token": secrets.get("SessionToken"),
+    }
+    expiration = to_datetime(secrets.get("Expiration"))
+    if expiration:
+        container_credentials["Expiration"] = expiration.isoformat()
+    return container_credentials
+
+
+class CredentialServer:
+    """
+    Serves the role credentials of the active group over http in the format of the ecs container credentials
+    endpoint, so sdks can use AWS_CONTAINER_CREDENTIALS_FULL_URI instead of reading ~/.aws/credentials.
+    The credentials are only held in memory and are replaced on every login and refresh.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._credentials: Dict[str, dict] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self.token: Optional[str] = None
+
+    def start(self, port: int) -> None:
+        if self.is_running():
+            return
+        self.token = load_or_create_token()
+        self._server = ThreadingHTTPServer((server_host, port), self._create_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="credential-server", daemon=True)
+        self._thread.start()
+        logger.info(f"credential server listening on {self.get_url()}")
+
+    def stop(self) -> None:
+        if not self.is_running():
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
+        self._thread = None
+        logger.info("credential server stopped")
+
+    def is_running(self) -> bool:
+        return self._server is not None
+
+    def get_port(self) -> Optional[int]:
+        if not self.is_running():
+            return None
+        return self._server.server_address[1]
+
+    def get_url(self, profile_name: str = "default") -> Optional[str]:
+        if not self.is_running():
+            return None
+        return f"http://{server_host}:{self.get_port()}{credentials_path_prefix}/{profile_name}"
+
+    def set_credentials(self, profile_name: str, secrets: dict) -> None:
+        container_credentials = to_container_credentials(secrets)
+        with self._lock:
+            self._credentials[profile_name] = container_credentials
+
+    def get_credentials(self, profile_name: str) -> Optional[dict]:
+        with self._lock:
+            return self._credentials.get(profile_name)
+
+    def set_default(self, profile_name: str) -> None:
+        with self._lock:
+            if profile_name in self._credentials:
+                self._credentials["default"] = self._credentials[profile_name]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._credentials.clear()
+
+    def store_fetched_credentials(self, profile_list: List[Profile], secrets: Dict[str, dict],
+                                  default_override: str | None) -> None:
+        for profile in profile_list:
+            if profile.profile not in secrets:
+                continue
+            self.set_credentials(profile.profile, secrets[profile.profile])
+            if util.use_as_default(profile, default_override):
+                self.set_credentials("default", secrets[profile.profile])
+
+    def _is_authorized(self, authorization: Optional[str]) -> bool:
+        if not authorization or not self.token:
+            return False
+        return hmac.compare_digest(authorization.encode(), self.token.encode())
+
+    def _create_handler(self):
+        credential_server = self
+
+        class CredentialRequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if not credential_server._is_authorized(self.headers.get("Authorization")):
+                    self._respond(401, {"message": "unauthorized"})
+                    return
+                path = self.path.split("?", 1)[0].rstrip("/")
+                if not path.startswith(f"{credentials_path_prefix}/"):
+                    self._respond(404, {"message": "not found"})
+                    return
+                profile_name = path[len(credentials_path_prefix) + 1:]
+                container_credentials = credential_server.get_credentials(profile_name)
+                if container_credentials is None:
+                    self._respond(404, {"message": f"no credentials for {profile_name}"})
+                    return
+                self._respond(200, container_credentials)
+
+            def _respond(self, status: int, body: dict) -> None:
+                content = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                logger.debug(f"credential server: {format % args}")
+
+        return CredentialRequestHandler
@@ -1,22 +1,17 @@
 from configparser import ConfigParser
+from contextlib import contextmanager
+from contextvars import ContextVar
 import logging
 import os
+import shlex
+import sys
+import threading
 from pathlib import Path
-from typing import Optional
-
-import boto3
-import botocore
-from app.aws import iam
-from botocore.exceptions import (
-    ClientError,
-    EndpointConnectionError,
-    NoCredentialsError,
-    ParamValidationError,
-    ReadTimeoutError,
-)
-from app.core import files
-from app.shell import shell
+from typing import Dict, List, Optional
 
+from app.aws import clients, section_index
+from app.core import files
+from app.core.profile import Profile
 from app.core.profile_group import ProfileGroup
 from app.core.result import Result
 from app.util import util
@@ -32,58 +27,238 @@ def _get_config_path() -> str:
     return os.path.join(str(Path.home()), ".aws", "config")
 
 
+def get_credential_process_command(profile_name: str) -> str:
+    # the command is executed by the sdks, so it has to work without the environment of logsmith
+    if getattr(sys, "frozen", False):
+        executable = [sys.executable]
+    else:
+        app_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        executable = ["env", f"PYTHONPATH={os.path.dirname(app_path)}", sys.executable, os.path.join(app_path, "run.py")]
+    return " ".join(shlex.quote(part) for part in executable + ["credential-process", "--profile", profile_name])
+
+
 def _load_file(path: str) -> ConfigParser:
-    config_parser = ConfigParser()
-    config_parser.read(path)
-    return config_parser
+    return section_index.load(path)
 
 
 def _write_file(path: str, config_parser: ConfigParser) -> None:
-    with open(path, "w") as file:
-        config_parser.write(file)
+    # only changed sections are rendered, all others are copied with their comments and formatting
+    section_index.write(path, config_parser)
+
+
+def _snapshot(config_parser: ConfigParser) -> Dict[str, dict]:
+    return {section: dict(config_parser.items(section, raw=True)) for section in config_parser.sections()}
+
+
+def _apply_changes(current: ConfigParser, config_parser: ConfigParser, snapshot: Dict[str, dict]) -> ConfigParser:
+    # sections that are equal to the snapshot were not touched, the current file may hold newer values for them
+    for section in config_parser.sections():
+        values = dict(config_parser.items(section, raw=True))
+        if values == snapshot.get(section):
+            continue
+        if not current.has_section(section):
+            current.add_section(section)
+        for option in current.options(section):
+            if option not in values:
+                current.remove_option(section, option)
+        for option, value in values.items():
+            current.set(section, option, value)
+    for section in snapshot:
+        if not config_parser.has_section(section) and current.has_section(section):
+            current.remove_section(section)
+    return current
+
+
+class Transaction:
+    """
+    Collects all changes to ~/.aws/credentials and ~/.aws/config and writes every changed file once on commit.
+    Credentials that were changed inside the transaction are served from memory via get_client.
+    Changed config sections are flushed early, if botocore has to resolve them from disk.
+    Caller identities resolved inside the transaction are kept, because they do not change during one login.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._files: Dict[str, ConfigParser] = {}
+        self._snapshots: Dict[str, Dict[str, dict]] = {}
+        self._dirty = set()
+        self.identities: Dict[str, dict] = {}
+
+    def load(self, path: str) -> ConfigParser:
+        with self._lock:
+            if path not in self._files:
+                config_parser = _load_file(path)
+                self._files[path] = config_parser
+                self._snapshots[path] = _snapshot(config_parser)
+            return self._files[path]
+
+    def write(self, path: str, config_parser: ConfigParser) -> None:
+        with self._lock:
+            if path not in self._snapshots:
+                self._snapshots[path] = _snapshot(_load_file(path))
+            self._files[path] = config_parser
+            self._dirty.add(path)
+
+    def has_changed(self, path: str, section: str) -> bool:
+        with self._lock:
+            if path not in self._dirty:
+                return False
+            config_parser = self._files[path]
+            current = None
+            if config_parser.has_section(section):
+                current = dict(config_parser.items(section, raw=True))
+            return current != self._snapshots[path].get(section)
+
+    def get_pending_secrets(self, profile: str) -> Optional[dict]:
+        path = _get_credentials_path()
+        with self._lock:
+            if not self.has_changed(path, profile):
+                return None
+            credentials_file = self._files[path]
+            if not credentials_file.has_option(profile, "aws_access_key_id"):
+                return None
+            return {
+                "AccessKeyId": credentials_file.get(profile, "aws_access_key_id"),
+                "SecretAccessKey": credentials_file.get(profile, "aws_secret_access_key"),
+                "SessionToken": credentials_file.get(profile, "aws_session_token", fallback=None),
+            }
+
+    def flush_config_for(self, profile: str) -> None:
+        # botocore reads profile configuration (sso and chained profiles) from disk
+        path = _get_config_path()
+        with self._lock:
+            section = _get_config_section_name(profile)
+            visited = set()
+            while section and section not in visited:
+                visited.add(section)
+                if self.has_changed(path, section):
+                    logger.info(f"flush config for {profile}")
+                    self.flush(path)
+                    return
+                config_file = self._files.get(path)
+                if config_file is None or not config_file.has_option(section, "source_profile"):
+                    return
+                section = _get_config_section_name(config_file.get(section, "source_profile"))
+
+    def flush(self, path: str) -> None:
+        # the file is read again under the lock, so sections that another logsmith process wrote
+        # since the transaction loaded it are kept. The lock is not held for the whole transaction,
+        # because an sso login keeps it open while the user confirms the login in the browser.
+        with self._lock, files.write_lock():
+            if path not in self._dirty:
+                return
+            _write_file(path, _apply_changes(_load_file(path), self._files[path], self._snapshots[path]))
+            self._snapshots[path] = _snapshot(self._files[path])
+            self._dirty.discard(path)
+            clients.invalidate()
+
+    def commit(self) -> None:
+        # credentials and config are replaced under one lock, so other logsmith processes see both or neither
+        with self._lock, files.write_lock():
+            for path in sorted(self._dirty):
+                self.flush(path)
+
+
+# the transaction belongs to the thread that opened it, e.g. a login that waits for the sso portal.
+# other threads like the verify pool or the warm standby read and write the files directly.
+# fanout passes the context of the login thread on to its workers.
+_transaction: ContextVar[Optional[Transaction]] = ContextVar("transaction", default=None)
+
+
+@contextmanager
+def transaction():
+    active_transaction = _transaction.get()
+    if active_transaction is not None:
+        # nested transactions join the outer one
+        yield active_transaction
+        return
+
+    active_transaction = Transaction()
+    token = _transaction.set(active_transaction)
+    try:
+        yield active_transaction
+    finally:
+        _transaction.reset(token)
+        active_transaction.commit()
+
+
+def get_transaction() -> Optional[Transaction]:
+    return _transaction.get()
+
+
+def _get_config_section_name(profile: str) -> str:
+    if profile == "default":
+        return "default"
+    return f"profile {profile}"
 
 
 def load_credentials_file() -> ConfigParser:
+    active_transaction = _transaction.get()
+    if active_transaction is not None:
+        return active_transaction.load(_get_credentials_path())
     return _load_file(_get_credentials_path())
 
 
 def load_config_file() -> ConfigParser:
+    active_transaction = _transaction.get()
+    if active_transaction is not None:
+        return active_transaction.load(_get_config_path())
     return _load_file(_get_config_path())
 
 
 def write_credentials_file(credentials: ConfigParser) -> None:
+    active_transaction = _transaction.get()
+    if active_transaction is not None:
+        active_transaction.write(_get_credentials_path(), credentials)
+        return
     _write_file(_get_credentials_path(), credentials)
+    clients.invalidate()
 
 
 def write_config_file(config: ConfigParser) -> None:
+    active_transaction = _transaction.get()
+    if active_transaction is not None:
+        active_transaction.write(_get_config_path(), config)
+        return
     _write_file(_get_config_path(), config)
+    clients.invalidate()
 
 
 def get_client(
-    profile_name: str, service: str, timeout: Optional[int] = None, retries: Optional[int] = None
+    profile_name: str, service: str, timeout: Optional[int] = None, retries: Optional[int] = None,
+    read_timeout: Optional[int] = None
 ):
-    session = boto3.Session(profile_name=profile_name)
-    config_dict = {}
-    if timeout is not None:
-        config_dict["connect_timeout"] = timeout
-    if retries is not None:
-        config_dict["retries"] = {"total_max_attempts": retries}
-    if timeout is not None or retries is not None:
-        config = botocore.config.Config(**config_dict)
-        return session.client(service, config=config)
-    return session.client(service)
-
-
-def cleanup():
+    active_transaction = _transaction.get()
+    if active_transaction is not None:
+        secrets = active_transaction.get_pending_secrets(profile_name)
+        if secrets:
+            return clients.get_secrets_client(secrets, service, timeout=timeout, retries=retries,
+                                              read_timeout=read_timeout)
+        active_transaction.flush_config_for(profile_name)
+    return clients.get_client(profile_name, service, timeout=timeout, retries=retries, read_timeout=read_timeout)
+
+
+def get_session(profile_name: str):
+    active_transaction = _transaction.get()
+    if active_transaction is not None:
+        active_transaction.flush_config_for(profile_name)
+    return clients.get_session(profile_name)
+
+
+def cleanup(keep: Optional[List[str]] = None):
+    """
+    Removes all profiles written by logsmith. Profiles in keep are left in place,
+    which is used when the same group is logged in again.
+    """
     logger.info("cleanup credentials")
     result = Result()
     try:
         credentials_file = load_credentials_file()
-        credentials_file = _cleanup_profiles(credentials_file)
+        credentials_file = _cleanup_profiles(credentials_file, keep)
         write_credentials_file(credentials_file)
 
         config_file = load_config_file()
-        config_file = _cleanup_configs(config_file)
+        config_file = _cleanup_configs(config_file, keep)
         write_config_file(config_file)
     except:
         error_text = "could not cleanup credential files"
@@ -94,8 +269,10 @@ def cleanup():
     return result
 
 
-def _cleanup_profiles(credentials_file: ConfigParser) -> ConfigParser:
+def _cleanup_profiles(credentials_file: ConfigParser, keep: Optional[List[str]] = None) -> ConfigParser:
     for profile in credentials_file.sections():
+        if keep and profile in keep:
+            continue
         if not profile.startswith("access-key") and not profile.startswith(
             "session-token"
         ):
@@ -110,9 +287,12 @@ def write_profile_config(profile_group: ProfileGroup, region: str) -> Result:
     try:
         for profile in profile_group.get_profile_list(include_service_profile=True):
             logger.info(f"add region config for {profile.profile}")
-            add_profile_config(config_file, profile.profile, region)
+            credential_process = None
+            if profile_group.write_mode == "process":
+                credential_process = get_credential_process_command(profile.profile)
+            add_profile_config(config_file, profile.profile, region, credential_process)
             if profile.default:
-                add_profile_config(config_file, "default", region)
+                add_profile_config(config_file, "default", region, credential_process)
         write_config_file(config_file)
     except Exception:
         error_text = "error writing config"
@@ -124,8 +304,10 @@ def write_profile_config(profile_group: ProfileGroup, region: str) -> Result:
     return result
 
 
-def _cleanup_configs(config_file: ConfigParser) -> ConfigParser:
+def _cleanup_configs(config_file: ConfigParser, keep: Optional[List[str]] = None) -> ConfigParser:
     for config_name in config_file.sections():
+        if keep and config_name.removeprefix("profile ") in keep:
+            continue
         if "profile" in config_name:
             config_file.remove_section(config_name)
     return config_file
@@ -143,12 +325,31 @@ def add_profile_credentials(credentials_file: ConfigParser, profile: str, secret
                          str(secrets["SessionToken"]))
 
 
-def add_profile_config(config_file: ConfigParser, profile: str, region: str) -> None:
+def write_fetched_credentials(profile_list: List[Profile], secrets: Dict[str, dict], default_override: str | None) -> None:
+    if not secrets:
+        return
+    credentials_file = load_credentials_file()
+    for profile in profile_list:
+        if profile.profile not in secrets:
+            continue
+        add_profile_credentials(credentials_file, profile.profile, secrets[profile.profile])
+        if util.use_as_default(profile, default_override):
+            logger.info(f"set {profile.profile} to default")
+            add_profile_credentials(credentials_file, "default", secrets[profile.profile])
+    write_credentials_file(credentials_file)
+
+
+def add_profile_config(config_file: ConfigParser, profile: str, region: str,
+                       credential_process: Optional[str] = None) -> None:
     config_name = f"profile {profile}"
     if not config_file.has_section(config_name):
         config_file.add_section(config_name)
     config_file.set(config_name, "region", region)
     config_file.set(config_name, "output", "json")
+    if credential_process:
+        config_file.set(config_name, "credential_process", credential_process)
+    elif config_file.has_option(config_name, "credential_process"):
+        config_file.remove_option(config_name, "credential_process")
 
 
 def add_sso_profile(
@@ -0,0 +1,94 @@
+import contextvars
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Tuple
+
+from botocore.exceptions import ClientError
+
+from app.core.profile import Profile
+
+logger = logging.getLogger("logsmith")
+
+default_concurrency = 8
+
+throttling_error_codes = {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestLimitExceeded",
+    "TooManyRequestsException",
+}
+_max_attempts = 5
+_base_delay_seconds = 0.5
+
+
+def call_with_backoff(func: Callable, *args, **kwargs):
+    attempt = 1
+    while True:
+        try:
+            return func(*args, **kwargs)
+        except ClientError as error:
+            error_code = error.response.get("Error", {}).get("Code")
+            if error_code not in throttling_error_codes or attempt >= _max_attempts:
+                raise
+            # exponential backoff with full jitter
+            delay = random.uniform(0, _base_delay_seconds * 2 ** attempt)
+            logger.warning(f"request throttled ({error_code}), retry {attempt} in {delay:.2f}s")
+            time.sleep(delay)
+            attempt += 1
+
+
+def fetch_all(profile_list: List[Profile],
+              fetch: Callable,
+              concurrency: int = default_concurrency,
+              chained: bool = False) -> Tuple[Dict[str, dict], Dict[str, str]]:
+    """
+    Calls fetch(profile, source_secrets) for every profile on a bounded thread pool.
+    With chained=True, profiles whose source is another profile of the list wait for it
+    and receive its secrets, otherwise source_secrets is None.
+    Returns the secrets and the error messages, both keyed by profile name.
+    The workers run in a copy of the caller's context, so they share its credentials transaction.
+    """
+    secrets: Dict[str, dict] = {}
+    errors: Dict[str, str] = {}
+    profile_names = {profile.profile for profile in profile_list}
+    max_workers = max(1, min(int(concurrency), len(profile_list) or 1))
+
+    remaining = list(profile_list)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch") as executor:
+        while remaining:
+            wave = []
+            waiting = []
+            for profile in remaining:
+                source = profile.source if chained and profile.source in profile_names else None
+                if source is None or source in secrets:
+                    wave.append(profile)
+                elif source in errors:
+                    errors[profile.profile] = f"source profile {source} failed"
+                else:
+                    waiting.append(profile)
+
+            if not wave:
+                for profile in waiting:
+                    errors[profile.profile] = f"source profile {profile.source} could not be resolved"
+                break
+
+            futures = {}
+            for profile in wave:
+                source_secrets = secrets.get(profile.source) if chained else None
+                context = contextvars.copy_context()
+                future = executor.submit(context.run, call_with_backoff, fetch, profile, source_secrets)
+                futures[future] = profile
+
+            for future in as_completed(futures):
+                profile = futures[future]
+                try:
+                    secrets[profile.profile] = future.result()
+                except Exception as error:
+                    logger.error(f"could not fetch {profile.profile}", exc_info=error)
+                    errors[profile.profile] = str(error)
+            remaining = waiting
+
+    return secrets, errors
@@ -1,8 +1,8 @@
 import logging
+from typing import List, Optional
 
-import boto3
-import botocore
-from botocore import exceptions
+from app.aws import clients, credentials, trust_policy
+from app.aws.trust_policy import Principal
 from app.core.result import Result
 from app.util import util
 
@@ -11,8 +11,7 @@ logger = logging.getLogger("logsmith")
 
 def create_access_key(user_name, key_name) -> Result:
     result = Result()
-    session = boto3.Session(profile_name=util.generate_session_name(key_name))
-    client = session.client("iam")
+    client = credentials.get_client(util.generate_session_name(key_name), "iam")
 
     try:
         response = client.create_access_key(UserName=user_name)
@@ -36,8 +35,7 @@ def create_access_key(user_name, key_name) -> Result:
 
 def delete_iam_access_key(user_name, key_name, key_id) -> Result:
     result = Result()
-    session = boto3.Session(profile_name=util.generate_session_name(key_name))
-    client = session.client("iam")
+    client = credentials.get_client(util.generate_session_name(key_name), "iam")
 
     try:
         client.delete_access_key(UserName=user_name, AccessKeyId=key_id)
@@ -51,43 +49,45 @@ def delete_iam_access_key(user_name, key_name, key_id) -> Result:
     return result
 
 
-def get_role_name(profile: str):
-    session = boto3.Session(profile_name=profile)
-    client = session.client("sts")
+def get_principal(profile: str) -> Principal:
+    client = credentials.get_client(profile, "sts")
     arn = client.get_caller_identity()["Arn"]
-    return arn.split("/")[-2]
+    return Principal.from_caller_arn(arn)
 
 
 def fetch_role_arn(profile: str, role_name: str):
-    session = boto3.Session(profile_name=profile)
-    client = session.client("iam")
+    client = credentials.get_client(profile, "iam")
     role = client.get_role(RoleName=role_name)
     return role["Role"]["Arn"]
 
 
-def list_assumable_roles(source_profile: str) -> Result:
+def list_roles(profile: str) -> List[dict]:
+    # list_roles already contains the trust policy of every role, no need for a get_role per role
+    client = credentials.get_client(profile, "iam")
+    paginator = client.get_paginator("list_roles")
+    role_list = []
+    for page in paginator.paginate():
+        role_list.extend(page["Roles"])
+    return role_list
+
+
+def list_assumable_roles(source_profile: str, principal: Optional[Principal] = None) -> Result:
     logger.info(f"list assumable roles with profile {source_profile}")
     result = Result()
-    session = boto3.Session(profile_name=source_profile)
-    client = session.client("iam")
-
-    source_role_name = get_role_name(source_profile)
-    source_role_arn = fetch_role_arn(source_profile, source_role_name)
-    logger.info(f"source-arn: {source_role_arn}")
-
-    assumable_roles = []
-
-    role_list = client.list_roles()["Roles"]
-    for role in role_list:
-        response = client.get_role(RoleName=role["RoleName"])
-        assume_role_policy = response["Role"]["AssumeRolePolicyDocument"]
-        for statement in assume_role_policy["Statement"]:
-            if "Principal" in statement and "AWS" in statement["Principal"]:
-                if (
-                    statement["Effect"] == "Allow"
-                    and source_role_arn in statement["Principal"]["AWS"]
-                ):
-                    assumable_roles.append(role["RoleName"])
+
+    try:
+        if principal is None:
+            principal = get_principal(source_profile)
+        logger.info(f"source-arn: {principal.arn}")
+        role_list = list_roles(source_profile)
+    except Exception:
+        error_text = f"could not list roles with profile {source_profile}"
+        logger.error(error_text, exc_info=True)
+        result.error(error_text)
+        return result
+
+    assumable_roles = trust_policy.filter_assumable_roles(role_list, principal)
+    logger.info(f"{len(assumable_roles)} of {len(role_list)} roles are assumable")
 
     if not assumable_roles:
         result.error("no assumable roles found")
@@ -98,18 +98,25 @@ def list_assumable_roles(source_profile: str) -> Result:
 
 
 def assume_role(profile: str, session_name: str, account_id: str, role: str) -> dict:
-    session = boto3.Session(profile_name=profile)
-    client = session.client("sts")
+    client = credentials.get_client(profile, "sts")
+    response = client.assume_role(
+        RoleArn=f"arn:aws:iam::{account_id}:role/{role}", RoleSessionName=session_name
+    )
+    return response["Credentials"]
+
+
+def assume_role_with_secrets(secrets: dict, session_name: str, account_id: str, role: str) -> dict:
+    client = clients.get_secrets_client(secrets, "sts")
     response = client.assume_role(
         RoleArn=f"arn:aws:iam::{account_id}:role/{role}", RoleSessionName=session_name
     )
     return response["Credentials"]
 
 
-def get_caller_identity(profile: str) -> bool:
+def get_caller_identity(profile: str, timeout: Optional[int] = None, retries: Optional[int] = None,
+                        read_timeout: Optional[int] = None) -> bool:
     try:
-        session = boto3.Session(profile_name=profile)
-        client = session.client("sts")
+        client = credentials.get_client(profile, "sts", timeout=timeout, retries=retries, read_timeout=read_timeout)
         client.get_caller_identity()
         return True
     except Exception:
@@ -117,7 +124,7 @@ def get_caller_identity(profile: str) -> bool:
 
 
 def get_frozen_credentials(profile_name):
-    session = boto3.Session(profile_name=profile_name)
+    session = credentials.get_session(profile_name)
     creds = session.get_credentials().get_frozen_credentials()
     return {
         "AccessKeyId": creds.access_key,
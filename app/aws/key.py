@@ -1,5 +1,8 @@
 import logging
-from app.aws import iam, credentials
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+from app.aws import credentials, fanout, iam
 from botocore.exceptions import (
     ClientError,
     EndpointConnectionError,
@@ -9,11 +12,20 @@ from botocore.exceptions import (
 )
 
 from app.core.profile_group import ProfileGroup
+from app.core.refresh_schedule import to_datetime
 from app.core.result import Result
 from app.util import util
 
 logger = logging.getLogger("logsmith")
 
+# written next to the session token, so a later login knows whether the session is still valid without sts
+session_expiration_option = "logsmith_session_expiration"
+session_user_arn_option = "logsmith_user_arn"
+# the session is only trusted for the access key it was fetched with, a replaced or rotated key needs a new session
+session_access_key_id_option = "logsmith_access_key_id"
+# sessions closer to their expiration are checked against sts
+min_session_remaining_seconds = 300
+
 
 def has_access_key(access_key: str) -> Result:
     logger.info("has access key")
@@ -34,11 +46,15 @@ def check_access_key(access_key: str) -> Result:
     if not access_key_result.was_success:
         return access_key_result
 
-    logger.info("check access key")
     result = Result()
+    if has_valid_session(access_key):
+        # the session was fetched with this access key and is still valid, no need to ask sts
+        result.set_success()
+        return result
+
+    logger.info("check access key")
     try:
-        client = credentials.get_client(access_key, "sts", timeout=2, retries=2)
-        client.get_caller_identity()
+        get_caller_identity(access_key)
     except ClientError:
         error_text = "access key is not valid"
         result.error(error_text)
@@ -71,11 +87,15 @@ def check_session(access_key: str) -> Result:
     if not session_result.was_success:
         return session_result
 
-    logger.info(f"check session {session_token_profile_name}")
     result = Result()
+    if has_valid_session(access_key):
+        logger.info(f"check session {session_token_profile_name} - valid until {get_session_expiration(access_key)}")
+        result.set_success()
+        return result
+
+    logger.info(f"check session {session_token_profile_name}")
     try:
-        client = credentials.get_client(session_token_profile_name, "sts", timeout=2, retries=2)
-        client.get_caller_identity()
+        get_caller_identity(session_token_profile_name)
     except ClientError:
         # this is the normal case when the session token is not valid. Proceed then to fetch a new one
         return result
@@ -115,65 +135,94 @@ def fetch_session_token(access_key: str, mfa_token: str) -> Result:
         return result
 
     credentials.add_profile_credentials(credentials_file, session_token_profile_name, secrets)
+    _add_session_metadata(credentials_file, session_token_profile_name, secrets, _get_cached_identity(access_key),
+                          credentials_file.get(access_key, "aws_access_key_id", fallback=None))
     credentials.write_credentials_file(credentials_file)
     logger.info(f"{session_token_profile_name} successfully fetched")
     result.set_success()
     return result
 
 
-def fetch_key_credentials(user_name: str, profile_group: ProfileGroup, default_override: str | None) -> Result:
+def fetch_key_credentials(user_name: str,
+                          profile_group: ProfileGroup,
+                          default_override: str | None,
+                          concurrency: int = fanout.default_concurrency,
+                          profile_names: Optional[List[str]] = None,
+                          store: Callable = credentials.write_fetched_credentials,
+                          include_service_profile: bool = False) -> Result:
     result = Result()
-    credentials_file = credentials.load_credentials_file()
     logger.info("fetch role credentials")
-
+    session_token_profile_name = util.generate_session_name(profile_group.get_access_key())
+
+    def fetch(profile, source_secrets):
+        logger.info(f"fetch {profile.profile}")
+        # the service profile uses its role as session name, like in fetch_key_service_profile
+        session_name = profile.role if profile is profile_group.service_profile else user_name
+        if source_secrets:
+            return iam.assume_role_with_secrets(source_secrets, session_name, profile.account, profile.role)
+        source_profile = profile.source or session_token_profile_name
+        return iam.assume_role(source_profile, session_name, profile.account, profile.role)
+
+    profile_list = profile_group.get_profile_list(include_service_profile=include_service_profile)
+    if profile_names is not None:
+        # profiles outside the list keep their credentials and are used from disk as source
+        profile_list = [profile for profile in profile_list if profile.profile in profile_names]
     try:
-        for profile in profile_group.get_profile_list():
-            logger.info(f"fetch {profile.profile}")
-            source_profile = profile.source or util.generate_session_name(profile_group.get_access_key())
-            
-            secrets = iam.assume_role(source_profile, user_name, profile.account, profile.role)
-            
-            credentials.add_profile_credentials(credentials_file, profile.profile, secrets)
-            if util.use_as_default(profile, default_override):
-                credentials.add_profile_credentials(credentials_file, "default", secrets)
-
-            credentials.write_credentials_file(credentials_file)
+        secrets, errors = fanout.fetch_all(profile_list, fetch, concurrency=concurrency, chained=True)
+        store(profile_list, secrets, default_override)
     except Exception:
         error_text = "error while fetching role credentials"
         result.error(error_text)
         logger.error(error_text, exc_info=True)
         return result
 
+    if errors:
+        result.error(f"error while fetching role credentials for {', '.join(sorted(errors))}")
+        return result
+
+    result.add_payload({profile_name: profile_secrets.get("Expiration")
+                        for profile_name, profile_secrets in secrets.items()})
     result.set_success()
     return result
 
 
-def fetch_key_service_profile(profile_group: ProfileGroup, default_override: str | None) -> Result:
+def fetch_key_service_profile(profile_group: ProfileGroup,
+                              default_override: str | None,
+                              store: Callable = credentials.write_fetched_credentials,
+                              source_secrets: Optional[dict] = None) -> Result:
+    """
+    Assumes the service role with the credentials of its source profile. source_secrets is used for sources
+    that are not written to ~/.aws/credentials, e.g. in write mode process.
+    """
     result = Result()
-    credentials_file = credentials.load_credentials_file()
     logger.info("add service profile via access-key")
 
     service_profile = profile_group.service_profile
 
     try:
         logger.info(f"fetch {service_profile.profile}")
-        secrets = iam.assume_role(
-            service_profile.source,
-            service_profile.role,
-            service_profile.account,
-            service_profile.role,
-        )
-        credentials.add_profile_credentials(credentials_file, service_profile.profile, secrets)
-        if util.use_as_default(service_profile, default_override):
-            credentials.add_profile_credentials(credentials_file, "default", secrets)
-
-        credentials.write_credentials_file(credentials_file)
+        if source_secrets:
+            secrets = iam.assume_role_with_secrets(
+                source_secrets,
+                service_profile.role,
+                service_profile.account,
+                service_profile.role,
+            )
+        else:
+            secrets = iam.assume_role(
+                service_profile.source,
+                service_profile.role,
+                service_profile.account,
+                service_profile.role,
+            )
+        store([service_profile], {service_profile.profile: secrets}, default_override)
     except Exception:
         error_text = "error while fetching role credentials"
         result.error(error_text)
         logger.error(error_text, exc_info=True)
         return result
 
+    result.add_payload({service_profile.profile: secrets.get("Expiration")})
     result.set_success()
     return result
 
@@ -207,10 +256,71 @@ def get_access_key_id(key_name: str) -> str:
 
 
 def get_user_name(access_key) -> str:
+    user_arn = _get_session_user_arn(access_key) if has_valid_session(access_key) else None
+    if user_arn:
+        return user_arn.split("/")[-1]
     logger.info("fetch user name")
-    client = credentials.get_client(access_key, "sts")
+    return _extract_user_from_identity(get_caller_identity(access_key))
+
+
+def get_caller_identity(profile_name: str) -> dict:
+    # inside a transaction every profile is looked up once per login
+    active_transaction = credentials.get_transaction()
+    if active_transaction is not None and profile_name in active_transaction.identities:
+        return active_transaction.identities[profile_name]
+    client = credentials.get_client(profile_name, "sts", timeout=2, retries=2)
     identity = client.get_caller_identity()
-    return _extract_user_from_identity(identity)
+    if active_transaction is not None:
+        active_transaction.identities[profile_name] = identity
+    return identity
+
+
+def _get_cached_identity(profile_name: str) -> Optional[dict]:
+    active_transaction = credentials.get_transaction()
+    if active_transaction is None:
+        return None
+    return active_transaction.identities.get(profile_name)
+
+
+def get_session_expiration(access_key: str) -> Optional[datetime]:
+    credentials_file = credentials.load_credentials_file()
+    expiration = credentials_file.get(util.generate_session_name(access_key), session_expiration_option,
+                                      fallback=None)
+    try:
+        return to_datetime(expiration)
+    except ValueError:
+        return None
+
+
+def has_valid_session(access_key: str) -> bool:
+    credentials_file = credentials.load_credentials_file()
+    access_key_id = credentials_file.get(access_key, "aws_access_key_id", fallback=None)
+    session_access_key_id = credentials_file.get(util.generate_session_name(access_key),
+                                                 session_access_key_id_option, fallback=None)
+    if not access_key_id or access_key_id != session_access_key_id:
+        return False
+    expiration = get_session_expiration(access_key)
+    if expiration is None:
+        return False
+    return (expiration - datetime.now(timezone.utc)).total_seconds() > min_session_remaining_seconds
+
+
+def _get_session_user_arn(access_key: str) -> Optional[str]:
+    credentials_file = credentials.load_credentials_file()
+    return credentials_file.get(util.generate_session_name(access_key), session_user_arn_option, fallback=None)
+
+
+def _add_session_metadata(credentials_file, session_token_profile_name: str, secrets: dict,
+                          identity: Optional[dict], access_key_id: Optional[str]) -> None:
+    for option in [session_expiration_option, session_user_arn_option, session_access_key_id_option]:
+        credentials_file.remove_option(session_token_profile_name, option)
+    expiration = to_datetime(secrets.get("Expiration"))
+    if expiration:
+        credentials_file.set(session_token_profile_name, session_expiration_option, expiration.isoformat())
+    if identity and identity.get("Arn"):
+        credentials_file.set(session_token_profile_name, session_user_arn_option, identity["Arn"])
+    if access_key_id:
+        credentials_file.set(session_token_profile_name, session_access_key_id_option, access_key_id)
 
 
 def _extract_user_from_identity(identity):
@@ -218,9 +328,9 @@ def _extract_user_from_identity(identity):
 
 
 def _get_session_token(access_key: str, mfa_token: str) -> dict:
+    identity = get_caller_identity(access_key)
     client = credentials.get_client(access_key, "sts")
 
-    identity = client.get_caller_identity()
     duration = 43200  # 12 * 60 * 60
     user = _extract_user_from_identity(identity)
     mfa_arn = f'arn:aws:iam::{identity["Account"]}:mfa/{user}'
@@ -0,0 +1,119 @@
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from app.core import files
+from app.core.profile import Profile
+from app.core.profile_group import ProfileGroup
+from app.core.refresh_schedule import to_datetime
+
+logger = logging.getLogger("logsmith")
+
+# The cache is a plain text json file with mode 0600, like ~/.aws/credentials that holds the same credentials
+# while a group is active. It is not encrypted, anyone who can read the file can use the credentials until they expire.
+cache_file_name = "role_cache.json"
+cache_version = 1
+# credentials closer to their expiration are not restored, they would have to be refreshed right away
+min_remaining_seconds = 900
+
+
+def get_cache_path() -> str:
+    return os.path.join(files.get_app_path(), cache_file_name)
+
+
+def get_group_credentials(profile_group: ProfileGroup, access_key_id: str,
+                          min_remaining: int = min_remaining_seconds) -> Optional[Dict[str, dict]]:
+    """
+    Returns the cached role credentials of all profiles of the group, or None if any of them is missing,
+    expires within min_remaining seconds or was fetched for another access key, account or role.
+    """
+    entry = _load_entries().get(profile_group.name)
+    if not entry or entry.get("access_key_id") != access_key_id:
+        return None
+
+    cached_profiles = entry.get("profiles", {})
+    group_secrets = {}
+    for profile in profile_group.get_profile_list(include_service_profile=True):
+        cached = cached_profiles.get(profile.profile)
+        if not cached or cached.get("account") != profile.account or cached.get("role") != profile.role:
+            return None
+        if not _is_fresh(cached, min_remaining):
+            return None
+        group_secrets[profile.profile] = {
+            "AccessKeyId": cached["AccessKeyId"],
+            "SecretAccessKey": cached["SecretAccessKey"],
+            "SessionToken": cached["SessionToken"],
+            "Expiration": cached["Expiration"],
+        }
+    return group_secrets
+
+
+def store_group_credentials(profile_group: ProfileGroup, access_key_id: str, profile_list: List[Profile],
+                            secrets: Dict[str, dict]) -> None:
+    # the gui, the daemon and the warm standby all store groups, the shared write lock keeps their entries
+    with files.write_lock():
+        entries = _load_entries()
+        entry = entries.get(profile_group.name)
+        if not entry or entry.get("access_key_id") != access_key_id:
+            entry = {"access_key_id": access_key_id, "profiles": {}}
+        for profile in profile_list:
+            profile_secrets = secrets.get(profile.profile)
+            expiration = to_datetime(profile_secrets.get("Expiration")) if profile_secrets else None
+            if expiration is None:
+                continue
+            entry["profiles"][profile.profile] = {
+                "account": profile.account,
+                "role": profile.role,
+                "AccessKeyId": profile_secrets["AccessKeyId"],
+                "SecretAccessKey": profile_secrets["SecretAccessKey"],
+                "SessionToken": profile_secrets["SessionToken"],
+                "Expiration": expiration.isoformat(),
+            }
+        entries[profile_group.name] = entry
+        _write_entries(entries)
+
+
+def clear() -> None:
+    logger.info("clear role credential cache")
+    with files.write_lock():
+        files.remove_file(get_cache_path())
+
+
+def _is_fresh(cached: dict, min_remaining: int = min_remaining_seconds) -> bool:
+    try:
+        expiration = to_datetime(cached.get("Expiration"))
+    except ValueError:
+        return False
+    if expiration is None:
+        return False
+    return (expiration - datetime.now(timezone.utc)).total_seconds() > min_remaining
+
+
+def _load_entries() -> Dict[str, dict]:
+    try:
+        with open(get_cache_path(), "r") as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("version") != cache_version:
+        return {}
+    return cache.get("groups", {})
+
+
+def _write_entries(entries: Dict[str, dict]) -> None:
+    # expired credentials are dropped on every write, so the file does not grow with old groups
+    for group_name in list(entries):
+        profiles = {name: cached for name, cached in entries[group_name].get("profiles", {}).items()
+                    if _is_fresh(cached)}
+        if profiles:
+            entries[group_name]["profiles"] = profiles
+        else:
+            del entries[group_name]
+    if not entries:
+        clear()
+        return
+    os.makedirs(files.get_app_path(), exist_ok=True)
+    files.write_atomic(get_cache_path(), json.dumps({"version": cache_version, "groups": entries}))
+    os.chmod(get_cache_path(), 0o600)
@@ -0,0 +1,239 @@
+import io
+import logging
+import os
+import threading
+from configparser import ConfigParser
+from typing import Dict, List, Optional, Tuple
+
+from app.core import files
+
+logger = logging.getLogger("logsmith")
+
+comment_prefixes = ("#", ";")
+
+
+class Section:
+    __slots__ = ("name", "start", "body_start", "end", "values")
+
+    def __init__(self, name: str, start: int, body_start: int, end: int, values: Dict[str, str]):
+        # start..body_start holds the blank lines and comments above the header, body_start..end the section itself
+        self.name = name
+        self.start = start
+        self.body_start = body_start
+        self.end = end
+        self.values = values
+
+
+class SectionIndex:
+    """
+    Offsets and values of every section of an ini file, together with the file signature they were read from.
+    Writes copy unchanged sections verbatim from the old text and render only changed and new sections,
+    so comments and formatting of hand-maintained sections survive. The index of the written text is built
+    from the rendered parts, so the next write does not have to parse the file again.
+    """
+
+    def __init__(self, text: str, preamble_end: int, sections: List[Section], trailer_start: int,
+                 has_defaults: bool = False, signature: Optional[tuple] = None):
+        self.text = text
+        self.preamble_end = preamble_end
+        self.sections: Dict[str, Section] = {section.name: section for section in sections}
+        self.trailer_start = trailer_start
+        self.has_defaults = has_defaults
+        self.signature = signature
+
+    @classmethod
+    def parse(cls, text: str, config_parser: Optional[ConfigParser] = None,
+              signature: Optional[tuple] = None) -> "SectionIndex":
+        if config_parser is None:
+            config_parser = ConfigParser()
+            config_parser.read_string(text)
+
+        headers: List[Tuple[str, int]] = []
+        offset = 0
+        for line in text.splitlines(keepends=True):
+            # indented lines are continuations of multi line values
+            if not line[:1].isspace():
+                match = ConfigParser.SECTCRE.match(line.strip())
+                if match:
+                    headers.append((match.group("header"), offset))
+            offset += len(line)
+
+        next_starts = [header_start for _, header_start in headers[1:]] + [len(text)]
+        ends = [_get_body_end(text, header_start, next_start)
+                for (_, header_start), next_start in zip(headers, next_starts)]
+        preamble_end = _get_body_end(text, 0, headers[0][1]) if headers else len(text)
+        trailer_start = ends[-1] if ends else len(text)
+
+        sections = []
+        start = preamble_end
+        for (name, header_start), end in zip(headers, ends):
+            if name != config_parser.default_section:
+                sections.append(Section(name, start, header_start, end, dict(config_parser.items(name, raw=True))))
+            start = end
+        has_defaults = bool(config_parser.defaults()) or any(name == config_parser.default_section
+                                                             for name, _ in headers)
+        return cls(text, preamble_end, sections, trailer_start, has_defaults, signature)
+
+    def render(self, config_parser: ConfigParser) -> "SectionIndex":
+        return self.render_values(_get_values(config_parser))
+
+    def render_values(self, current: Dict[str, Dict[str, str]]) -> "SectionIndex":
+        preamble = self.text[:self.preamble_end]
+        parts = [preamble]
+        sections = []
+        length = len(preamble)
+        # text that is kept without a section of its own is carried over to the next section
+        pending = ""
+
+        def append(name, leading, body, values):
+            nonlocal length, pending
+            leading = pending + leading
+            pending = ""
+            parts.extend([leading, body])
+            sections.append(Section(name, length, length + len(leading), length + len(leading) + len(body), values))
+            length += len(leading) + len(body)
+
+        for name, section in self.sections.items():
+            values = current.get(name)
+            leading = self.text[section.start:section.body_start]
+            if values is None:
+                # comments above a removed section are kept, plain blank lines are not
+                if leading.strip():
+                    pending += leading
+            elif values == section.values:
+                append(name, leading, _with_newline(self.text[section.body_start:section.end]), values)
+            else:
+                append(name, leading, render_section(name, values), values)
+
+        if self.trailer_start < len(self.text):
+            pending += _with_newline(self.text[self.trailer_start:])
+        for name, values in current.items():
+            if name not in self.sections:
+                append(name, "\n" if length or pending else "", render_section(name, values), values)
+
+        parts.append(pending)
+        return SectionIndex("".join(parts), len(preamble), sections, length)
+
+
+def _get_values(config_parser: ConfigParser) -> Dict[str, Dict[str, str]]:
+    return {section: dict(config_parser.items(section, raw=True)) for section in config_parser.sections()}
+
+
+def render_section(name: str, values: Dict[str, str]) -> str:
+    config_parser = ConfigParser(interpolation=None)
+    config_parser.add_section(name)
+    for option, value in values.items():
+        config_parser.set(name, option, value)
+    buffer = io.StringIO()
+    config_parser.write(buffer)
+    # the blank line between sections belongs to the next section
+    return buffer.getvalue().rstrip("\n") + "\n"
+
+
+def _get_body_end(text: str, body_start: int, next_header: int) -> int:
+    # blank lines and comments directly above a header belong to that header
+    end = next_header
+    while end > body_start:
+        line_start = text.rfind("\n", body_start, end - 1) + 1
+        line_start = max(line_start, body_start)
+        line = text[line_start:end].strip()
+        if line and not line.startswith(comment_prefixes):
+            break
+        end = line_start
+    return end
+
+
+def _with_newline(text: str) -> str:
+    return text if text.endswith("\n") else text + "\n"
+
+
+_lock = threading.Lock()
+_indexes: Dict[str, SectionIndex] = {}
+# every loaded parser keeps the section values it was loaded with, so a write knows which sections the caller changed
+_loaded_values_attribute = "_section_index_loaded_values"
+
+
+def _get_signature(path: str) -> Optional[tuple]:
+    try:
+        file_stat = os.stat(path)
+    except OSError:
+        return None
+    return file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino
+
+
+def _get_index(path: str) -> Tuple[SectionIndex, Optional[ConfigParser]]:
+    signature = _get_signature(path)
+    with _lock:
+        index = _indexes.get(path)
+    if index is not None and signature is not None and index.signature == signature:
+        return index, None
+    try:
+        with open(path, "r") as file:
+            text = file.read()
+    except OSError:
+        text = ""
+    config_parser = ConfigParser()
+    config_parser.read_string(text, source=path)
+    index = SectionIndex.parse(text, config_parser, signature)
+    with _lock:
+        _indexes[path] = index
+    return index, config_parser
+
+
+def load(path: str) -> ConfigParser:
+    index, config_parser = _get_index(path)
+    if config_parser is None:
+        # the file is unchanged since it was indexed, its text does not have to be read again
+        config_parser = ConfigParser()
+        config_parser.read_string(index.text, source=path)
+    setattr(config_parser, _loaded_values_attribute,
+            {name: section.values for name, section in index.sections.items()})
+    return config_parser
+
+
+def write(path: str, config_parser: ConfigParser) -> None:
+    # the lock keeps other logsmith processes from replacing the file between reading and writing it
+    with files.write_lock():
+        index, _ = _get_index(path)
+        if index.has_defaults or config_parser.defaults():
+            # values of a DEFAULT section are merged into every section, a delta can not be computed per section
+            buffer = io.StringIO()
+            config_parser.write(buffer)
+            files.write_atomic(path, buffer.getvalue())
+            with _lock:
+                _indexes.pop(path, None)
+            return
+
+        current = _get_values(config_parser)
+        new_index = index.render_values(_merge(index, getattr(config_parser, _loaded_values_attribute, None), current))
+        if new_index.text != index.text or index.signature is None:
+            files.write_atomic(path, new_index.text)
+            new_index.signature = _get_signature(path)
+            with _lock:
+                _indexes[path] = new_index
+        # a later write of the same parser applies only what changed after this one
+        setattr(config_parser, _loaded_values_attribute, current)
+
+
+def _merge(index: SectionIndex, loaded: Optional[Dict[str, Dict[str, str]]],
+           current: Dict[str, Dict[str, str]]) -> Dict[str, Dict[str, str]]:
+    # parsers that were not loaded from the file replace it. For loaded parsers only the sections that changed
+    # since the load are applied, sections another process wrote in the meantime are kept.
+    if loaded is None:
+        return current
+    values = {name: section.values for name, section in index.sections.items()}
+    for name, section_values in current.items():
+        if section_values != loaded.get(name):
+            values[name] = section_values
+    for name in loaded:
+        if name not in current:
+            values.pop(name, None)
+    return values
+
+
+def invalidate(path: Optional[str] = None) -> None:
+    with _lock:
+        if path is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(path, None)
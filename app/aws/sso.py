@@ -1,9 +1,11 @@
 import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
 
-import boto3
-from app.aws import iam, credentials
+from app.aws import clients, credentials, fanout, iam, sso_oidc
 from app.core import files
 from app.core.profile import Profile
+from app.core.refresh_schedule import to_datetime
 from app.shell import shell
 
 from app.core.profile_group import ProfileGroup
@@ -13,6 +15,9 @@ from app.util.util import use_as_default
 logger = logging.getLogger("logsmith")
 
 sso_shadow_prefix = "sso-shadow-"
+min_token_remaining_seconds = 60
+# the sso token is renewed this long before it expires
+token_renewal_margin_seconds = 300
 
 
 def write_sso_profiles(profile_group: ProfileGroup, default_override: str | None, shadow_mode: bool) -> Result:
@@ -61,7 +66,7 @@ def write_sso_profiles(profile_group: ProfileGroup, default_override: str | None
                     profile_args["profile"] = "default"
                     credentials.add_sso_profile(**profile_args)
 
-            credentials.write_config_file(config_file)
+        credentials.write_config_file(config_file)
     except Exception:
         error_text = "error while fetching role credentials"
         result.error(error_text)
@@ -117,66 +122,80 @@ def write_sso_service_profile(profile_group: ProfileGroup, default_override: str
     return result
 
 
-def write_sso_as_key_credentials(profile_group: ProfileGroup, default_override: str | None) -> Result:
+def write_sso_as_key_credentials(profile_group: ProfileGroup,
+                                 default_override: str | None,
+                                 concurrency: int = fanout.default_concurrency) -> Result:
     result = Result()
-    credentials_file = credentials.load_credentials_file()
     logger.info("fetch credentials via sso (as key)")
 
-    try:
-        for profile in profile_group.get_profile_list():
-            logger.info(f"fetch {profile.profile}")
-
-            secrets = iam.get_frozen_credentials(f"{sso_shadow_prefix}{profile.profile}")
+    sso_token = get_sso_access_token(profile_group.get_sso_session())
+    if sso_token is None:
+        result.error("no valid sso access token found, please login again")
+        return result
+    access_token, sso_region = sso_token
 
-            credentials.add_profile_credentials(credentials_file, profile.profile, secrets)
-            if use_as_default(profile, default_override):
-                logger.info(f"set {profile.profile} to default")
-                credentials.add_profile_credentials(credentials_file, "default", secrets)
+    def fetch(profile, source_secrets):
+        logger.info(f"fetch {profile.profile}")
+        if source_secrets:
+            # chained profiles assume their role in the account of the source, like the sso chain profiles
+            source = profile_group.get_profile(profile.source)
+            return iam.assume_role_with_secrets(source_secrets, profile.role, source.account, profile.role)
+        return fetch_role_credentials_via_sso(access_token, sso_region, profile.account, profile.role)
 
-            credentials.write_credentials_file(credentials_file)
+    profile_list = profile_group.get_profile_list()
+    try:
+        secrets, errors = fanout.fetch_all(profile_list, fetch, concurrency=concurrency, chained=True)
+        credentials.write_fetched_credentials(profile_list, secrets, default_override)
     except Exception:
         error_text = "error while fetching role credentials"
         result.error(error_text)
         logger.error(error_text, exc_info=True)
         return result
 
+    if errors:
+        result.error(f"error while fetching role credentials for {', '.join(sorted(errors))}")
+        return result
+
+    result.add_payload({profile_name: profile_secrets.get("Expiration")
+                        for profile_name, profile_secrets in secrets.items()})
     result.set_success()
     return result
 
 
-def write_sso_as_key_credentials2(profile_group: ProfileGroup, default_override: str | None) -> Result:
-    result = Result()
-    credentials_file = credentials.load_credentials_file()
-    logger.info("fetch credentials via sso (as key)")
-
+def get_sso_access_token(sso_session_name: str) -> Optional[Tuple[str, str]]:
+    """
+    Returns the access token and region of the sso session from the token cache of the aws cli,
+    or None if there is no token or it expires within the next minute.
+    """
+    sso_token = files.load_sso_token(sso_session_name)
+    if sso_token is None:
+        return None
     try:
-        for profile in profile_group.get_profile_list():
-            logger.info(f"fetch {profile.profile}")
-
-            if not profile.source:
-                credential_result = fetch_role_credentials_via_sso(account_id=profile.account,
-                                                                   region=profile_group.region,
-                                                                   role_name=profile.role)
-                if not credential_result.was_success:
-                    return credential_result
-                secrets = credential_result.payload
-            else:
-                secrets = iam.assume_role(profile.source, profile.role, profile.account, profile.role)
-
-            credentials.add_profile_credentials(credentials_file, profile.profile, secrets)
-            if use_as_default(profile, default_override):
-                logger.info(f"set {profile.profile} to default")
-                credentials.add_profile_credentials(credentials_file, "default", secrets)
-
-            credentials.write_credentials_file(credentials_file)
-    except Exception:
-        error_text = "error while fetching role credentials"
-        result.error(error_text)
-        logger.error(error_text, exc_info=True)
-        return result
-
-    result.set_success()
-    return result
+        expires_at = to_datetime(sso_token.get("expiresAt"))
+    except ValueError:
+        return None
+    if expires_at is None or (expires_at - datetime.now(timezone.utc)).total_seconds() < min_token_remaining_seconds:
+        return None
+
+    sso_region = sso_token.get("region")
+    if not sso_region:
+        config_file = credentials.load_config_file()
+        sso_region = config_file.get(f"sso-session {sso_session_name}", "sso_region", fallback=None)
+    if not sso_region:
+        return None
+    return sso_token["accessToken"], sso_region
+
+
+def fetch_role_credentials_via_sso(access_token: str, sso_region: str, account_id: str, role_name: str) -> dict:
+    client = clients.get_unsigned_client("sso", sso_region, timeout=10, retries=3)
+    response = client.get_role_credentials(roleName=role_name, accountId=account_id, accessToken=access_token)
+    role_credentials = response["roleCredentials"]
+    return {
+        "AccessKeyId": role_credentials["accessKeyId"],
+        "SecretAccessKey": role_credentials["secretAccessKey"],
+        "SessionToken": role_credentials["sessionToken"],
+        "Expiration": to_datetime(role_credentials["expiration"]),
+    }
 
 
 def write_sso_service_profile_as_key_credentials(profile_group: ProfileGroup, default_override: str | None) -> Result:
@@ -209,6 +228,7 @@ def write_sso_service_profile_as_key_credentials(profile_group: ProfileGroup, de
         logger.error(error_text, exc_info=True)
         return result
 
+    result.add_payload({service_profile.profile: secrets.get("Expiration")})
     result.set_success()
     return result
 
@@ -243,16 +263,82 @@ def get_sso_sessions_list() -> list:
     return session_name_list
 
 
-def sso_login(profile_group: ProfileGroup) -> Result:
+def get_sso_token_expiration(sso_session_name: str) -> Optional[datetime]:
+    sso_token = files.load_sso_token(sso_session_name)
+    if sso_token is None:
+        return None
+    try:
+        return to_datetime(sso_token.get("expiresAt"))
+    except ValueError:
+        return None
+
+
+def is_sso_token_valid(sso_session_name: str) -> bool:
+    expiration = get_sso_token_expiration(sso_session_name)
+    if expiration is None:
+        return False
+    return (expiration - datetime.now(timezone.utc)).total_seconds() > token_renewal_margin_seconds
+
+
+def can_refresh_sso_token(sso_token: dict) -> bool:
+    if not all(sso_token.get(field) for field in ["refreshToken", "clientId", "clientSecret", "region"]):
+        return False
+    try:
+        registration_expiration = to_datetime(sso_token.get("registrationExpiresAt"))
+    except ValueError:
+        return False
+    return registration_expiration is None or registration_expiration > datetime.now(timezone.utc)
+
+
+def refresh_sso_token(sso_session_name: str) -> Result:
+    result = Result()
+    sso_token = files.load_sso_token(sso_session_name)
+    if sso_token is None or not can_refresh_sso_token(sso_token):
+        result.error("sso token can not be refreshed")
+        return result
+
+    logger.info(f"refresh sso token of {sso_session_name}")
+    try:
+        client = clients.get_unsigned_client("sso-oidc", sso_token["region"], timeout=10, retries=3)
+        response = client.create_token(grantType="refresh_token",
+                                       clientId=sso_token["clientId"],
+                                       clientSecret=sso_token["clientSecret"],
+                                       refreshToken=sso_token["refreshToken"])
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=response["expiresIn"])
+        sso_token["accessToken"] = response["accessToken"]
+        sso_token["expiresAt"] = expires_at.strftime("%Y-%m-%dT%H:%M:%SZ")
+        if response.get("refreshToken"):
+            sso_token["refreshToken"] = response["refreshToken"]
+        files.save_sso_token(sso_session_name, sso_token)
+    except Exception:
+        error_text = "error while refreshing sso token"
+        result.error(error_text)
+        logger.error(error_text, exc_info=True)
+        return result
+
+    result.set_success()
+    return result
+
+
+def sso_login(profile_group: ProfileGroup, force: bool = False) -> Result:
+    result = Result()
     sso_session_name = profile_group.get_sso_session()
 
-    # boto3 does not support login at the moment
-    # unset AWS_PROFILE and AWS_DEFAULT_PROFILE because sso login fails is profile is present
-    # or aborts when profiles are not found.
-    return shell.run(
-        command=f"env -u AWS_PROFILE -u AWS_DEFAULT_PROFILE aws sso login --sso-session {sso_session_name}",
-        timeout=600,
-    )
+    # a forced login always starts a new device login, the cached token is what the user wants to replace
+    if force:
+        return sso_oidc.login(sso_session_name)
+
+    # the token may still be valid, also when it was renewed by aws sso login outside of logsmith
+    if is_sso_token_valid(sso_session_name):
+        logger.info(f"sso token of {sso_session_name} is still valid, skip sso login")
+        result.set_success()
+        return result
+    sso_token = files.load_sso_token(sso_session_name)
+    if sso_token is not None and can_refresh_sso_token(sso_token) and refresh_sso_token(sso_session_name).was_success:
+        result.set_success()
+        return result
+
+    return sso_oidc.login(sso_session_name)
 
 
 def sso_logout() -> Result:
@@ -0,0 +1,98 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List
+
+from app.aws import clients, fanout, sso
+from app.core import files, sso_catalog
+from app.core.result import Result
+
+logger = logging.getLogger("logsmith")
+
+# roles change less often than accounts, they are listed again after this time
+role_max_age_seconds = 24 * 60 * 60
+
+
+def discover(sso_session_name: str, concurrency: int = fanout.default_concurrency, full: bool = False) -> Result:
+    """
+    Lists the accounts of the sso session and the roles of new or stale accounts, and stores them in the catalog.
+    The payload holds the generation of the session, the number of accounts and of accounts whose roles were listed.
+    """
+    result = Result()
+    sso_token = sso.get_sso_access_token(sso_session_name)
+    if sso_token is None:
+        result.error("no valid sso access token found, please login again")
+        return result
+    access_token, sso_region = sso_token
+
+    logger.info(f"discover accounts of {sso_session_name}")
+    try:
+        client = clients.get_unsigned_client("sso", sso_region, timeout=10, retries=3)
+        accounts = list_accounts(client, access_token)
+    except Exception:
+        error_text = f"error while listing the accounts of {sso_session_name}"
+        result.error(error_text)
+        logger.error(error_text, exc_info=True)
+        return result
+
+    catalog = files.load_sso_catalog()
+    session_entry = sso_catalog.get_session_entry(catalog, sso_session_name)
+    if full:
+        stale_account_ids = list(accounts)
+    else:
+        stale_account_ids = sso_catalog.get_stale_account_ids(session_entry, list(accounts), role_max_age_seconds)
+    roles, errors = list_all_account_roles(client, access_token, stale_account_ids, concurrency)
+
+    # roles that could be listed are kept even if other accounts failed
+    sso_catalog.update_session_entry(catalog, sso_session_name, accounts, roles)
+    files.save_sso_catalog(catalog)
+
+    if errors:
+        result.error(f"error while listing the roles of {', '.join(sorted(errors))}")
+        return result
+
+    result.add_payload({
+        "generation": sso_catalog.get_generation(catalog, sso_session_name),
+        "accounts": len(accounts),
+        "listed_roles": len(roles),
+    })
+    result.set_success()
+    return result
+
+
+def list_accounts(client, access_token: str) -> Dict[str, dict]:
+    accounts = {}
+    paginator = client.get_paginator("list_accounts")
+    for page in paginator.paginate(accessToken=access_token):
+        for account in page.get("accountList", []):
+            accounts[account["accountId"]] = {"name": account.get("accountName", ""),
+                                              "email": account.get("emailAddress", "")}
+    return accounts
+
+
+def list_account_roles(client, access_token: str, account_id: str) -> List[str]:
+    roles = []
+    paginator = client.get_paginator("list_account_roles")
+    for page in paginator.paginate(accessToken=access_token, accountId=account_id):
+        roles.extend(role["roleName"] for role in page.get("roleList", []))
+    return roles
+
+
+def list_all_account_roles(client, access_token: str, account_ids: List[str],
+                           concurrency: int) -> (Dict[str, List[str]], Dict[str, str]):
+    roles: Dict[str, List[str]] = {}
+    errors: Dict[str, str] = {}
+    if not account_ids:
+        return roles, errors
+
+    max_workers = max(1, min(int(concurrency), len(account_ids)))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="discover") as executor:
+        futures = {executor.submit(fanout.call_with_backoff, list_account_roles, client, access_token, account_id):
+                   account_id for account_id in account_ids}
+        for future in as_completed(futures):
+            account_id = futures[future]
+            try:
+                roles[account_id] = future.result()
+            except Exception as error:
+                logger.error(f"error while listing the roles of {account_id}", exc_info=True)
+                errors[account_id] = str(error)
+    return roles, errors
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import logging
+import time
+import webbrowser
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional
+
+from app.aws import clients, credentials
+from app.core import files
+from app.core.refresh_schedule import to_datetime
+from app.core.result import Result
+
+logger = logging.getLogger("logsmith")
+
+device_code_grant_type = "urn:ietf:params:oauth:grant-type:device_code"
+# same limit as the former aws sso login, the user has to confirm the code in the browser within this time
+login_timeout_seconds = 600
+# client registrations are renewed this long before they expire, like the aws cli does
+registration_renewal_margin_seconds = 900
+slow_down_seconds = 5
+
+
+def login(sso_session_name: str, open_browser: Callable[[str], bool] = webbrowser.open) -> Result:
+    """
+    Logs in to the sso session with the oidc device authorization flow, like aws sso login --use-device-code.
+    The client registration and the token are written to ~/.aws/sso/cache in the format of the aws cli,
+    so the aws cli and the sdks use the token as well.
+    """
+    result = Result()
+    sso_session = get_sso_session_config(sso_session_name)
+    if sso_session is None:
+        result.error(f"sso session {sso_session_name} is missing sso_start_url or sso_region")
+        return result
+    start_url, sso_region, scopes = sso_session
+
+    logger.info(f"start sso login of {sso_session_name}")
+    try:
+        client = clients.get_unsigned_client("sso-oidc", sso_region, timeout=10, retries=3)
+        registration = get_client_registration(client, sso_session_name, start_url, sso_region, scopes)
+        authorization = client.start_device_authorization(clientId=registration["clientId"],
+                                                          clientSecret=registration["clientSecret"],
+                                                          startUrl=start_url)
+        verification_uri = authorization.get("verificationUriComplete") or authorization["verificationUri"]
+        logger.info(f"confirm the code {authorization['userCode']} at {verification_uri}")
+        if not open_browser(verification_uri):
+            logger.warning(f"could not open a browser, open {verification_uri} manually")
+
+        response = _poll_token(client, registration, authorization)
+        if response is None:
+            result.error("sso login was not confirmed in time")
+            return result
+    except Exception:
+        error_text = f"error during sso login of {sso_session_name}"
+        result.error(error_text)
+        logger.error(error_text, exc_info=True)
+        return result
+
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=response["expiresIn"])
+    sso_token = {
+        "startUrl": start_url,
+        "region": sso_region,
+        "accessToken": response["accessToken"],
+        "expiresAt": _format_timestamp(expires_at),
+        "clientId": registration["clientId"],
+        "clientSecret": registration["clientSecret"],
+        "registrationExpiresAt": registration["expiresAt"],
+    }
+    if response.get("refreshToken"):
+        sso_token["refreshToken"] = response["refreshToken"]
+    files.save_sso_token(sso_session_name, sso_token)
+    logger.info(f"sso login of {sso_session_name} successful")
+    result.set_success()
+    return result
+
+
+def get_sso_session_config(sso_session_name: str) -> Optional[tuple]:
+    config_file = credentials.load_config_file()
+    section = f"sso-session {sso_session_name}"
+    start_url = config_file.get(section, "sso_start_url", fallback=None)
+    sso_region = config_file.get(section, "sso_region", fallback=None)
+    if not start_url or not sso_region:
+        return None
+    scopes_text = config_file.get(section, "sso_registration_scopes", fallback="")
+    scopes = [scope.strip() for scope in scopes_text.split(",") if scope.strip()]
+    return start_url, sso_region, scopes
+
+
+def get_registration_cache_key(sso_session_name: str, start_url: str, sso_region: str, scopes: List[str]) -> str:
+    # the same key as the aws cli, so both share one registration
+    args = {"tool": "botocore", "startUrl": start_url, "region": sso_region}
+    if scopes:
+        args["scopes"] = scopes
+    args["session_name"] = sso_session_name
+    cache_args = json.dumps(args, sort_keys=True)
+    return hashlib.sha1(cache_args.encode("utf-8")).hexdigest()
+
+
+def get_client_registration(client, sso_session_name: str, start_url: str, sso_region: str,
+                            scopes: List[str]) -> dict:
+    cache_key = get_registration_cache_key(sso_session_name, start_url, sso_region, scopes)
+    registration = files.load_sso_registration(cache_key)
+    if registration is not None and _is_registration_valid(registration):
+        return registration
+
+    logger.info(f"register sso client for {sso_session_name}")
+    register_args = {"clientName": f"botocore-client-{int(time.time())}", "clientType": "public"}
+    if scopes:
+        register_args["scopes"] = scopes
+    response = client.register_client(**register_args)
+    registration = {
+        "clientId": response["clientId"],
+        "clientSecret": response["clientSecret"],
+        "expiresAt": _format_timestamp(datetime.fromtimestamp(response["clientSecretExpiresAt"], timezone.utc)),
+    }
+    if scopes:
+        registration["scopes"] = scopes
+    files.save_sso_registration(cache_key, registration)
+    return registration
+
+
+def _is_registration_valid(registration: dict) -> bool:
+    try:
+        expires_at = to_datetime(registration.get("expiresAt"))
+    except ValueError:
+        return False
+    if expires_at is None:
+        return False
+    return (expires_at - datetime.now(timezone.utc)).total_seconds() > registration_renewal_margin_seconds
+
+
+def _poll_token(client, registration: dict, authorization: dict) -> Optional[dict]:
+    from botocore.exceptions import ClientError
+
+    interval_seconds = authorization.get("interval") or slow_down_seconds
+    deadline = time.monotonic() + min(authorization.get("expiresIn", login_timeout_seconds), login_timeout_seconds)
+    while time.monotonic() < deadline:
+        time.sleep(interval_seconds)
+        try:
+            return client.create_token(grantType=device_code_grant_type,
+                                       deviceCode=authorization["deviceCode"],
+                                       clientId=registration["clientId"],
+                                       clientSecret=registration["clientSecret"])
+        except ClientError as error:
+            error_code = error.response.get("Error", {}).get("Code")
+            if error_code == "AuthorizationPendingException":
+                continue
+            if error_code == "SlowDownException":
+                interval_seconds += slow_down_seconds
+                continue
+            if error_code == "ExpiredTokenException":
+                return None
+            raise
+    return None
+
+
+def _format_timestamp(timestamp: datetime) -> str:
+    return timestamp.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
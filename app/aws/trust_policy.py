@@ -0,0 +1,178 @@
+import json
+import logging
+from fnmatch import fnmatchcase
+from typing import List, Union
+from urllib.parse import unquote
+
+logger = logging.getLogger("logsmith")
+
+assume_role_action = "sts:assumerole"
+principal_arn_condition_keys = {"aws:principalarn"}
+principal_account_condition_keys = {"aws:principalaccount"}
+positive_condition_operators = {"stringequals", "stringlike", "arnequals", "arnlike"}
+negative_condition_operators = {"stringnotequals", "stringnotlike", "arnnotequals", "arnnotlike"}
+
+
+class Principal:
+    """
+    The identity that wants to assume a role, e.g. a role or user of the source profile.
+    IAM names are unique per account and type, so the path of the arn does not matter for matching.
+    """
+
+    def __init__(self, account_id: str, principal_type: str, name: str):
+        self.account_id: str = account_id
+        self.principal_type: str = principal_type
+        self.name: str = name
+
+    @property
+    def arn(self) -> str:
+        return f"arn:aws:iam::{self.account_id}:{self.principal_type}/{self.name}"
+
+    @staticmethod
+    def from_caller_arn(arn: str) -> "Principal":
+        # arn:aws:sts::123456789012:assumed-role/role-name/session-name
+        # arn:aws:iam::123456789012:user/path/user-name
+        account_id = arn.split(":")[4]
+        resource = arn.split(":", 5)[5]
+        resource_parts = resource.split("/")
+        if resource_parts[0] == "assumed-role":
+            return Principal(account_id, "role", resource_parts[1])
+        return Principal(account_id, resource_parts[0], resource_parts[-1])
+
+    def __repr__(self):
+        return f"Principal({self.arn})"
+
+
+def parse_policy_document(document: Union[str, dict, None]) -> dict:
+    # the iam api returns url-encoded json, boto3 usually decodes it already
+    if not document:
+        return {}
+    if isinstance(document, dict):
+        return document
+    try:
+        return json.loads(unquote(document))
+    except ValueError:
+        logger.warning("could not parse policy document", exc_info=True)
+        return {}
+
+
+def allows_assume_role(document: Union[str, dict, None], principal: Principal) -> bool:
+    policy = parse_policy_document(document)
+    allowed = False
+    for statement in _as_list(policy.get("Statement")):
+        if not isinstance(statement, dict) or not _statement_applies(statement, principal):
+            continue
+        if statement.get("Effect") == "Deny":
+            return False
+        if statement.get("Effect") == "Allow":
+            allowed = True
+    return allowed
+
+
+def filter_assumable_roles(role_list: List[dict], principal: Principal) -> List[str]:
+    return [role["RoleName"] for role in role_list
+            if allows_assume_role(role.get("AssumeRolePolicyDocument"), principal)]
+
+
+def _statement_applies(statement: dict, principal: Principal) -> bool:
+    if "Action" in statement:
+        if not any(fnmatchcase(assume_role_action, action.lower()) for action in _as_list(statement["Action"])):
+            return False
+    elif "NotAction" in statement:
+        if any(fnmatchcase(assume_role_action, action.lower()) for action in _as_list(statement["NotAction"])):
+            return False
+    else:
+        return False
+
+    if "Principal" not in statement:
+        return False
+    if not _principal_matches(statement["Principal"], principal):
+        return False
+    return _condition_matches(statement.get("Condition", {}), principal)
+
+
+def _principal_matches(statement_principal: Union[str, dict], principal: Principal) -> bool:
+    if statement_principal == "*":
+        return True
+    if not isinstance(statement_principal, dict):
+        return False
+    return any(_principal_entry_matches(entry, principal) for entry in _as_list(statement_principal.get("AWS")))
+
+
+def _principal_entry_matches(entry: str, principal: Principal) -> bool:
+    if entry == "*":
+        return True
+    if entry.isdigit():
+        return entry == principal.account_id
+    parts = entry.split(":", 5)
+    if len(parts) != 6 or parts[2] != "iam":
+        return False
+    account_id = parts[4]
+    resource = parts[5]
+    if resource == "root":
+        return account_id == principal.account_id
+    return _arn_matches(entry, principal)
+
+
+def _arn_matches(pattern: str, principal: Principal) -> bool:
+    parts = pattern.split(":", 5)
+    resource_parts = parts[5].split("/")
+    if not fnmatchcase(principal.account_id, parts[4]) or not fnmatchcase(principal.principal_type,
+                                                                           resource_parts[0]):
+        return False
+    if len(resource_parts) < 2:
+        return False
+    # the principal is only known by its name, so ignore the path unless the pattern spans it with a wildcard
+    if fnmatchcase(principal.name, resource_parts[-1]):
+        return True
+    return fnmatchcase(principal.name, "/".join(resource_parts[1:]))
+
+
+def _condition_matches(condition: dict, principal: Principal) -> bool:
+    # only conditions on the principal can be evaluated locally, all others are assumed to be satisfied
+    if not isinstance(condition, dict):
+        return True
+    for operator, values in condition.items():
+        operator_name = operator.lower().split(":")[-1].replace("ifexists", "")
+        if not isinstance(values, dict):
+            continue
+        for key, expected in values.items():
+            key_name = key.lower()
+            if key_name in principal_arn_condition_keys:
+                actual = principal.arn
+                patterns = [_strip_arn_path(pattern) for pattern in _as_list(expected)]
+            elif key_name in principal_account_condition_keys:
+                actual = principal.account_id
+                patterns = _as_list(expected)
+            else:
+                continue
+            matches = any(_condition_value_matches(operator_name, actual, pattern) for pattern in patterns)
+            if operator_name in positive_condition_operators and not matches:
+                return False
+            if operator_name in negative_condition_operators and matches:
+                return False
+    return True
+
+
+def _condition_value_matches(operator_name: str, actual: str, pattern: str) -> bool:
+    if operator_name.endswith("like"):
+        return fnmatchcase(actual, pattern)
+    return actual == pattern
+
+
+def _strip_arn_path(arn: str) -> str:
+    parts = arn.split(":", 5)
+    if len(parts) != 6:
+        return arn
+    resource_parts = parts[5].split("/")
+    if len(resource_parts) <= 2:
+        return arn
+    return ":".join(parts[:5] + [f"{resource_parts[0]}/{resource_parts[-1]}"])
+
+
+def _as_list(value) -> List:
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    return [value]
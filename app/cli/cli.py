@@ -1,23 +1,17 @@
 import os
+import signal
 import sys
-import time
 from getpass import getpass
 
-from app.aws import iam
 from app.aws.regions import region_list
+from app.cli import output
 from app.core.core import Core
+from app.core.refresh_loop import RefreshLoop
 from app.core.result import Result
-from core.profile_group import ProfileGroup
+from app.core.profile_group import ProfileGroup
 
 script_dir = os.path.dirname(os.path.realpath(__file__))
 work_dir = os.getcwd()
-C = "\x1b[1m"
-CO = "\x1b[1m\x1b[38;5;208m"
-CB = "\x1b[1m\x1b[34m"
-CR = "\x1b[1m\x1b[31m"
-CG = "\x1b[1m\x1b[32m"
-CY = "\x1b[1m\x1b[93m"
-CC = "\x1b[0m"
 
 
 class Cli:
@@ -47,9 +41,10 @@ class Cli:
             self.login_with_key(profile_group=profile_group, region=region, oneshot=oneshot)
         elif profile_group.get_auth_mode() == 'sso':
             self.login_with_sso(profile_group=profile_group, region=region, oneshot=oneshot)
-        result = Result()
-        result.error('auth_mode was neither key or sso.')
-        return result
+        else:
+            result = Result()
+            result.error('auth_mode was neither key or sso.')
+            return result
 
     def login_with_key(self, profile_group: ProfileGroup, region: str, oneshot: bool):
         login_result = self.core.login_with_key(profile_group=profile_group, mfa_token=None)
@@ -66,12 +61,7 @@ class Cli:
 
         if oneshot:
             sys.exit(0)
-
-        seconds = 300
-        self._info(f'start timer for {seconds}')
-        time.sleep(seconds)
-        self.login(profile_group.name, region)
-
+        self.run_refresh_loop()
 
     def login_with_sso(self, profile_group: ProfileGroup, region: str, oneshot: bool):
         login_result = self.core.login_with_sso(profile_group=profile_group)
@@ -84,16 +74,39 @@ class Cli:
 
         if oneshot:
             sys.exit(0)
-
-        seconds = 28800
-        self._info(f'start timer for {seconds}')
-        time.sleep(seconds)
-        self.login(profile_group.name, region)
+        self.run_refresh_loop()
+
+    def run_refresh_loop(self):
+        refresh_loop = RefreshLoop(refresh=self._refresh, get_delay=self.core.get_next_refresh_delay)
+        # SIGTERM and SIGINT end the loop after a running refresh, SIGHUP refreshes immediately
+        signal.signal(signal.SIGTERM, lambda signum, frame: refresh_loop.stop())
+        signal.signal(signal.SIGINT, lambda signum, frame: refresh_loop.stop())
+        signal.signal(signal.SIGHUP, lambda signum, frame: refresh_loop.trigger())
+        refresh_loop.run()
+        self._info('refresh stopped')
+
+    def _refresh(self) -> Result:
+        profile_group = self.core.active_profile_group
+        refresh_result = self.core.refresh()
+        if (not refresh_result.was_success and not refresh_result.was_error
+                and profile_group.auth_mode == 'key' and sys.stdin.isatty()):
+            # the session token expired, a new one needs a mfa token
+            refresh_result = self.core.login_with_key(profile_group=profile_group,
+                                                      mfa_token=self.ask_for_mfa_token())
+        if refresh_result.was_success:
+            self.core.verify()
+            self._info('refresh successful')
+        return refresh_result
 
     def logout(self):
         logout_result = self.core.logout()
         self._check_and_signal_error(logout_result)
 
+    def set_default(self, profile_name):
+        set_default_result = self.core.set_default_profile(profile_name)
+        self._check_and_signal_error(set_default_result)
+        self._info(f'default profile set to {profile_name}')
+
     def rotate_access_key(self, key_name):
         rotate_result = self.core.rotate_access_key(access_key=key_name, mfa_token=None)
         self._check_and_signal_error(rotate_result)
@@ -142,7 +155,7 @@ class Cli:
         self._info('service role was successfully set')
 
     def list_service_roles(self, profile):
-        result = iam.list_assumable_roles(source_profile=profile)
+        result = self.core.list_assumable_roles(source_profile=profile)
         if not self._check_and_signal_error(result):
             return
 
@@ -150,6 +163,16 @@ class Cli:
         for role in result.payload:
             print(role)
 
+    def discover_accounts(self, sso_session_name):
+        result = self.core.discover_sso_accounts(sso_session_name=sso_session_name)
+        self._check_and_signal_error(result)
+
+        discovery = result.payload
+        self._info(f'{discovery["accounts"]} accounts in the sso catalog (generation {discovery["generation"]}), '
+                   f'roles listed for {discovery["listed_roles"]}')
+        for group_name in discovery["groups"]:
+            print(group_name)
+
     def toggle(self, toggle, value):
         boolean = self._parse_boolean(value)
         if toggle == 'script':
@@ -173,15 +196,15 @@ class Cli:
 
     @staticmethod
     def _info(s):
-        print(f'{CG}{s}{CC}')
+        output.info(s)
 
     @staticmethod
     def _error(s):
-        print(f'{CR}{s}{CC}')
+        output.error(s)
 
     @staticmethod
     def _warning(s):
-        print(f'{CY}{s}{CC}')
+        output.warning(s)
 
     @staticmethod
     def _print_regions():
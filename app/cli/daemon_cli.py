@@ -0,0 +1,73 @@
+import sys
+from typing import Optional
+
+from app.cli import output
+from app.core.result import Result
+from app.daemon import client
+
+
+class DaemonCli:
+    """
+    Thin client for a running logsmith daemon. It imports neither Core nor boto3,
+    so commands return as soon as the daemon answers.
+    """
+
+    def login(self, profile_group_name: str, region: Optional[str]):
+        login_result = client.send("login", group=profile_group_name, region=region)
+        self._check_and_signal_error(login_result)
+        if not login_result.was_success:
+            mfa_token = input('mfa token: ')
+            login_result = client.send("login", group=profile_group_name, region=region, mfa_token=mfa_token)
+            self._check_and_signal_error(login_result)
+        output.info('login successful')
+
+    def logout(self):
+        self._check_and_signal_error(client.send("logout"))
+        output.info('logout successful')
+
+    def set_region(self, region: str):
+        self._check_and_signal_error(client.send("region", region=region))
+        output.info(f'region set to {region}')
+
+    def set_default(self, profile: str):
+        self._check_and_signal_error(client.send("set-default", profile=profile))
+        output.info(f'default profile set to {profile}')
+
+    def status(self):
+        status_result = client.send("status")
+        self._check_and_signal_error(status_result)
+        self._print_status(status_result.payload)
+
+    def verify(self):
+        verify_result = client.send("verify")
+        self._check_and_signal_error(verify_result)
+        self._print_status(verify_result.payload)
+
+    @staticmethod
+    def _print_status(status: dict):
+        if not status.get('group'):
+            output.warning('not logged in')
+            return
+        output.info(f"group: {status['group']}")
+        print(f"region: {status['region']}")
+        if status.get('default_profile'):
+            print(f"default profile: {status['default_profile']}")
+        if status.get('last_login'):
+            print(f"last login: {status['last_login']}")
+        if status.get('credential_server'):
+            print(f"credential server: {status['credential_server']}")
+        for profile in status.get('profiles', []):
+            line = f"  {profile['profile']}: {'verified' if profile['verified'] else 'not verified'}"
+            if profile.get('expiration'):
+                line += f", expires {profile['expiration']}"
+            if profile['verified']:
+                print(line)
+            else:
+                output.warning(line)
+
+    @staticmethod
+    def _check_and_signal_error(result: Result):
+        if result.was_error:
+            output.error(result.error_message)
+            sys.exit(1)
+        return True
@@ -1,7 +1,22 @@
-from app.cli.cli import Cli
+import sys
+
+from app import arguments
+from app.cli import output
+from app.cli.daemon_cli import DaemonCli
+from app.daemon import client
 
 
 def start_cli(args):
+    if arguments.use_daemon_client(args):
+        if client.is_running():
+            start_daemon_client(args)
+            return
+        if args.status or args.verify:
+            output.error(client.not_running_message)
+            sys.exit(1)
+
+    # only import core and boto3 when there is no daemon to talk to
+    from app.cli.cli import Cli
     cli = Cli()
     if args.list:
         cli.list()
@@ -9,6 +24,8 @@ def start_cli(args):
         cli.login(args.login, args.region, args.oneshot)
     if args.logout:
         cli.logout()
+    if args.set_default:
+        cli.set_default(args.set_default)
     if args.rotate_access_key:
         cli.rotate_access_key(args.rotate_access_key)
     if args.set_access_key:
@@ -22,5 +39,23 @@ def start_cli(args):
         profile = args.set_service_roles[1]
         role = args.set_service_roles[2]
         cli.set_service_role(group, profile, role)
+    if args.discover_accounts is not None:
+        cli.discover_accounts(args.discover_accounts or None)
     if args.toggle:
         cli.toggle(args.toggle[0], args.toggle[1])
+
+
+def start_daemon_client(args):
+    daemon_cli = DaemonCli()
+    if args.login:
+        daemon_cli.login(args.login, args.region)
+    elif args.region:
+        daemon_cli.set_region(args.region)
+    if args.logout:
+        daemon_cli.logout()
+    if args.set_default:
+        daemon_cli.set_default(args.set_default)
+    if args.verify:
+        daemon_cli.verify()
+    elif args.status:
+        daemon_cli.status()
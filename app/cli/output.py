@@ -0,0 +1,19 @@
+C = "\x1b[1m"
+CO = "\x1b[1m\x1b[38;5;208m"
+CB = "\x1b[1m\x1b[34m"
+CR = "\x1b[1m\x1b[31m"
+CG = "\x1b[1m\x1b[32m"
+CY = "\x1b[1m\x1b[93m"
+CC = "\x1b[0m"
+
+
+def info(s):
+    print(f'{CG}{s}{CC}')
+
+
+def error(s):
+    print(f'{CR}{s}{CC}')
+
+
+def warning(s):
+    print(f'{CY}{s}{CC}')
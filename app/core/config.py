@@ -1,16 +1,32 @@
+import time
 from typing import List, Dict, Optional
 
-from app.core import files
+from app.core import files, sso_catalog
+from app.core.profile import Profile
 from app.core.profile_group import ProfileGroup
+from app.util import util
 
 _default_access_key = 'access-key'
 _default_sso_sesson = 'sso'
 _default_sso_interval = '8'
+_default_request_concurrency = '8'
+_default_warm_standby_groups = '0'
+_default_warm_standby_sts_budget = '60'
+
+# the assumable roles are cached in ~/.logsmith/assumable_roles_cache.json, keyed by account and source principal
+assumable_roles_cache_ttl_seconds = 3600
+
+# group switches are counted in ~/.logsmith/group_usage.json, older switches weigh less with every half life
+group_usage_half_life_seconds = 3 * 24 * 60 * 60
 
 
 class Config:
     def __init__(self):
         self.profile_groups: Dict[str, ProfileGroup] = {}
+        self._groups_by_account: Dict[str, List[ProfileGroup]] = {}
+        # the raw accounts.yaml data and catalog generation of every group, to find the groups that changed on reload
+        self._group_data: Dict[str, tuple] = {}
+        self._sso_catalog: dict = {}
         self.service_roles: Dict = {}
 
         self.valid = False
@@ -21,14 +37,15 @@ class Config:
         self.default_access_key = None
         self.default_sso_session = None
         self.default_sso_interval = None
+        self.request_concurrency = None
+        self.credential_server_port = None
+        self.yaml_cache_sidecar = False
+        self.role_credential_cache = False
+        self.warm_standby_groups = None
+        self.warm_standby_sts_budget = None
 
     def initialize(self) -> None:
-        config = files.load_config()
-        self.mfa_shell_command = config.get('mfa_shell_command', None)
-        self.shell_path_extension = config.get('shell_path_extension', None)
-        self.default_access_key = config.get('default_access_key', _default_access_key)
-        self.default_sso_session = config.get('default_sso_session', _default_sso_sesson)
-        self.default_sso_interval = config.get('default_sso_interval', _default_sso_interval)
+        self._apply_settings(files.load_config())
 
         self.service_roles = files.load_service_roles()
 
@@ -38,26 +55,137 @@ class Config:
                                        default_sso_session=self.default_sso_session,
                                        default_sso_interval=self.default_sso_interval)
 
+    def _apply_settings(self, config: dict) -> None:
+        self.mfa_shell_command = config.get('mfa_shell_command', None)
+        self.shell_path_extension = config.get('shell_path_extension', None)
+        self.default_access_key = config.get('default_access_key', _default_access_key)
+        self.default_sso_session = config.get('default_sso_session', _default_sso_sesson)
+        self.default_sso_interval = config.get('default_sso_interval', _default_sso_interval)
+        self.request_concurrency = config.get('request_concurrency', _default_request_concurrency)
+        self.credential_server_port = config.get('credential_server_port', None)
+        self.yaml_cache_sidecar = bool(config.get('yaml_cache_sidecar', False))
+        files.set_yaml_cache_sidecar(self.yaml_cache_sidecar)
+        self.role_credential_cache = bool(config.get('role_credential_cache', False))
+        self.warm_standby_groups = config.get('warm_standby_groups', _default_warm_standby_groups)
+        self.warm_standby_sts_budget = config.get('warm_standby_sts_budget', _default_warm_standby_sts_budget)
+
     def initialize_profile_groups(self, accounts: dict, service_roles: dict, 
                                   default_access_key: str, 
                                   default_sso_session: str,
                                   default_sso_interval: str) -> None:
-        self.profile_groups = {}
+        self._group_data = {}
+        self._sso_catalog = _load_sso_catalog(accounts)
+        profile_groups = {}
+        for group_name, group_data in accounts.items():
+            profile_groups[group_name] = self._create_profile_group(group_name, group_data, service_roles,
+                                                                    default_access_key=default_access_key,
+                                                                    default_sso_session=default_sso_session,
+                                                                    default_sso_interval=default_sso_interval)
+        self._set_profile_groups(profile_groups)
+
+    def reload_settings(self) -> None:
+        group_defaults = (self.default_access_key, self.default_sso_session, self.default_sso_interval)
+        self._apply_settings(files.load_config())
+        if group_defaults != (self.default_access_key, self.default_sso_session, self.default_sso_interval):
+            # the defaults are part of every group
+            self.initialize_profile_groups(accounts=files.load_accounts(), service_roles=self.service_roles,
+                                           default_access_key=self.default_access_key,
+                                           default_sso_session=self.default_sso_session,
+                                           default_sso_interval=self.default_sso_interval)
+
+    def reload_accounts(self) -> List[str]:
+        """
+        Reads accounts.yaml again and only creates the groups that were added or changed. Unchanged groups keep
+        their objects and with them the verification state of their profiles.
+        Returns the names of all added, changed and removed groups.
+        """
+        accounts = files.load_accounts()
+        self._sso_catalog = _load_sso_catalog(accounts)
+        changed_groups = [group_name for group_name, group_data in accounts.items()
+                          if group_name not in self.profile_groups
+                          or self._group_data.get(group_name) != self._get_group_state(group_data,
+                                                                                       self.default_sso_session)]
+        removed_groups = [group_name for group_name in self.profile_groups if group_name not in accounts]
+        if not changed_groups and not removed_groups:
+            return []
+
+        profile_groups = {}
         for group_name, group_data in accounts.items():
-            profile_group = ProfileGroup(name=group_name,
-                                         group=group_data,
-                                         default_access_key=default_access_key,
-                                         default_sso_session=default_sso_session,
-                                         default_sso_interval=default_sso_interval)
-            self.profile_groups[group_name] = profile_group
-
-            if group_name in service_roles:
-                selected_service_source_profile = service_roles[group_name].get('selected_profile', None)
-                selected_service_role = service_roles[group_name].get('selected_role', None)
-                if selected_service_source_profile and selected_service_role:
-                    profile_group.set_service_role_profile(
-                        source_profile_name=selected_service_source_profile,
-                        role_name=selected_service_role)
+            if group_name in changed_groups:
+                profile_groups[group_name] = self._create_profile_group(
+                    group_name, group_data, self.service_roles,
+                    default_access_key=self.default_access_key,
+                    default_sso_session=self.default_sso_session,
+                    default_sso_interval=self.default_sso_interval)
+            else:
+                profile_groups[group_name] = self.profile_groups[group_name]
+        for group_name in removed_groups:
+            self._group_data.pop(group_name, None)
+        self._set_profile_groups(profile_groups)
+        return changed_groups + removed_groups
+
+    def reload_service_roles(self) -> List[str]:
+        # logsmith writes this file itself, reading back its own write changes nothing
+        service_roles = files.load_service_roles()
+        if service_roles == self.service_roles:
+            return []
+        self.service_roles = service_roles
+        changed_groups = []
+        for group_name, profile_group in self.profile_groups.items():
+            selected_profile = self.get_selected_service_role_source_profile(group_name)
+            selected_role = self.get_selected_service_role(group_name)
+            service_profile = profile_group.service_profile
+            if not selected_profile or not selected_role:
+                continue
+            if service_profile and (service_profile.source, service_profile.role) == (selected_profile, selected_role):
+                continue
+            profile_group.set_service_role_profile(source_profile_name=selected_profile, role_name=selected_role)
+            self._set_profile_groups(self.profile_groups)
+            changed_groups.append(group_name)
+        return changed_groups
+
+    def _create_profile_group(self, group_name: str, group_data: dict, service_roles: dict,
+                              default_access_key: str,
+                              default_sso_session: str,
+                              default_sso_interval: str) -> ProfileGroup:
+        catalog_profiles = None
+        if group_data.get('catalog'):
+            sso_session = group_data.get('sso_session', None) or default_sso_session
+            catalog_profiles = sso_catalog.select_profiles(
+                sso_catalog.get_session_entry(self._sso_catalog, sso_session), group_data['catalog'])
+        profile_group = ProfileGroup(name=group_name,
+                                     group=group_data,
+                                     default_access_key=default_access_key,
+                                     default_sso_session=default_sso_session,
+                                     default_sso_interval=default_sso_interval,
+                                     catalog_profiles=catalog_profiles)
+        self._group_data[group_name] = self._get_group_state(group_data, default_sso_session)
+
+        if group_name in service_roles:
+            selected_service_source_profile = service_roles[group_name].get('selected_profile', None)
+            selected_service_role = service_roles[group_name].get('selected_role', None)
+            if selected_service_source_profile and selected_service_role:
+                profile_group.set_service_role_profile(
+                    source_profile_name=selected_service_source_profile,
+                    role_name=selected_service_role)
+        return profile_group
+
+    def _get_group_state(self, group_data: dict, default_sso_session: str) -> tuple:
+        # groups that select from the catalog change with the generation of their sso session as well
+        if not group_data.get('catalog'):
+            return group_data, None
+        sso_session = group_data.get('sso_session', None) or default_sso_session
+        return group_data, sso_catalog.get_generation(self._sso_catalog, sso_session)
+
+    def _set_profile_groups(self, profile_groups: Dict[str, ProfileGroup]) -> None:
+        groups_by_account = {}
+        for profile_group in profile_groups.values():
+            for profile in profile_group.profiles:
+                groups = groups_by_account.setdefault(profile.account, [])
+                if not groups or groups[-1] is not profile_group:
+                    groups.append(profile_group)
+        self.profile_groups = profile_groups
+        self._groups_by_account = groups_by_account
         self.validate()
 
     def set_mfa_shell_command(self, mfa_shell_command: str) -> None:
@@ -78,6 +206,45 @@ class Config:
     def set_default_sso_session(self, default_sso_session: str) -> None:
         self.default_sso_session = default_sso_session
 
+    def set_request_concurrency(self, request_concurrency: str) -> None:
+        self.request_concurrency = request_concurrency
+
+    def get_request_concurrency(self) -> int:
+        if util.is_positive_int(self.request_concurrency) and int(self.request_concurrency) > 0:
+            return int(self.request_concurrency)
+        return int(_default_request_concurrency)
+
+    def set_credential_server_port(self, credential_server_port: str | None) -> None:
+        self.credential_server_port = credential_server_port or None
+
+    def get_credential_server_port(self) -> Optional[int]:
+        if util.is_positive_int(self.credential_server_port) and 0 < int(self.credential_server_port) < 65536:
+            return int(self.credential_server_port)
+        return None
+
+    def set_yaml_cache_sidecar(self, yaml_cache_sidecar: bool) -> None:
+        self.yaml_cache_sidecar = bool(yaml_cache_sidecar)
+        files.set_yaml_cache_sidecar(self.yaml_cache_sidecar)
+
+    def set_role_credential_cache(self, role_credential_cache: bool) -> None:
+        self.role_credential_cache = bool(role_credential_cache)
+
+    def set_warm_standby_groups(self, warm_standby_groups: str) -> None:
+        self.warm_standby_groups = warm_standby_groups
+
+    def get_warm_standby_groups(self) -> int:
+        if util.is_positive_int(self.warm_standby_groups):
+            return int(self.warm_standby_groups)
+        return int(_default_warm_standby_groups)
+
+    def set_warm_standby_sts_budget(self, warm_standby_sts_budget: str) -> None:
+        self.warm_standby_sts_budget = warm_standby_sts_budget
+
+    def get_warm_standby_sts_budget(self) -> int:
+        if util.is_positive_int(self.warm_standby_sts_budget):
+            return int(self.warm_standby_sts_budget)
+        return int(_default_warm_standby_sts_budget)
+
     def save_config(self) -> None:
         files.save_config_file({
             'mfa_shell_command': self.mfa_shell_command,
@@ -85,6 +252,12 @@ class Config:
             'default_access_key': self.default_access_key,
             'default_sso_session': self.default_sso_session,
             'default_sso_interval': self.default_sso_interval,
+            'request_concurrency': self.request_concurrency,
+            'credential_server_port': self.credential_server_port,
+            'yaml_cache_sidecar': self.yaml_cache_sidecar,
+            'role_credential_cache': self.role_credential_cache,
+            'warm_standby_groups': self.warm_standby_groups,
+            'warm_standby_sts_budget': self.warm_standby_sts_budget,
         })
 
     def save_accounts(self) -> None:
@@ -115,6 +288,41 @@ class Config:
         self.service_roles[group_name]['available'][profile_name] = role_list
         files.save_service_roles_file(self.service_roles)
 
+    def save_cached_assumable_roles(self, account_id: str, principal_arn: str, role_list: List[str]) -> None:
+        cache = files.load_assumable_roles_cache()
+        cache.setdefault(account_id, {})[principal_arn] = {
+            'fetched_at': int(time.time()),
+            'roles': role_list,
+        }
+        files.save_assumable_roles_cache(cache)
+
+    def get_cached_assumable_roles(self, account_id: str, principal_arn: str,
+                                   ttl_seconds: int = assumable_roles_cache_ttl_seconds) -> Optional[List[str]]:
+        entry = files.load_assumable_roles_cache().get(account_id, {}).get(principal_arn)
+        if not entry:
+            return None
+        if time.time() - entry.get('fetched_at', 0) > ttl_seconds:
+            return None
+        return entry.get('roles')
+
+    def record_group_switch(self, group_name: str) -> None:
+        now = int(time.time())
+        usage = files.load_group_usage()
+        entry = usage.get(group_name, {})
+        usage[group_name] = {
+            'score': _decay(entry.get('score', 0), now - entry.get('last_used', now)) + 1,
+            'last_used': now,
+        }
+        files.save_group_usage(usage)
+
+    def get_frequent_groups(self) -> List[str]:
+        # most frequently used groups first, recent switches count more than old ones
+        now = int(time.time())
+        usage = files.load_group_usage()
+        scores = {group_name: _decay(entry.get('score', 0), now - entry.get('last_used', now))
+                  for group_name, entry in usage.items() if group_name in self.profile_groups}
+        return sorted(scores, key=lambda group_name: scores[group_name], reverse=True)
+
     def get_selected_service_role_source_profile(self, group: str) -> Optional[str]:
         return self.service_roles.get(group, {}).get('selected_profile')
 
@@ -160,8 +368,26 @@ class Config:
     def get_group(self, name) -> Optional[ProfileGroup]:
         return self.profile_groups.get(name, None)
 
+    def get_profiles_by_account(self, account_id: str) -> List[Profile]:
+        # the groups keep their own account index, which also follows changes of the service profile
+        profiles = []
+        for profile_group in self._groups_by_account.get(str(account_id), []):
+            profiles.extend(profile_group.get_profiles_by_account(account_id))
+        return profiles
+
     def to_dict(self) -> dict:
         d = {}
         for name, group in self.profile_groups.items():
             d[name] = group.to_dict()
         return d
+
+
+def _load_sso_catalog(accounts: dict) -> dict:
+    # most setups list their profiles, the catalog is only read when a group selects from it
+    if any(isinstance(group_data, dict) and group_data.get('catalog') for group_data in accounts.values()):
+        return files.load_sso_catalog()
+    return {}
+
+
+def _decay(score: float, elapsed_seconds: int) -> float:
+    return score * 0.5 ** (max(elapsed_seconds, 0) / group_usage_half_life_seconds)
@@ -1,17 +1,32 @@
 import logging
-from typing import Optional, List
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from functools import partial
+from typing import Callable, Optional, List
 
-from app.aws import iam, key, credentials, sso
+from app.aws import iam, key, credentials, credential_process, role_cache, sso, sso_discovery
+from app.aws.credential_server import CredentialServer
 from app.core import files
 from app.core.config import Config, ProfileGroup
+from app.core.file_watcher import FileWatcher
 from app.core.profile import Profile
+from app.core.refresh_schedule import RefreshSchedule
 from app.core.result import Result
+from app.core.sts_budget import StsBudget
 from app.core.toggles import Toggles
 from app.gcp import login, config
 from app.shell import shell
+from app.util import util
 
 logger = logging.getLogger("logsmith")
 
+verify_timeout_seconds = 5
+verify_retries = 2
+verify_deadline_seconds = 30
+# the warm standby checks its groups this often, groups are fetched again before the role cache drops them
+standby_interval_seconds = 300
+min_sso_token_delay_seconds = 60
+
 
 class Core:
     def __init__(self):
@@ -24,6 +39,10 @@ class Core:
         self.default_profile_override: str | None = None
         self.empty_profile_group: ProfileGroup = ProfileGroup("logout", {}, "", "", "")
         self.region_override: str | None = None
+        self.refresh_schedule: RefreshSchedule = RefreshSchedule()
+        self.credential_server: CredentialServer = CredentialServer()
+        self.last_login: datetime | None = None
+        self.sts_budget: StsBudget = StsBudget()
 
     ########################
     # ACCESS KEY LOGIN
@@ -32,12 +51,38 @@ class Core:
     ) -> Result:
         result = Result()
         logger.info(f"start key login {profile_group.name} with token {mfa_token}")
-        self.active_profile_group = profile_group
 
-        cleanup_resul = credentials.cleanup()
-        if not cleanup_resul.was_success:
-            return cleanup_resul
+        with credentials.transaction():
+            switch_group = not self._is_active_group(profile_group)
+            cleanup_resul = self._cleanup(profile_group)
+            if not cleanup_resul.was_success:
+                return cleanup_resul
+
+            if not (switch_group and self._restore_cached_roles(profile_group)):
+                fetch_result = self._fetch_key_roles(profile_group, mfa_token)
+                if not fetch_result.was_success:
+                    return fetch_result
+
+            set_region_result = self.set_region(self.region_override)
+            if not set_region_result.was_success:
+                return set_region_result
+
+        logger.info("key login success")
+        self.last_login = datetime.now(timezone.utc)
+        if switch_group and self.is_warm_standby_enabled():
+            self.config.record_group_switch(profile_group.name)
+        self._handle_support_files(profile_group)
+
+        if self.toggles.run_script:
+            run_script_result = self.run_script(profile_group)
+            if not run_script_result.was_success:
+                return run_script_result
+
+        result.set_success()
+        return result
 
+    def _fetch_key_roles(self, profile_group: ProfileGroup, mfa_token: Optional[str]) -> Result:
+        result = Result()
         access_key = profile_group.get_access_key()
         access_key_result = key.check_access_key(access_key=access_key)
         if not access_key_result.was_success:
@@ -50,66 +95,121 @@ class Core:
             return session_result
 
         user_name = key.get_user_name(access_key=access_key)
-        role_result = key.fetch_key_credentials(user_name, profile_group, self.default_profile_override)
+        role_result = key.fetch_key_credentials(user_name, profile_group, self.default_profile_override,
+                                                concurrency=self.config.get_request_concurrency(),
+                                                **self._get_store_args(profile_group))
         if not role_result.was_success:
             return role_result
+        self.refresh_schedule.update(role_result.payload)
 
         if profile_group.service_profile is not None:
-            service_profile_result = key.fetch_key_service_profile(profile_group, self.default_profile_override)
+            service_profile_result = key.fetch_key_service_profile(profile_group, self.default_profile_override,
+                                                                   **self._get_store_args(profile_group),
+                                                                   source_secrets=self._get_service_source_secrets(
+                                                                       profile_group))
             if not service_profile_result.was_success:
                 return service_profile_result
+            self.refresh_schedule.update(service_profile_result.payload)
 
-        set_region_result = self.set_region(self.region_override)
-        if not set_region_result.was_success:
-            return set_region_result
+        result.set_success()
+        return result
 
-        logger.info("key login success")
-        self._handle_support_files(profile_group)
+    def _restore_cached_roles(self, profile_group: ProfileGroup) -> bool:
+        # switching back to a recently used group only writes the cached role credentials
+        if not self._use_role_cache(profile_group):
+            return False
+        try:
+            access_key_id = key.get_access_key_id(profile_group.get_access_key())
+        except Exception:
+            return False
+        group_secrets = role_cache.get_group_credentials(profile_group, access_key_id)
+        if group_secrets is None:
+            return False
+
+        logger.info(f"restore role credentials of {profile_group.name} from cache")
+        store = self._get_store_args(profile_group, cache_roles=False).get("store",
+                                                                           credentials.write_fetched_credentials)
+        store(profile_group.get_profile_list(include_service_profile=True), group_secrets,
+              self.default_profile_override)
+        self.refresh_schedule.update({profile_name: secrets["Expiration"]
+                                      for profile_name, secrets in group_secrets.items()})
+        return True
+
+    def refresh_with_key(self, profile_group: ProfileGroup) -> Result:
+        if not self._is_active_group(profile_group):
+            return self.login_with_key(profile_group, mfa_token=None)
 
-        if self.toggles.run_script:
-            run_script_result = self.run_script(profile_group)
-            if not run_script_result.was_success:
-                return run_script_result
+        result = Result()
+        profile_names = self._get_profiles_to_refresh(profile_group)
+        logger.info(f"start key refresh {profile_group.name}: {', '.join(profile_names) or 'nothing to refresh'}")
+        if not profile_names:
+            result.set_success()
+            return result
 
+        with credentials.transaction():
+            access_key = profile_group.get_access_key()
+            session_result = self._ensure_session(access_key=access_key, mfa_token=None)
+            if not session_result.was_success:
+                return session_result
+
+            role_names = [name for name in profile_names
+                          if not profile_group.service_profile or name != profile_group.service_profile.profile]
+            if role_names:
+                user_name = key.get_user_name(access_key=access_key)
+                role_result = key.fetch_key_credentials(user_name, profile_group, self.default_profile_override,
+                                                        concurrency=self.config.get_request_concurrency(),
+                                                        profile_names=role_names,
+                                                        **self._get_store_args(profile_group))
+                if not role_result.was_success:
+                    return role_result
+                self.refresh_schedule.update(role_result.payload)
+
+            if profile_group.service_profile is not None and profile_group.service_profile.profile in profile_names:
+                service_profile_result = key.fetch_key_service_profile(
+                    profile_group, self.default_profile_override, **self._get_store_args(profile_group),
+                    source_secrets=self._get_service_source_secrets(profile_group))
+                if not service_profile_result.was_success:
+                    return service_profile_result
+                self.refresh_schedule.update(service_profile_result.payload)
+
+        logger.info("key refresh success")
         result.set_success()
         return result
 
     ########################
     # SSO LOGIN
-    def login_with_sso(self, profile_group: ProfileGroup) -> Result:
+    def login_with_sso(self, profile_group: ProfileGroup, force: bool = False) -> Result:
         result = Result()
         logger.info(f"start sso login {profile_group.name}")
-        self.active_profile_group = profile_group
 
-        cleanup_resul = credentials.cleanup()
-        if not cleanup_resul.was_success:
-            return cleanup_resul
-
-        sso_login_result = sso.sso_login(profile_group)
-        if not sso_login_result.was_success:
-            return sso_login_result
-
-        if profile_group.write_mode == "sso":
-            write_result = self.login_with_sso__write_sso(profile_group)
-            if not write_result.was_success:
-                return write_result
-
-        elif profile_group.write_mode == "key":
-            write_result = self.login_with_sso__write_sso(profile_group, True)
-            if not write_result.was_success:
-                return write_result
-            write_result = self.login_with_sso_write_key(profile_group)
-            if not write_result.was_success:
-                return write_result
-        else:
-            result.error("unkown write mode")
-            return result
+        with credentials.transaction():
+            cleanup_resul = self._cleanup(profile_group)
+            if not cleanup_resul.was_success:
+                return cleanup_resul
+
+            sso_login_result = sso.sso_login(profile_group, force=force)
+            if not sso_login_result.was_success:
+                return sso_login_result
+
+            if profile_group.write_mode == "sso":
+                write_result = self.login_with_sso__write_sso(profile_group)
+                if not write_result.was_success:
+                    return write_result
+
+            elif profile_group.write_mode == "key":
+                write_result = self.login_with_sso_write_key(profile_group)
+                if not write_result.was_success:
+                    return write_result
+            else:
+                result.error("unkown write mode")
+                return result
 
-        set_region_result = self.set_region(self.region_override)
-        if not set_region_result.was_success:
-            return set_region_result
+            set_region_result = self.set_region(self.region_override)
+            if not set_region_result.was_success:
+                return set_region_result
 
         logger.info("sso login success")
+        self.last_login = datetime.now(timezone.utc)
         self._handle_support_files(profile_group)
 
         if self.toggles.run_script:
@@ -138,18 +238,161 @@ class Core:
     def login_with_sso_write_key(self, profile_group: ProfileGroup) -> Result:
         result = Result()
         logger.info("write mode: key")
-        sso_credentiol_result = sso.write_sso_as_key_credentials(profile_group, self.default_profile_override)
-        if not sso_credentiol_result.was_success:
-            return sso_credentiol_result
+        with credentials.transaction():
+            sso_credentiol_result = sso.write_sso_as_key_credentials(profile_group, self.default_profile_override,
+                                                                      concurrency=self.config.get_request_concurrency())
+            if not sso_credentiol_result.was_success:
+                return sso_credentiol_result
+            self.refresh_schedule.update(sso_credentiol_result.payload)
+
+            if profile_group.service_profile is not None:
+                service_profile_result = sso.write_sso_service_profile_as_key_credentials(profile_group, self.default_profile_override )
+                if not service_profile_result.was_success:
+                    return service_profile_result
+                self.refresh_schedule.update(service_profile_result.payload)
 
-        if profile_group.service_profile is not None:
-            service_profile_result = sso.write_sso_service_profile_as_key_credentials(profile_group, self.default_profile_override )
-            if not service_profile_result.was_success:
-                return service_profile_result
+        result.set_success()
+        return result
 
+    ########################
+    # REFRESH
+    def refresh(self) -> Result:
+        # keeps the active group logged in, key groups refresh their credentials shortly before they expire
+        # and sso groups log in again once the sso interval has passed
+        result = Result()
+        profile_group = self.active_profile_group
+        if profile_group is None or profile_group.type != "aws":
+            result.set_success()
+            return result
+
+        if profile_group.auth_mode == "key":
+            return self.refresh_with_key(profile_group)
+        if self.should_login_with_sso(profile_group):
+            return self.login_with_sso(profile_group)
+        if profile_group.write_mode == "key":
+            return self.login_with_sso_write_key(profile_group)
         result.set_success()
         return result
 
+    def get_next_refresh_delay(self) -> int:
+        delay_seconds = self.refresh_schedule.get_next_delay()
+        # sso groups log in again just before their sso token expires
+        token_delay_seconds = self._get_sso_token_delay()
+        if token_delay_seconds is not None:
+            delay_seconds = min(delay_seconds, token_delay_seconds)
+        return delay_seconds
+
+    ########################
+    # WARM STANDBY
+    def is_warm_standby_enabled(self) -> bool:
+        return self.config.get_warm_standby_groups() > 0
+
+    def get_next_standby_delay(self) -> int:
+        return standby_interval_seconds
+
+    def prefetch_standby_groups(self) -> Result:
+        # keeps the role credentials of the most used key groups in the role cache,
+        # so switching to one of them only writes the cached credentials
+        result = Result()
+        if not self.is_warm_standby_enabled():
+            result.set_success()
+            return result
+
+        failed_groups = []
+        for profile_group in self._get_standby_groups():
+            prefetch_result = self._prefetch_group(profile_group)
+            if not prefetch_result.was_success:
+                failed_groups.append(profile_group.name)
+        if failed_groups:
+            result.error(f"warm standby failed for {', '.join(failed_groups)}")
+            return result
+        result.set_success()
+        return result
+
+    def _get_standby_groups(self) -> List[ProfileGroup]:
+        standby_groups = []
+        for group_name in self.config.get_frequent_groups():
+            profile_group = self.config.get_group(group_name)
+            if profile_group.type != "aws" or profile_group.auth_mode != "key":
+                continue
+            if self._is_active_group(profile_group):
+                continue
+            standby_groups.append(profile_group)
+        return standby_groups[:self.config.get_warm_standby_groups()]
+
+    def _prefetch_group(self, profile_group: ProfileGroup) -> Result:
+        result = Result()
+        access_key = profile_group.get_access_key()
+        try:
+            access_key_id = key.get_access_key_id(access_key)
+        except Exception:
+            logger.info(f"skip warm standby of {profile_group.name}, access key {access_key} not found")
+            result.set_success()
+            return result
+
+        # credentials are fetched again one interval before the role cache would stop restoring them
+        min_remaining = role_cache.min_remaining_seconds + standby_interval_seconds
+        if role_cache.get_group_credentials(profile_group, access_key_id, min_remaining=min_remaining) is not None:
+            result.set_success()
+            return result
+
+        # the background never asks for a mfa token, it uses the session of an earlier login
+        if not key.has_valid_session(access_key):
+            logger.info(f"skip warm standby of {profile_group.name}, no session for {access_key}")
+            result.set_success()
+            return result
+
+        profile_list = profile_group.get_profile_list(include_service_profile=True)
+        if not self.sts_budget.try_spend(len(profile_list), self.config.get_warm_standby_sts_budget()):
+            logger.info(f"skip warm standby of {profile_group.name}, the sts budget for this hour is spent")
+            result.set_success()
+            return result
+
+        logger.info(f"prefetch role credentials of {profile_group.name}")
+
+        def store(fetched_profile_list, secrets, _):
+            role_cache.store_group_credentials(profile_group, access_key_id, fetched_profile_list, secrets)
+
+        user_name = key.get_user_name(access_key=access_key)
+        return key.fetch_key_credentials(user_name, profile_group, None,
+                                         concurrency=self.config.get_request_concurrency(),
+                                         store=store, include_service_profile=True)
+
+    def should_login_with_sso(self, profile_group: ProfileGroup) -> bool:
+        if self.last_login is None:
+            return True
+        sso_interval = profile_group.get_sso_interval()
+        if not util.is_positive_int(sso_interval) or int(sso_interval) == 0:
+            return False
+        # the cached sso token decides, it may also have been renewed by aws sso login outside of logsmith.
+        # without a token the interval since the last login is used.
+        token_expiration = sso.get_sso_token_expiration(profile_group.get_sso_session())
+        if token_expiration is not None:
+            remaining_seconds = (token_expiration - datetime.now(timezone.utc)).total_seconds()
+            return remaining_seconds <= sso.token_renewal_margin_seconds
+        elapsed_seconds = (datetime.now(timezone.utc) - self.last_login).total_seconds()
+        return elapsed_seconds >= int(sso_interval) * 60 * 60
+
+    def is_refresh_due(self) -> bool:
+        profile_group = self.active_profile_group
+        if self._is_sso_group(profile_group) and self.should_login_with_sso(profile_group):
+            return True
+        return not self.refresh_schedule.has_expirations() or bool(self.refresh_schedule.get_stale_profiles())
+
+    def _get_sso_token_delay(self) -> Optional[int]:
+        profile_group = self.active_profile_group
+        if not self._is_sso_group(profile_group):
+            return None
+        token_expiration = sso.get_sso_token_expiration(profile_group.get_sso_session())
+        if token_expiration is None:
+            return None
+        remaining_seconds = (token_expiration - datetime.now(timezone.utc)).total_seconds()
+        return max(int(remaining_seconds) - sso.token_renewal_margin_seconds, min_sso_token_delay_seconds)
+
+    @staticmethod
+    def _is_sso_group(profile_group: Optional[ProfileGroup]) -> bool:
+        return profile_group is not None and profile_group.type == "aws" and profile_group.auth_mode == "sso"
+
     ########################
     # GCP
     def login_gcp(self, profile_group: ProfileGroup) -> Result:
@@ -196,16 +439,39 @@ class Core:
 
     ########################
     # VERIFY
-    def verify(self) -> Result:
+    def verify(self, on_verified: Optional[Callable[[Profile], None]] = None) -> Result:
         try:
             logger.info("start verify profiles")
             result = Result()
 
-            for profile in self.active_profile_group.get_profile_list(include_service_profile=True):
+            profile_list = self.active_profile_group.get_profile_list(include_service_profile=True)
+            max_workers = max(1, min(self.config.get_request_concurrency(), len(profile_list)))
+            executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="verify")
+            futures = {}
+            for profile in profile_list:
                 logger.info(f"verify {profile.profile}")
-                profile.verified = iam.get_caller_identity(profile.profile)
-                # profile.verified = True
-                logger.info(f"  status {profile.verified}")
+                future = executor.submit(iam.get_caller_identity, profile.profile,
+                                         timeout=verify_timeout_seconds, retries=verify_retries,
+                                         read_timeout=verify_timeout_seconds)
+                futures[future] = profile
+
+            try:
+                for future in as_completed(futures, timeout=verify_deadline_seconds):
+                    profile = futures[future]
+                    profile.verified = future.result()
+                    logger.info(f"  status {profile.profile} {profile.verified}")
+                    if on_verified:
+                        on_verified(profile)
+            except TimeoutError:
+                for future, profile in futures.items():
+                    if future.done():
+                        continue
+                    logger.warning(f"  verify {profile.profile} exceeded {verify_deadline_seconds}s")
+                    profile.verified = False
+                    if on_verified:
+                        on_verified(profile)
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
 
             result.set_success()
             return result
@@ -224,6 +490,7 @@ class Core:
         set_default_result = credentials.set_as_default_profile(profile_name)
         if not set_default_result.was_success:
             return set_default_result
+        self.credential_server.set_default(profile_name)
 
         result.set_success()
         return result
@@ -235,6 +502,11 @@ class Core:
         logger.info(f"start logout")
         self.active_profile_group = None
         self.default_profile_override = None
+        self.last_login = None
+        self.refresh_schedule.clear()
+        credential_process.clear_cache()
+        self.credential_server.clear()
+        role_cache.clear()
 
         cleanup_result = credentials.cleanup()
         if not cleanup_result.was_success:
@@ -303,6 +575,7 @@ class Core:
             return delete_access_key_result
 
         logger.info("save key")
+        role_cache.clear()
         key.set_access_key(
             key_name=access_key,
             key_id=create_access_key_result.payload["AccessKeyId"],
@@ -324,9 +597,84 @@ class Core:
             logger.error(str(error), exc_info=True)
             result.error("could not save config or accounts")
             return result
+        return self.update_credential_server()
+
+    def update_credential_server(self) -> Result:
+        result = Result()
+        port = self.config.get_credential_server_port()
+        if self.credential_server.get_port() == port:
+            result.set_success()
+            return result
+
+        self.credential_server.stop()
+        if port is None:
+            result.set_success()
+            return result
+        try:
+            self.credential_server.start(port)
+        except OSError:
+            error_text = f"could not start credential server on port {port}"
+            result.error(error_text)
+            logger.error(error_text, exc_info=True)
+            return result
         result.set_success()
         return result
 
+    ########################
+    # SSO DISCOVERY
+    def discover_sso_accounts(self, sso_session_name: Optional[str] = None, full: bool = False) -> Result:
+        sso_session_name = sso_session_name or self.config.default_sso_session
+        discover_result = sso_discovery.discover(sso_session_name,
+                                                 concurrency=self.config.get_request_concurrency(),
+                                                 full=full)
+        # groups are rebuilt from the roles that could be listed, also when some accounts failed
+        changed_groups = self.reload_accounts()
+        if not discover_result.was_success:
+            return discover_result
+
+        result = Result()
+        result.add_payload({**discover_result.payload, "groups": changed_groups})
+        result.set_success()
+        return result
+
+    ########################
+    # RELOAD
+    @staticmethod
+    def watch_files(file_watcher: FileWatcher, on_change: Callable[[str], None]) -> None:
+        """
+        Registers the files that are reloaded when another program or the user changes them.
+        on_change is called with the kind of change: accounts, config, service_roles or sso_token.
+        """
+        file_watcher.watch(files.get_accounts_path(), partial(on_change, "accounts"))
+        file_watcher.watch(files.get_config_path(), partial(on_change, "config"))
+        file_watcher.watch(files.get_service_roles_path(), partial(on_change, "service_roles"))
+        # groups that select their profiles from the sso catalog change with it
+        file_watcher.watch(files.get_sso_catalog_path(), partial(on_change, "accounts"))
+        file_watcher.watch(files.get_aws_cache_path(), partial(on_change, "sso_token"), directory=True)
+
+    def reload_accounts(self) -> List[str]:
+        changed_groups = self.config.reload_accounts()
+        if changed_groups:
+            logger.info(f"reloaded groups {', '.join(changed_groups)}")
+        if self.active_profile_group and self.active_profile_group.name in changed_groups:
+            profile_group = self.config.get_group(self.active_profile_group.name)
+            if profile_group:
+                # the credentials stay written, the next refresh uses the changed profiles
+                self.active_profile_group = profile_group
+            else:
+                logger.warning(f"active group {self.active_profile_group.name} was removed from the accounts")
+        return changed_groups
+
+    def reload_config(self) -> Result:
+        self.config.reload_settings()
+        return self.update_credential_server()
+
+    def reload_service_roles(self) -> List[str]:
+        return self.config.reload_service_roles()
+
+    def is_active_sso_group(self) -> bool:
+        return self._is_sso_group(self.active_profile_group)
+
     def set_service_role(self, profile_name: str, role_name: str) -> Result:
         result = Result()
         logger.info("set service role")
@@ -354,6 +702,33 @@ class Core:
         result.set_success()
         return result
 
+    def list_assumable_roles(self, source_profile: str) -> Result:
+        result = Result()
+        logger.info(f"list assumable roles for {source_profile}")
+        try:
+            principal = iam.get_principal(source_profile)
+        except Exception:
+            error_text = f"could not get identity of profile {source_profile}"
+            logger.error(error_text, exc_info=True)
+            result.error(error_text)
+            return result
+
+        cached_roles = self.config.get_cached_assumable_roles(
+            account_id=principal.account_id, principal_arn=principal.arn
+        )
+        if cached_roles:
+            logger.info(f"use cached assumable roles for {principal.arn}")
+            result.add_payload(cached_roles)
+            result.set_success()
+            return result
+
+        result = iam.list_assumable_roles(source_profile=source_profile, principal=principal)
+        if result.was_success:
+            self.config.save_cached_assumable_roles(
+                account_id=principal.account_id, principal_arn=principal.arn, role_list=result.payload
+            )
+        return result
+
     def run_script(self, profile_group: ProfileGroup) -> Result:
         result = Result()
         if not profile_group or not profile_group.script:
@@ -392,6 +767,70 @@ class Core:
         result.set_success()
         return result
 
+    def _is_active_group(self, profile_group: ProfileGroup) -> bool:
+        return self.active_profile_group is not None and self.active_profile_group.name == profile_group.name
+
+    def _cleanup(self, profile_group: ProfileGroup) -> Result:
+        # a new group starts from a clean state, the same group is updated in place
+        if not self._is_active_group(profile_group):
+            self.active_profile_group = profile_group
+            self.refresh_schedule.clear()
+            credential_process.clear_cache()
+            self.credential_server.clear()
+            return credentials.cleanup()
+
+        self.active_profile_group = profile_group
+        keep = []
+        for profile in profile_group.get_profile_list(include_service_profile=True):
+            keep.append(profile.profile)
+        keep.append("default")
+        return credentials.cleanup(keep=keep)
+
+    def _get_store_args(self, profile_group: ProfileGroup, cache_roles: bool = True) -> dict:
+        serve = self.credential_server.is_running()
+        cache = cache_roles and self._use_role_cache(profile_group)
+        # in write mode process the sdks fetch the role credentials via credential_process from the cache
+        if profile_group.write_mode == "process":
+            store = credential_process.store_fetched_credentials
+        elif serve or cache:
+            store = credentials.write_fetched_credentials
+        else:
+            return {}
+        if not serve and not cache:
+            return {"store": store}
+
+        def store_all(profile_list, secrets, default_override):
+            store(profile_list, secrets, default_override)
+            if serve:
+                self.credential_server.store_fetched_credentials(profile_list, secrets, default_override)
+            if cache:
+                access_key_id = key.get_access_key_id(profile_group.get_access_key())
+                role_cache.store_group_credentials(profile_group, access_key_id, profile_list, secrets)
+
+        return {"store": store_all}
+
+    @staticmethod
+    def _get_service_source_secrets(profile_group: ProfileGroup) -> Optional[dict]:
+        # in write mode process the source profile has no credentials in ~/.aws/credentials
+        if profile_group.write_mode != "process":
+            return None
+        return credential_process.load_cached_credentials(profile_group.service_profile.source)
+
+    def _use_role_cache(self, profile_group: ProfileGroup) -> bool:
+        # the warm standby promotes its credentials through the role cache
+        use_cache = self.config.role_credential_cache or self.is_warm_standby_enabled()
+        return use_cache and profile_group.auth_mode == "key"
+
+    def _get_profiles_to_refresh(self, profile_group: ProfileGroup) -> List[str]:
+        stale_profiles = self.refresh_schedule.get_stale_profiles()
+        profile_names = []
+        for profile in profile_group.get_profile_list(include_service_profile=True):
+            if (profile.profile in stale_profiles
+                    or not profile.verified
+                    or self.refresh_schedule.get_expiration(profile.profile) is None):
+                profile_names.append(profile.profile)
+        return profile_names
+
     @staticmethod
     def _handle_support_files(profile_group: ProfileGroup):
         logger.info("handle support files")
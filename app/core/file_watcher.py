@@ -0,0 +1,224 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger("logsmith")
+
+_in_modify = 0x00000002
+_in_attrib = 0x00000004
+_in_close_write = 0x00000008
+_in_moved_from = 0x00000040
+_in_moved_to = 0x00000080
+_in_create = 0x00000100
+_in_delete = 0x00000200
+_in_delete_self = 0x00000400
+_in_move_self = 0x00000800
+_in_ignored = 0x00008000
+_in_nonblock = 0o4000
+_in_cloexec = 0o2000000
+
+_watch_mask = (_in_modify | _in_attrib | _in_close_write | _in_moved_from | _in_moved_to | _in_create
+               | _in_delete | _in_delete_self | _in_move_self)
+_event_header = struct.Struct("iIII")
+
+
+class Watch:
+    def __init__(self, path: str, callback: Callable[[], None], directory: bool):
+        self.path = os.path.abspath(path)
+        self.callback = callback
+        self.directory = directory
+        # the parent directory is watched for files, so an atomic replace of the file is seen
+        self.watched_path = self.path if directory else os.path.dirname(self.path)
+        self.name = None if directory else os.path.basename(self.path)
+        self.signature = None
+        self.due_time = None
+
+    def matches(self, directory: str, name: Optional[str]) -> bool:
+        # changes without a name concern the directory itself, e.g. it was created or removed
+        if directory != self.watched_path:
+            return False
+        return self.directory or name is None or name == self.name
+
+
+class FileWatcher:
+    """
+    Calls a callback when a watched file or a file in a watched directory changes.
+    Uses inotify where the platform has it and compares file signatures in an interval everywhere else.
+    Changes are debounced, the callback runs once on the watcher thread after the writes have settled.
+    """
+
+    def __init__(self, debounce_seconds: float = 0.5, poll_interval_seconds: float = 2.0,
+                 use_inotify: bool = True):
+        self.debounce_seconds = debounce_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self.use_inotify = use_inotify
+        self.watches: List[Watch] = []
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._inotify: Optional[_Inotify] = None
+
+    def watch(self, path: str, callback: Callable[[], None], directory: bool = False) -> None:
+        watch = Watch(path, callback, directory)
+        watch.signature = _get_signature(watch.path, directory)
+        self.watches.append(watch)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        if self.use_inotify:
+            self._inotify = _Inotify.create()
+        if self._inotify is not None:
+            # watches are in place when start returns, later writes are not missed
+            self._inotify.add_missing_watches(self._get_watched_paths())
+        else:
+            logger.info("watch files by polling")
+        self._thread = threading.Thread(target=self._run, name="file-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                if self._inotify is not None:
+                    # a directory that appeared may already contain the files, it counts as a change
+                    changes = {(directory, None)
+                               for directory in self._inotify.add_missing_watches(self._get_watched_paths())}
+                    changes |= self._inotify.read(self._get_timeout(self.poll_interval_seconds))
+                    for watch in self.watches:
+                        if any(watch.matches(directory, name) for directory, name in changes):
+                            self._mark_due(watch)
+                else:
+                    self._stop_event.wait(self._get_timeout(self.poll_interval_seconds))
+                    for watch in self.watches:
+                        signature = _get_signature(watch.path, watch.directory)
+                        if signature != watch.signature:
+                            watch.signature = signature
+                            self._mark_due(watch)
+                self._run_due_callbacks()
+            except Exception:
+                logger.error("file watcher failed", exc_info=True)
+                self._stop_event.wait(self.poll_interval_seconds)
+
+    def _get_watched_paths(self) -> set:
+        return {watch.watched_path for watch in self.watches}
+
+    def _mark_due(self, watch: Watch) -> None:
+        # every further change moves the callback back, so a burst of writes results in one call
+        watch.due_time = time.monotonic() + self.debounce_seconds
+
+    def _get_timeout(self, timeout: float) -> float:
+        due_times = [watch.due_time for watch in self.watches if watch.due_time is not None]
+        if not due_times:
+            return timeout
+        return max(0.0, min(timeout, min(due_times) - time.monotonic()))
+
+    def _run_due_callbacks(self) -> None:
+        now = time.monotonic()
+        for watch in self.watches:
+            if watch.due_time is None or watch.due_time > now:
+                continue
+            watch.due_time = None
+            try:
+                watch.callback()
+            except Exception:
+                logger.error(f"reload after change of {watch.path} failed", exc_info=True)
+
+
+def _get_signature(path: str, directory: bool) -> Optional[tuple]:
+    try:
+        file_stat = os.stat(path)
+    except OSError:
+        return None
+    if not directory:
+        return file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino
+    entries = []
+    try:
+        with os.scandir(path) as iterator:
+            for entry in iterator:
+                try:
+                    entry_stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((entry.name, entry_stat.st_mtime_ns, entry_stat.st_size, entry_stat.st_ino))
+    except OSError:
+        return None
+    return tuple(sorted(entries))
+
+
+class _Inotify:
+    def __init__(self, libc, file_descriptor: int):
+        self.libc = libc
+        self.file_descriptor = file_descriptor
+        self.directories: Dict[int, str] = {}
+
+    @classmethod
+    def create(cls) -> Optional["_Inotify"]:
+        library = ctypes.util.find_library("c")
+        if not library:
+            return None
+        try:
+            libc = ctypes.CDLL(library, use_errno=True)
+            inotify_init1 = libc.inotify_init1
+        except (OSError, AttributeError):
+            return None
+        inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        file_descriptor = inotify_init1(_in_nonblock | _in_cloexec)
+        if file_descriptor < 0:
+            return None
+        return cls(libc, file_descriptor)
+
+    def add_missing_watches(self, directories: set) -> set:
+        # directories that do not exist yet are watched as soon as they are created
+        added_directories = set()
+        for directory in directories - set(self.directories.values()):
+            watch_descriptor = self.libc.inotify_add_watch(self.file_descriptor, os.fsencode(directory), _watch_mask)
+            if watch_descriptor >= 0:
+                self.directories[watch_descriptor] = directory
+                added_directories.add(directory)
+        return added_directories
+
+    def read(self, timeout: float) -> set:
+        readable, _, _ = select.select([self.file_descriptor], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self.file_descriptor, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        changes = set()
+        offset = 0
+        while offset + _event_header.size <= len(data):
+            watch_descriptor, mask, _, length = _event_header.unpack_from(data, offset)
+            offset += _event_header.size
+            name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace") or None
+            offset += length
+            directory = self.directories.get(watch_descriptor)
+            if directory is None:
+                continue
+            if mask & _in_ignored:
+                # the directory was removed, it is watched again once it exists
+                del self.directories[watch_descriptor]
+            changes.add((directory, name))
+        return changes
+
+    def close(self) -> None:
+        os.close(self.file_descriptor)
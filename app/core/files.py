@@ -1,11 +1,16 @@
+import fcntl
+import hashlib
 import io
 import json
 import logging
+import marshal
 import os
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List
-
-from ruamel.yaml import YAML
+from typing import List, Optional
 
 logger = logging.getLogger('logsmith')
 config_file_name = 'config.yaml'
@@ -14,12 +19,22 @@ accounts_file_name = 'accounts.yaml'
 service_roles_file_name = 'service_roles.yaml'
 log_file_name = 'app.log'
 active_group_file_name = 'active_group'
-
-# TODO set to base to avoid automatic conversion
-yamli = YAML(typ='safe')
-yamli.default_flow_style = False
-yamli.sort_base_mapping_type_on_output = False
-yamli.indent(sequence=4)
+lock_file_name = 'write.lock'
+sso_catalog_file_name = 'sso_catalog.json'
+assumable_roles_cache_file_name = 'assumable_roles_cache.json'
+group_usage_file_name = 'group_usage.json'
+yaml_cache_dir_name = 'cache'
+yaml_cache_version = 1
+
+_yamli = None
+
+# Parsed yaml files are kept per path as marshalled data, together with the mtime, size and inode of the file.
+# A changed signature invalidates the entry. Large accounts files can also be cached in a sidecar file in
+# ~/.logsmith/cache, so that a new process does not have to parse them again.
+_yaml_cache_lock = threading.Lock()
+_yaml_cache = {}
+_yaml_cache_settings = {'sidecar': False}
+_yaml_cache_stats = {'parsed': 0, 'memory_hits': 0, 'sidecar_hits': 0}
 
 home_variables = ['\"${HOME}\"', '\"$HOME\"', '${HOME}', '$HOME', '~']
 
@@ -58,9 +73,42 @@ def get_active_group_file_path() -> str:
     return f'{get_app_path()}/{active_group_file_name}'
 
 
+def get_yaml_cache_path() -> str:
+    return os.path.join(get_app_path(), yaml_cache_dir_name)
+
+
+def get_lock_path() -> str:
+    return f'{get_app_path()}/{lock_file_name}'
+
+
+def get_sso_catalog_path() -> str:
+    return f'{get_app_path()}/{sso_catalog_file_name}'
+
+
+def get_assumable_roles_cache_path() -> str:
+    return f'{get_app_path()}/{assumable_roles_cache_file_name}'
+
+
+def get_group_usage_path() -> str:
+    return f'{get_app_path()}/{group_usage_file_name}'
+
+
+def _get_yaml():
+    # ruamel is imported on first use, entry points like the daemon client never read yaml
+    global _yamli
+    if _yamli is None:
+        from ruamel.yaml import YAML
+        # TODO set to base to avoid automatic conversion
+        _yamli = YAML(typ='safe')
+        _yamli.default_flow_style = False
+        _yamli.sort_base_mapping_type_on_output = False
+        _yamli.indent(sequence=4)
+    return _yamli
+
+
 def parse_yaml(text: str) -> dict:
     try:
-        return yamli.load(text) or {}
+        return _get_yaml().load(text) or {}
     except Exception as e:
         logging.warning('error while parsing yaml', exc_info=True)
         return {}
@@ -68,7 +116,7 @@ def parse_yaml(text: str) -> dict:
 
 def dump_yaml(d: dict) -> str:
     buffer = io.BytesIO()
-    yamli.dump(d, buffer)
+    _get_yaml().dump(d, buffer)
     return buffer.getvalue().decode("utf-8")
 
 
@@ -90,8 +138,153 @@ def _load_file_window(path, position) -> (str, int):
 
 
 def _write_file(path, content) -> None:
-    with open(path, 'w') as file:
-        file.write(str(content))
+    write_atomic(path, str(content))
+    with _yaml_cache_lock:
+        _yaml_cache.pop(path, None)
+
+
+def set_yaml_cache_sidecar(enabled: bool) -> None:
+    _yaml_cache_settings['sidecar'] = bool(enabled)
+
+
+def get_yaml_cache_stats() -> dict:
+    with _yaml_cache_lock:
+        return dict(_yaml_cache_stats)
+
+
+def clear_yaml_cache() -> None:
+    with _yaml_cache_lock:
+        _yaml_cache.clear()
+        for key in _yaml_cache_stats:
+            _yaml_cache_stats[key] = 0
+
+
+def _get_file_signature(path) -> Optional[tuple]:
+    try:
+        file_stat = os.stat(path)
+    except OSError:
+        return None
+    return file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino
+
+
+def load_yaml_file(path, sidecar: bool = False) -> dict:
+    signature = _get_file_signature(path)
+    if signature is None:
+        return {}
+    with _yaml_cache_lock:
+        entry = _yaml_cache.get(path)
+        if entry is not None and entry[0] == signature:
+            _yaml_cache_stats['memory_hits'] += 1
+            # every caller gets its own copy, because the config classes modify the loaded dicts
+            return marshal.loads(entry[1])
+
+    data = _load_yaml_sidecar(path, signature) if sidecar else None
+    if data is None:
+        parsed = parse_yaml(_load_file(path))
+        with _yaml_cache_lock:
+            _yaml_cache_stats['parsed'] += 1
+        try:
+            data = marshal.dumps(parsed)
+        except ValueError:
+            # e.g. yaml timestamps, such files are parsed on every load
+            logger.debug(f'{path} contains values that can not be cached')
+            return parsed
+        if sidecar:
+            _write_yaml_sidecar(path, signature, data)
+    else:
+        with _yaml_cache_lock:
+            _yaml_cache_stats['sidecar_hits'] += 1
+
+    with _yaml_cache_lock:
+        _yaml_cache[path] = (signature, data)
+    return marshal.loads(data)
+
+
+def _get_yaml_sidecar_path(path) -> str:
+    return os.path.join(get_yaml_cache_path(), f'{os.path.basename(path)}.marshal')
+
+
+def _load_yaml_sidecar(path, signature: tuple) -> Optional[bytes]:
+    try:
+        with open(_get_yaml_sidecar_path(path), 'rb') as file:
+            version, sidecar_signature, data = marshal.load(file)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if version != yaml_cache_version or tuple(sidecar_signature) != signature:
+        return None
+    return data
+
+
+def _write_yaml_sidecar(path, signature: tuple, data: bytes) -> None:
+    try:
+        os.makedirs(get_yaml_cache_path(), mode=0o700, exist_ok=True)
+        write_atomic(_get_yaml_sidecar_path(path), marshal.dumps((yaml_cache_version, signature, data)))
+    except OSError:
+        logger.warning(f'could not write yaml cache for {path}', exc_info=True)
+
+
+# flock is held per open file, so the lock file is opened once per process and shared between threads
+_write_lock = threading.RLock()
+_write_lock_state = {'depth': 0, 'file': None}
+
+
+@contextmanager
+def write_lock():
+    """
+    Advisory lock shared by all logsmith processes, e.g. the gui and a cli login loop. Reentrant within a process.
+    """
+    with _write_lock:
+        if _write_lock_state['depth'] == 0:
+            os.makedirs(get_app_path(), exist_ok=True)
+            lock_file = open(get_lock_path(), 'a')
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            _write_lock_state['file'] = lock_file
+        _write_lock_state['depth'] += 1
+        try:
+            yield
+        finally:
+            _write_lock_state['depth'] -= 1
+            if _write_lock_state['depth'] == 0:
+                lock_file = _write_lock_state['file']
+                _write_lock_state['file'] = None
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                lock_file.close()
+
+
+def write_atomic(path, content: str | bytes) -> None:
+    # readers either see the old or the new file, never a partially written one.
+    # symlinks are resolved, so that the link itself is not replaced by a regular file.
+    target_path = os.path.realpath(path)
+    directory = os.path.dirname(target_path)
+    with write_lock():
+        file_descriptor, temp_path = tempfile.mkstemp(prefix=f'.{os.path.basename(target_path)}.',
+                                                      suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(file_descriptor, 'wb' if isinstance(content, bytes) else 'w') as file:
+                file.write(content)
+                file.flush()
+                os.fsync(file.fileno())
+            if path_exist(target_path):
+                os.chmod(temp_path, stat.S_IMODE(os.stat(target_path).st_mode))
+            os.replace(temp_path, target_path)
+        except BaseException:
+            if path_exist(temp_path):
+                os.remove(temp_path)
+            raise
+        _fsync_directory(directory)
+
+
+def _fsync_directory(directory) -> None:
+    try:
+        directory_descriptor = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(directory_descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(directory_descriptor)
 
 
 def remove_file(path) -> None:
@@ -109,19 +302,19 @@ def path_exist(path):
     return os.path.exists(path)
 
 def load_config() -> dict:
-    return parse_yaml(_load_file(get_config_path()))
+    return load_yaml_file(get_config_path())
 
 
 def load_toggles() -> dict:
-    return parse_yaml(_load_file(get_toggles_path()))
+    return load_yaml_file(get_toggles_path())
 
 
 def load_accounts() -> dict:
-    return parse_yaml(_load_file(get_accounts_path()))
+    return load_yaml_file(get_accounts_path(), sidecar=_yaml_cache_settings['sidecar'])
 
 
 def load_service_roles() -> dict:
-    return parse_yaml(_load_file(get_service_roles_path()))
+    return load_yaml_file(get_service_roles_path(), sidecar=_yaml_cache_settings['sidecar'])
 
 
 def save_config_file(config_dict: dict) -> None:
@@ -140,6 +333,47 @@ def save_service_roles_file(service_roles: dict) -> None:
     _write_file(get_service_roles_path(), dump_yaml(service_roles))
 
 
+def load_sso_catalog() -> dict:
+    return _load_json_file(get_sso_catalog_path())
+
+
+def save_sso_catalog(catalog: dict) -> None:
+    _save_json_file(get_sso_catalog_path(), catalog)
+
+
+def load_assumable_roles_cache() -> dict:
+    return _load_json_file(get_assumable_roles_cache_path())
+
+
+def save_assumable_roles_cache(cache: dict) -> None:
+    _save_json_file(get_assumable_roles_cache_path(), cache)
+
+
+def load_group_usage() -> dict:
+    return _load_json_file(get_group_usage_path())
+
+
+def save_group_usage(usage: dict) -> None:
+    _save_json_file(get_group_usage_path(), usage)
+
+
+def _load_json_file(path: str) -> dict:
+    # files that logsmith maintains itself, kept out of the yaml files the user edits
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return data
+
+
+def _save_json_file(path: str, data: dict) -> None:
+    os.makedirs(get_app_path(), exist_ok=True)
+    write_atomic(path, json.dumps(data, indent=2, sort_keys=True))
+
+
 def load_logs() -> str:
     return _load_file(get_log_path()) or ''
 
@@ -152,6 +386,10 @@ def write_active_group_file(group_name) -> None:
     _write_file(get_active_group_file_path(), group_name)
 
 
+def load_active_group() -> str:
+    return _load_file(get_active_group_file_path()).strip()
+
+
 def get_home_dir():
     return os.path.expanduser("~")
 
@@ -177,3 +415,52 @@ def get_local_sso_access_token() -> List[str]:
         if token is not None:
             access_tokens.append(token)
     return access_tokens
+
+
+def get_sso_token_path(sso_session_name: str) -> str:
+    # the aws cli names the token cache of a sso session after the sha1 of the session name
+    file_name = hashlib.sha1(sso_session_name.encode('utf-8')).hexdigest()
+    return os.path.join(get_aws_cache_path(), f'{file_name}.json')
+
+
+def load_sso_token(sso_session_name: str) -> Optional[dict]:
+    data = _load_sso_cache_file(get_sso_token_path(sso_session_name))
+    if data is None or data.get('accessToken') is None:
+        return None
+    return data
+
+
+def save_sso_token(sso_session_name: str, sso_token: dict) -> None:
+    _save_sso_cache_file(get_sso_token_path(sso_session_name), sso_token)
+
+
+def get_sso_registration_path(cache_key: str) -> str:
+    # the aws cli names client registrations after the sha1 of their start url, region, scopes and session
+    return os.path.join(get_aws_cache_path(), f'{cache_key}.json')
+
+
+def load_sso_registration(cache_key: str) -> Optional[dict]:
+    data = _load_sso_cache_file(get_sso_registration_path(cache_key))
+    if data is None or data.get('clientId') is None or data.get('clientSecret') is None:
+        return None
+    return data
+
+
+def save_sso_registration(cache_key: str, registration: dict) -> None:
+    _save_sso_cache_file(get_sso_registration_path(cache_key), registration)
+
+
+def _load_sso_cache_file(path: str) -> Optional[dict]:
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    return data
+
+
+def _save_sso_cache_file(path: str, data: dict) -> None:
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    write_atomic(path, json.dumps(data))
@@ -1,4 +1,7 @@
 class Profile:
+    # large configs hold thousands of profiles, slots keep them small
+    __slots__ = ('group', 'profile', 'account', 'role', 'default', 'source', 'verified')
+
     def __init__(self, group, profile: dict):
         self.group = group
         self.profile = profile.get('profile', None)
@@ -1,13 +1,15 @@
 import logging
-from typing import List, Optional
+from typing import Dict, List, Optional
 
+from app.core import sso_catalog
 from app.core.profile import Profile
 from app.util import util
 
 logger = logging.getLogger('logsmith')
 
 class ProfileGroup:
-    def __init__(self, name, group: dict, default_access_key: str, default_sso_session: str, default_sso_interval: str):
+    def __init__(self, name, group: dict, default_access_key: str, default_sso_session: str, default_sso_interval: str,
+                 catalog_profiles: Optional[List[dict]] = None):
         self.name: str = name
         self.team: str = group.get('team', None)
         self.region: str = group.get('region', None)
@@ -20,14 +22,41 @@ class ProfileGroup:
         self.sso_session: str = group.get('sso_session', None)
         self.default_sso_interval = default_sso_interval
         self.sso_interval: str = group.get('sso_interval', None)
-        self.profiles: List[Profile] = []
         self.type: str = group.get('type', 'aws')  # only aws (default) & gcp as values are allowed
         self.script: str = group.get('script', None)  # only aws (default) & gcp as values are allowed
+        # selects profiles from the sso catalog instead of listing them, see sso_catalog.select_profiles
+        self.catalog: Optional[dict] = group.get('catalog', None)
 
         self.service_profile: Optional[Profile] = None
 
-        for profile_data in group.get('profiles', []):
-            self.profiles.append(Profile(self, profile_data))
+        self._profiles_by_name: Dict[str, Profile] = {}
+        self._profiles_by_account: Dict[str, List[Profile]] = {}
+        self._default_profile: Optional[Profile] = None
+        self._configured_profile_count = len(group.get('profiles', []))
+        self.profiles = [Profile(self, profile_data)
+                         for profile_data in group.get('profiles', []) + (catalog_profiles or [])]
+
+    @property
+    def profiles(self) -> List[Profile]:
+        return self._profiles
+
+    @profiles.setter
+    def profiles(self, profiles: List[Profile]) -> None:
+        self._profiles = profiles
+        self._index_profiles()
+
+    def _index_profiles(self) -> None:
+        # lookups by name and account are done per profile during login, so they must not scan the whole group
+        self._profiles_by_name = {}
+        self._profiles_by_account = {}
+        self._default_profile = None
+        for profile in self._profiles:
+            self._profiles_by_name.setdefault(profile.profile, profile)
+            self._profiles_by_account.setdefault(profile.account, []).append(profile)
+            if self._default_profile is None and profile.default:
+                self._default_profile = profile
+        if self.service_profile:
+            self._profiles_by_account.setdefault(self.service_profile.account, []).append(self.service_profile)
 
     def validate(self) -> (bool, str):
         if not self.team:
@@ -38,8 +67,10 @@ class ProfileGroup:
             return False, f'{self.name} has no color'
         if not self.auth_mode or not self.auth_mode in ['key', 'sso']:
             return False, f'{self.name} has an invalid auth_mode (either key or sso)'
-        if not self.write_mode or not self.write_mode in ['key', 'sso']:
-            return False, f'{self.name} has an invalid write_mode (either key or sso)'
+        if not self.write_mode or not self.write_mode in ['key', 'sso', 'process']:
+            return False, f'{self.name} has an invalid write_mode (either key, sso or process)'
+        if self.write_mode == 'process' and self.auth_mode != 'key':
+            return False, f'{self.name} has write_mode \'process\', which requires auth_mode \'key\''
         if not self.write_mode or (self.auth_mode == 'key' and self.write_mode == 'sso'):
             return False, f'{self.name} has auth_mode \'key\' and write_mode \'sso\', \nwhich are not compatible'
         if self.access_key and not self.access_key.startswith('access-key'):
@@ -48,6 +79,11 @@ class ProfileGroup:
             return False, f'sso_session \"{self.sso_session}\" must have the prefix \"sso\"'
         if self.sso_interval and not util.is_positive_int(self.sso_interval):
             return False, f'sso_interval \"{self.sso_interval}\" must be a positive integer or 0'
+        if self.catalog and not sso_catalog.is_valid_profile_template(
+                self.catalog.get('profile', sso_catalog.default_profile_template)):
+            return False, f'catalog profile of \"{self.name}\" may only use {{account_id}}, {{account_name}} and {{role}}'
+        if self.type == "aws" and len(self.profiles) == 0 and self.catalog:
+            return False, f'aws \"{self.name}\" matches no profiles in the sso catalog'
         if self.type == "aws" and len(self.profiles) == 0:
             return False, f'aws \"{self.name}\" has no profiles'
         for profile in self.profiles:
@@ -74,10 +110,14 @@ class ProfileGroup:
         return self.profiles
 
     def get_profile(self, profile_name) -> Optional[Profile]:
-        return next((profile for profile in self.profiles if profile.profile == profile_name), None)
+        return self._profiles_by_name.get(profile_name, None)
 
     def get_default_profile(self) -> Optional[Profile]:
-        return next((profile for profile in self.profiles if profile.default), None)
+        return self._default_profile
+
+    def get_profiles_by_account(self, account_id: str) -> List[Profile]:
+        # includes the service profile, which is assumed in the account of its source profile
+        return list(self._profiles_by_account.get(str(account_id), []))
 
     def get_auth_mode(self) -> str:
         return self.auth_mode
@@ -110,6 +150,7 @@ class ProfileGroup:
                 'default': False,
                 'source': source_profile_name
             })
+        self._index_profiles()
 
     def to_dict(self) -> dict:
         result_dict = {
@@ -129,5 +170,10 @@ class ProfileGroup:
             result_dict['sso_interval'] = self.sso_interval
         if self.type != "aws":
             result_dict["type"] = self.type
-        result_dict['profiles'] = [profile.to_dict() for profile in self.profiles]
+        if self.catalog:
+            # profiles from the catalog are selected again on every start, only the selector is saved
+            result_dict['catalog'] = self.catalog
+            result_dict['profiles'] = [profile.to_dict() for profile in self.profiles[:self._configured_profile_count]]
+        else:
+            result_dict['profiles'] = [profile.to_dict() for profile in self.profiles]
         return result_dict
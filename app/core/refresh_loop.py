@@ -0,0 +1,95 @@
+import logging
+import random
+import threading
+import time
+from typing import Callable
+
+from app.core.result import Result
+
+logger = logging.getLogger('logsmith')
+
+backoff_base_seconds = 30
+backoff_max_seconds = 900
+
+
+class RefreshLoop:
+    """
+    Runs a refresh whenever the delay returned by get_delay has passed, until it is stopped.
+    Deadlines are measured on the monotonic clock, so changes of the wall clock do not shift them.
+    After a failed refresh the next attempt is delayed with an exponential, jittered backoff instead.
+    """
+
+    def __init__(self, refresh: Callable[[], Result], get_delay: Callable[[], float],
+                 clock: Callable[[], float] = time.monotonic):
+        self._refresh = refresh
+        self._get_delay = get_delay
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._refresh_requested = False
+        self.failures = 0
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            delay_seconds = self.get_next_delay()
+            logger.info(f'next refresh in {int(delay_seconds)}s')
+            if self._wait(self._clock() + delay_seconds):
+                self._run_refresh()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+
+    def is_stopped(self) -> bool:
+        return self._stopped.is_set()
+
+    def reschedule(self) -> None:
+        # the delay is computed again, e.g. after a login changed the expirations
+        self._wakeup.set()
+
+    def trigger(self) -> None:
+        with self._lock:
+            self._refresh_requested = True
+        self._wakeup.set()
+
+    def get_next_delay(self) -> float:
+        if self.failures:
+            return get_backoff_delay(self.failures)
+        return self._get_delay()
+
+    def _wait(self, deadline: float) -> bool:
+        # returns true when the refresh is due, false when the loop was stopped or rescheduled
+        while not self._stopped.is_set():
+            remaining_seconds = deadline - self._clock()
+            if remaining_seconds <= 0:
+                return True
+            if self._wakeup.wait(timeout=remaining_seconds):
+                self._wakeup.clear()
+                with self._lock:
+                    refresh_requested = self._refresh_requested
+                    self._refresh_requested = False
+                return refresh_requested and not self._stopped.is_set()
+        return False
+
+    def _run_refresh(self) -> None:
+        try:
+            refresh_result = self._refresh()
+        except Exception:
+            logger.error('unexpected error during refresh', exc_info=True)
+            refresh_result = None
+
+        if refresh_result is not None and refresh_result.was_success:
+            self.failures = 0
+            return
+        self.failures += 1
+        if refresh_result is not None and refresh_result.was_error:
+            logger.error(f'refresh failed: {refresh_result.error_message}')
+        else:
+            logger.warning(f'refresh did not succeed ({self.failures} in a row)')
+
+
+def get_backoff_delay(failures: int) -> float:
+    backoff_seconds = min(backoff_base_seconds * 2 ** (failures - 1), backoff_max_seconds)
+    # half of the backoff is random, so that many clients do not retry in lockstep
+    return backoff_seconds / 2 + random.uniform(0, backoff_seconds / 2)
@@ -0,0 +1,88 @@
+import logging
+import random
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+logger = logging.getLogger('logsmith')
+
+refresh_lead_seconds = 300
+refresh_jitter_seconds = 120
+fallback_interval_seconds = 600
+# the timer is re-checked at least this often, because timers do not advance while the machine sleeps
+max_check_interval_seconds = 900
+min_delay_seconds = 10
+
+
+def to_datetime(expiration) -> Optional[datetime]:
+    if expiration is None or expiration == '':
+        return None
+    if isinstance(expiration, datetime):
+        if expiration.tzinfo is None:
+            return expiration.replace(tzinfo=timezone.utc)
+        return expiration
+    if isinstance(expiration, (int, float)):
+        # sso returns the expiration in epoch milliseconds
+        return datetime.fromtimestamp(expiration / 1000, tz=timezone.utc)
+    return datetime.fromisoformat(str(expiration).replace('Z', '+00:00'))
+
+
+class RefreshSchedule:
+    """
+    Keeps the expiration of every fetched profile and the time it should be refreshed,
+    which is shortly before it expires with a random jitter per profile.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._expirations: Dict[str, datetime] = {}
+        self._refresh_times: Dict[str, datetime] = {}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._expirations.clear()
+            self._refresh_times.clear()
+
+    def set_expiration(self, profile_name: str, expiration) -> None:
+        expiration = to_datetime(expiration)
+        if expiration is None:
+            return
+        lead_seconds = refresh_lead_seconds + random.uniform(0, refresh_jitter_seconds)
+        with self._lock:
+            self._expirations[profile_name] = expiration
+            self._refresh_times[profile_name] = datetime.fromtimestamp(expiration.timestamp() - lead_seconds,
+                                                                       tz=timezone.utc)
+
+    def update(self, expirations: Optional[Dict[str, object]]) -> None:
+        if not expirations:
+            return
+        for profile_name, expiration in expirations.items():
+            self.set_expiration(profile_name, expiration)
+
+    def remove(self, profile_name: str) -> None:
+        with self._lock:
+            self._expirations.pop(profile_name, None)
+            self._refresh_times.pop(profile_name, None)
+
+    def get_expiration(self, profile_name: str) -> Optional[datetime]:
+        with self._lock:
+            return self._expirations.get(profile_name)
+
+    def has_expirations(self) -> bool:
+        with self._lock:
+            return bool(self._expirations)
+
+    def get_stale_profiles(self, now: Optional[datetime] = None) -> List[str]:
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            return [profile_name for profile_name, refresh_time in self._refresh_times.items()
+                    if refresh_time <= now]
+
+    def get_next_delay(self, now: Optional[datetime] = None) -> int:
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            if not self._refresh_times:
+                return fallback_interval_seconds
+            next_refresh = min(self._refresh_times.values())
+        delay = int((next_refresh - now).total_seconds())
+        return max(min_delay_seconds, min(delay, max_check_interval_seconds))
@@ -0,0 +1,119 @@
+import fnmatch
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from app.core.refresh_schedule import to_datetime
+
+# The catalog holds the accounts and roles an sso session can access, as returned by the sso portal:
+# {"sessions": {"<sso session>": {"generation": 3, "accounts": {"<account id>": {"name": "...", "email": "...",
+#  "roles": ["..."], "roles_updated_at": "<iso timestamp>"}}}}}
+# The generation is only increased when accounts or roles change, so readers can tell whether
+# the groups that reference the catalog have to be built again.
+default_profile_template = '{account_name}-{role}'
+
+
+def get_session_entry(catalog: dict, sso_session_name: str) -> dict:
+    return catalog.get('sessions', {}).get(sso_session_name, {})
+
+
+def get_generation(catalog: dict, sso_session_name: str) -> int:
+    return get_session_entry(catalog, sso_session_name).get('generation', 0)
+
+
+def is_valid_profile_template(profile_template) -> bool:
+    # templates may only use the named fields, anything else would fail for every profile of the group
+    if not isinstance(profile_template, str):
+        return False
+    try:
+        profile_template.format(account_id='', account_name='', role='')
+    except (KeyError, IndexError, ValueError, AttributeError):
+        return False
+    return True
+
+
+def select_profiles(session_entry: dict, selector: dict) -> List[dict]:
+    """
+    Returns the profile data of all catalog roles that match the selector of a group.
+    The selector matches account_id, account_name, account_email and role with shell-style wildcards,
+    names the profiles with the profile template and marks the profile named default as default profile.
+    """
+    account_id_pattern = str(selector.get('account_id', '*'))
+    account_name_pattern = selector.get('account_name', '*')
+    account_email_pattern = selector.get('account_email', '*')
+    role_pattern = selector.get('role', '*')
+    profile_template = selector.get('profile', default_profile_template)
+    default_profile_name = selector.get('default', None)
+    if not is_valid_profile_template(profile_template):
+        return []
+
+    profiles = []
+    accounts = session_entry.get('accounts', {})
+    for account_id, account in sorted(accounts.items(), key=lambda item: (item[1].get('name', ''), item[0])):
+        account_name = account.get('name', '')
+        if not fnmatch.fnmatchcase(account_id, account_id_pattern) \
+                or not fnmatch.fnmatchcase(account_name, account_name_pattern) \
+                or not fnmatch.fnmatchcase(account.get('email', ''), account_email_pattern):
+            continue
+        for role in sorted(account.get('roles', [])):
+            if not fnmatch.fnmatchcase(role, role_pattern):
+                continue
+            profile_name = profile_template.format(account_id=account_id, account_name=account_name, role=role)
+            profiles.append({
+                'profile': profile_name,
+                'account': account_id,
+                'role': role,
+                'default': profile_name == default_profile_name,
+            })
+    return profiles
+
+
+def get_stale_account_ids(session_entry: dict, account_ids: List[str], max_age_seconds: int,
+                          now: Optional[datetime] = None) -> List[str]:
+    # roles are listed again for new accounts and for accounts whose roles are older than max_age_seconds
+    now = now or datetime.now(timezone.utc)
+    accounts = session_entry.get('accounts', {})
+    stale_account_ids = []
+    for account_id in account_ids:
+        try:
+            roles_updated_at = to_datetime(accounts.get(account_id, {}).get('roles_updated_at'))
+        except ValueError:
+            roles_updated_at = None
+        if roles_updated_at is None or (now - roles_updated_at).total_seconds() >= max_age_seconds:
+            stale_account_ids.append(account_id)
+    return stale_account_ids
+
+
+def update_session_entry(catalog: dict, sso_session_name: str, accounts: Dict[str, dict],
+                         roles: Dict[str, List[str]], now: Optional[datetime] = None) -> bool:
+    """
+    Replaces the accounts of the session with the listed accounts. Roles are taken from roles where they were
+    listed again and kept from the catalog otherwise. Returns whether accounts or roles changed,
+    in which case the generation of the session was increased.
+    """
+    now = now or datetime.now(timezone.utc)
+    session_entry = catalog.setdefault('sessions', {}).setdefault(sso_session_name, {'generation': 0})
+    old_accounts = session_entry.get('accounts', {})
+
+    new_accounts = {}
+    for account_id, account in accounts.items():
+        new_account = dict(old_accounts.get(account_id, {}))
+        new_account['name'] = account.get('name', '')
+        new_account['email'] = account.get('email', '')
+        if account_id in roles:
+            new_account['roles'] = sorted(roles[account_id])
+            new_account['roles_updated_at'] = now.isoformat()
+        else:
+            new_account.setdefault('roles', [])
+        new_accounts[account_id] = new_account
+
+    changed = _get_content(old_accounts) != _get_content(new_accounts)
+    session_entry['accounts'] = new_accounts
+    if changed:
+        session_entry['generation'] = session_entry.get('generation', 0) + 1
+    return changed
+
+
+def _get_content(accounts: Dict[str, dict]) -> dict:
+    # the time of the last listing is not part of the content, listing the same roles again changes nothing
+    return {account_id: (account.get('name'), account.get('email'), sorted(account.get('roles', [])))
+            for account_id, account in accounts.items()}
@@ -0,0 +1,39 @@
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+window_seconds = 3600
+
+
+class StsBudget:
+    """
+    Counts the sts calls of background work within the last hour, so it can not spend more than the configured
+    number of calls per hour. The window slides on the monotonic clock.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._spent = deque()
+
+    def try_spend(self, calls: int, calls_per_hour: int) -> bool:
+        with self._lock:
+            now = self._clock()
+            self._drop_expired(now)
+            if self._get_spent() + calls > calls_per_hour:
+                return False
+            self._spent.append((now, calls))
+            return True
+
+    def get_remaining(self, calls_per_hour: int) -> int:
+        with self._lock:
+            self._drop_expired(self._clock())
+            return max(calls_per_hour - self._get_spent(), 0)
+
+    def _drop_expired(self, now: float) -> None:
+        while self._spent and now - self._spent[0][0] >= window_seconds:
+            self._spent.popleft()
+
+    def _get_spent(self) -> int:
+        return sum(calls for _, calls in self._spent)
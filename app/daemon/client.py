@@ -0,0 +1,86 @@
+import json
+import os
+import socket
+from typing import Optional
+
+from app.core import files
+from app.core.result import Result
+
+socket_file_name = "daemon.sock"
+connect_timeout_seconds = 1
+max_message_bytes = 1024 * 1024
+not_running_message = "logsmith daemon is not running, start it with 'logsmith daemon'"
+
+
+def get_socket_path() -> str:
+    return os.path.join(files.get_app_path(), socket_file_name)
+
+
+def result_to_dict(result: Result) -> dict:
+    return {
+        "was_success": result.was_success,
+        "was_error": result.was_error,
+        "error_message": result.error_message,
+        "payload": result.payload,
+    }
+
+
+def result_from_dict(result_dict: dict) -> Result:
+    result = Result()
+    result.was_success = result_dict.get("was_success", False)
+    result.was_error = result_dict.get("was_error", False)
+    result.error_message = result_dict.get("error_message", "unknown")
+    result.payload = result_dict.get("payload", "")
+    return result
+
+
+def encode(message: dict) -> bytes:
+    return json.dumps(message, default=str).encode() + b"\n"
+
+
+def decode(line: bytes) -> dict:
+    return json.loads(line.decode())
+
+
+def _connect(socket_path: str) -> socket.socket:
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.settimeout(connect_timeout_seconds)
+    try:
+        connection.connect(socket_path)
+    except OSError:
+        connection.close()
+        raise
+    return connection
+
+
+def is_running(socket_path: Optional[str] = None) -> bool:
+    socket_path = socket_path or get_socket_path()
+    if not os.path.exists(socket_path):
+        return False
+    try:
+        _connect(socket_path).close()
+    except OSError:
+        return False
+    return True
+
+
+def send(command: str, socket_path: Optional[str] = None, **arguments) -> Result:
+    socket_path = socket_path or get_socket_path()
+    try:
+        connection = _connect(socket_path)
+    except OSError:
+        result = Result()
+        result.error(not_running_message)
+        return result
+
+    with connection:
+        # logins can wait for mfa tokens or the sso browser flow, so only the connect is bounded
+        connection.settimeout(None)
+        connection.sendall(encode({"command": command, "arguments": arguments}))
+        with connection.makefile("rb") as reader:
+            line = reader.readline(max_message_bytes)
+    if not line:
+        result = Result()
+        result.error(f"logsmith daemon closed the connection during {command}")
+        return result
+    return result_from_dict(decode(line))
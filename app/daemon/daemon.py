@@ -0,0 +1,243 @@
+import logging
+import os
+import socketserver
+import threading
+from typing import Callable, Dict, Optional
+
+from app.aws.regions import region_list
+from app.core.core import Core
+from app.core.file_watcher import FileWatcher
+from app.core.refresh_loop import RefreshLoop
+from app.core.result import Result
+from app.daemon import client
+
+logger = logging.getLogger("logsmith")
+
+
+class Daemon:
+    """
+    Owns one Core for the lifetime of the process and keeps the active group logged in.
+    Commands arrive as json lines on a unix socket and are executed one at a time.
+    """
+
+    def __init__(self, core: Optional[Core] = None):
+        self.core: Core = core or Core()
+        self.refresh_loop = RefreshLoop(refresh=self.refresh, get_delay=self.core.get_next_refresh_delay)
+        self.standby_loop = RefreshLoop(refresh=self.prefetch_standby_groups,
+                                        get_delay=self.core.get_next_standby_delay)
+        self.file_watcher = FileWatcher()
+        self.core.watch_files(self.file_watcher, self.reload)
+        self._lock = threading.RLock()
+        self._stopped = threading.Event()
+        self._server: Optional[socketserver.ThreadingUnixStreamServer] = None
+        self._threads = []
+        self.commands: Dict[str, Callable[..., Result]] = {
+            "login": self.login,
+            "logout": self.logout,
+            "region": self.set_region,
+            "set-default": self.set_default,
+            "status": self.status,
+            "verify": self.verify,
+        }
+
+    ########################
+    # COMMANDS
+    def handle(self, request: dict) -> Result:
+        command = self.commands.get(request.get("command"))
+        if command is None:
+            result = Result()
+            result.error(f"unknown command {request.get('command')}")
+            return result
+        try:
+            return command(**request.get("arguments", {}))
+        except TypeError:
+            error_text = f"invalid arguments for {request.get('command')}"
+            result = Result()
+            result.error(error_text)
+            logger.error(error_text, exc_info=True)
+            return result
+
+    def login(self, group: str, region: Optional[str] = None, mfa_token: Optional[str] = None) -> Result:
+        result = Result()
+        profile_group = self.core.config.get_group(group)
+        if not profile_group:
+            result.error(f"profile group {group} not found")
+            return result
+        if profile_group.type != "aws":
+            result.error(f"{profile_group.type} groups are not supported by the daemon")
+            return result
+        if region is not None and region not in region_list:
+            result.error(f"invalid region: {region}")
+            return result
+
+        with self._lock:
+            if profile_group.auth_mode == "key":
+                login_result = self.core.login_with_key(profile_group=profile_group, mfa_token=mfa_token)
+            else:
+                login_result = self.core.login_with_sso(profile_group=profile_group)
+            if not login_result.was_success:
+                return login_result
+
+            if region:
+                region_result = self.core.set_region(region)
+                if not region_result.was_success:
+                    return region_result
+            self.core.verify()
+        self.refresh_loop.reschedule()
+
+        result.set_success()
+        return result
+
+    def logout(self) -> Result:
+        with self._lock:
+            return self.core.logout()
+
+    def set_region(self, region: Optional[str]) -> Result:
+        if region is not None and region not in region_list:
+            result = Result()
+            result.error(f"invalid region: {region}")
+            return result
+        with self._lock:
+            return self.core.set_region(region)
+
+    def set_default(self, profile: str) -> Result:
+        with self._lock:
+            return self.core.set_default_profile(profile)
+
+    def verify(self) -> Result:
+        with self._lock:
+            if not self.core.active_profile_group:
+                result = Result()
+                result.error("not logged in")
+                return result
+            verify_result = self.core.verify()
+            if not verify_result.was_success:
+                return verify_result
+        return self.status()
+
+    def status(self) -> Result:
+        # status does not take the lock, so it answers immediately even while a login is running
+        result = Result()
+        profile_group = self.core.active_profile_group
+        refresh_schedule = self.core.refresh_schedule
+        profiles = []
+        if profile_group:
+            for profile in profile_group.get_profile_list(include_service_profile=True):
+                expiration = refresh_schedule.get_expiration(profile.profile)
+                profiles.append({
+                    "profile": profile.profile,
+                    "verified": profile.verified,
+                    "expiration": expiration.isoformat() if expiration else None,
+                })
+        result.add_payload({
+            "group": profile_group.name if profile_group else None,
+            "region": self.core.get_region(),
+            "default_profile": self.core.default_profile_override,
+            "last_login": self.core.last_login.isoformat() if self.core.last_login else None,
+            "profiles": profiles,
+            "credential_server": self.core.credential_server.get_url(),
+        })
+        result.set_success()
+        return result
+
+    ########################
+    # REFRESH
+    def refresh(self) -> Result:
+        with self._lock:
+            refresh_result = self.core.refresh()
+            if refresh_result.was_success and self.core.active_profile_group:
+                self.core.verify()
+            return refresh_result
+
+    def prefetch_standby_groups(self) -> Result:
+        with self._lock:
+            return self.core.prefetch_standby_groups()
+
+    ########################
+    # RELOAD
+    def reload(self, change: str) -> None:
+        with self._lock:
+            if change == "accounts":
+                self.core.reload_accounts()
+            elif change == "config":
+                # errors of the credential server are logged by the core
+                self.core.reload_config()
+            elif change == "service_roles":
+                self.core.reload_service_roles()
+            elif change == "sso_token" and self.core.is_active_sso_group():
+                # a token renewed outside of logsmith moves the next sso login
+                self.core.verify()
+        if change == "sso_token":
+            self.refresh_loop.reschedule()
+
+    ########################
+    # SERVER
+    def start(self, socket_path: Optional[str] = None) -> None:
+        socket_path = socket_path or client.get_socket_path()
+        if client.is_running(socket_path):
+            raise RuntimeError(f"another logsmith daemon is listening on {socket_path}")
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+        # the socket accepts credentials commands, so only the current user may connect
+        previous_umask = os.umask(0o177)
+        try:
+            self._server = socketserver.ThreadingUnixStreamServer(socket_path, self._create_handler())
+        finally:
+            os.umask(previous_umask)
+        self._server.daemon_threads = True
+
+        self._stopped.clear()
+        self._threads = [
+            threading.Thread(target=self._server.serve_forever, name="daemon-socket", daemon=True),
+            threading.Thread(target=self.refresh_loop.run, name="daemon-refresh", daemon=True),
+            threading.Thread(target=self.standby_loop.run, name="daemon-standby", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        self.file_watcher.start()
+        logger.info(f"daemon listening on {socket_path}")
+
+    def stop(self) -> None:
+        self.request_stop()
+        self.file_watcher.stop()
+        if self._server is not None:
+            socket_path = self._server.server_address
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self.core.credential_server.stop()
+        logger.info("daemon stopped")
+
+    def request_stop(self) -> None:
+        self._stopped.set()
+        self.refresh_loop.stop()
+        self.standby_loop.stop()
+
+    def wait(self) -> None:
+        self._stopped.wait()
+
+    def _create_handler(self):
+        daemon = self
+
+        class CommandHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline(client.max_message_bytes)
+                if not line:
+                    return
+                try:
+                    request = client.decode(line)
+                except ValueError:
+                    result = Result()
+                    result.error("malformed request")
+                else:
+                    logger.info(f"daemon command {request.get('command')}")
+                    result = daemon.handle(request)
+                self.wfile.write(client.encode(client.result_to_dict(result)))
+
+        return CommandHandler
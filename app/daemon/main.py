@@ -0,0 +1,26 @@
+import logging
+import signal
+import sys
+
+from app.daemon.daemon import Daemon
+
+logger = logging.getLogger('logsmith')
+
+
+def start_daemon():
+    daemon = Daemon()
+    credential_server_result = daemon.core.update_credential_server()
+    if credential_server_result.was_error:
+        logger.error(credential_server_result.error_message)
+
+    try:
+        daemon.start()
+    except RuntimeError as error:
+        logger.error(str(error))
+        sys.exit(1)
+
+    # the handlers only set the stop event, the main thread shuts the threads down
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.request_stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: daemon.request_stop())
+    daemon.wait()
+    daemon.stop()
@@ -4,7 +4,7 @@ from typing import TYPE_CHECKING
 from PyQt6 import QtGui
 from PyQt6.QtCore import Qt, QRect
 from PyQt6.QtWidgets import QApplication, QLabel, QPlainTextEdit, QPushButton, \
-    QHBoxLayout, QVBoxLayout, QDialog, QLineEdit
+    QHBoxLayout, QVBoxLayout, QDialog, QLineEdit, QCheckBox
 
 from app import version
 from app.core import files
@@ -56,6 +56,28 @@ class ConfigDialog(QDialog):
         self.default_sso_interval_input = QLineEdit(self)
         self.default_sso_interval_input.setStyleSheet(styles.input_field_style)
 
+        self.request_concurrency_label = QLabel("Parallel aws requests during login and verify:", self)
+        self.request_concurrency_input = QLineEdit(self)
+        self.request_concurrency_input.setStyleSheet(styles.input_field_style)
+
+        self.credential_server_port_label = QLabel(
+            "Port of the local container credentials endpoint (empty to disable):", self)
+        self.credential_server_port_input = QLineEdit(self)
+        self.credential_server_port_input.setStyleSheet(styles.input_field_style)
+
+        self.yaml_cache_sidecar_checkbox = QCheckBox("Cache parsed accounts on disk (for large accounts files)", self)
+        self.role_credential_cache_checkbox = QCheckBox(
+            "Keep role credentials in a private, unencrypted file to switch back to key groups without sts", self)
+
+        self.warm_standby_groups_label = QLabel(
+            "Most used key groups to keep logged in in the background (0 to disable):", self)
+        self.warm_standby_groups_input = QLineEdit(self)
+        self.warm_standby_groups_input.setStyleSheet(styles.input_field_style)
+
+        self.warm_standby_sts_budget_label = QLabel("Sts calls per hour the background login may spend:", self)
+        self.warm_standby_sts_budget_input = QLineEdit(self)
+        self.warm_standby_sts_budget_input.setStyleSheet(styles.input_field_style)
+
         self.ok_button = QPushButton("OK")
         self.ok_button.clicked.connect(self.ok)
         self.cancel_button = QPushButton("Cancel")
@@ -94,6 +116,16 @@ class ConfigDialog(QDialog):
         vbox.addWidget(self.default_sso_session_input)
         vbox.addWidget(self.default_sso_interval_label)
         vbox.addWidget(self.default_sso_interval_input)
+        vbox.addWidget(self.request_concurrency_label)
+        vbox.addWidget(self.request_concurrency_input)
+        vbox.addWidget(self.credential_server_port_label)
+        vbox.addWidget(self.credential_server_port_input)
+        vbox.addWidget(self.yaml_cache_sidecar_checkbox)
+        vbox.addWidget(self.role_credential_cache_checkbox)
+        vbox.addWidget(self.warm_standby_groups_label)
+        vbox.addWidget(self.warm_standby_groups_input)
+        vbox.addWidget(self.warm_standby_sts_budget_label)
+        vbox.addWidget(self.warm_standby_sts_budget_input)
 
         vbox.addLayout(hbox)
         self.setLayout(vbox)
@@ -129,6 +161,31 @@ class ConfigDialog(QDialog):
             self.set_error_text('sso interval must not be a positive integer or 0')
             return
 
+        request_concurrency = self.request_concurrency_input.text()
+        request_concurrency = request_concurrency.strip()
+        if not util.is_positive_int(request_concurrency) or int(request_concurrency) == 0:
+            self.set_error_text('parallel requests must be a positive integer')
+            return
+
+        credential_server_port = self.credential_server_port_input.text()
+        credential_server_port = credential_server_port.strip()
+        if credential_server_port and (not util.is_positive_int(credential_server_port)
+                                       or not 0 < int(credential_server_port) < 65536):
+            self.set_error_text('credential server port must be empty or between 1 and 65535')
+            return
+
+        warm_standby_groups = self.warm_standby_groups_input.text()
+        warm_standby_groups = warm_standby_groups.strip()
+        if not util.is_positive_int(warm_standby_groups):
+            self.set_error_text('background groups must be a positive integer or 0')
+            return
+
+        warm_standby_sts_budget = self.warm_standby_sts_budget_input.text()
+        warm_standby_sts_budget = warm_standby_sts_budget.strip()
+        if not util.is_positive_int(warm_standby_sts_budget):
+            self.set_error_text('sts calls per hour must be a positive integer or 0')
+            return
+
         config = Config()
         config.initialize_profile_groups(accounts=raw_config_dict,
                                          service_roles={},
@@ -141,6 +198,12 @@ class ConfigDialog(QDialog):
             config.set_default_access_key(default_access_key)
             config.set_default_sso_session(default_sso_session)
             config.set_default_sso_interval(default_sso_interval)
+            config.set_request_concurrency(request_concurrency)
+            config.set_credential_server_port(credential_server_port)
+            config.set_yaml_cache_sidecar(self.yaml_cache_sidecar_checkbox.isChecked())
+            config.set_role_credential_cache(self.role_credential_cache_checkbox.isChecked())
+            config.set_warm_standby_groups(warm_standby_groups)
+            config.set_warm_standby_sts_budget(warm_standby_sts_budget)
             self.gui.edit_config(config)
             self.hide()
         else:
@@ -158,6 +221,7 @@ class ConfigDialog(QDialog):
 
     def debug_shell(self):
         commands = ['echo "--env--"', 'env', 'echo "--lookup aws--"', 'which aws']
+        shell.refresh_env()
         shell.run("&&".join(commands))
         self.set_success_text('shell debug complete: see logs')
 
@@ -207,6 +271,12 @@ class ConfigDialog(QDialog):
             self.default_sso_interval_input.setText("None")
         else:
             self.default_sso_interval_input.setText(config.default_sso_interval)
+        self.request_concurrency_input.setText(str(config.get_request_concurrency()))
+        self.credential_server_port_input.setText(str(config.get_credential_server_port() or ''))
+        self.yaml_cache_sidecar_checkbox.setChecked(config.yaml_cache_sidecar)
+        self.role_credential_cache_checkbox.setChecked(config.role_credential_cache)
+        self.warm_standby_groups_input.setText(str(config.get_warm_standby_groups()))
+        self.warm_standby_sts_budget_input.setText(str(config.get_warm_standby_sts_budget()))
 
         self.show()
         self.raise_()
@@ -5,16 +5,14 @@ from typing import List, Optional
 from datetime import timezone
 from datetime import datetime
 
-from PyQt6.QtCore import QCoreApplication
+from PyQt6.QtCore import QCoreApplication, pyqtSignal
 from PyQt6.QtWidgets import QMainWindow
 from app.core.profile import Profile
 from app.util import util
-from core.core import Core
-from gui.mfa_dialog import MfaDialog
-from gui.repeater import Repeater
 
 from app.core.config import Config, ProfileGroup
 from app.core.core import Core
+from app.core.file_watcher import FileWatcher
 from app.core.result import Result
 from app.gui.access_key_dialog import SetKeyDialog
 from app.gui.assets import ICON_DISCONNECTED, Assets, ICON_STYLE_OUTLINE, ICON_STYLE_ERROR, ICON_STYLE_FULL, ICON_STYLE_GCP, \
@@ -31,10 +29,16 @@ from app.gui.trayicon import SystemTrayIcon
 from app.yubico import mfa
 
 logger = logging.getLogger('logsmith')
-STANDARD_LOGIN_REPEATER_INTERVAL = 600
+
+standby_delay_after_login_seconds = 30
 
 
 class Gui(QMainWindow):
+    # emitted from the verify thread, handled in the gui thread
+    profile_verified_channel = pyqtSignal()
+    # emitted from the file watcher thread with the kind of change
+    file_changed_channel = pyqtSignal(str)
+
     def __init__(self, app):
         QMainWindow.__init__(self)
         self.app = app
@@ -43,6 +47,7 @@ class Gui(QMainWindow):
         self.last_login: None | datetime = None
         self.last_login_text: str = 'never'
         self.login_repeater = Repeater()
+        self.standby_repeater = Repeater()
         self.tray_icon = SystemTrayIcon(parent=self,
                                         assets=self.assets,
                                         toggles=self.core.toggles,
@@ -56,13 +61,23 @@ class Gui(QMainWindow):
 
         # This is needed to keep the task alive, otherwise it crashes the application
         self.task: Optional[BackgroundTask] = None
+        self.standby_task: Optional[BackgroundTask] = None
         self._active_tasks: set[BackgroundTask] = set()
+        self.profile_verified_channel.connect(self._on_profile_verified)
+        self.file_changed_channel.connect(self._on_file_changed)
+        self.file_watcher = FileWatcher()
+        self.core.watch_files(self.file_watcher, self.file_changed_channel.emit)
+        self.file_watcher.start()
 
         self.tray_icon.show()
+        self._check_and_signal_error(self.core.update_credential_server())
 
     def login(self, profile_group: ProfileGroup, force: bool= False):
         if profile_group.type == "aws" and profile_group.auth_mode == "key":
-            self.login_key(profile_group=profile_group)
+            if not force and self.core.active_profile_group and self.core.active_profile_group.name == profile_group.name:
+                self.refresh_key(profile_group=profile_group)
+            else:
+                self.login_key(profile_group=profile_group)
         elif profile_group.type == "aws" and profile_group.auth_mode == "sso" and profile_group.write_mode == "sso":
             self.login_sso(profile_group=profile_group, force=force)
         elif profile_group.type == "aws" and profile_group.auth_mode == "sso" and profile_group.write_mode == "key":
@@ -93,10 +108,9 @@ class Gui(QMainWindow):
             self._to_error_state()
             return
 
-        elapsed_seconds = self.elapsed_seconds_since_login()
-        if force or self.should_login(elapsed_seconds, sso_interval):
-            tasks.append(Task(self.core.login_with_sso, profile_group=profile_group))
-        tasks.append(Task(self.core.verify))
+        if force or self.core.should_login_with_sso(profile_group):
+            tasks.append(Task(self.core.login_with_sso, profile_group=profile_group, force=force))
+        tasks.append(Task(self.core.verify, on_verified=self._signal_profile_verified))
 
         self.task = BackgroundTask(
             task=tasks,
@@ -120,14 +134,13 @@ class Gui(QMainWindow):
             self._to_error_state()
             return
 
-        elapsed_seconds = self.elapsed_seconds_since_login()
-        if force or self.should_login(elapsed_seconds, sso_interval):
+        if force or self.core.should_login_with_sso(profile_group):
             logger.info("trigger full login")
-            tasks.append(Task(self.core.login_with_sso, profile_group=profile_group))
+            tasks.append(Task(self.core.login_with_sso, profile_group=profile_group, force=force))
         else:
             logger.info("trigger refresh login")
             tasks.append(Task(self.core.login_with_sso_write_key, profile_group=profile_group))
-        tasks.append(Task(self.core.verify))
+        tasks.append(Task(self.core.verify, on_verified=self._signal_profile_verified))
 
         self.task = BackgroundTask(
             task=tasks,
@@ -149,7 +162,7 @@ class Gui(QMainWindow):
         self.tray_icon.refresh_profile_status(self.core.active_profile_group, self.core.default_profile_override)
 
         self._to_login_state()
-        self.start_login_repeater(STANDARD_LOGIN_REPEATER_INTERVAL)
+        self.schedule_refresh()
 
     def _on_login_sso_failure(self):
         logger.info('-- sso login failure --')
@@ -163,7 +176,21 @@ class Gui(QMainWindow):
         self.task = BackgroundTask(
             task=[
                 Task(self.core.login_with_key, profile_group=profile_group, mfa_token=mfa_token),
-                Task(self.core.verify),
+                Task(self.core.verify, on_verified=self._signal_profile_verified),
+            ],
+            on_success=self._on_login_key_success,
+            on_failure=partial(self._on_login_key_failure, profile_group=profile_group),
+            on_error=self._on_error
+        )
+        self._start_task(self.task)
+
+    def refresh_key(self, profile_group: ProfileGroup):
+        self.login_repeater.stop()
+        self._to_busy_state()
+        self.task = BackgroundTask(
+            task=[
+                Task(self.core.refresh_with_key, profile_group=profile_group),
+                Task(self.core.verify, on_verified=self._signal_profile_verified),
             ],
             on_success=self._on_login_key_success,
             on_failure=partial(self._on_login_key_failure, profile_group=profile_group),
@@ -183,7 +210,8 @@ class Gui(QMainWindow):
         self.tray_icon.refresh_profile_status(self.core.active_profile_group, self.core.default_profile_override)
 
         self._to_login_state()
-        self.start_login_repeater(STANDARD_LOGIN_REPEATER_INTERVAL)
+        self.schedule_refresh()
+        self.schedule_standby_prefetch(standby_delay_after_login_seconds)
 
     def _on_login_key_failure(self, profile_group: ProfileGroup):
         logger.info('-- key login failure --')
@@ -218,6 +246,60 @@ class Gui(QMainWindow):
         self._to_login_state()
         self.start_login_repeater(8 * 60 * 60)
 
+    ########################
+    # VERIFY
+    def _signal_profile_verified(self, profile: Profile):
+        self.profile_verified_channel.emit()
+
+    def _on_profile_verified(self):
+        if self.core.active_profile_group:
+            self.tray_icon.refresh_profile_status(self.core.active_profile_group, self.core.default_profile_override)
+
+    ########################
+    # RELOAD
+    def _on_file_changed(self, change: str):
+        if change == 'accounts':
+            changed_groups = self.core.reload_accounts()
+            if changed_groups:
+                self._rebuild_menu()
+            if self.core.active_profile_group and self.core.active_profile_group.name in changed_groups:
+                self.verify()
+        elif change == 'config':
+            self._check_and_signal_error(self.core.reload_config())
+        elif change == 'service_roles':
+            changed_groups = self.core.reload_service_roles()
+            if self.core.active_profile_group and self.core.active_profile_group.name in changed_groups:
+                self._rebuild_menu()
+        elif change == 'sso_token' and self.core.is_active_sso_group():
+            # a token renewed outside of logsmith moves the next sso login
+            self.verify()
+            self.schedule_refresh()
+
+    def _rebuild_menu(self):
+        self.tray_icon.populate_context_menu(self.core.get_profile_group_list())
+        active_profile_group = self.core.active_profile_group
+        if not active_profile_group:
+            return
+        if active_profile_group.service_profile:
+            self.tray_icon.set_service_role(profile_name=active_profile_group.service_profile.source,
+                                            role_name=active_profile_group.service_profile.role)
+        self.tray_icon.update_region_text(self.core.get_region())
+        self.tray_icon.update_copy_menus(active_profile_group)
+        self.tray_icon.refresh_profile_status(active_profile_group, self.core.default_profile_override)
+        self._to_login_state()
+
+    def verify(self):
+        if self._active_tasks:
+            # a running login verifies the group when it is done
+            return
+        task = BackgroundTask(
+            task=Task(self.core.verify, on_verified=self._signal_profile_verified),
+            on_success=self._to_login_state,
+            on_failure=self._on_error,
+            on_error=self._on_error,
+        )
+        self._start_task(task)
+
     ########################
     # REPEATER
     def start_login_repeater(self, delay_seconds):
@@ -225,27 +307,43 @@ class Gui(QMainWindow):
         self.login_repeater.start(task=prepared_login,
                                   delay_seconds=delay_seconds)
 
-    def save_login_datetime(self):
-        self.last_login = datetime.now(timezone.utc)
+    def schedule_refresh(self):
+        delay_seconds = self.core.get_next_refresh_delay()
+        self.login_repeater.start(task=self._on_refresh_due, delay_seconds=delay_seconds)
 
-    def elapsed_seconds_since_login(self) -> int | None:
-        if self.last_login is None:
-            return None
-        return int((datetime.now(timezone.utc) - self.last_login).total_seconds())
+    def schedule_standby_prefetch(self, delay_seconds: int):
+        if not self.core.is_warm_standby_enabled():
+            self.standby_repeater.stop()
+            return
+        self.standby_repeater.start(task=self._on_standby_due, delay_seconds=delay_seconds)
 
-    def should_login(self, elapsed: int | None, threshold: int | str | None) -> bool:
-        logger.info(f'elapsed {elapsed}s / {threshold}h since login')
-        if elapsed is None:
-            return True
+    def _on_standby_due(self):
+        if any(task is not self.standby_task for task in self._active_tasks):
+            # a login is running, the standby waits for it
+            self.schedule_standby_prefetch(standby_delay_after_login_seconds)
+            return
+        reschedule = partial(self._on_standby_done, self.core.get_next_standby_delay())
+        self.standby_task = BackgroundTask(
+            task=Task(self.core.prefetch_standby_groups),
+            on_success=reschedule,
+            on_failure=reschedule,
+            on_error=reschedule,
+        )
+        self._start_task(self.standby_task)
 
-        if threshold is None or threshold == 0 or threshold == "0":
-            return False
+    def _on_standby_done(self, delay_seconds: int, error_message: Optional[str] = None):
+        # a failed prefetch only costs the next switch a full login, it does not change the tray state
+        self.schedule_standby_prefetch(delay_seconds)
 
-        elapsed_seconds = int(elapsed)
-        threshold_seconds = int(threshold) * 60 * 60
-        if elapsed_seconds >= threshold_seconds:
-            return True
-        return False
+    def _on_refresh_due(self):
+        if not self.core.is_refresh_due():
+            logger.info('no credentials close to expiry')
+            self.schedule_refresh()
+            return
+        self.login(profile_group=self.core.active_profile_group)
+
+    def save_login_datetime(self):
+        self.last_login = datetime.now(timezone.utc)
 
     ########################
     # SET DEFAULT PROFILE
@@ -489,6 +587,9 @@ class Gui(QMainWindow):
 
     def stop_and_exit(self):
         self.login_repeater.stop()
+        self.standby_repeater.stop()
+        self.file_watcher.stop()
+        self.core.credential_server.stop()
         self.exit()
 
     @staticmethod
@@ -4,7 +4,6 @@ from PyQt6.QtCore import Qt
 from PyQt6.QtWidgets import QDialog, QLabel, QLineEdit, QApplication, QHBoxLayout, QVBoxLayout, \
     QPushButton, QListWidget
 
-from app.aws import iam
 from app.core.config import Config
 from app.core.core import Core
 from app.gui import styles
@@ -136,7 +135,7 @@ class ServiceProfileDialog(QDialog):
             self.available_role_selection.clear()
             self.fetch_button.setText('fetching roles... Please wait.')
             self.fetch_roles_task = BackgroundTask(
-                task=Task(iam.list_assumable_roles, source_profile=self.selected_source_profile),
+                task=Task(self.core.list_assumable_roles, source_profile=self.selected_source_profile),
                 on_success=self.on_fetch_roles_success,
                 on_failure=self.on_fetch_roles_error,
                 on_error=self.on_fetch_roles_error)
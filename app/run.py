@@ -2,10 +2,8 @@ import logging
 import os
 import sys
 
-import arguments
+from app import arguments
 from app.core import files
-from cli.main import start_cli
-from gui.main import start_gui
 
 
 def main():
@@ -22,13 +20,20 @@ def main():
         os.mkdir(aws_path)
 
     args = arguments.parse(sys.argv[1:])
+    if arguments.use_credential_process(args):
+        # runs for every sdk credential refresh, so it must not touch the gui log file
+        from app.aws import credential_process
+        sys.exit(credential_process.run(args.profile))
+
     logging.basicConfig(level=logging.getLevelName(args.loglevel))
     logger = logging.getLogger('logsmith')
     logger.propagate = False
     logger.setLevel(logging.DEBUG)
     log_formatter = logging.Formatter("%(asctime)12s [%(levelname)s] %(threadName)-12.12s %(message)s")
 
-    file_handler = logging.FileHandler(f'{app_path}/app.log', mode='w')
+    # the daemon runs next to the gui, so it must not truncate the gui log
+    log_file_name = 'daemon.log' if arguments.use_daemon(args) else 'app.log'
+    file_handler = logging.FileHandler(f'{app_path}/{log_file_name}', mode='w')
     file_handler.setFormatter(log_formatter)
     logger.addHandler(file_handler)
 
@@ -39,9 +44,15 @@ def main():
     logging.info(f'config dir {app_path}')
     logging.info('start app')
 
-    if arguments.use_cli(args):
+    # every entry point only imports what it needs, qt is only loaded for the gui
+    if arguments.use_daemon(args):
+        from app.daemon.main import start_daemon
+        start_daemon()
+    elif arguments.use_cli(args):
+        from app.cli.main import start_cli
         start_cli(args)
     else:
+        from app.gui.main import start_gui
         start_gui()
 
 
@@ -5,11 +5,20 @@ import subprocess
 import threading
 import time
 
-from app.core.files import load_config
+from app.core.files import get_config_path, load_config
 from app.core.result import Result
 
 logger = logging.getLogger('logsmith')
 
+# Forking a login shell to read its environment is the most expensive part of a command.
+# The environment is kept until the TTL expires, the path extension in config.yaml changes
+# or refresh_env is called, e.g. by the debug shell button in the config dialog.
+env_ttl_seconds = 900
+_lock = threading.Lock()
+_env_cache = {'env': None, 'path_extension': None, 'created_at': 0.0}
+_config_cache = {'signature': None, 'path_extension': None}
+_stats = {'env_loads': 0, 'env_hits': 0, 'env_load_seconds': 0.0}
+
 def get_login_shell():
     return os.environ.get("SHELL") or pwd.getpwuid(os.getuid()).pw_shell or "/bin/sh"
 
@@ -28,14 +37,60 @@ def login_shell_env(path_extension=None):
         env['PATH'] = f'{path_extension}:{original_path}'
     return env
 
+def _get_config_signature():
+    try:
+        stat = os.stat(get_config_path())
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def _get_path_extension():
+    signature = _get_config_signature()
+    if signature is None or signature != _config_cache['signature']:
+        config = load_config()
+        _config_cache['signature'] = signature
+        _config_cache['path_extension'] = config.get("shell_path_extension", None)
+    return _config_cache['path_extension']
+
+
+def get_env() -> dict:
+    with _lock:
+        path_extension = _get_path_extension()
+        env = _env_cache['env']
+        age = time.monotonic() - _env_cache['created_at']
+        if env is not None and _env_cache['path_extension'] == path_extension and age < env_ttl_seconds:
+            _stats['env_hits'] += 1
+            return dict(env)
+
+        start = time.monotonic()
+        env = login_shell_env(path_extension)
+        duration = time.monotonic() - start
+        logger.info(f"loaded login shell environment in {duration:.3f}s")
+        _env_cache['env'] = env
+        _env_cache['path_extension'] = path_extension
+        _env_cache['created_at'] = time.monotonic()
+        _stats['env_loads'] += 1
+        _stats['env_load_seconds'] += duration
+        return dict(env)
+
+
+def refresh_env() -> None:
+    with _lock:
+        _env_cache['env'] = None
+        _config_cache['signature'] = None
+
+
+def get_env_stats() -> dict:
+    with _lock:
+        return dict(_stats)
+
+
 def run(command, timeout=5) -> Result:
     logger.info(f"run command: {command}")
     shell = get_login_shell()
     logger.info(f"shell: {shell}")
 
-    config = load_config()
-    path_extension = config.get("shell_path_extension", None)
-
     result = Result()
     proc = None
     lines: list[str] = []
@@ -57,7 +112,7 @@ def run(command, timeout=5) -> Result:
             text=True,
             bufsize=1,
             executable=shell,
-            env=login_shell_env(path_extension),
+            env=get_env(),
         )
 
         assert proc.stdout is not None
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+##################
+# Measures the imports of the logsmith entry points with `python -X importtime`.
+# Fails if an entry point imports a module it does not need or exceeds its import time budget.
+##################
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+repository_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+run_path = os.path.join(repository_path, 'app', 'run.py')
+
+heavy_modules = {'PyQt6', 'boto3', 'botocore.session', 'botocore.client'}
+
+# budgets are a multiple of the import time on a developer machine, to leave room for slower ci runners
+entry_points = {
+    'version': {
+        'command': [run_path, '--version'],
+        'forbidden': heavy_modules | {'ruamel.yaml', 'app.core.core'},
+        'budget_ms': 150,
+    },
+    'daemon client': {
+        'command': [run_path, '--status'],
+        'forbidden': heavy_modules | {'ruamel.yaml', 'app.core.core'},
+        'budget_ms': 150,
+    },
+    'cli': {
+        'command': [run_path, '--list'],
+        'forbidden': heavy_modules,
+        'budget_ms': 400,
+    },
+    'credential process': {
+        'command': [run_path, 'credential-process', '--profile', 'default'],
+        'forbidden': heavy_modules,
+        'budget_ms': 400,
+    },
+    'gui': {
+        'command': ['-c', 'import app.gui.gui'],
+        'forbidden': {'boto3', 'botocore.session', 'botocore.client'},
+        'budget_ms': 1500,
+        'requires': 'PyQt6.QtWidgets',
+    },
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the import time of the logsmith entry points.')
+    parser.add_argument('--repeat', type=int, default=5, help='measurements per entry point, the median is used')
+    parser.add_argument('--budget-factor', type=float, default=1.0, help='multiply all budgets with this factor')
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as home_path:
+        for name, entry_point in entry_points.items():
+            if entry_point.get('requires') and not is_importable(entry_point['requires'], home_path):
+                print(f'{name:20} skipped, {entry_point["requires"]} can not be imported')
+                continue
+            failures.extend(check_entry_point(name, entry_point, args.repeat, args.budget_factor, home_path))
+
+    for failure in failures:
+        print(f'FAIL {failure}')
+    sys.exit(1 if failures else 0)
+
+
+def check_entry_point(name: str, entry_point: dict, repeat: int, budget_factor: float, home_path: str) -> list:
+    failures = []
+    # the first run compiles the bytecode, it is not part of the measurement
+    measure(entry_point['command'], home_path)
+    measurements = [measure(entry_point['command'], home_path) for _ in range(repeat)]
+    import_ms = statistics.median(total_ms for total_ms, _ in measurements)
+    modules = measurements[-1][1]
+
+    budget_ms = entry_point['budget_ms'] * budget_factor
+    print(f'{name:20} {import_ms:7.1f} ms  (budget {budget_ms:.0f} ms, {len(modules)} modules)')
+    if import_ms > budget_ms:
+        failures.append(f'{name} imports took {import_ms:.1f} ms, the budget is {budget_ms:.0f} ms')
+    for module in sorted(entry_point['forbidden'] & modules):
+        failures.append(f'{name} imports {module}')
+    return failures
+
+
+def measure(command: list, home_path: str) -> (float, set):
+    process = subprocess.run([sys.executable, '-X', 'importtime', *command],
+                             env=get_env(home_path), cwd=repository_path,
+                             stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    return parse_importtime(process.stderr)
+
+
+def parse_importtime(output: str) -> (float, set):
+    # import time: self [us] | cumulative | imported package
+    total_us = 0
+    modules = set()
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, _, module = line[len('import time:'):].split('|')
+        if not self_us.strip().isdigit():
+            continue
+        total_us += int(self_us)
+        modules.add(module.strip())
+    return total_us / 1000, modules
+
+
+def is_importable(module: str, home_path: str) -> bool:
+    process = subprocess.run([sys.executable, '-c', f'import {module}'], env=get_env(home_path),
+                             capture_output=True)
+    return process.returncode == 0
+
+
+def get_env(home_path: str) -> dict:
+    env = dict(os.environ)
+    env['HOME'] = home_path
+    env['PYTHONPATH'] = repository_path
+    return env
+
+
+if __name__ == '__main__':
+    main()
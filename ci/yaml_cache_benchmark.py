@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+##################
+# Measures loads of a large accounts.yaml: parsed, from the in-memory cache and from the sidecar file.
+# Fails if a cached load is not at least --min-speedup times faster than parsing.
+##################
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from unittest import mock
+
+repository_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repository_path)
+
+from app.core import files  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare cached and parsed loads of a large accounts.yaml.')
+    parser.add_argument('--repeat', type=int, default=5, help='measurements per load, the median is used')
+    parser.add_argument('--groups', type=int, default=50, help='groups in the generated accounts file')
+    parser.add_argument('--profiles', type=int, default=20, help='profiles per group')
+    parser.add_argument('--min-speedup', type=float, default=10.0, help='required speedup of cached loads')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_path:
+        with mock.patch.object(files, 'get_app_path', return_value=os.path.join(temp_path, '.logsmith')):
+            accounts_path = os.path.join(temp_path, 'accounts.yaml')
+            write_accounts(accounts_path, args.groups, args.profiles)
+            timings = measure(accounts_path, args.repeat)
+
+    failures = []
+    parse_ms = timings['parse']
+    for name, load_ms in timings.items():
+        speedup = parse_ms / load_ms if load_ms else float('inf')
+        print(f'{name:10} {load_ms:8.2f} ms  ({speedup:.1f}x)')
+        if name != 'parse' and speedup < args.min_speedup:
+            failures.append(f'{name} loads are only {speedup:.1f}x faster than parsing, '
+                            f'the minimum is {args.min_speedup:.0f}x')
+
+    for failure in failures:
+        print(f'FAIL {failure}')
+    sys.exit(1 if failures else 0)
+
+
+def measure(accounts_path: str, repeat: int) -> dict:
+    samples = {'parse': [], 'memory': [], 'sidecar': []}
+    for _ in range(repeat):
+        files.clear_yaml_cache()
+        sidecar_path = files._get_yaml_sidecar_path(accounts_path)
+        if os.path.exists(sidecar_path):
+            os.remove(sidecar_path)
+        samples['parse'].append(time_load(accounts_path, sidecar=True))
+        samples['memory'].append(time_load(accounts_path))
+        files.clear_yaml_cache()
+        samples['sidecar'].append(time_load(accounts_path, sidecar=True))
+    return {name: statistics.median(values) for name, values in samples.items()}
+
+
+def time_load(path: str, sidecar: bool = False) -> float:
+    start = time.perf_counter()
+    files.load_yaml_file(path, sidecar=sidecar)
+    return (time.perf_counter() - start) * 1000
+
+
+def write_accounts(path: str, group_count: int, profile_count: int) -> None:
+    lines = []
+    for group in range(group_count):
+        lines += [f'group-{group}:', '  color: "#388E3C"', '  team: test', '  region: eu-central-1', '  profiles:']
+        for profile in range(profile_count):
+            lines += [f'    - profile: profile-{group}-{profile}',
+                      f'      account: "{group:06d}{profile:06d}"',
+                      '      role: developer']
+    with open(path, 'w') as file:
+        file.write('\n'.join(lines) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -72,3 +72,46 @@ def test_unknown_parameter(capsys):
     assert "logsmith: error: unrecognized arguments: --foobar" in captured.err
     assert captured.out == ""
     assert exc.value.code != 0
+
+
+def test_credential_process():
+    args = arguments.parse(["credential-process", "--profile", "developer"])
+    assert arguments.use_credential_process(args)
+    assert not arguments.use_cli(args)
+    assert args.profile == "developer"
+
+
+def test_credential_process__missing_profile(capsys):
+    with pytest.raises(SystemExit) as exc:
+        arguments.parse(["credential-process"])
+
+    captured = capsys.readouterr()
+    assert "the following arguments are required: --profile" in captured.err
+    assert exc.value.code != 0
+
+
+def test_daemon():
+    args = arguments.parse(["daemon"])
+    assert arguments.use_daemon(args)
+    assert not arguments.use_cli(args)
+
+
+def test_use_daemon_client():
+    assert arguments.use_daemon_client(arguments.parse(["--login", "development", "--region", "eu-west-1"]))
+    assert arguments.use_daemon_client(arguments.parse(["--status"]))
+    assert arguments.use_daemon_client(arguments.parse(["--set-default", "developer"]))
+    assert not arguments.use_daemon_client(arguments.parse(["--list"]))
+    assert not arguments.use_daemon_client(arguments.parse(["--login", "development", "--toggle", "script", "false"]))
+
+
+def test_discover_accounts():
+    assert None is arguments.parse([]).discover_accounts
+    assert "" == arguments.parse(["--discover-accounts"]).discover_accounts
+    assert "sso-team" == arguments.parse(["--discover-accounts", "sso-team"]).discover_accounts
+    assert not arguments.use_daemon_client(arguments.parse(["--status", "--discover-accounts"]))
+
+
+def test_discover_accounts__uses_cli():
+    assert arguments.use_cli(arguments.parse(["--discover-accounts"]))
+    assert arguments.use_cli(arguments.parse(["--discover-accounts", "my-session"]))
+    assert not arguments.use_cli(arguments.parse([]))
@@ -0,0 +1,172 @@
+import pytest
+
+from app.aws import clients, credentials, iam
+from tests.test_data import test_accounts
+
+
+@pytest.fixture(autouse=True)
+def empty_pool(mocker):
+    clients.invalidate()
+    mocker.patch.dict(clients._stats, {"sessions": 0, "clients": 0})
+    yield
+    clients.invalidate()
+
+
+@pytest.fixture
+def mock_create_session(mocker):
+    def create_session(**kwargs):
+        clients._stats["sessions"] += 1
+        session = mocker.Mock()
+        session.client.side_effect = lambda *args, **kwargs: mocker.MagicMock()
+        return session
+
+    return mocker.patch.object(clients, "_create_session", side_effect=create_session)
+
+
+def test_get_session__pooled_per_profile(mock_create_session):
+    first = clients.get_session("developer")
+    second = clients.get_session("developer")
+    other = clients.get_session("readonly")
+
+    assert first is second
+    assert first is not other
+    assert 2 == mock_create_session.call_count
+
+
+def test_get_client__pooled_per_profile_service_and_config(mock_create_session):
+    first = clients.get_client("developer", "sts")
+    second = clients.get_client("developer", "sts")
+    iam_client = clients.get_client("developer", "iam")
+    timeout_client = clients.get_client("developer", "sts", timeout=2, retries=2)
+
+    assert first is second
+    assert first is not iam_client
+    assert first is not timeout_client
+    assert 1 == mock_create_session.call_count
+    assert 3 == clients.get_stats()["clients"]
+
+
+def test_get_unsigned_client__pooled_per_service_and_region(mocker):
+    from botocore import UNSIGNED
+    mock_create_session = mocker.patch.object(clients, "_create_session")
+    mock_create_session.return_value.client.side_effect = lambda *args, **kwargs: mocker.MagicMock()
+
+    first = clients.get_unsigned_client("sso", "eu-central-1", timeout=10)
+    second = clients.get_unsigned_client("sso", "eu-central-1", timeout=10)
+    other_region = clients.get_unsigned_client("sso", "us-east-1", timeout=10)
+
+    assert first is second
+    assert first is not other_region
+    client_call = mock_create_session.return_value.client.call_args
+    assert "us-east-1" == client_call.kwargs["region_name"]
+    assert UNSIGNED is client_call.kwargs["config"].signature_version
+    assert 10 == client_call.kwargs["config"].connect_timeout
+
+
+def test_get_secrets_client__pooled_per_access_key_and_capped(mocker, mock_create_session):
+    mocker.patch.object(clients, "max_secrets_clients", 2)
+
+    def get_secrets(access_key_id):
+        return {"AccessKeyId": access_key_id, "SecretAccessKey": "secret", "SessionToken": "token"}
+
+    first = clients.get_secrets_client(get_secrets("first"), "sts")
+    assert first is clients.get_secrets_client(get_secrets("first"), "sts")
+    # every role refresh brings a new access key id, only the most recently used clients are kept
+    clients.get_secrets_client(get_secrets("second"), "sts")
+    clients.get_secrets_client(get_secrets("first"), "sts")
+    clients.get_secrets_client(get_secrets("third"), "sts")
+
+    assert 2 == clients.get_stats()["pooled_clients"]
+    assert first is clients.get_secrets_client(get_secrets("first"), "sts")
+    assert 3 == mock_create_session.call_count
+    clients.get_secrets_client(get_secrets("second"), "sts")
+    assert 4 == mock_create_session.call_count
+
+
+def test_create_client_config__read_timeout_only_when_given():
+    config = clients._create_client_config(timeout=2, retries=2)
+    verify_config = clients._create_client_config(timeout=5, retries=2, read_timeout=5)
+
+    assert 2 == config.connect_timeout
+    assert 60 == config.read_timeout
+    assert 5 == verify_config.read_timeout
+
+
+def test_invalidate(mock_create_session):
+    first = clients.get_client("developer", "sts")
+    clients.invalidate()
+    second = clients.get_client("developer", "sts")
+
+    assert first is not second
+    assert 2 == mock_create_session.call_count
+
+
+def test_write_credentials_file__invalidates_pool(mocker, mock_create_session):
+    mocker.patch.object(credentials, "_write_file")
+    clients.get_client("developer", "sts")
+
+    credentials.write_credentials_file(credentials.ConfigParser())
+
+    assert 0 == clients.get_stats()["pooled_clients"]
+
+
+def test_write_config_file__invalidates_pool(mocker, mock_create_session):
+    mocker.patch.object(credentials, "_write_file")
+    clients.get_client("developer", "sts")
+
+    credentials.write_config_file(credentials.ConfigParser())
+
+    assert 0 == clients.get_stats()["pooled_clients"]
+
+
+def test_get_client__pool_invalidated_when_files_change_on_disk(mocker, mock_create_session, tmp_path):
+    credentials_path = tmp_path / "credentials"
+    credentials_path.write_text("[developer]\n")
+    mocker.patch.object(clients, "_get_aws_file_paths", return_value=(str(credentials_path), str(tmp_path / "config")))
+    first = clients.get_client("developer", "sts")
+    unchanged = clients.get_client("developer", "sts")
+
+    # another process, e.g. a cli refresh loop, replaces the credentials file
+    replaced_path = tmp_path / "credentials.new"
+    replaced_path.write_text("[developer]\naws_access_key_id = new\n")
+    replaced_path.replace(credentials_path)
+    second = clients.get_client("developer", "sts")
+
+    assert first is unchanged
+    assert first is not second
+    assert 2 == mock_create_session.call_count
+
+
+def test_benchmark__sessions_and_clients_per_login(mocker, mock_create_session):
+    # a key login assumes every role and verifies every profile afterwards
+    profile_group = test_accounts.get_test_profile_group(include_service_role=True)
+    profile_list = profile_group.get_profile_list(include_service_profile=True)
+
+    # before pooling, every lookup created its own session and client, measured by emptying the pool on each lookup
+    unpooled_check_files = mocker.patch.object(clients, "_check_files", side_effect=clients.invalidate)
+    _login(profile_list)
+    unpooled = clients.get_stats()
+
+    mocker.stop(unpooled_check_files)
+    clients.invalidate()
+    clients._stats.update({"sessions": 0, "clients": 0})
+    _login(profile_list)
+    pooled = clients.get_stats()
+
+    print(f"login with {len(profile_list)} profiles: "
+          f"{unpooled['sessions']} sessions / {unpooled['clients']} clients before, "
+          f"{pooled['sessions']} sessions / {pooled['clients']} clients after")
+    assert unpooled_check_files.called
+    assert 2 * len(profile_list) == unpooled["sessions"]
+    assert 2 * len(profile_list) == unpooled["clients"]
+    assert 1 + len(profile_list) == pooled["sessions"]
+    assert 1 + len(profile_list) == pooled["clients"]
+    assert 1 + len(profile_list) == pooled["pooled_sessions"]
+
+
+def _login(profile_list) -> None:
+    source_profile = "session-token-access-key"
+    for profile in profile_list:
+        iam.assume_role(source_profile, "user", profile.account, profile.role)
+    for profile in profile_list:
+        iam.get_caller_identity(profile.profile)
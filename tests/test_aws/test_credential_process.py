@@ -0,0 +1,123 @@
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from botocore.credentials import ProcessProvider
+
+from app.aws import credential_process, iam, key
+from app.core import files
+from app.core.profile_group import ProfileGroup
+from tests.test_data import test_accounts
+
+
+def get_secrets(key_id: str, expires_in: timedelta = timedelta(hours=1)) -> dict:
+    return {
+        "AccessKeyId": key_id,
+        "SecretAccessKey": "secret",
+        "SessionToken": "token",
+        "Expiration": datetime.now(timezone.utc) + expires_in,
+    }
+
+
+@pytest.fixture(autouse=True)
+def app_path(mocker, tmp_path):
+    mocker.patch.object(files, "get_app_path", return_value=str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def profile_group():
+    return ProfileGroup("test", test_accounts.get_test_group_chain_assume(),
+                        "access-key", "default-sso-session", "default-sso-interval")
+
+
+@pytest.fixture
+def mock_identity(mocker):
+    return mocker.patch.object(key, "get_user_name", return_value="some-user")
+
+
+def test_store_credentials(app_path):
+    credential_process.store_credentials("developer", get_secrets("key-id"))
+
+    cached = credential_process.load_cached_credentials("developer")
+    assert 1 == cached["Version"]
+    assert "key-id" == cached["AccessKeyId"]
+    assert credential_process.is_fresh(cached)
+    assert 0o600 == (app_path / "credential_process" / "developer.json").stat().st_mode & 0o777
+
+
+def test_is_fresh():
+    now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    assert not credential_process.is_fresh(None)
+    assert not credential_process.is_fresh({"Expiration": "2026-01-01T00:04:00+00:00"}, now)
+    assert credential_process.is_fresh({"Expiration": "2026-01-01T01:00:00+00:00"}, now)
+
+
+def test_get_credentials__from_cache(mocker, profile_group):
+    mock_assume = mocker.patch.object(iam, "assume_role")
+    credential_process.store_credentials("developer", get_secrets("cached"))
+
+    assert "cached" == credential_process.get_credentials(profile_group, "developer")["AccessKeyId"]
+    mock_assume.assert_not_called()
+
+
+def test_get_credentials__fetches_expiring_credentials(mocker, profile_group, mock_identity):
+    mock_assume = mocker.patch.object(iam, "assume_role", return_value=get_secrets("fresh"))
+    credential_process.store_credentials("developer", get_secrets("expiring", timedelta(minutes=1)))
+
+    assert "fresh" == credential_process.get_credentials(profile_group, "developer")["AccessKeyId"]
+    mock_assume.assert_called_once_with("session-token-access-key", "some-user", "123456789012", "developer")
+    assert "fresh" == credential_process.load_cached_credentials("developer")["AccessKeyId"]
+    mock_identity.assert_called_once_with("access-key")
+
+
+def test_get_credentials__chained_profile(mocker, profile_group, mock_identity):
+    mocker.patch.object(iam, "assume_role", return_value=get_secrets("developer"))
+    mock_assume_with_secrets = mocker.patch.object(iam, "assume_role_with_secrets", return_value=get_secrets("service"))
+
+    assert "service" == credential_process.get_credentials(profile_group, "service")["AccessKeyId"]
+    assert "developer" == mock_assume_with_secrets.call_args.args[0]["AccessKeyId"]
+
+
+def test_get_credentials__unknown_profile(profile_group):
+    with pytest.raises(ValueError):
+        credential_process.get_credentials(profile_group, "unknown")
+
+
+def test_clear_cache():
+    credential_process.store_credentials("developer", get_secrets("key-id"))
+    credential_process.clear_cache()
+    assert None is credential_process.load_cached_credentials("developer")
+
+
+def test_run__prints_credentials(mocker, capsys, profile_group):
+    mocker.patch.object(credential_process.Config, "initialize")
+    mocker.patch.object(credential_process.Config, "get_group", return_value=profile_group)
+    mocker.patch.object(files, "load_active_group", return_value="test")
+    credential_process.store_credentials("developer", get_secrets("key-id"))
+
+    assert 0 == credential_process.run("developer")
+    assert "key-id" == json.loads(capsys.readouterr().out)["AccessKeyId"]
+
+
+def test_run__no_active_group(mocker, capsys):
+    mocker.patch.object(credential_process.Config, "initialize")
+    mocker.patch.object(files, "load_active_group", return_value="")
+
+    assert 1 == credential_process.run("developer")
+    captured = capsys.readouterr()
+    assert "" == captured.out
+    assert "no active group" in captured.err
+
+
+def test_output_is_accepted_by_botocore(app_path):
+    credential_process.store_credentials("developer", get_secrets("key-id"))
+    cache_file = app_path / "credential_process" / "developer.json"
+    command = f"{sys.executable} -c \"import sys; sys.stdout.write(open('{cache_file}').read())\""
+    provider = ProcessProvider("developer", load_config=lambda: {"profiles": {"developer": {"credential_process": command}}})
+
+    botocore_credentials = provider.load()
+
+    assert "key-id" == botocore_credentials.get_frozen_credentials().access_key
+    assert botocore_credentials.refresh_needed() is False
@@ -0,0 +1,117 @@
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from botocore.credentials import ContainerProvider
+
+from app.aws import credential_server
+from app.aws.credential_server import CredentialServer
+from app.core import files
+from app.core.profile import Profile
+
+
+def get_secrets(key_id: str) -> dict:
+    return {
+        "AccessKeyId": key_id,
+        "SecretAccessKey": "secret",
+        "SessionToken": "token",
+        "Expiration": datetime.now(timezone.utc) + timedelta(hours=1),
+    }
+
+
+@pytest.fixture
+def server(mocker, tmp_path):
+    mocker.patch.object(files, "get_app_path", return_value=str(tmp_path))
+    server = CredentialServer()
+    server.start(0)
+    yield server
+    server.stop()
+
+
+def request(url: str, token: str | None) -> int:
+    headers = {"Authorization": token} if token else {}
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as error:
+        return error.code
+
+
+def test_load_or_create_token(mocker, tmp_path):
+    mocker.patch.object(files, "get_app_path", return_value=str(tmp_path))
+
+    token = credential_server.load_or_create_token()
+
+    assert token == credential_server.load_or_create_token()
+    assert 0o600 == (tmp_path / "credential_server.token").stat().st_mode & 0o777
+
+
+def test_credentials_are_accepted_by_botocore(server):
+    server.set_credentials("developer", get_secrets("key-id"))
+    provider = ContainerProvider(environ={
+        "AWS_CONTAINER_CREDENTIALS_FULL_URI": server.get_url("developer"),
+        "AWS_CONTAINER_AUTHORIZATION_TOKEN": server.token,
+    })
+
+    botocore_credentials = provider.load()
+
+    frozen_credentials = botocore_credentials.get_frozen_credentials()
+    assert "key-id" == frozen_credentials.access_key
+    assert "token" == frozen_credentials.token
+    assert botocore_credentials.refresh_needed() is False
+
+
+def test_credentials_are_replaced_on_refresh(server):
+    server.set_credentials("developer", get_secrets("old"))
+    server.set_credentials("developer", get_secrets("new"))
+    provider = ContainerProvider(environ={
+        "AWS_CONTAINER_CREDENTIALS_FULL_URI": server.get_url("developer"),
+        "AWS_CONTAINER_AUTHORIZATION_TOKEN": server.token,
+    })
+
+    assert "new" == provider.load().get_frozen_credentials().access_key
+
+
+def test_request__requires_token(server):
+    server.set_credentials("developer", get_secrets("key-id"))
+
+    assert 401 == request(server.get_url("developer"), None)
+    assert 401 == request(server.get_url("developer"), "wrong-token")
+    assert 200 == request(server.get_url("developer"), server.token)
+
+
+def test_request__unknown_profile(server):
+    assert 404 == request(server.get_url("unknown"), server.token)
+
+
+def test_store_fetched_credentials(server):
+    profile_list = [Profile(None, {"profile": "developer", "account": "123", "role": "developer", "default": True}),
+                    Profile(None, {"profile": "readonly", "account": "123", "role": "readonly"})]
+
+    server.store_fetched_credentials(profile_list, {"developer": get_secrets("developer-key")}, None)
+
+    assert "developer-key" == server.get_credentials("developer")["AccessKeyId"]
+    assert "developer-key" == server.get_credentials("default")["AccessKeyId"]
+    assert None is server.get_credentials("readonly")
+
+
+def test_set_default(server):
+    server.set_credentials("readonly", get_secrets("readonly-key"))
+
+    server.set_default("readonly")
+
+    assert "readonly-key" == server.get_credentials("default")["AccessKeyId"]
+
+
+def test_clear(server):
+    server.set_credentials("developer", get_secrets("key-id"))
+    server.clear()
+    assert 404 == request(server.get_url("developer"), server.token)
+
+
+def test_stop():
+    server = CredentialServer()
+    server.stop()
+    assert not server.is_running()
+    assert None is server.get_url()
@@ -1,4 +1,5 @@
 import os
+import threading
 from unittest.mock import call
 
 from app.aws import credentials
@@ -70,9 +71,9 @@ def test_write_profile_config(mocker):
     assert not result.was_error
 
     add_profile_calls = [
-        call(mock_config_parser, "developer", "us-east-12"),
-        call(mock_config_parser, "readonly", "us-east-12"),
-        call(mock_config_parser, "default", "us-east-12"),
+        call(mock_config_parser, "developer", "us-east-12", None),
+        call(mock_config_parser, "readonly", "us-east-12", None),
+        call(mock_config_parser, "default", "us-east-12", None),
     ]
     assert add_profile_calls == mock_add_profile.mock_calls
     mock_write_config_file.assert_called_once_with(mock_config_parser)
@@ -98,13 +99,33 @@ def test_write_profile_config__no_default_region(mocker):
     assert not result.was_error
 
     expected = [
-        call(mock_config_parser, "developer", "us-east-12"),
-        call(mock_config_parser, "readonly", "us-east-12"),
+        call(mock_config_parser, "developer", "us-east-12", None),
+        call(mock_config_parser, "readonly", "us-east-12", None),
     ]
     assert expected == mock_add_profile.mock_calls
     mock_write_config_file.assert_called_once_with(mock_config_parser)
 
 
+def test_write_profile_config__write_mode_process(mocker):
+    mock_load_config = mocker.patch.object(credentials, "load_config_file")
+    mock_add_profile = mocker.patch.object(credentials, "add_profile_config")
+    mocker.patch.object(credentials, "write_config_file")
+    mocker.patch.object(credentials, "get_credential_process_command", side_effect=lambda profile: f"cmd {profile}")
+
+    profile_group = ProfileGroup("test", test_accounts.get_test_group(),
+                                 "default-access-key", "default-sso-session", "default-sso-interval")
+    profile_group.write_mode = "process"
+    credentials.write_profile_config(profile_group, "us-east-12")
+
+    config_parser = mock_load_config.return_value
+    expected = [
+        call(config_parser, "developer", "us-east-12", "cmd developer"),
+        call(config_parser, "readonly", "us-east-12", "cmd readonly"),
+        call(config_parser, "default", "us-east-12", "cmd readonly"),
+    ]
+    assert expected == mock_add_profile.mock_calls
+
+
 def test__cleanup_configs(mocker):
     mock_config_parser = mocker.Mock()
     mock_config_parser.sections.return_value = [
@@ -127,6 +148,25 @@ def test__cleanup_configs(mocker):
     assert expected == mock_config_parser.remove_section.mock_calls
 
 
+def test__cleanup_profiles__keeps_profiles(mocker):
+    mock_config_parser = mocker.Mock()
+    mock_config_parser.sections.return_value = ["developer", "unused-profile", "default", "access-key"]
+
+    credentials._cleanup_profiles(mock_config_parser, keep=["developer", "default"])
+
+    assert [call("unused-profile")] == mock_config_parser.remove_section.mock_calls
+
+
+def test__cleanup_configs__keeps_profiles(mocker):
+    mock_config_parser = mocker.Mock()
+    mock_config_parser.sections.return_value = ["profile developer", "profile sso-shadow-developer",
+                                                "profile unused-profile", "default"]
+
+    credentials._cleanup_configs(mock_config_parser, keep=["developer", "sso-shadow-developer"])
+
+    assert [call("profile unused-profile")] == mock_config_parser.remove_section.mock_calls
+
+
 def test__add_profile_credentials(mocker):
     mock_config_parser = mocker.Mock()
     mock_config_parser.has_section.return_value = False
@@ -156,6 +196,16 @@ def test__add_profile_config(mocker):
     assert expected_calls == mock_config_parser.set.mock_calls
 
 
+def test__add_profile_config__credential_process():
+    config_parser = credentials.ConfigParser()
+
+    credentials.add_profile_config(config_parser, "test-profile", "us-east-12", "logsmith credential-process")
+    assert "logsmith credential-process" == config_parser.get("profile test-profile", "credential_process")
+
+    credentials.add_profile_config(config_parser, "test-profile", "us-east-12")
+    assert not config_parser.has_option("profile test-profile", "credential_process")
+
+
 def test_set_as_default_profile(mocker):
     mock_load_credentials_file = mocker.patch.object(credentials, "load_credentials_file")
     mock_load_config_file = mocker.patch.object(credentials, "load_config_file")
@@ -232,3 +282,132 @@ def test_replace_profile__same_name():
 
     assert config.has_section("same")
     assert "us-east-1" == config.get("same", "region")
+
+
+def test_transaction__writes_each_file_once_on_commit(mocker):
+    mock_write_file = mocker.patch.object(credentials, "_write_file")
+    mocker.patch.object(credentials, "_load_file", side_effect=lambda path: credentials.ConfigParser())
+
+    with credentials.transaction():
+        for profile in ["developer", "readonly"]:
+            credentials_file = credentials.load_credentials_file()
+            credentials.add_profile_credentials(credentials_file, profile, test_secrets)
+            credentials.write_credentials_file(credentials_file)
+
+            config_file = credentials.load_config_file()
+            credentials.add_profile_config(config_file, profile, "eu-central-1")
+            credentials.write_config_file(config_file)
+        mock_write_file.assert_not_called()
+
+    written_paths = sorted(write_call.args[0] for write_call in mock_write_file.mock_calls)
+    assert sorted([credentials._get_config_path(), credentials._get_credentials_path()]) == written_paths
+
+
+def test_transaction__nested_transactions_join_outer(mocker):
+    mock_write_file = mocker.patch.object(credentials, "_write_file")
+    mocker.patch.object(credentials, "_load_file", side_effect=lambda path: credentials.ConfigParser())
+
+    with credentials.transaction() as outer:
+        with credentials.transaction() as inner:
+            credentials.write_credentials_file(credentials.load_credentials_file())
+        assert outer is inner
+        mock_write_file.assert_not_called()
+
+    assert 1 == mock_write_file.call_count
+
+
+def test_transaction__keeps_sections_written_by_other_processes(mocker, tmp_path):
+    credentials_path = tmp_path / "credentials"
+    credentials_path.write_text("[access-key]\naws_access_key_id = key\n\n[developer]\naws_access_key_id = old\n")
+    mocker.patch.object(credentials, "_get_credentials_path", return_value=str(credentials_path))
+    mocker.patch.object(credentials.files, "get_app_path", return_value=str(tmp_path))
+
+    with credentials.transaction():
+        credentials_file = credentials.load_credentials_file()
+        credentials_file.remove_section("developer")
+        credentials.add_profile_credentials(credentials_file, "readonly", test_secrets)
+        credentials.write_credentials_file(credentials_file)
+        # e.g. a cli refresh loop writes its credentials while the gui login is still running
+        credentials_path.write_text("[access-key]\naws_access_key_id = rotated\n\n[developer]\n"
+                                    "aws_access_key_id = old\n\n[other]\naws_access_key_id = other\n")
+
+    written = credentials.ConfigParser()
+    written.read(credentials_path)
+    assert ["access-key", "other", "readonly"] == sorted(written.sections())
+    assert "rotated" == written.get("access-key", "aws_access_key_id")
+    assert "other" == written.get("other", "aws_access_key_id")
+
+
+def test_transaction__not_visible_to_other_threads(mocker):
+    mocker.patch.object(credentials, "_write_file")
+    mocker.patch.object(credentials, "_load_file", side_effect=lambda path: credentials.ConfigParser())
+    seen = {}
+
+    def read_transaction():
+        seen["transaction"] = credentials.get_transaction()
+
+    with credentials.transaction():
+        # e.g. the verify pool of the gui while an sso login waits for the portal
+        thread = threading.Thread(target=read_transaction)
+        thread.start()
+        thread.join()
+
+    assert None is seen["transaction"]
+
+
+def test_transaction__commits_on_exception(mocker):
+    mock_write_file = mocker.patch.object(credentials, "_write_file")
+    mocker.patch.object(credentials, "_load_file", side_effect=lambda path: credentials.ConfigParser())
+
+    try:
+        with credentials.transaction():
+            credentials.write_credentials_file(credentials.load_credentials_file())
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+
+    assert 1 == mock_write_file.call_count
+    assert credentials.get_transaction() is None
+
+
+def test_get_client__serves_pending_credentials_from_memory(mocker):
+    mocker.patch.object(credentials, "_write_file")
+    mocker.patch.object(credentials, "_load_file", side_effect=lambda path: credentials.ConfigParser())
+    mock_get_client = mocker.patch.object(credentials.clients, "get_client")
+    mock_get_secrets_client = mocker.patch.object(credentials.clients, "get_secrets_client")
+
+    with credentials.transaction():
+        credentials_file = credentials.load_credentials_file()
+        credentials.add_profile_credentials(credentials_file, "developer", test_secrets)
+        credentials.write_credentials_file(credentials_file)
+
+        credentials.get_client("developer", "sts")
+        credentials.get_client("session-token-access-key", "sts", timeout=2, retries=2)
+
+    mock_get_secrets_client.assert_called_once_with(test_secrets, "sts", timeout=None, retries=None,
+                                                    read_timeout=None)
+    mock_get_client.assert_called_once_with("session-token-access-key", "sts", timeout=2, retries=2,
+                                            read_timeout=None)
+
+
+def test_get_session__flushes_changed_config_first(mocker):
+    mock_write_file = mocker.patch.object(credentials, "_write_file")
+    mocker.patch.object(credentials, "_load_file", side_effect=lambda path: credentials.ConfigParser())
+    mocker.patch.object(credentials.clients, "get_session")
+
+    with credentials.transaction():
+        config_file = credentials.load_config_file()
+        credentials.add_sso_profile(config_file, "sso", "sso-shadow-developer", "123456789012", "developer", "eu-central-1")
+        credentials.add_sso_chain_profile(config_file, "sso-shadow-service", "arn", "sso-shadow-developer", "eu-central-1")
+        credentials.write_config_file(config_file)
+
+        credentials.get_session("unrelated")
+        mock_write_file.assert_not_called()
+
+        credentials.get_session("sso-shadow-service")
+        mock_write_file.assert_called_once_with(credentials._get_config_path(), config_file)
+
+        credentials.get_session("sso-shadow-developer")
+        assert 1 == mock_write_file.call_count
+
+    assert 1 == mock_write_file.call_count
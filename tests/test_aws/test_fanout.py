@@ -0,0 +1,117 @@
+import threading
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+
+from app.aws import credentials, fanout
+from app.core.profile_group import ProfileGroup
+from tests.test_data import test_accounts
+
+throttling_error = ClientError({"Error": {"Code": "Throttling", "Message": "Rate exceeded"}}, "AssumeRole")
+access_denied_error = ClientError({"Error": {"Code": "AccessDenied", "Message": "denied"}}, "AssumeRole")
+
+
+def get_profile_group(profile_count: int) -> ProfileGroup:
+    group = test_accounts.get_test_group_no_default()
+    group["profiles"] = [
+        {"profile": f"profile-{i}", "account": f"{i:012}", "role": "developer"} for i in range(profile_count)
+    ]
+    return ProfileGroup("test", group, "default-access-key", "default-sso-session", "default-sso-interval")
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(mocker):
+    return mocker.patch.object(fanout.time, "sleep")
+
+
+def test_call_with_backoff__retries_throttling(mocker, no_sleep):
+    func = mocker.Mock(side_effect=[throttling_error, throttling_error, "secrets"])
+
+    assert "secrets" == fanout.call_with_backoff(func, "a", b="b")
+    assert 3 == func.call_count
+    assert 2 == no_sleep.call_count
+
+
+def test_call_with_backoff__gives_up_after_max_attempts(mocker, no_sleep):
+    func = mocker.Mock(side_effect=throttling_error)
+
+    with pytest.raises(ClientError):
+        fanout.call_with_backoff(func)
+    assert fanout._max_attempts == func.call_count
+
+
+def test_call_with_backoff__does_not_retry_other_errors(mocker, no_sleep):
+    func = mocker.Mock(side_effect=access_denied_error)
+
+    with pytest.raises(ClientError):
+        fanout.call_with_backoff(func)
+    assert 1 == func.call_count
+    no_sleep.assert_not_called()
+
+
+def test_fetch_all__respects_concurrency_limit():
+    profile_group = get_profile_group(12)
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def fetch(profile, source_secrets):
+        with lock:
+            running.append(profile.profile)
+            peak.append(len(running))
+        time.sleep(0.01)
+        with lock:
+            running.remove(profile.profile)
+        return {"AccessKeyId": profile.profile}
+
+    secrets, errors = fanout.fetch_all(profile_group.get_profile_list(), fetch, concurrency=3)
+
+    assert 12 == len(secrets)
+    assert {} == errors
+    assert max(peak) <= 3
+
+
+def test_fetch_all__collects_errors_per_profile():
+    profile_group = get_profile_group(3)
+
+    def fetch(profile, source_secrets):
+        if profile.profile == "profile-1":
+            raise access_denied_error
+        return {"AccessKeyId": profile.profile}
+
+    secrets, errors = fanout.fetch_all(profile_group.get_profile_list(), fetch)
+
+    assert ["profile-0", "profile-2"] == sorted(secrets)
+    assert ["profile-1"] == list(errors)
+
+
+def test_fetch_all__chained_profiles_receive_source_secrets():
+    profile_group = ProfileGroup("test", test_accounts.get_test_group_chain_assume(),
+                                 "default-access-key", "default-sso-session", "default-sso-interval")
+    received = {}
+
+    def fetch(profile, source_secrets):
+        received[profile.profile] = source_secrets
+        return {"AccessKeyId": profile.profile}
+
+    secrets, errors = fanout.fetch_all(profile_group.get_profile_list(), fetch, chained=True)
+
+    assert {} == errors
+    assert None is received["developer"]
+    assert {"AccessKeyId": "developer"} == received["service"]
+
+
+def test_fetch_all__workers_share_the_transaction_of_the_caller(mocker):
+    mocker.patch.object(credentials, "_write_file")
+    mocker.patch.object(credentials, "_load_file", side_effect=lambda path: credentials.ConfigParser())
+    transactions = []
+
+    def fetch(profile, source_secrets):
+        transactions.append(credentials.get_transaction())
+        return {"AccessKeyId": profile.profile}
+
+    with credentials.transaction() as active_transaction:
+        fanout.fetch_all(get_profile_group(3).get_profile_list(), fetch, concurrency=3)
+
+    assert [active_transaction] * 3 == transactions
@@ -0,0 +1,67 @@
+from app.aws import credentials, iam
+from app.aws.trust_policy import Principal
+
+
+def get_role(role_name: str, principal_arn: str) -> dict:
+    return {
+        "RoleName": role_name,
+        "AssumeRolePolicyDocument": {
+            "Statement": [{"Effect": "Allow", "Principal": {"AWS": principal_arn}, "Action": "sts:AssumeRole"}]
+        },
+    }
+
+
+def test_list_assumable_roles__paginates_without_get_role(mocker):
+    client = mocker.Mock()
+    client.get_paginator.return_value.paginate.return_value = [
+        {"Roles": [get_role(f"role-{i}", "arn:aws:iam::123456789012:role/developer") for i in range(100)]},
+        {"Roles": [get_role("other", "arn:aws:iam::123456789012:role/readonly"),
+                   get_role("pipeline", "arn:aws:iam::123456789012:root")]},
+    ]
+    mocker.patch.object(credentials, "get_client", return_value=client)
+    principal = Principal("123456789012", "role", "developer")
+
+    result = iam.list_assumable_roles("developer", principal=principal)
+
+    assert result.was_success
+    assert 101 == len(result.payload)
+    assert "pipeline" in result.payload
+    assert "other" not in result.payload
+    client.get_paginator.assert_called_once_with("list_roles")
+    client.get_role.assert_not_called()
+
+
+def test_list_assumable_roles__resolves_principal(mocker):
+    client = mocker.Mock()
+    client.get_caller_identity.return_value = {"Arn": "arn:aws:sts::123456789012:assumed-role/developer/session"}
+    client.get_paginator.return_value.paginate.return_value = [
+        {"Roles": [get_role("pipeline", "arn:aws:iam::123456789012:role/developer")]}
+    ]
+    mocker.patch.object(credentials, "get_client", return_value=client)
+
+    result = iam.list_assumable_roles("developer")
+
+    assert result.was_success
+    assert ["pipeline"] == result.payload
+
+
+def test_list_assumable_roles__no_roles(mocker):
+    client = mocker.Mock()
+    client.get_paginator.return_value.paginate.return_value = [{"Roles": []}]
+    mocker.patch.object(credentials, "get_client", return_value=client)
+
+    result = iam.list_assumable_roles("developer", principal=Principal("123456789012", "role", "developer"))
+
+    assert result.was_error
+    assert "no assumable roles found" == result.error_message
+
+
+def test_list_assumable_roles__error(mocker):
+    client = mocker.Mock()
+    client.get_paginator.side_effect = Exception("denied")
+    mocker.patch.object(credentials, "get_client", return_value=client)
+
+    result = iam.list_assumable_roles("developer", principal=Principal("123456789012", "role", "developer"))
+
+    assert result.was_error
+    assert "could not list roles with profile developer" == result.error_message
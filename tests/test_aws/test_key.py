@@ -1,4 +1,5 @@
 import os
+from datetime import datetime, timedelta, timezone
 from unittest.mock import call
 
 from botocore.exceptions import (ClientError, EndpointConnectionError,
@@ -179,12 +180,14 @@ def test_fetch_key_credentials(mocker):
     result = key.fetch_key_credentials("test_user", profile_group, None)
     assert result.was_success
     assert not result.was_error
+    assert {"developer": None, "readonly": None} == result.payload
 
     expected_mock_assume_calls = [
         call("session-token-default-access-key", "test_user", "123456789012", "developer"),
         call("session-token-default-access-key", "test_user", "012345678901", "readonly"),
     ]
-    assert expected_mock_assume_calls == mock_assume.mock_calls
+    mock_assume.assert_has_calls(expected_mock_assume_calls, any_order=True)
+    assert len(expected_mock_assume_calls) == mock_assume.call_count
 
     expected_mock_add_profile_calls = [
         call(
@@ -216,7 +219,42 @@ def test_fetch_key_credentials(mocker):
         ),
     ]
     assert expected_mock_add_profile_calls == mock_add_profile.mock_calls
-    assert 2 == mock_write_credentials.call_count
+    assert 1 == mock_write_credentials.call_count
+
+def test_fetch_key_credentials__only_given_profiles(mocker):
+    mocker.patch.object(credentials, "load_credentials_file")
+    mock_add_profile = mocker.patch.object(credentials, "add_profile_credentials")
+    mocker.patch.object(credentials, "write_credentials_file")
+    mock_assume = mocker.patch.object(key.iam, "assume_role")
+    mock_assume.return_value = test_secrets
+
+    profile_group = ProfileGroup("test", test_accounts.get_test_group(),
+                                 "default-access-key", "default-sso-session", "default-sso-interval")
+    result = key.fetch_key_credentials("test_user", profile_group, None, profile_names=["readonly"])
+
+    assert result.was_success
+    assert ["readonly"] == list(result.payload)
+    mock_assume.assert_called_once_with("session-token-default-access-key", "test_user", "012345678901", "readonly")
+    assert ["readonly", "default"] == [c.args[1] for c in mock_add_profile.mock_calls]
+
+
+def test_fetch_key_credentials__include_service_profile(mocker):
+    mock_assume = mocker.patch.object(key.iam, "assume_role", return_value=test_secrets)
+    mock_assume_with_secrets = mocker.patch.object(key.iam, "assume_role_with_secrets", return_value=test_secrets)
+    mock_store = mocker.Mock()
+
+    profile_group = ProfileGroup("test", test_accounts.get_test_group(),
+                                 "default-access-key", "default-sso-session", "default-sso-interval")
+    profile_group.set_service_role_profile(source_profile_name="developer", role_name="pipeline")
+    result = key.fetch_key_credentials("test_user", profile_group, None, store=mock_store,
+                                       include_service_profile=True)
+
+    assert result.was_success
+    assert ["developer", "readonly", "service"] == sorted(result.payload)
+    assert 2 == mock_assume.call_count
+    mock_assume_with_secrets.assert_called_once_with(test_secrets, "pipeline", "123456789012", "pipeline")
+    assert profile_group.get_profile_list(include_service_profile=True) == mock_store.call_args.args[0]
+
 
 def test_fetch_key_credentials__with_default_overwrite(mocker):
     mock_load_credentials = mocker.patch.object(credentials, "load_credentials_file")
@@ -243,7 +281,8 @@ def test_fetch_key_credentials__with_default_overwrite(mocker):
         call("session-token-default-access-key", "test_user", "123456789012", "developer"),
         call("session-token-default-access-key", "test_user", "012345678901", "readonly"),
     ]
-    assert expected_mock_assume_calls == mock_assume.mock_calls
+    mock_assume.assert_has_calls(expected_mock_assume_calls, any_order=True)
+    assert len(expected_mock_assume_calls) == mock_assume.call_count
 
     expected_mock_add_profile_calls = [
         call(
@@ -276,7 +315,7 @@ def test_fetch_key_credentials__with_default_overwrite(mocker):
         
     ]
     assert expected_mock_add_profile_calls == mock_add_profile.mock_calls
-    assert 2 == mock_write_credentials.call_count
+    assert 1 == mock_write_credentials.call_count
 
 
 def test_fetch_key_credentials_with_specific_access_key(mocker):
@@ -304,7 +343,8 @@ def test_fetch_key_credentials_with_specific_access_key(mocker):
         call("session-token-specific-access-key", "test_user", "123456789012", "developer"),
         call("session-token-specific-access-key", "test_user", "012345678901", "readonly"),
     ]
-    assert expected_mock_assume_calls == mock_assume.mock_calls
+    mock_assume.assert_has_calls(expected_mock_assume_calls, any_order=True)
+    assert len(expected_mock_assume_calls) == mock_assume.call_count
 
     expected_mock_add_profile_calls = [
         call(
@@ -336,7 +376,7 @@ def test_fetch_key_credentials_with_specific_access_key(mocker):
         ),
     ]
     assert expected_mock_add_profile_calls == mock_add_profile.mock_calls
-    assert 2 == mock_write_credentials.call_count
+    assert 1 == mock_write_credentials.call_count
 
 
 def test_fetch_key_credentials__no_default(mocker):
@@ -364,7 +404,8 @@ def test_fetch_key_credentials__no_default(mocker):
         call("session-token-default-access-key", "test-user", "123456789012", "developer"),
         call("session-token-default-access-key", "test-user", "012345678901", "readonly"),
     ]
-    assert expected_mock_assume_calls == mock_assume.mock_calls
+    mock_assume.assert_has_calls(expected_mock_assume_calls, any_order=True)
+    assert len(expected_mock_assume_calls) == mock_assume.call_count
 
     expected_mock_add_profile_calls = [
         call(
@@ -388,7 +429,7 @@ def test_fetch_key_credentials__no_default(mocker):
     ]
     assert expected_mock_add_profile_calls == mock_add_profile.mock_calls
 
-    assert 2 == mock_write_credentials.call_count
+    assert 1 == mock_write_credentials.call_count
 
 def test_fetch_key_credentials__no_default__with_default_overwrite(mocker):
     mock_load_credentials = mocker.patch.object(credentials, "load_credentials_file")
@@ -415,7 +456,8 @@ def test_fetch_key_credentials__no_default__with_default_overwrite(mocker):
         call("session-token-default-access-key", "test-user", "123456789012", "developer"),
         call("session-token-default-access-key", "test-user", "012345678901", "readonly"),
     ]
-    assert expected_mock_assume_calls == mock_assume.mock_calls
+    mock_assume.assert_has_calls(expected_mock_assume_calls, any_order=True)
+    assert len(expected_mock_assume_calls) == mock_assume.call_count
 
     expected_mock_add_profile_calls = [
         call(
@@ -447,7 +489,7 @@ def test_fetch_key_credentials__no_default__with_default_overwrite(mocker):
         ),
     ]
     assert expected_mock_add_profile_calls == mock_add_profile.mock_calls
-    assert 2 == mock_write_credentials.call_count
+    assert 1 == mock_write_credentials.call_count
 
 
 def test_fetch_key_credentials__chain_assume(mocker):
@@ -455,10 +497,12 @@ def test_fetch_key_credentials__chain_assume(mocker):
     mock_add_profile = mocker.patch.object(credentials, "add_profile_credentials")
     mock_write_credentials = mocker.patch.object(credentials, "write_credentials_file")
     mock_assume = mocker.patch.object(key.iam, "assume_role")
+    mock_assume_with_secrets = mocker.patch.object(key.iam, "assume_role_with_secrets")
 
     mock_config_parser = mocker.Mock()
     mock_load_credentials.return_value = mock_config_parser
     mock_assume.return_value = test_secrets
+    mock_assume_with_secrets.return_value = test_secrets
 
     profile_group = ProfileGroup(
         "test",
@@ -471,11 +515,9 @@ def test_fetch_key_credentials__chain_assume(mocker):
     assert result.was_success
     assert not result.was_error
 
-    expected_mock_assume_calls = [
-        call("session-token-default-access-key", "test-user", "123456789012", "developer"),
-        call("developer", "test-user", "012345678901", "service"),
-    ]
-    assert expected_mock_assume_calls == mock_assume.mock_calls
+    # the chained profile is assumed with the in-memory credentials of its source profile
+    assert [call("session-token-default-access-key", "test-user", "123456789012", "developer")] == mock_assume.mock_calls
+    assert [call(test_secrets, "test-user", "012345678901", "service")] == mock_assume_with_secrets.mock_calls
 
     expected_mock_add_profile_calls = [
         call(
@@ -498,7 +540,62 @@ def test_fetch_key_credentials__chain_assume(mocker):
         ),
     ]
     assert expected_mock_add_profile_calls == mock_add_profile.mock_calls
-    assert 2 == mock_write_credentials.call_count
+    assert 1 == mock_write_credentials.call_count
+
+
+def test_fetch_key_credentials__partial_failure(mocker):
+    mock_load_credentials = mocker.patch.object(credentials, "load_credentials_file")
+    mock_add_profile = mocker.patch.object(credentials, "add_profile_credentials")
+    mock_write_credentials = mocker.patch.object(credentials, "write_credentials_file")
+    mock_assume = mocker.patch.object(key.iam, "assume_role")
+
+    mock_config_parser = mocker.Mock()
+    mock_load_credentials.return_value = mock_config_parser
+
+    def assume_role(source_profile, user_name, account, role):
+        if role == "readonly":
+            raise client_error
+        return test_secrets
+
+    mock_assume.side_effect = assume_role
+
+    profile_group = ProfileGroup(
+        "test",
+        test_accounts.get_test_group_no_default(),
+        "default-access-key",
+        "default-sso-session",
+        "default-sso-interval",
+    )
+    result = key.fetch_key_credentials("test-user", profile_group, None)
+
+    assert result.was_error
+    assert "error while fetching role credentials for readonly" == result.error_message
+    assert [call(mock_config_parser, "developer", test_secrets)] == mock_add_profile.mock_calls
+    mock_write_credentials.assert_called_once_with(mock_config_parser)
+
+
+def test_fetch_key_credentials__chain_assume__source_failure(mocker):
+    mocker.patch.object(credentials, "load_credentials_file")
+    mocker.patch.object(credentials, "add_profile_credentials")
+    mock_write_credentials = mocker.patch.object(credentials, "write_credentials_file")
+    mock_assume = mocker.patch.object(key.iam, "assume_role")
+    mock_assume_with_secrets = mocker.patch.object(key.iam, "assume_role_with_secrets")
+
+    mock_assume.side_effect = client_error
+
+    profile_group = ProfileGroup(
+        "test",
+        test_accounts.get_test_group_chain_assume(),
+        "default-access-key",
+        "default-sso-session",
+        "default-sso-interval",
+    )
+    result = key.fetch_key_credentials("test-user", profile_group, None)
+
+    assert result.was_error
+    assert "error while fetching role credentials for developer, service" == result.error_message
+    mock_assume_with_secrets.assert_not_called()
+    mock_write_credentials.assert_not_called()
 
 
 def test_fetch_key_service_profile(mocker):
@@ -509,22 +606,40 @@ def test_fetch_key_service_profile(mocker):
 
     mock_config_parser = mocker.Mock()
     mock_load_credentials.return_value = mock_config_parser
-    mock_assume.return_value = "secrets"
+    secrets = {"AccessKeyId": "key-id", "Expiration": "2026-01-01T12:00:00Z"}
+    mock_assume.return_value = secrets
 
     profile_group = test_accounts.get_test_profile_group(include_service_role=True)
     result = key.fetch_key_service_profile(profile_group, None)
     assert result.was_success
+    assert {"service": "2026-01-01T12:00:00Z"} == result.payload
 
     expected_assume_role_calls = [call("developer", "dummy", "123456789012", "dummy")]
     assert expected_assume_role_calls == mock_assume.mock_calls
 
-    expected_add_profile_credentialscalls = [call(mock_config_parser, "service", "secrets")]
+    expected_add_profile_credentialscalls = [call(mock_config_parser, "service", secrets)]
     assert expected_add_profile_credentialscalls == mock_add_profile.mock_calls
 
     expected_write_credentials_file_calls = [call(mock_config_parser)]
     assert expected_write_credentials_file_calls == mock_write_credentials.mock_calls
 
 
+def test_fetch_key_service_profile__with_source_secrets(mocker):
+    mock_assume = mocker.patch.object(key.iam, "assume_role")
+    mock_assume_with_secrets = mocker.patch.object(key.iam, "assume_role_with_secrets",
+                                                   return_value={"AccessKeyId": "key-id"})
+    mock_store = mocker.Mock()
+    source_secrets = {"AccessKeyId": "source-key-id", "SecretAccessKey": "secret", "SessionToken": "token"}
+
+    profile_group = test_accounts.get_test_profile_group(include_service_role=True)
+    result = key.fetch_key_service_profile(profile_group, None, store=mock_store, source_secrets=source_secrets)
+
+    assert result.was_success
+    mock_assume.assert_not_called()
+    mock_assume_with_secrets.assert_called_once_with(source_secrets, "dummy", "123456789012", "dummy")
+    mock_store.assert_called_once_with([profile_group.service_profile], {"service": {"AccessKeyId": "key-id"}}, None)
+
+
 def test_set_access_key(mocker):
     mock_load_credentials = mocker.patch.object(credentials, "load_credentials_file")
     mock_write_credentials = mocker.patch.object(credentials, "write_credentials_file")
@@ -578,3 +693,90 @@ def test_check_session__no_session_found(mocker):
 
     assert not result.was_success
     assert not result.was_error
+
+
+def _get_credentials_with_session(expiration: datetime):
+    credentials_file = credentials._load_file(test_credentials_file_path)
+    credentials_file.set("session-token-access-key", key.session_expiration_option, expiration.isoformat())
+    credentials_file.set("session-token-access-key", key.session_user_arn_option,
+                         "arn:aws:iam::123456789012:user/some-user")
+    credentials_file.set("session-token-access-key", key.session_access_key_id_option,
+                         credentials_file.get("access-key", "aws_access_key_id"))
+    return credentials_file
+
+
+def test_check_session__known_valid_session_skips_sts(mocker):
+    mock_load_credentials = mocker.patch.object(credentials, "load_credentials_file")
+    mock_get_client = mocker.patch.object(credentials, "get_client")
+    mock_load_credentials.return_value = _get_credentials_with_session(datetime.now(timezone.utc) + timedelta(hours=1))
+
+    assert key.check_session("access-key").was_success
+    assert key.check_access_key("access-key").was_success
+    assert "some-user" == key.get_user_name("access-key")
+    mock_get_client.assert_not_called()
+
+
+def test_check_session__session_of_a_replaced_access_key_is_checked(mocker):
+    mock_load_credentials = mocker.patch.object(credentials, "load_credentials_file")
+    mock_get_client = mocker.patch.object(credentials, "get_client")
+    credentials_file = _get_credentials_with_session(datetime.now(timezone.utc) + timedelta(hours=1))
+    credentials_file.set("access-key", "aws_access_key_id", "rotated-key-id")
+    mock_load_credentials.return_value = credentials_file
+
+    assert not key.has_valid_session("access-key")
+    assert key.check_access_key("access-key").was_success
+    assert [call("access-key", "sts", timeout=2, retries=2),
+            call().get_caller_identity()] == mock_get_client.mock_calls
+
+
+def test_check_session__session_close_to_expiration_is_checked(mocker):
+    mock_load_credentials = mocker.patch.object(credentials, "load_credentials_file")
+    mock_get_client = mocker.patch.object(credentials, "get_client")
+    mock_load_credentials.return_value = _get_credentials_with_session(datetime.now(timezone.utc) + timedelta(minutes=1))
+
+    result = key.check_session("access-key")
+
+    assert result.was_success
+    assert [call("session-token-access-key", "sts", timeout=2, retries=2),
+            call().get_caller_identity()] == mock_get_client.mock_calls
+
+
+def test_get_caller_identity__cached_per_transaction(mocker):
+    mocker.patch.object(credentials, "_load_file", side_effect=lambda path: credentials.ConfigParser())
+    mocker.patch.object(credentials, "_write_file")
+    mock_get_client = mocker.patch.object(credentials, "get_client")
+    mock_get_client.return_value.get_caller_identity.return_value = {"Arn": "arn:aws:iam::123456789012:user/some-user",
+                                                                     "Account": "123456789012"}
+
+    with credentials.transaction():
+        assert "some-user" == key.get_user_name("access-key")
+        key.get_caller_identity("access-key")
+    assert 1 == mock_get_client.return_value.get_caller_identity.call_count
+
+    key.get_caller_identity("access-key")
+    assert 2 == mock_get_client.return_value.get_caller_identity.call_count
+
+
+def test_fetch_session_token__stores_expiration_and_user(mocker):
+    mocker.patch.object(credentials, "_load_file", side_effect=lambda path: credentials.ConfigParser())
+    mock_write_file = mocker.patch.object(credentials, "_write_file")
+    mock_get_client = mocker.patch.object(credentials, "get_client")
+    expiration = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    mock_client = mock_get_client.return_value
+    mock_client.get_caller_identity.return_value = {"Arn": "arn:aws:iam::123456789012:user/some-user",
+                                                    "Account": "123456789012"}
+    mock_client.get_session_token.return_value = {"Credentials": {**test_secrets, "Expiration": expiration}}
+
+    with credentials.transaction():
+        credentials_file = credentials.load_credentials_file()
+        credentials_file.read_dict({"access-key": {"aws_access_key_id": "long-term-key-id"}})
+        result = key.fetch_session_token("access-key", "123456")
+        credentials_file = credentials.load_credentials_file()
+
+    assert result.was_success
+    assert 1 == mock_client.get_caller_identity.call_count
+    assert expiration.isoformat() == credentials_file.get("session-token-access-key", key.session_expiration_option)
+    assert "arn:aws:iam::123456789012:user/some-user" == credentials_file.get("session-token-access-key",
+                                                                             key.session_user_arn_option)
+    assert "long-term-key-id" == credentials_file.get("session-token-access-key", key.session_access_key_id_option)
+    assert 1 == mock_write_file.call_count
@@ -0,0 +1,115 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.aws import role_cache
+from app.core import files
+from tests.test_data.test_accounts import get_test_profile_group
+
+#######################
+# Fixures
+
+
+@pytest.fixture(autouse=True)
+def app_path(mocker, tmp_path):
+    mocker.patch.object(files, "get_app_path", return_value=str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture(scope="function")
+def profile_group():
+    return get_test_profile_group()
+
+
+def _get_secrets(profile_group, expiration: datetime) -> dict:
+    return {profile.profile: {"AccessKeyId": f"{profile.profile}-key-id",
+                              "SecretAccessKey": f"{profile.profile}-secret",
+                              "SessionToken": f"{profile.profile}-token",
+                              "Expiration": expiration}
+            for profile in profile_group.get_profile_list(include_service_profile=True)}
+
+
+def _store(profile_group, expiration: datetime, access_key_id: str = "key-id") -> dict:
+    secrets = _get_secrets(profile_group, expiration)
+    role_cache.store_group_credentials(profile_group, access_key_id,
+                                       profile_group.get_profile_list(include_service_profile=True), secrets)
+    return secrets
+
+#######################
+# Tests
+
+
+def test_store_and_get_group_credentials(profile_group):
+    expiration = datetime.now(timezone.utc) + timedelta(hours=1)
+    secrets = _store(profile_group, expiration)
+
+    result = role_cache.get_group_credentials(profile_group, "key-id")
+
+    assert ["developer", "readonly"] == sorted(result)
+    assert secrets["developer"]["SessionToken"] == result["developer"]["SessionToken"]
+    assert expiration.isoformat() == result["developer"]["Expiration"]
+
+
+def test_cache_file_is_private(profile_group):
+    _store(profile_group, datetime.now(timezone.utc) + timedelta(hours=1))
+
+    assert 0o600 == os.stat(role_cache.get_cache_path()).st_mode & 0o777
+
+
+def test_get_group_credentials__corrupt_file_is_ignored(profile_group):
+    _store(profile_group, datetime.now(timezone.utc) + timedelta(hours=1))
+    with open(role_cache.get_cache_path(), "a") as file:
+        file.write("}")
+
+    assert None is role_cache.get_group_credentials(profile_group, "key-id")
+
+
+def test_store_group_credentials__holds_write_lock(mocker, profile_group):
+    load_entries = role_cache._load_entries
+
+    def assert_locked():
+        assert 0 < files._write_lock_state["depth"]
+        return load_entries()
+
+    mocker.patch.object(role_cache, "_load_entries", side_effect=assert_locked)
+
+    _store(profile_group, datetime.now(timezone.utc) + timedelta(hours=1))
+
+    role_cache._load_entries.assert_called_once_with()
+
+
+def test_get_group_credentials__expired(profile_group):
+    _store(profile_group, datetime.now(timezone.utc) + timedelta(minutes=5))
+
+    assert None is role_cache.get_group_credentials(profile_group, "key-id")
+
+
+def test_get_group_credentials__access_key_rotated(profile_group):
+    _store(profile_group, datetime.now(timezone.utc) + timedelta(hours=1))
+
+    assert None is role_cache.get_group_credentials(profile_group, "new-key-id")
+
+
+def test_get_group_credentials__role_changed(profile_group):
+    _store(profile_group, datetime.now(timezone.utc) + timedelta(hours=1))
+    profile_group.get_profile("developer").role = "admin"
+
+    assert None is role_cache.get_group_credentials(profile_group, "key-id")
+
+
+def test_get_group_credentials__service_profile_missing(profile_group):
+    _store(profile_group, datetime.now(timezone.utc) + timedelta(hours=1))
+    profile_group.set_service_role_profile(source_profile_name="developer", role_name="pipeline")
+
+    assert None is role_cache.get_group_credentials(profile_group, "key-id")
+
+
+def test_clear(profile_group):
+    _store(profile_group, datetime.now(timezone.utc) + timedelta(hours=1))
+
+    role_cache.clear()
+
+    assert None is role_cache.get_group_credentials(profile_group, "key-id")
+    assert not os.path.exists(role_cache.get_cache_path())
+
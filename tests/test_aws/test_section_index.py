@@ -0,0 +1,194 @@
+import os
+from configparser import ConfigParser
+
+import pytest
+
+from app.aws import section_index
+from app.aws.section_index import SectionIndex
+
+credentials_text = """# managed by hand
+[access-key]
+# rotated yearly
+aws_access_key_id = some-key-id
+aws_secret_access_key  =  some-secret
+
+; personal profile
+[personal]
+aws_access_key_id = personal-key-id
+aws_secret_access_key = personal-secret
+
+[developer]
+aws_access_key_id = old-id
+aws_secret_access_key = old-secret
+aws_session_token = old-token
+# trailing comment
+"""
+
+
+#######################
+# Fixures
+
+
+@pytest.fixture(autouse=True)
+def before_after_each_test():
+    section_index.invalidate()
+    yield
+    section_index.invalidate()
+
+
+@pytest.fixture(scope="function")
+def credentials_path(tmp_path, mocker):
+    mocker.patch("app.core.files.get_app_path", return_value=str(tmp_path / ".logsmith"))
+    path = tmp_path / "credentials"
+    path.write_text(credentials_text)
+    return str(path)
+
+
+def _assert_index_matches_text(index: SectionIndex):
+    parsed = SectionIndex.parse(index.text)
+    assert [(section.name, section.start, section.body_start, section.end, section.values)
+            for section in parsed.sections.values()] == \
+           [(section.name, section.start, section.body_start, section.end, section.values)
+            for section in index.sections.values()]
+
+
+#######################
+# Tests
+
+
+def test_parse():
+    index = SectionIndex.parse(credentials_text)
+
+    assert ["access-key", "personal", "developer"] == list(index.sections)
+    assert "" == credentials_text[:index.preamble_end]
+    access_key = index.sections["access-key"]
+    assert "# managed by hand\n" == credentials_text[access_key.start:access_key.body_start]
+    assert credentials_text[access_key.body_start:].startswith("[access-key]\n# rotated yearly\n")
+    personal = index.sections["personal"]
+    assert "\n; personal profile\n" == credentials_text[personal.start:personal.body_start]
+    assert {"aws_access_key_id": "personal-key-id", "aws_secret_access_key": "personal-secret"} == personal.values
+    assert "# trailing comment\n" == credentials_text[index.trailer_start:]
+
+
+def test_write__changes_only_changed_sections(credentials_path):
+    config_parser = section_index.load(credentials_path)
+    config_parser.set("developer", "aws_session_token", "new-token")
+
+    section_index.write(credentials_path, config_parser)
+
+    expected = credentials_text.replace("aws_session_token = old-token", "aws_session_token = new-token")
+    with open(credentials_path) as file:
+        assert expected == file.read()
+
+
+def test_write__removes_and_adds_sections(credentials_path):
+    config_parser = section_index.load(credentials_path)
+    config_parser.remove_section("personal")
+    config_parser.add_section("readonly")
+    config_parser.set("readonly", "aws_access_key_id", "readonly-id")
+
+    section_index.write(credentials_path, config_parser)
+
+    with open(credentials_path) as file:
+        text = file.read()
+    assert "[personal]" not in text
+    assert "some-secret\n\n; personal profile\n\n[developer]" in text
+    assert text.endswith("# trailing comment\n\n[readonly]\naws_access_key_id = readonly-id\n")
+    assert ["access-key", "developer", "readonly"] == section_index.load(credentials_path).sections()
+
+
+def test_write__index_stays_valid_across_writes(credentials_path, mocker):
+    section_index.load(credentials_path)
+    mock_parse = mocker.spy(SectionIndex, "parse")
+
+    for i in range(3):
+        config_parser = section_index.load(credentials_path)
+        config_parser.set("developer", "aws_session_token", f"token-{i}")
+        if i == 1:
+            config_parser.remove_section("personal")
+        config_parser.add_section(f"profile-{i}")
+        config_parser.set(f"profile-{i}", "region", "eu-central-1")
+        section_index.write(credentials_path, config_parser)
+        assert 0 == mock_parse.call_count
+        _assert_index_matches_text(section_index._indexes[credentials_path])
+        mock_parse.reset_mock()
+
+
+def test_write__file_changed_by_another_program(credentials_path):
+    config_parser = section_index.load(credentials_path)
+    with open(credentials_path, "a") as file:
+        file.write("\n[external]\nregion = eu-west-1\n")
+    os.utime(credentials_path, ns=(0, 0))
+
+    config_parser = section_index.load(credentials_path)
+    config_parser.set("developer", "aws_session_token", "new-token")
+    section_index.write(credentials_path, config_parser)
+
+    with open(credentials_path) as file:
+        text = file.read()
+    assert "[external]\nregion = eu-west-1\n" in text
+    assert "aws_session_token = new-token" in text
+
+
+def test_write__keeps_sections_written_after_the_load(credentials_path):
+    config_parser = section_index.load(credentials_path)
+    # another logsmith process writes its sections while this parser is held
+    other_parser = section_index.load(credentials_path)
+    other_parser.set("personal", "aws_access_key_id", "rotated-key-id")
+    other_parser.add_section("external")
+    other_parser.set("external", "region", "eu-west-1")
+    section_index.write(credentials_path, other_parser)
+
+    config_parser.set("developer", "aws_session_token", "new-token")
+    config_parser.remove_section("access-key")
+    section_index.write(credentials_path, config_parser)
+
+    written = section_index.load(credentials_path)
+    assert ["personal", "developer", "external"] == written.sections()
+    assert "rotated-key-id" == written.get("personal", "aws_access_key_id")
+    assert "new-token" == written.get("developer", "aws_session_token")
+
+
+def test_write__parser_that_was_not_loaded_replaces_the_file(credentials_path):
+    config_parser = ConfigParser()
+    config_parser.add_section("developer")
+    config_parser.set("developer", "aws_access_key_id", "new-id")
+
+    section_index.write(credentials_path, config_parser)
+
+    assert ["developer"] == section_index.load(credentials_path).sections()
+
+
+def test_write__unchanged_file_is_not_written(credentials_path, mocker):
+    mock_write_atomic = mocker.patch("app.core.files.write_atomic")
+
+    section_index.write(credentials_path, section_index.load(credentials_path))
+
+    mock_write_atomic.assert_not_called()
+
+
+def test_write__new_file(tmp_path, mocker):
+    mocker.patch("app.core.files.get_app_path", return_value=str(tmp_path / ".logsmith"))
+    path = str(tmp_path / "config")
+    config_parser = ConfigParser()
+    config_parser.add_section("profile developer")
+    config_parser.set("profile developer", "region", "eu-central-1")
+    config_parser.add_section("profile readonly")
+    config_parser.set("profile readonly", "region", "eu-central-1")
+
+    section_index.write(path, config_parser)
+
+    with open(path) as file:
+        assert "[profile developer]\nregion = eu-central-1\n\n[profile readonly]\nregion = eu-central-1\n" == file.read()
+
+
+def test_write__default_section_is_written_completely(tmp_path, mocker):
+    mocker.patch("app.core.files.get_app_path", return_value=str(tmp_path / ".logsmith"))
+    path = tmp_path / "config"
+    path.write_text("[DEFAULT]\nregion = eu-central-1\n\n# comment\n[profile developer]\noutput = json\n")
+
+    config_parser = section_index.load(str(path))
+    config_parser.set("profile developer", "output", "text")
+    section_index.write(str(path), config_parser)
+
+    assert "[DEFAULT]\nregion = eu-central-1\n\n[profile developer]\noutput = text\n\n" == path.read_text()
@@ -1,4 +1,5 @@
 import os
+from datetime import datetime, timezone
 from unittest.mock import call
 
 import boto3
@@ -7,6 +8,7 @@ from botocore.exceptions import ClientError, EndpointConnectionError, NoCredenti
 from app.aws import iam, sso
 from app.aws.sso import credentials
 from app.core import files
+from app.core.refresh_schedule import to_datetime
 from app.core.profile_group import ProfileGroup
 from app.shell import shell
 from tests.test_data import test_accounts
@@ -87,7 +89,7 @@ def test_write_sso_profiles(mocker):
     ]
     assert expected_mock_add_profile_calls == mock_add_sso_profile.mock_calls
     mock_add_sso_chain.assert_not_called()
-    assert [call(mock_config_parser), call(mock_config_parser)] == mock_write_config.mock_calls
+    assert [call(mock_config_parser)] == mock_write_config.mock_calls
 
 
 def test_write_sso_profiles__with_default_overwrite(mocker):
@@ -139,7 +141,7 @@ def test_write_sso_profiles__with_default_overwrite(mocker):
 
     assert expected_mock_add_profile_calls == mock_add_sso_profile.mock_calls
     mock_add_sso_chain.assert_not_called()
-    assert [call(mock_config_parser), call(mock_config_parser)] == mock_write_config.mock_calls
+    assert [call(mock_config_parser)] == mock_write_config.mock_calls
 
 
 def test_write_sso_profiles__with_default_overwrite__with_shadow(mocker):
@@ -183,7 +185,7 @@ def test_write_sso_profiles__with_default_overwrite__with_shadow(mocker):
 
     assert expected_mock_add_profile_calls == mock_add_sso_profile.mock_calls
     mock_add_sso_chain.assert_not_called()
-    assert [call(mock_config_parser), call(mock_config_parser)] == mock_write_config.mock_calls
+    assert [call(mock_config_parser)] == mock_write_config.mock_calls
 
 
 def test_write_sso_profiles__no_default(mocker):
@@ -226,7 +228,7 @@ def test_write_sso_profiles__no_default(mocker):
     ]
     assert expected_mock_add_profile_calls == mock_add_sso_profile.mock_calls
     mock_add_sso_chain.assert_not_called()
-    assert [call(mock_config_parser), call(mock_config_parser)] == mock_write_config.mock_calls
+    assert [call(mock_config_parser)] == mock_write_config.mock_calls
 
 
 def test_write_sso_profiles__no_default__with_default_overwrite(mocker):
@@ -277,7 +279,7 @@ def test_write_sso_profiles__no_default__with_default_overwrite(mocker):
     ]
     assert expected_mock_add_profile_calls == mock_add_sso_profile.mock_calls
     mock_add_sso_chain.assert_not_called()
-    assert [call(mock_config_parser), call(mock_config_parser)] == mock_write_config.mock_calls
+    assert [call(mock_config_parser)] == mock_write_config.mock_calls
 
 
 def test_write_sso_profiles__chain_assume(mocker):
@@ -322,7 +324,7 @@ def test_write_sso_profiles__chain_assume(mocker):
         ),
     ]
     assert expected_mock_chain_profile_calls == mock_add_sso_chain.mock_calls
-    assert [call(mock_config_parser), call(mock_config_parser)] == mock_write_config.mock_calls
+    assert [call(mock_config_parser)] == mock_write_config.mock_calls
 
 
 def test_write_sso_profiles__chain_assume__with_shadow(mocker):
@@ -367,7 +369,7 @@ def test_write_sso_profiles__chain_assume__with_shadow(mocker):
         ),
     ]
     assert expected_mock_chain_profile_calls == mock_add_sso_chain.mock_calls
-    assert [call(mock_config_parser), call(mock_config_parser)] == mock_write_config.mock_calls
+    assert [call(mock_config_parser)] == mock_write_config.mock_calls
 
 
 def test_write_sso_profiles__chain_assume__with_default_overwrite(mocker):
@@ -420,7 +422,7 @@ def test_write_sso_profiles__chain_assume__with_default_overwrite(mocker):
         ),
     ]
     assert expected_mock_chain_profile_calls == mock_add_sso_chain.mock_calls
-    assert [call(mock_config_parser), call(mock_config_parser)] == mock_write_config.mock_calls
+    assert [call(mock_config_parser)] == mock_write_config.mock_calls
 
 
 def test_write_sso_profiles__source_profile_missing(mocker):
@@ -569,9 +571,8 @@ def test_write_sso_service_profile_as_key_credentials__error(mocker):
 
 
 def test_sso_login(mocker):
-    mock_shell_run = mocker.patch.object(shell, "run")
-
-    mock_shell_run.return_value = success_result
+    mock_login = mocker.patch.object(sso.sso_oidc, "login", return_value=success_result)
+    mocker.patch.object(files, "load_sso_token", return_value=None)
     profile_group = ProfileGroup(
         "test",
         test_accounts.get_test_group__with_sso(),
@@ -582,11 +583,78 @@ def test_sso_login(mocker):
 
     result = sso.sso_login(profile_group)
 
-    expected_command = (
-        "env -u AWS_PROFILE -u AWS_DEFAULT_PROFILE aws sso login --sso-session specific-sso-session"
-    )
-    mock_shell_run.assert_called_once_with(command=expected_command, timeout=600)
+    mock_login.assert_called_once_with("specific-sso-session")
+    assert result.was_success
+
+
+def test_sso_login__token_still_valid(mocker):
+    mock_login = mocker.patch.object(sso.sso_oidc, "login")
+    mocker.patch.object(files, "load_sso_token", return_value={"accessToken": "sso-token",
+                                                               "expiresAt": "2099-01-01T00:00:00Z"})
+    profile_group = ProfileGroup("test", test_accounts.get_test_group__with_sso(),
+                                 "default-access-key", "default-sso-session", "default-sso-interval")
+
+    result = sso.sso_login(profile_group)
+
+    assert result.was_success
+    mock_login.assert_not_called()
+
+
+def test_sso_login__expired_token_is_refreshed(mocker):
+    mock_login = mocker.patch.object(sso.sso_oidc, "login")
+    sso_token = {"accessToken": "old-token", "expiresAt": "2020-01-01T00:00:00Z", "region": "eu-central-1",
+                 "refreshToken": "refresh-token", "clientId": "client-id", "clientSecret": "client-secret",
+                 "registrationExpiresAt": "2099-01-01T00:00:00Z"}
+    mocker.patch.object(files, "load_sso_token", side_effect=lambda _: dict(sso_token))
+    mock_save_sso_token = mocker.patch.object(files, "save_sso_token")
+    mock_get_client = mocker.patch.object(sso.clients, "get_unsigned_client")
+    mock_get_client.return_value.create_token.return_value = {"accessToken": "new-token", "expiresIn": 3600}
+    profile_group = ProfileGroup("test", test_accounts.get_test_group__with_sso(),
+                                 "default-access-key", "default-sso-session", "default-sso-interval")
+
+    result = sso.sso_login(profile_group)
+
+    assert result.was_success
+    mock_login.assert_not_called()
+    mock_get_client.return_value.create_token.assert_called_once_with(grantType="refresh_token",
+                                                                      clientId="client-id",
+                                                                      clientSecret="client-secret",
+                                                                      refreshToken="refresh-token")
+    session_name, saved_token = mock_save_sso_token.call_args.args
+    assert "specific-sso-session" == session_name
+    assert "new-token" == saved_token["accessToken"]
+    assert "refresh-token" == saved_token["refreshToken"]
+    assert to_datetime(saved_token["expiresAt"]) > datetime.now(timezone.utc)
+
+
+def test_sso_login__expired_registration_starts_device_login(mocker):
+    mock_login = mocker.patch.object(sso.sso_oidc, "login", return_value=success_result)
+    mocker.patch.object(files, "load_sso_token", return_value={
+        "accessToken": "old-token", "expiresAt": "2020-01-01T00:00:00Z", "region": "eu-central-1",
+        "refreshToken": "refresh-token", "clientId": "client-id", "clientSecret": "client-secret",
+        "registrationExpiresAt": "2020-01-01T00:00:00Z"})
+    mock_get_client = mocker.patch.object(sso.clients, "get_unsigned_client")
+    profile_group = ProfileGroup("test", test_accounts.get_test_group__with_sso(),
+                                 "default-access-key", "default-sso-session", "default-sso-interval")
+
+    result = sso.sso_login(profile_group)
+
+    assert result.was_success
+    mock_get_client.assert_not_called()
+    mock_login.assert_called_once_with("specific-sso-session")
+
+
+def test_sso_login__forced_ignores_valid_token(mocker):
+    mock_login = mocker.patch.object(sso.sso_oidc, "login", return_value=success_result)
+    mocker.patch.object(files, "load_sso_token", return_value={"accessToken": "sso-token",
+                                                               "expiresAt": "2099-01-01T00:00:00Z"})
+    profile_group = ProfileGroup("test", test_accounts.get_test_group__with_sso(),
+                                 "default-access-key", "default-sso-session", "default-sso-interval")
+
+    result = sso.sso_login(profile_group, force=True)
+
     assert result.was_success
+    mock_login.assert_called_once_with("specific-sso-session")
 
 
 def test_sso_logout(mocker):
@@ -599,15 +667,34 @@ def test_sso_logout(mocker):
     assert result.was_success
 
 
+def _mock_sso_portal(mocker, expires_at="2099-01-01T00:00:00Z"):
+    mocker.patch.object(files, "load_sso_token", return_value={"accessToken": "sso-token",
+                                                               "expiresAt": expires_at,
+                                                               "region": "eu-central-1"})
+    mock_get_client = mocker.patch.object(sso.clients, "get_unsigned_client")
+    mock_client = mock_get_client.return_value
+    mock_client.get_role_credentials.return_value = {"roleCredentials": sso_role_credentials}
+    return mock_get_client, mock_client
+
+
+sso_role_credentials = {
+    "accessKeyId": "test-key-id",
+    "secretAccessKey": "test-access-key",
+    "sessionToken": "test-session-token",
+    "expiration": 4102444800000,
+}
+sso_secrets = {**test_secrets, "Expiration": datetime(2100, 1, 1, tzinfo=timezone.utc)}
+
+
 def test_write_sso_as_key_credentials(mocker):
     mock_load_credentials = mocker.patch.object(credentials, "load_credentials_file")
     mock_write_credentials = mocker.patch.object(credentials, "write_credentials_file")
     mock_add_profile = mocker.patch.object(credentials, "add_profile_credentials")
     mock_freeze_credentials = mocker.patch.object(iam, "get_frozen_credentials")
+    mock_get_client, mock_client = _mock_sso_portal(mocker)
 
     mock_credentials_file = mocker.Mock()
     mock_load_credentials.return_value = mock_credentials_file
-    mock_freeze_credentials.return_value = test_secrets
 
     profile_group = ProfileGroup(
         "test",
@@ -618,31 +705,37 @@ def test_write_sso_as_key_credentials(mocker):
     )
     result = sso.write_sso_as_key_credentials(profile_group, None)
     assert result.was_success
+    assert {"developer": sso_secrets["Expiration"], "readonly": sso_secrets["Expiration"]} == result.payload
 
-    expected_fetch_calls = [call('sso-shadow-developer'), call('sso-shadow-readonly')]
-    assert expected_fetch_calls == mock_freeze_credentials.mock_calls
+    expected_fetch_calls = [
+        call(roleName="developer", accountId="123456789012", accessToken="sso-token"),
+        call(roleName="readonly", accountId="012345678901", accessToken="sso-token"),
+    ]
+    mock_client.get_role_credentials.assert_has_calls(expected_fetch_calls, any_order=True)
+    assert len(expected_fetch_calls) == mock_client.get_role_credentials.call_count
+    for get_client_call in mock_get_client.call_args_list:
+        assert call("sso", "eu-central-1", timeout=10, retries=3) == get_client_call
+    mock_freeze_credentials.assert_not_called()
 
     expected_add_calls = [
-        call(mock_credentials_file, "developer", test_secrets),
-        call(mock_credentials_file, "readonly", test_secrets),
-        call(mock_credentials_file, "default", test_secrets),
+        call(mock_credentials_file, "developer", sso_secrets),
+        call(mock_credentials_file, "readonly", sso_secrets),
+        call(mock_credentials_file, "default", sso_secrets),
     ]
     assert expected_add_calls == mock_add_profile.mock_calls
-    assert 2 == mock_write_credentials.call_count
+    assert 1 == mock_write_credentials.call_count
 
 
 def test_write_sso_as_key_credentials__chain_assume(mocker):
     mock_load_credentials = mocker.patch.object(credentials, "load_credentials_file")
-    mock_write_credentials = mocker.patch.object(credentials, "write_credentials_file")
+    mocker.patch.object(credentials, "write_credentials_file")
     mock_add_profile = mocker.patch.object(credentials, "add_profile_credentials")
-    mock_freeze_credentials = mocker.patch.object(iam, "get_frozen_credentials")
+    mock_assume_with_secrets = mocker.patch.object(iam, "assume_role_with_secrets")
+    _, mock_client = _mock_sso_portal(mocker)
 
     mock_credentials_file = mocker.Mock()
     mock_load_credentials.return_value = mock_credentials_file
-    mock_freeze_credentials.return_value = test_secrets
-
-    fetch_result = get_success_result()
-    fetch_result.add_payload(test_secrets)
+    mock_assume_with_secrets.return_value = test_secrets
 
     profile_group = ProfileGroup(
         "test",
@@ -654,25 +747,25 @@ def test_write_sso_as_key_credentials__chain_assume(mocker):
     result = sso.write_sso_as_key_credentials(profile_group, None)
     assert result.was_success
 
-    expected_fetch_calls = [call('sso-shadow-developer'), call('sso-shadow-service')]
-    assert expected_fetch_calls == mock_freeze_credentials.mock_calls
+    mock_client.get_role_credentials.assert_called_once_with(roleName="developer", accountId="123456789012",
+                                                             accessToken="sso-token")
+    mock_assume_with_secrets.assert_called_once_with(sso_secrets, "service", "123456789012", "service")
 
     expected_add_calls = [
-        call(mock_credentials_file, "developer", test_secrets),
+        call(mock_credentials_file, "developer", sso_secrets),
         call(mock_credentials_file, "service", test_secrets),
     ]
     assert expected_add_calls == mock_add_profile.mock_calls
-    assert 2 == mock_write_credentials.call_count
 
 
 def test_write_sso_as_key_credentials__fetch_error(mocker):
     mock_load_credentials = mocker.patch.object(credentials, "load_credentials_file")
     mock_write_credentials = mocker.patch.object(credentials, "write_credentials_file")
     mock_add_profile = mocker.patch.object(credentials, "add_profile_credentials")
-    mock_freeze_credentials = mocker.patch.object(iam, "get_frozen_credentials")
+    _, mock_client = _mock_sso_portal(mocker)
 
     mock_load_credentials.return_value = mocker.Mock()
-    mock_freeze_credentials.side_effect = Exception("boom")
+    mock_client.get_role_credentials.side_effect = Exception("boom")
 
     profile_group = ProfileGroup(
         "test",
@@ -688,6 +781,33 @@ def test_write_sso_as_key_credentials__fetch_error(mocker):
     mock_write_credentials.assert_not_called()
 
 
+def test_write_sso_as_key_credentials__expired_token(mocker):
+    mock_write_credentials = mocker.patch.object(credentials, "write_credentials_file")
+    _, mock_client = _mock_sso_portal(mocker, expires_at="2020-01-01T00:00:00Z")
+
+    profile_group = ProfileGroup("test", test_accounts.get_test_group__with_sso(),
+                                 "default-access-key", "default-sso-session", "default-sso-interval")
+    result = sso.write_sso_as_key_credentials(profile_group, None)
+
+    assert result.was_error
+    assert "no valid sso access token found, please login again" == result.error_message
+    mock_client.get_role_credentials.assert_not_called()
+    mock_write_credentials.assert_not_called()
+
+
+def test_get_sso_access_token__region_from_sso_session(mocker):
+    mock_load_sso_token = mocker.patch.object(files, "load_sso_token")
+    mock_load_config = mocker.patch.object(credentials, "load_config_file")
+    mock_load_sso_token.return_value = {"accessToken": "sso-token", "expiresAt": "2099-01-01T00:00:00Z"}
+    mock_load_config.return_value.get.return_value = "eu-west-1"
+
+    assert ("sso-token", "eu-west-1") == sso.get_sso_access_token("specific-sso-session")
+
+    mock_load_sso_token.assert_called_once_with("specific-sso-session")
+    mock_load_config.return_value.get.assert_called_once_with("sso-session specific-sso-session", "sso_region",
+                                                              fallback=None)
+
+
 def test_get_sso_sessions_list(mocker):
     mock_load_config_file = mocker.patch.object(credentials, "load_config_file")
 
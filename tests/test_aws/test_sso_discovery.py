@@ -0,0 +1,100 @@
+from botocore.exceptions import ClientError
+
+from app.aws import sso_discovery
+from app.core import files, sso_catalog
+
+
+def _get_paginator(accounts_pages: list, roles: dict, failing_accounts=()):
+    def get_paginator(operation):
+        paginator = _Paginator()
+        if operation == "list_accounts":
+            paginator.pages = lambda **kwargs: accounts_pages
+        else:
+            def pages(accessToken, accountId):
+                if accountId in failing_accounts:
+                    raise ClientError({"Error": {"Code": "ForbiddenException", "Message": "denied"}}, "ListAccountRoles")
+                # one page per role, to cover the pagination
+                return [{"roleList": [{"roleName": role, "accountId": accountId}]} for role in roles[accountId]]
+            paginator.pages = pages
+        return paginator
+    return get_paginator
+
+
+class _Paginator:
+    pages = None
+
+    def paginate(self, **kwargs):
+        return self.pages(**kwargs)
+
+
+accounts_pages = [
+    {"accountList": [{"accountId": "111111111111", "accountName": "team-a-dev", "emailAddress": "dev@example.com"}]},
+    {"accountList": [{"accountId": "222222222222", "accountName": "team-a-live", "emailAddress": "live@example.com"}]},
+]
+roles = {"111111111111": ["developer", "readonly"], "222222222222": ["readonly"]}
+
+
+def _mock(mocker, catalog: dict, failing_accounts=()):
+    mocker.patch.object(sso_discovery.sso, "get_sso_access_token", return_value=("access-token", "eu-central-1"))
+    mock_get_client = mocker.patch.object(sso_discovery.clients, "get_unsigned_client")
+    mock_get_client.return_value.get_paginator.side_effect = _get_paginator(accounts_pages, roles, failing_accounts)
+    mocker.patch.object(files, "load_sso_catalog", return_value=catalog)
+    return mocker.patch.object(files, "save_sso_catalog"), mock_get_client
+
+
+#######################
+# Tests
+
+
+def test_discover(mocker):
+    mock_save, mock_get_client = _mock(mocker, {})
+
+    result = sso_discovery.discover("sso")
+
+    assert result.was_success
+    assert {"generation": 1, "accounts": 2, "listed_roles": 2} == result.payload
+    mock_get_client.assert_called_once_with("sso", "eu-central-1", timeout=10, retries=3)
+    catalog = mock_save.call_args.args[0]
+    session_entry = sso_catalog.get_session_entry(catalog, "sso")
+    assert ["developer", "readonly"] == session_entry["accounts"]["111111111111"]["roles"]
+    assert "team-a-live" == session_entry["accounts"]["222222222222"]["name"]
+
+
+def test_discover__lists_roles_of_new_and_stale_accounts_only(mocker):
+    catalog = {}
+    mock_save, mock_get_client = _mock(mocker, catalog)
+    sso_discovery.discover("sso")
+    mock_get_client.return_value.get_paginator.reset_mock()
+
+    result = sso_discovery.discover("sso")
+
+    assert result.was_success
+    assert {"generation": 1, "accounts": 2, "listed_roles": 0} == result.payload
+    assert [mocker.call("list_accounts")] == mock_get_client.return_value.get_paginator.call_args_list
+
+    result = sso_discovery.discover("sso", full=True)
+
+    assert 2 == result.payload["listed_roles"]
+    assert 1 == result.payload["generation"]
+
+
+def test_discover__failed_account_keeps_the_others(mocker):
+    mock_save, _ = _mock(mocker, {}, failing_accounts=["222222222222"])
+
+    result = sso_discovery.discover("sso")
+
+    assert result.was_error
+    assert "error while listing the roles of 222222222222" == result.error_message
+    session_entry = sso_catalog.get_session_entry(mock_save.call_args.args[0], "sso")
+    assert ["developer", "readonly"] == session_entry["accounts"]["111111111111"]["roles"]
+    assert "roles_updated_at" not in session_entry["accounts"]["222222222222"]
+
+
+def test_discover__no_sso_token(mocker):
+    mocker.patch.object(sso_discovery.sso, "get_sso_access_token", return_value=None)
+    mock_get_client = mocker.patch.object(sso_discovery.clients, "get_unsigned_client")
+
+    result = sso_discovery.discover("sso")
+
+    assert result.was_error
+    mock_get_client.assert_not_called()
@@ -0,0 +1,193 @@
+import json
+import threading
+import time
+from configparser import ConfigParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.aws import clients, credentials, sso_oidc
+from app.core import files
+from app.core.refresh_schedule import to_datetime
+
+
+class StandInOidc:
+    """
+    Answers the sso-oidc calls of the device authorization flow like the aws endpoint.
+    The device code is approved when approve is called, until then create_token reports a pending authorization.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.approved = threading.Event()
+        self.pending_errors = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._create_handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def approve(self, _=None) -> bool:
+        self.approved.set()
+        return True
+
+    def get_operations(self) -> list:
+        return [path for path, _ in self.requests]
+
+    def answer(self, path: str, body: dict) -> (int, dict, dict):
+        self.requests.append((path, body))
+        if path == "/client/register":
+            return 200, {}, {"clientId": f"client-{len(self.requests)}", "clientSecret": "client-secret",
+                             "clientIdIssuedAt": int(time.time()),
+                             "clientSecretExpiresAt": int(time.time()) + 90 * 24 * 60 * 60}
+        if path == "/device_authorization":
+            return 200, {}, {"deviceCode": "device-code", "userCode": "ABCD-EFGH",
+                             "verificationUri": "https://device.sso.example.com/",
+                             "verificationUriComplete": "https://device.sso.example.com/?user_code=ABCD-EFGH",
+                             "expiresIn": 60, "interval": 1}
+        if path == "/token":
+            if self.pending_errors:
+                error_type = self.pending_errors.pop(0)
+                return 400, {"x-amzn-ErrorType": error_type}, {"error": error_type}
+            if not self.approved.is_set():
+                return 400, {"x-amzn-ErrorType": "AuthorizationPendingException"}, {"error": "authorization_pending"}
+            return 200, {}, {"accessToken": "access-token", "tokenType": "Bearer", "expiresIn": 28800,
+                             "refreshToken": "refresh-token"}
+        return 404, {}, {}
+
+    def _create_handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                status, headers, response = stand_in.answer(self.path, body)
+                content = json.dumps(response).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+#######################
+# Fixures
+
+
+@pytest.fixture
+def oidc(mocker, monkeypatch, tmp_path):
+    stand_in = StandInOidc()
+    stand_in.thread.start()
+    monkeypatch.setenv("AWS_ENDPOINT_URL_SSO_OIDC", stand_in.url)
+    mocker.patch.object(files, "get_aws_cache_path", return_value=str(tmp_path / "sso" / "cache"))
+    config_file = ConfigParser()
+    config_file.read_dict({"sso-session some-session": {
+        "sso_start_url": "https://example.awsapps.com/start",
+        "sso_region": "eu-central-1",
+        "sso_registration_scopes": "sso:account:access",
+    }})
+    mocker.patch.object(credentials, "load_config_file", return_value=config_file)
+    clients.invalidate()
+    yield stand_in
+    clients.invalidate()
+    stand_in.server.shutdown()
+    stand_in.server.server_close()
+
+#######################
+# Tests
+
+
+def test_login(oidc):
+    result = sso_oidc.login("some-session", open_browser=oidc.approve)
+
+    assert result.was_success
+    assert ["/client/register", "/device_authorization", "/token"] == oidc.get_operations()
+    _, register_body = oidc.requests[0]
+    assert {"clientType": "public", "scopes": ["sso:account:access"]} == {
+        key: register_body[key] for key in ["clientType", "scopes"]}
+    _, token_body = oidc.requests[2]
+    assert "urn:ietf:params:oauth:grant-type:device_code" == token_body["grantType"]
+    assert "device-code" == token_body["deviceCode"]
+
+    sso_token = files.load_sso_token("some-session")
+    assert "access-token" == sso_token["accessToken"]
+    assert "refresh-token" == sso_token["refreshToken"]
+    assert "eu-central-1" == sso_token["region"]
+    assert "https://example.awsapps.com/start" == sso_token["startUrl"]
+    assert "client-1" == sso_token["clientId"]
+    assert to_datetime(sso_token["registrationExpiresAt"]) > to_datetime(sso_token["expiresAt"])
+
+
+def test_login__token_is_readable_by_botocore(oidc, tmp_path):
+    from botocore.utils import SSOTokenLoader
+    from botocore.credentials import JSONFileCache
+
+    sso_oidc.login("some-session", open_browser=oidc.approve)
+
+    token_loader = SSOTokenLoader(cache=JSONFileCache(str(tmp_path / "sso" / "cache")))
+    sso_token = token_loader("https://example.awsapps.com/start", session_name="some-session")
+    assert "access-token" == sso_token["accessToken"]
+
+
+def test_login__reuses_client_registration(oidc):
+    sso_oidc.login("some-session", open_browser=oidc.approve)
+    oidc.requests.clear()
+
+    result = sso_oidc.login("some-session", open_browser=oidc.approve)
+
+    assert result.was_success
+    assert ["/device_authorization", "/token"] == oidc.get_operations()
+
+
+def test_login__waits_for_confirmation(oidc):
+    def open_browser(_):
+        # the user confirms the code a little later in the browser
+        threading.Timer(1.5, oidc.approve).start()
+        return True
+
+    result = sso_oidc.login("some-session", open_browser=open_browser)
+
+    assert result.was_success
+    assert 2 <= oidc.get_operations().count("/token")
+
+
+def test_login__device_code_expired(oidc):
+    oidc.pending_errors = ["ExpiredTokenException"]
+
+    result = sso_oidc.login("some-session", open_browser=oidc.approve)
+
+    assert result.was_error
+    assert "sso login was not confirmed in time" == result.error_message
+    assert None is files.load_sso_token("some-session")
+
+
+def test_login__access_denied(oidc):
+    oidc.pending_errors = ["AccessDeniedException"]
+
+    result = sso_oidc.login("some-session", open_browser=oidc.approve)
+
+    assert result.was_error
+    assert "error during sso login of some-session" == result.error_message
+
+
+def test_login__unknown_sso_session(oidc):
+    result = sso_oidc.login("other-session", open_browser=oidc.approve)
+
+    assert result.was_error
+    assert [] == oidc.requests
+
+
+def test_get_registration_cache_key():
+    # registration file names in ~/.aws/sso/cache, the aws cli hashes json.dumps(args, sort_keys=True)
+    assert "0b44ffb371fea722a6b987facaf6372306c3e114" == sso_oidc.get_registration_cache_key(
+        "some-session", "https://example.awsapps.com/start", "eu-central-1", ["sso:account:access"])
+    assert "c6cdf4762e51cee1bbbba44ffc5ecce384f3b1c0" == sso_oidc.get_registration_cache_key(
+        "some-session", "https://example.awsapps.com/start", "eu-central-1", [])
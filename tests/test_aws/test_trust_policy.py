@@ -0,0 +1,95 @@
+from urllib.parse import quote
+import json
+
+from app.aws import trust_policy
+from app.aws.trust_policy import Principal
+
+principal = Principal("123456789012", "role", "developer")
+
+
+def get_policy(principal_entry, effect="Allow", action="sts:AssumeRole", condition=None) -> dict:
+    statement = {"Effect": effect, "Principal": principal_entry, "Action": action}
+    if condition:
+        statement["Condition"] = condition
+    return {"Version": "2012-10-17", "Statement": [statement]}
+
+
+def test_principal_from_caller_arn__assumed_role():
+    result = Principal.from_caller_arn("arn:aws:sts::123456789012:assumed-role/developer/session")
+    assert "arn:aws:iam::123456789012:role/developer" == result.arn
+
+
+def test_principal_from_caller_arn__user_with_path():
+    result = Principal.from_caller_arn("arn:aws:iam::123456789012:user/team/someone")
+    assert "arn:aws:iam::123456789012:user/someone" == result.arn
+
+
+def test_allows_assume_role__exact_role_arn():
+    policy = get_policy({"AWS": "arn:aws:iam::123456789012:role/developer"})
+    assert trust_policy.allows_assume_role(policy, principal)
+
+
+def test_allows_assume_role__role_arn_with_path():
+    policy = get_policy({"AWS": "arn:aws:iam::123456789012:role/some/path/developer"})
+    assert trust_policy.allows_assume_role(policy, principal)
+
+
+def test_allows_assume_role__other_role():
+    policy = get_policy({"AWS": "arn:aws:iam::123456789012:role/readonly"})
+    assert not trust_policy.allows_assume_role(policy, principal)
+
+
+def test_allows_assume_role__principal_list():
+    policy = get_policy({"AWS": ["arn:aws:iam::123456789012:role/readonly",
+                                 "arn:aws:iam::123456789012:role/developer"]})
+    assert trust_policy.allows_assume_role(policy, principal)
+
+
+def test_allows_assume_role__account_root():
+    assert trust_policy.allows_assume_role(get_policy({"AWS": "arn:aws:iam::123456789012:root"}), principal)
+    assert trust_policy.allows_assume_role(get_policy({"AWS": "123456789012"}), principal)
+    assert not trust_policy.allows_assume_role(get_policy({"AWS": "arn:aws:iam::999999999999:root"}), principal)
+
+
+def test_allows_assume_role__wildcards():
+    assert trust_policy.allows_assume_role(get_policy("*"), principal)
+    assert trust_policy.allows_assume_role(get_policy({"AWS": "*"}), principal)
+    assert trust_policy.allows_assume_role(get_policy({"AWS": "arn:aws:iam::123456789012:role/dev*"}), principal)
+    assert trust_policy.allows_assume_role(get_policy({"AWS": "arn:aws:iam::123456789012:role/developer"},
+                                                      action="sts:*"), principal)
+
+
+def test_allows_assume_role__principal_arn_condition():
+    condition = {"ArnLike": {"aws:PrincipalArn": "arn:aws:iam::123456789012:role/dev*"}}
+    assert trust_policy.allows_assume_role(get_policy({"AWS": "*"}, condition=condition), principal)
+
+    condition = {"StringEquals": {"aws:PrincipalArn": "arn:aws:iam::123456789012:role/readonly"}}
+    assert not trust_policy.allows_assume_role(get_policy({"AWS": "*"}, condition=condition), principal)
+
+
+def test_allows_assume_role__ignores_other_services_and_actions():
+    assert not trust_policy.allows_assume_role(get_policy({"Service": "ec2.amazonaws.com"}), principal)
+    assert not trust_policy.allows_assume_role(get_policy({"AWS": "arn:aws:iam::123456789012:role/developer"},
+                                                          action="sts:TagSession"), principal)
+
+
+def test_allows_assume_role__deny_wins():
+    policy = get_policy({"AWS": "arn:aws:iam::123456789012:root"})
+    policy["Statement"].append({"Effect": "Deny",
+                                "Principal": {"AWS": "arn:aws:iam::123456789012:role/developer"},
+                                "Action": "sts:AssumeRole"})
+    assert not trust_policy.allows_assume_role(policy, principal)
+
+
+def test_allows_assume_role__url_encoded_document():
+    policy = quote(json.dumps(get_policy({"AWS": "arn:aws:iam::123456789012:role/developer"})))
+    assert trust_policy.allows_assume_role(policy, principal)
+
+
+def test_filter_assumable_roles():
+    role_list = [
+        {"RoleName": "pipeline", "AssumeRolePolicyDocument": get_policy({"AWS": "arn:aws:iam::123456789012:root"})},
+        {"RoleName": "lambda", "AssumeRolePolicyDocument": get_policy({"Service": "lambda.amazonaws.com"})},
+        {"RoleName": "broken", "AssumeRolePolicyDocument": "%7Bnot-json"},
+    ]
+    assert ["pipeline"] == trust_policy.filter_assumable_roles(role_list, principal)
@@ -2,6 +2,7 @@ from unittest.mock import call
 
 import pytest
 
+from app.core import config as config_module
 from app.core import files
 from app.core.config import Config, _default_access_key, _default_sso_sesson, _default_sso_interval
 from tests.test_data.test_accounts import get_default_test_accounts, get_test_accounts__minimal, get_test_accounts__mixed_auth_modes
@@ -92,6 +93,8 @@ def test_initialize(config, mocker):
     assert 'some-sso-session' == config.default_sso_session
     assert 'some-command' == config.mfa_shell_command
     assert '/some/dir/' == config.shell_path_extension
+    assert 4 == config.get_request_concurrency()
+    assert None is config.get_credential_server_port()
 
 
 def test_save_accounts__default(config, mocker):
@@ -236,7 +239,13 @@ def test_save_config__defaults(config, mocker):
         'shell_path_extension': None,
         'default_access_key': None,
         'default_sso_session': None,
-        'default_sso_interval': None}
+        'default_sso_interval': None,
+        'request_concurrency': None,
+        'credential_server_port': None,
+        'yaml_cache_sidecar': False,
+        'role_credential_cache': False,
+        'warm_standby_groups': None,
+        'warm_standby_sts_budget': None}
     mock_save_config_file.assert_called_once_with(expected)
 
 
@@ -248,6 +257,12 @@ def test_save_config(config, mocker):
     config.default_access_key = 'some access key'
     config.default_sso_session = 'some sso session'
     config.default_sso_interval = 'some interval'
+    config.request_concurrency = '4'
+    config.credential_server_port = '9911'
+    config.yaml_cache_sidecar = True
+    config.role_credential_cache = True
+    config.warm_standby_groups = '3'
+    config.warm_standby_sts_budget = '30'
     config.save_config()
 
     expected = {
@@ -255,7 +270,13 @@ def test_save_config(config, mocker):
         'shell_path_extension': 'some path',
         'default_access_key': 'some access key',
         'default_sso_session': 'some sso session',
-        'default_sso_interval': 'some interval'}
+        'default_sso_interval': 'some interval',
+        'request_concurrency': '4',
+        'credential_server_port': '9911',
+        'yaml_cache_sidecar': True,
+        'role_credential_cache': True,
+        'warm_standby_groups': '3',
+        'warm_standby_sts_budget': '30'}
     mock_save_config_file.assert_called_once_with(expected)
 
 
@@ -424,6 +445,17 @@ def test_initialize_profile_groups__replace_old_values_on_config_reload(config):
     assert 1 == len(development_group.profiles)
 
 
+def test_get_request_concurrency__default(config):
+    assert 8 == config.get_request_concurrency()
+
+
+def test_get_request_concurrency__invalid_value_falls_back_to_default(config):
+    config.set_request_concurrency('0')
+    assert 8 == config.get_request_concurrency()
+    config.set_request_concurrency('many')
+    assert 8 == config.get_request_concurrency()
+
+
 def test_set_default_sso_interval__string_none_sets_none(config):
     config.set_default_sso_interval('None')
     assert None == config.default_sso_interval
@@ -546,6 +578,23 @@ def test_get_group(config):
     assert expected == config.get_group('1')
 
 
+def test_get_profiles_by_account(config):
+    accounts = get_default_test_accounts()
+    accounts['live']['profiles'].append({'profile': 'developer', 'account': '123495678901', 'role': 'admin'})
+    config.initialize_profile_groups(accounts=accounts, service_roles={}, default_access_key='some-access-key',
+                                     default_sso_session='some-sso-session', default_sso_interval='8')
+
+    result = config.get_profiles_by_account('123495678901')
+
+    assert [('development', 'developer'), ('live', 'developer')] == [(profile.group.name, profile.profile)
+                                                                     for profile in result]
+    assert [] == config.get_profiles_by_account('999999999999')
+
+    config.get_group('development').set_service_role_profile(source_profile_name='developer', role_name='pipeline')
+    assert ['developer', 'service', 'developer'] == [profile.profile
+                                                     for profile in config.get_profiles_by_account('123495678901')]
+
+
 def test_to_dict(config, mocker):
     mock_group1 = mocker.Mock()
     mock_group1.to_dict.return_value = 'group 1'
@@ -566,3 +615,205 @@ def test_to_dict(config, mocker):
     expected = {'1': 'group 1', '2': 'group 2', '3': 'group 3'}
 
     assert expected == result
+
+
+def test_save_cached_assumable_roles(config, mocker):
+    mocker.patch.object(files, "load_assumable_roles_cache", return_value={})
+    mock_save_assumable_roles_cache = mocker.patch.object(files, "save_assumable_roles_cache")
+    mock_save_service_roles_file = mocker.patch.object(files, "save_service_roles_file")
+    mocker.patch('app.core.config.time.time', return_value=1000)
+
+    config.save_cached_assumable_roles(account_id='123456789012',
+                                       principal_arn='arn:aws:iam::123456789012:role/developer',
+                                       role_list=['pipeline'])
+    expected = {
+        '123456789012': {
+            'arn:aws:iam::123456789012:role/developer': {'fetched_at': 1000, 'roles': ['pipeline']}}}
+    mock_save_assumable_roles_cache.assert_called_once_with(expected)
+    mock_save_service_roles_file.assert_not_called()
+
+
+def test_get_cached_assumable_roles(config, mocker):
+    mocker.patch.object(files, "load_assumable_roles_cache", return_value={
+        '123456789012': {
+            'arn:aws:iam::123456789012:role/developer': {'fetched_at': 1000, 'roles': ['pipeline']}}})
+    mock_time = mocker.patch('app.core.config.time.time', return_value=1000 + 60)
+
+    assert ['pipeline'] == config.get_cached_assumable_roles('123456789012', 'arn:aws:iam::123456789012:role/developer')
+    assert None == config.get_cached_assumable_roles('123456789012', 'arn:aws:iam::123456789012:role/readonly')
+    assert None == config.get_cached_assumable_roles('999999999999', 'arn:aws:iam::123456789012:role/developer')
+
+    mock_time.return_value = 1000 + 3601
+    assert None == config.get_cached_assumable_roles('123456789012', 'arn:aws:iam::123456789012:role/developer')
+
+
+def test_record_group_switch(config, mocker):
+    usage = {}
+    mocker.patch.object(files, "load_group_usage", side_effect=lambda: dict(usage))
+    mock_save_group_usage = mocker.patch.object(files, "save_group_usage", side_effect=usage.update)
+    mock_time = mocker.patch('app.core.config.time.time', return_value=1000)
+
+    config.record_group_switch('development')
+    mock_time.return_value = 1000 + config_module.group_usage_half_life_seconds
+    config.record_group_switch('development')
+
+    expected = {'development': {'score': 1.5, 'last_used': 1000 + 259200}}
+    mock_save_group_usage.assert_called_with(expected)
+
+
+def test_get_frequent_groups(config, mocker):
+    config.profile_groups = {'development': mocker.Mock(), 'live': mocker.Mock(), 'staging': mocker.Mock()}
+    half_life = config_module.group_usage_half_life_seconds
+    mocker.patch.object(files, "load_group_usage", return_value={
+        'development': {'score': 3, 'last_used': 1000},
+        'live': {'score': 4, 'last_used': 1000 - half_life},
+        'staging': {'score': 1, 'last_used': 1000},
+        'removed': {'score': 9, 'last_used': 1000}})
+    mocker.patch('app.core.config.time.time', return_value=1000)
+
+    assert ['development', 'live', 'staging'] == config.get_frequent_groups()
+
+
+def test_get_warm_standby_settings(config):
+    assert 0 == config.get_warm_standby_groups()
+    assert 60 == config.get_warm_standby_sts_budget()
+    config.set_warm_standby_groups('3')
+    config.set_warm_standby_sts_budget('many')
+    assert 3 == config.get_warm_standby_groups()
+    assert 60 == config.get_warm_standby_sts_budget()
+
+
+def test_get_credential_server_port(config):
+    config.set_credential_server_port('9911')
+    assert 9911 == config.get_credential_server_port()
+
+
+def test_get_credential_server_port__disabled_or_invalid(config):
+    for port in [None, '', '0', '70000', 'abc']:
+        config.set_credential_server_port(port)
+        assert None is config.get_credential_server_port()
+
+
+def _initialize(config, mocker, accounts: dict, service_roles: dict):
+    mocker.patch.object(files, "load_config", return_value=get_test_config())
+    mocker.patch.object(files, "load_accounts", return_value=accounts)
+    mocker.patch.object(files, "load_service_roles", return_value=service_roles)
+    config.initialize()
+
+
+def test_reload_accounts__keeps_unchanged_groups(config, mocker):
+    _initialize(config, mocker, get_default_test_accounts(), get_test_service_roles())
+    development = config.get_group("development")
+    development.get_profile("developer").verified = True
+    accounts = get_default_test_accounts()
+    accounts["live"]["profiles"][1]["role"] = "auditor"
+    del accounts["gcp-project-dev"]
+    accounts["staging"] = get_default_test_accounts()["development"]
+    mocker.patch.object(files, "load_accounts", return_value=accounts)
+
+    changed_groups = config.reload_accounts()
+
+    assert ["live", "staging", "gcp-project-dev"] == changed_groups
+    assert ["development", "live", "staging"] == list(config.profile_groups)
+    assert development is config.get_group("development")
+    assert development.get_profile("developer").verified
+    assert "auditor" == config.get_group("live").get_profile("readonly").role
+    assert [config.get_group("live").get_profile("readonly")] == config.get_profiles_by_account("0000000000")
+
+
+def test_reload_accounts__unchanged(config, mocker):
+    _initialize(config, mocker, get_default_test_accounts(), get_test_service_roles())
+    profile_groups = dict(config.profile_groups)
+
+    assert [] == config.reload_accounts()
+    assert profile_groups == config.profile_groups
+
+
+def test_reload_service_roles(config, mocker):
+    _initialize(config, mocker, get_default_test_accounts(), {})
+    service_roles = get_test_service_roles()
+    mocker.patch.object(files, "load_service_roles", return_value=service_roles)
+
+    assert ["development"] == config.reload_service_roles()
+    assert "pipeline" == config.get_group("development").service_profile.role
+    assert [] == config.reload_service_roles()
+
+
+def test_reload_settings__group_defaults_changed(config, mocker):
+    _initialize(config, mocker, get_default_test_accounts(), get_test_service_roles())
+    development = config.get_group("development")
+    mocker.patch.object(files, "load_config", return_value={**get_test_config(), "request_concurrency": 8})
+
+    config.reload_settings()
+
+    assert development is config.get_group("development")
+
+    mocker.patch.object(files, "load_config", return_value={**get_test_config(), "default_access_key": "other-key"})
+
+    config.reload_settings()
+
+    assert development is not config.get_group("development")
+    assert "other-key" == config.get_group("development").get_access_key()
+
+
+def _get_catalog(generation: int, roles: list) -> dict:
+    return {"sessions": {"sso": {"generation": generation, "accounts": {
+        "111111111111": {"name": "team-a-dev", "email": "", "roles": roles},
+        "222222222222": {"name": "team-b-dev", "email": "", "roles": ["developer"]},
+    }}}}
+
+
+def test_catalog_group(config, mocker):
+    accounts = get_default_test_accounts()
+    accounts["team-a"] = {"color": "#388E3C", "team": "team-a", "region": "eu-central-1", "auth_mode": "sso",
+                          "sso_session": "sso", "catalog": {"account_name": "team-a-*", "default": "team-a-dev-developer"}}
+    mocker.patch.object(files, "load_sso_catalog", return_value=_get_catalog(1, ["developer"]))
+    _initialize(config, mocker, accounts, {})
+    development = config.get_group("development")
+
+    team_a = config.get_group("team-a")
+    assert ["team-a-dev-developer"] == [profile.profile for profile in team_a.profiles]
+    assert "team-a-dev-developer" == team_a.get_default_profile().profile
+    assert {"account_name": "team-a-*", "default": "team-a-dev-developer"} == team_a.to_dict()["catalog"]
+    assert [] == team_a.to_dict()["profiles"]
+    assert config.valid
+
+    mocker.patch.object(files, "load_sso_catalog", return_value=_get_catalog(2, ["developer", "readonly"]))
+
+    assert ["team-a"] == config.reload_accounts()
+    assert ["team-a-dev-developer", "team-a-dev-readonly"] == [profile.profile
+                                                               for profile in config.get_group("team-a").profiles]
+    assert development is config.get_group("development")
+
+
+def test_catalog_group__no_matching_profiles(config, mocker):
+    accounts = {"team-c": {"color": "#388E3C", "team": "team-c", "region": "eu-central-1", "auth_mode": "sso",
+                           "sso_session": "sso", "catalog": {"account_name": "team-c-*"}}}
+    mocker.patch.object(files, "load_sso_catalog", return_value=_get_catalog(1, ["developer"]))
+
+    _initialize(config, mocker, accounts, {})
+
+    assert not config.valid
+    assert 'aws "team-c" matches no profiles in the sso catalog' == config.error
+
+
+def test_catalog_group__invalid_profile_template(config, mocker):
+    mocker.patch.object(files, "load_sso_catalog", return_value=_get_catalog(1, ["developer"]))
+    for profile_template in ["{team}-{role}", "{}"]:
+        accounts = {"team-a": {"color": "#388E3C", "team": "team-a", "region": "eu-central-1", "auth_mode": "sso",
+                               "sso_session": "sso", "catalog": {"account_name": "team-a-*",
+                                                                 "profile": profile_template}}}
+
+        _initialize(config, mocker, accounts, {})
+
+        assert not config.valid
+        assert ('catalog profile of "team-a" may only use {account_id}, {account_name} and {role}'
+                == config.error)
+
+
+def test_initialize__catalog_is_only_read_when_used(config, mocker):
+    mock_load_sso_catalog = mocker.patch.object(files, "load_sso_catalog")
+
+    _initialize(config, mocker, get_default_test_accounts(), {})
+
+    mock_load_sso_catalog.assert_not_called()
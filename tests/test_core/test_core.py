@@ -1,13 +1,16 @@
+import threading
 from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 from unittest.mock import Mock, call
 
 import pytest
 
 from app.core import core as core_module
 from app.core import files
+from app.aws.trust_policy import Principal
 from app.core.core import Core
 from app.core.result import Result
-from tests.test_data.test_accounts import get_default_test_accounts, get_test_profile_group
+from tests.test_data.test_accounts import get_default_test_accounts, get_test_profile_group, get_test_profile_group_sso
 from tests.test_data.test_config import get_test_config
 from tests.test_data.test_results import (
     get_error_result,
@@ -32,6 +35,7 @@ def ctx(mocker) -> Ctx:
     mocker.patch.object(files, "load_config", return_value=get_test_config())
     mocker.patch.object(files, "load_service_roles", return_value=get_test_service_roles())
     mocker.patch.object(files, "load_toggles", return_value=get_test_toggles())
+    mocker.patch.object(files, "load_sso_token", return_value=None)
 
     core = Core()
     return Ctx(
@@ -441,3 +445,265 @@ def test__check_name__contain_spaces(ctx):
     assert result.was_error
     assert result.error_message == "'sso test' must not contain spaces"
     assert not result.was_success
+
+
+def test_verify(ctx, mocker):
+    mock_iam = mocker.patch.object(core_module, "iam")
+    mock_iam.get_caller_identity.side_effect = lambda profile, timeout, retries, read_timeout: profile != "readonly"
+    profile_group = get_test_profile_group(include_service_role=True)
+    ctx.core.active_profile_group = profile_group
+    verified = []
+
+    result = ctx.core.verify(on_verified=lambda profile: verified.append(profile.profile))
+
+    assert result.was_success
+    assert {"developer": True, "readonly": False, "service": True} == {
+        profile.profile: profile.verified for profile in profile_group.get_profile_list(include_service_profile=True)}
+    assert ["developer", "readonly", "service"] == sorted(verified)
+    mock_iam.get_caller_identity.assert_any_call("developer", timeout=core_module.verify_timeout_seconds,
+                                                 retries=core_module.verify_retries,
+                                                 read_timeout=core_module.verify_timeout_seconds)
+
+
+def test_verify__deadline_marks_pending_profiles_unverified(ctx, mocker):
+    mocker.patch.object(core_module, "verify_deadline_seconds", 0.2)
+    mock_iam = mocker.patch.object(core_module, "iam")
+    release = threading.Event()
+
+    def get_caller_identity(profile, timeout, retries, read_timeout):
+        if profile == "readonly":
+            release.wait(5)
+        return True
+
+    mock_iam.get_caller_identity.side_effect = get_caller_identity
+    profile_group = get_test_profile_group()
+    ctx.core.active_profile_group = profile_group
+    for profile in profile_group.get_profile_list():
+        profile.verified = True
+
+    result = ctx.core.verify()
+    release.set()
+
+    assert result.was_success
+    assert profile_group.get_profile("developer").verified
+    assert not profile_group.get_profile("readonly").verified
+
+
+def test_list_assumable_roles__fetches_and_caches(ctx, mocker):
+    mock_iam = mocker.patch.object(core_module, "iam")
+    cache = {}
+    mocker.patch.object(files, "load_assumable_roles_cache", side_effect=lambda: cache)
+    mock_save = mocker.patch.object(files, "save_assumable_roles_cache", side_effect=cache.update)
+    mock_iam.get_principal.return_value = Principal("123456789012", "role", "developer")
+    mock_iam.list_assumable_roles.return_value = get_success_result()
+    mock_iam.list_assumable_roles.return_value.add_payload(["pipeline"])
+
+    first = ctx.core.list_assumable_roles("developer")
+    second = ctx.core.list_assumable_roles("developer")
+
+    assert ["pipeline"] == first.payload
+    assert ["pipeline"] == second.payload
+    assert second.was_success
+    mock_iam.list_assumable_roles.assert_called_once_with(
+        source_profile="developer", principal=mock_iam.get_principal.return_value
+    )
+    assert 1 == mock_save.call_count
+
+
+def test_list_assumable_roles__does_not_cache_errors(ctx, mocker):
+    mock_iam = mocker.patch.object(core_module, "iam")
+    mocker.patch.object(files, "load_assumable_roles_cache", return_value={})
+    mock_save = mocker.patch.object(files, "save_assumable_roles_cache")
+    mock_iam.get_principal.return_value = Principal("123456789012", "role", "developer")
+    mock_iam.list_assumable_roles.return_value = get_error_result()
+
+    result = ctx.core.list_assumable_roles("developer")
+
+    assert result.was_error
+    mock_save.assert_not_called()
+
+
+def test_update_credential_server__starts_configured_port(ctx, mocker):
+    mock_server = mocker.patch.object(ctx.core, "credential_server")
+    mock_server.get_port.return_value = None
+    ctx.core.config.set_credential_server_port("9911")
+
+    result = ctx.core.update_credential_server()
+
+    assert result.was_success
+    mock_server.start.assert_called_once_with(9911)
+
+
+def test_update_credential_server__disabled(ctx, mocker):
+    mock_server = mocker.patch.object(ctx.core, "credential_server")
+    mock_server.get_port.return_value = 9911
+    ctx.core.config.set_credential_server_port(None)
+
+    result = ctx.core.update_credential_server()
+
+    assert result.was_success
+    mock_server.stop.assert_called_once_with()
+    mock_server.start.assert_not_called()
+
+
+def test_update_credential_server__port_in_use(ctx, mocker):
+    mock_server = mocker.patch.object(ctx.core, "credential_server")
+    mock_server.get_port.return_value = None
+    mock_server.start.side_effect = OSError("address in use")
+    ctx.core.config.set_credential_server_port("9911")
+
+    result = ctx.core.update_credential_server()
+
+    assert result.was_error
+    assert "could not start credential server on port 9911" == result.error_message
+
+
+def test_refresh__not_logged_in(ctx, mocker):
+    mock_refresh_with_key = mocker.patch.object(Core, "refresh_with_key")
+
+    assert ctx.core.refresh().was_success
+    mock_refresh_with_key.assert_not_called()
+
+
+def test_refresh__key(ctx, mocker):
+    mock_refresh_with_key = mocker.patch.object(Core, "refresh_with_key", return_value=ctx.success_result)
+    ctx.core.active_profile_group = get_test_profile_group()
+
+    assert ctx.core.refresh() == ctx.success_result
+    mock_refresh_with_key.assert_called_once_with(ctx.core.active_profile_group)
+
+
+def test_refresh__sso_within_interval(ctx, mocker):
+    mock_login_with_sso = mocker.patch.object(Core, "login_with_sso")
+    mock_write_key = mocker.patch.object(Core, "login_with_sso_write_key", return_value=ctx.success_result)
+    profile_group = get_test_profile_group_sso()
+    profile_group.sso_interval = "8"
+    profile_group.write_mode = "key"
+    ctx.core.active_profile_group = profile_group
+    ctx.core.last_login = datetime.now(timezone.utc) - timedelta(hours=1)
+
+    assert ctx.core.refresh().was_success
+    mock_login_with_sso.assert_not_called()
+    mock_write_key.assert_called_once_with(profile_group)
+
+
+def test_refresh__sso_after_interval(ctx, mocker):
+    mock_login_with_sso = mocker.patch.object(Core, "login_with_sso", return_value=ctx.success_result)
+    profile_group = get_test_profile_group_sso()
+    profile_group.sso_interval = "8"
+    ctx.core.active_profile_group = profile_group
+    ctx.core.last_login = datetime.now(timezone.utc) - timedelta(hours=9)
+
+    assert ctx.core.refresh().was_success
+    mock_login_with_sso.assert_called_once_with(profile_group)
+
+
+def test_refresh__sso_token_still_valid_after_interval(ctx, mocker):
+    mock_login_with_sso = mocker.patch.object(Core, "login_with_sso")
+    mocker.patch.object(files, "load_sso_token", return_value={
+        "accessToken": "sso-token", "expiresAt": (datetime.now(timezone.utc) + timedelta(hours=2)).isoformat()})
+    profile_group = get_test_profile_group_sso()
+    profile_group.sso_interval = "8"
+    ctx.core.active_profile_group = profile_group
+    ctx.core.last_login = datetime.now(timezone.utc) - timedelta(hours=9)
+
+    assert ctx.core.refresh().was_success
+    mock_login_with_sso.assert_not_called()
+
+
+def test_refresh__sso_token_about_to_expire(ctx, mocker):
+    mock_login_with_sso = mocker.patch.object(Core, "login_with_sso", return_value=ctx.success_result)
+    mocker.patch.object(files, "load_sso_token", return_value={
+        "accessToken": "sso-token", "expiresAt": (datetime.now(timezone.utc) + timedelta(minutes=2)).isoformat()})
+    profile_group = get_test_profile_group_sso()
+    profile_group.sso_interval = "8"
+    ctx.core.active_profile_group = profile_group
+    ctx.core.last_login = datetime.now(timezone.utc) - timedelta(hours=1)
+
+    assert ctx.core.refresh().was_success
+    mock_login_with_sso.assert_called_once_with(profile_group)
+
+
+def test_get_next_refresh_delay__sso_token_expiration(ctx, mocker):
+    mocker.patch.object(files, "load_sso_token", return_value={
+        "accessToken": "sso-token", "expiresAt": (datetime.now(timezone.utc) + timedelta(minutes=10)).isoformat()})
+    ctx.core.active_profile_group = get_test_profile_group_sso()
+    ctx.core.last_login = datetime.now(timezone.utc)
+    ctx.core.refresh_schedule.set_expiration("developer", datetime.now(timezone.utc) + timedelta(hours=1))
+
+    assert 5 * 60 - 5 <= ctx.core.get_next_refresh_delay() <= 5 * 60
+    assert not ctx.core.is_refresh_due()
+
+
+def test_refresh__sso_interval_disabled(ctx, mocker):
+    mock_login_with_sso = mocker.patch.object(Core, "login_with_sso")
+    profile_group = get_test_profile_group_sso()
+    profile_group.sso_interval = "0"
+    ctx.core.active_profile_group = profile_group
+    ctx.core.last_login = datetime.now(timezone.utc) - timedelta(days=30)
+
+    assert ctx.core.refresh().was_success
+    mock_login_with_sso.assert_not_called()
+
+
+def test_watch_files(ctx, mocker):
+    mock_file_watcher = mocker.Mock()
+    on_change = mocker.Mock()
+
+    ctx.core.watch_files(mock_file_watcher, on_change)
+    for watch_call in mock_file_watcher.watch.call_args_list:
+        watch_call.args[1]()
+
+    assert [call("accounts"), call("config"), call("service_roles"), call("accounts"), call("sso_token")] \
+           == on_change.mock_calls
+    assert {"directory": True} == mock_file_watcher.watch.call_args_list[4].kwargs
+
+
+def test_reload_accounts__active_group_changed(ctx, mocker):
+    ctx.core.active_profile_group = ctx.core.config.get_group("development")
+    accounts = get_default_test_accounts()
+    accounts["development"]["profiles"][1]["role"] = "auditor"
+    mocker.patch.object(files, "load_accounts", return_value=accounts)
+
+    changed_groups = ctx.core.reload_accounts()
+
+    assert ["development"] == changed_groups
+    assert ctx.core.config.get_group("development") is ctx.core.active_profile_group
+    assert "auditor" == ctx.core.active_profile_group.get_profile("readonly").role
+
+
+def test_reload_accounts__active_group_removed(ctx, mocker):
+    active_profile_group = ctx.core.config.get_group("development")
+    ctx.core.active_profile_group = active_profile_group
+    accounts = get_default_test_accounts()
+    del accounts["development"]
+    mocker.patch.object(files, "load_accounts", return_value=accounts)
+
+    assert ["development"] == ctx.core.reload_accounts()
+    assert active_profile_group is ctx.core.active_profile_group
+
+
+def test_reload_config(ctx, mocker):
+    mocker.patch.object(files, "load_config", return_value={**get_test_config(), "credential_server_port": "0"})
+    mock_update_credential_server = mocker.patch.object(ctx.core, "update_credential_server",
+                                                        return_value=ctx.success_result)
+
+    result = ctx.core.reload_config()
+
+    assert result.was_success
+    assert "0" == ctx.core.config.credential_server_port
+    mock_update_credential_server.assert_called_once_with()
+
+
+def test_discover_sso_accounts(ctx, mocker):
+    discover_result = Result()
+    discover_result.add_payload({"generation": 2, "accounts": 3, "listed_roles": 1})
+    discover_result.set_success()
+    mock_discover = mocker.patch.object(core_module.sso_discovery, "discover", return_value=discover_result)
+    mocker.patch.object(ctx.core.config, "reload_accounts", return_value=["team-a"])
+
+    result = ctx.core.discover_sso_accounts()
+
+    assert result.was_success
+    mock_discover.assert_called_once_with("some-sso-session", concurrency=4, full=False)
+    assert {"generation": 2, "accounts": 3, "listed_roles": 1, "groups": ["team-a"]} == result.payload
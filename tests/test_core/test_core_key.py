@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from datetime import datetime, timezone
 from unittest.mock import call
 
 import pytest
@@ -16,6 +17,12 @@ from tests.test_data.test_results import (
 from tests.test_data.test_service_roles import get_test_service_roles
 from tests.test_data.test_toggles import get_test_toggles
 
+test_secrets = {
+    "AccessKeyId": "test-key-id",
+    "SecretAccessKey": "test-access-key",
+    "SessionToken": "test-session-token",
+}
+
 
 @dataclass
 class Ctx:
@@ -133,7 +140,7 @@ def test_login_key__fetch_key_credentials_failure(ctx, mocker):
     expected_key_calls = [
         call.check_access_key(access_key="some-access-key"),
         call.get_user_name(access_key="some-access-key"),
-        call.fetch_key_credentials("user", profile_group, "default_overwrite"),
+        call.fetch_key_credentials("user", profile_group, "default_overwrite", concurrency=4),
     ]
     assert expected_key_calls == mock_key.mock_calls
     mock_set_region.assert_not_called()
@@ -166,7 +173,7 @@ def test_login_key__set_region_failure(ctx, mocker):
     expected_key_calls = [
         call.check_access_key(access_key="some-access-key"),
         call.get_user_name(access_key="some-access-key"),
-        call.fetch_key_credentials("user", profile_group, "default_overwrite"),
+        call.fetch_key_credentials("user", profile_group, "default_overwrite", concurrency=4),
     ]
     assert expected_key_calls == mock_key.mock_calls
     mock_handle_support_files.assert_not_called()
@@ -202,7 +209,7 @@ def test_login_key__run_script_failure(ctx, mocker):
     expected_key_calls = [
         call.check_access_key(access_key="some-access-key"),
         call.get_user_name(access_key="some-access-key"),
-        call.fetch_key_credentials("user", profile_group, "default_overwrite"),
+        call.fetch_key_credentials("user", profile_group, "default_overwrite", concurrency=4),
     ]
     assert expected_key_calls == mock_key.mock_calls
 
@@ -238,7 +245,7 @@ def test_login_key__successful_login_with_run_script_disabled(ctx, mocker):
     expected_key_calls = [
         call.check_access_key(access_key="some-access-key"),
         call.get_user_name(access_key="some-access-key"),
-        call.fetch_key_credentials("user", profile_group, "default_overwrite"),
+        call.fetch_key_credentials("user", profile_group, "default_overwrite", concurrency=4),
     ]
     assert expected_key_calls == mock_key.mock_calls
 
@@ -272,7 +279,7 @@ def test_login_key__successful_login(ctx, mocker):
     expected_key_calls = [
         call.check_access_key(access_key="some-access-key"),
         call.get_user_name(access_key="some-access-key"),
-        call.fetch_key_credentials("user", profile_group, "default_overwrite"),
+        call.fetch_key_credentials("user", profile_group, "default_overwrite", concurrency=4),
     ]
     assert expected_key_calls == mock_key.mock_calls
 
@@ -326,8 +333,8 @@ def test_login_key__fetch_service_role_failure(ctx, mocker):
     expected_key_calls = [
         call.check_access_key(access_key="some-access-key"),
         call.get_user_name(access_key="some-access-key"),
-        call.fetch_key_credentials("user", profile_group, "default_overwrite"),
-        call.fetch_key_service_profile(profile_group, "default_overwrite"),
+        call.fetch_key_credentials("user", profile_group, "default_overwrite", concurrency=4),
+        call.fetch_key_service_profile(profile_group, "default_overwrite", source_secrets=None),
     ]
     assert expected_key_calls == mock_key.mock_calls
 
@@ -366,7 +373,352 @@ def test_login_key__successfull_login_with_service_role(ctx, mocker):
     expected_key_calls = [
         call.check_access_key(access_key="some-access-key"),
         call.get_user_name(access_key="some-access-key"),
-        call.fetch_key_credentials("user", profile_group, "default_overwrite"),
-        call.fetch_key_service_profile(profile_group, "default_overwrite"),
+        call.fetch_key_credentials("user", profile_group, "default_overwrite", concurrency=4),
+        call.fetch_key_service_profile(profile_group, "default_overwrite", source_secrets=None),
     ]
     assert expected_key_calls == mock_key.mock_calls
+
+
+def test_login_key__writes_each_file_once(ctx, mocker):
+    credentials_module = core_module.credentials
+    mock_write_file = mocker.patch.object(credentials_module, "_write_file")
+    mocker.patch.object(credentials_module, "_load_file",
+                        side_effect=lambda path: credentials_module.ConfigParser())
+    mocker.patch.object(core_module.key, "check_access_key", return_value=ctx.success_result)
+    mocker.patch.object(core_module.key, "check_session", return_value=ctx.fail_result)
+    mocker.patch.object(core_module.key, "get_user_name", return_value="user")
+    mocker.patch.object(core_module.key, "_get_session_token", return_value=test_secrets)
+    mocker.patch.object(core_module.key.iam, "assume_role", return_value=test_secrets)
+    mocker.patch.object(Core, "_handle_support_files")
+    mocker.patch.object(Core, "run_script")
+
+    profile_group = ctx.key_profile_group
+    result = ctx.core.login_with_key(profile_group, "123456")
+    assert result.was_success
+
+    written_paths = [write_call.args[0] for write_call in mock_write_file.mock_calls]
+    assert sorted([credentials_module._get_config_path(), credentials_module._get_credentials_path()]) == sorted(written_paths)
+
+    credentials_file = mock_write_file.mock_calls[written_paths.index(credentials_module._get_credentials_path())].args[1]
+    assert ["session-token-some-access-key", "developer", "readonly", "service"] == credentials_file.sections()
+
+
+def test_login_key__records_expirations(ctx, mocker):
+    mock_credentials = mocker.patch.object(core_module, "credentials")
+    mock_key = mocker.patch.object(core_module, "key")
+    mocker.patch.object(Core, "_ensure_session", return_value=ctx.success_result)
+    mocker.patch.object(Core, "set_region", return_value=ctx.success_result)
+    mocker.patch.object(Core, "_handle_support_files")
+    mocker.patch.object(Core, "run_script", return_value=ctx.success_result)
+
+    mock_credentials.cleanup.return_value = ctx.success_result
+    mock_key.check_access_key.return_value = ctx.success_result
+    role_result = get_success_result()
+    role_result.add_payload({"developer": "2026-01-01T12:00:00Z", "readonly": "2026-01-01T13:00:00Z"})
+    mock_key.fetch_key_credentials.return_value = role_result
+    ctx.core.refresh_schedule.set_expiration("other-group-profile", "2026-01-01T12:00:00Z")
+
+    result = ctx.core.login_with_key(get_test_profile_group(), None)
+
+    assert result.was_success
+    assert datetime(2026, 1, 1, 12, tzinfo=timezone.utc) == ctx.core.refresh_schedule.get_expiration("developer")
+    assert datetime(2026, 1, 1, 13, tzinfo=timezone.utc) == ctx.core.refresh_schedule.get_expiration("readonly")
+    assert None is ctx.core.refresh_schedule.get_expiration("other-group-profile")
+
+
+def test_login_key__write_mode_process_stores_in_credential_process_cache(ctx, mocker):
+    mock_credentials = mocker.patch.object(core_module, "credentials")
+    mock_key = mocker.patch.object(core_module, "key")
+    mocker.patch.object(Core, "_ensure_session", return_value=ctx.success_result)
+    mocker.patch.object(Core, "set_region", return_value=ctx.success_result)
+    mocker.patch.object(Core, "_handle_support_files")
+    mocker.patch.object(Core, "run_script", return_value=ctx.success_result)
+
+    mock_credentials.cleanup.return_value = ctx.success_result
+    mock_key.check_access_key.return_value = ctx.success_result
+    mock_key.get_user_name.return_value = "user"
+    mock_key.fetch_key_credentials.return_value = ctx.success_result
+    profile_group = get_test_profile_group()
+    profile_group.write_mode = "process"
+
+    result = ctx.core.login_with_key(profile_group, None)
+
+    assert result.was_success
+    mock_key.fetch_key_credentials.assert_called_once_with(
+        "user", profile_group, "default_overwrite", concurrency=4,
+        store=core_module.credential_process.store_fetched_credentials)
+
+
+def test_login_key__write_mode_process_assumes_service_role_with_cached_source(ctx, mocker, tmp_path):
+    credentials_module = core_module.credentials
+    mocker.patch.object(credentials_module, "_write_file")
+    mocker.patch.object(credentials_module, "_load_file",
+                        side_effect=lambda path: credentials_module.ConfigParser())
+    mocker.patch.object(core_module.credential_process, "get_cache_path", return_value=str(tmp_path))
+    mocker.patch.object(core_module.key, "check_access_key", return_value=ctx.success_result)
+    mocker.patch.object(Core, "_ensure_session", return_value=ctx.success_result)
+    mocker.patch.object(core_module.key, "get_user_name", return_value="user")
+    mocker.patch.object(Core, "_handle_support_files")
+    mocker.patch.object(Core, "run_script")
+
+    def assume_role(profile, session_name, account_id, role):
+        return {**test_secrets, "AccessKeyId": f"{role}-key-id", "Expiration": "2099-01-01T00:00:00Z"}
+
+    mock_assume_role = mocker.patch.object(core_module.key.iam, "assume_role", side_effect=assume_role)
+    mock_assume_role_with_secrets = mocker.patch.object(core_module.key.iam, "assume_role_with_secrets",
+                                                        return_value=test_secrets)
+    profile_group = ctx.key_profile_group
+    profile_group.write_mode = "process"
+    service_profile = profile_group.service_profile
+
+    result = ctx.core.login_with_key(profile_group, None)
+
+    assert result.was_success
+    # the source profile only exists in the credential process cache, not in ~/.aws/credentials
+    assert service_profile.source not in [assume_call.args[0] for assume_call in mock_assume_role.mock_calls]
+    source_secrets = mock_assume_role_with_secrets.call_args.args[0]
+    assert f"{profile_group.get_profile(service_profile.source).role}-key-id" == source_secrets["AccessKeyId"]
+    assert test_secrets["AccessKeyId"] == core_module.credential_process.load_cached_credentials(
+        service_profile.profile)["AccessKeyId"]
+
+
+def test_login_key__feeds_running_credential_server(ctx, mocker):
+    mock_credentials = mocker.patch.object(core_module, "credentials")
+    mock_key = mocker.patch.object(core_module, "key")
+    mocker.patch.object(Core, "_ensure_session", return_value=ctx.success_result)
+    mocker.patch.object(Core, "set_region", return_value=ctx.success_result)
+    mocker.patch.object(Core, "_handle_support_files")
+    mocker.patch.object(Core, "run_script", return_value=ctx.success_result)
+    mock_server = mocker.patch.object(ctx.core, "credential_server")
+    mock_server.is_running.return_value = True
+
+    mock_credentials.cleanup.return_value = ctx.success_result
+    mock_key.check_access_key.return_value = ctx.success_result
+    mock_key.get_user_name.return_value = "user"
+    mock_key.fetch_key_credentials.return_value = ctx.success_result
+    profile_group = get_test_profile_group()
+
+    result = ctx.core.login_with_key(profile_group, None)
+
+    assert result.was_success
+    store = mock_key.fetch_key_credentials.call_args.kwargs["store"]
+    profile_list = profile_group.get_profile_list()
+    store(profile_list, {"developer": test_secrets}, None)
+    mock_credentials.write_fetched_credentials.assert_called_once_with(profile_list, {"developer": test_secrets}, None)
+    mock_server.store_fetched_credentials.assert_called_once_with(profile_list, {"developer": test_secrets}, None)
+
+
+def test_login_key__same_group_keeps_profiles_in_place(ctx, mocker):
+    mock_credentials = mocker.patch.object(core_module, "credentials")
+    mock_credentials.cleanup.return_value = ctx.error_result
+    profile_group = get_test_profile_group()
+    ctx.core.active_profile_group = profile_group
+
+    ctx.core.login_with_key(profile_group, None)
+
+    keep = mock_credentials.cleanup.call_args.kwargs["keep"]
+    assert "developer" in keep
+    assert "sso-shadow-developer" not in keep
+    assert "default" in keep
+
+
+def test_refresh_key__other_group_logs_in(ctx, mocker):
+    mock_login = mocker.patch.object(Core, "login_with_key", return_value=ctx.success_result)
+    profile_group = get_test_profile_group()
+
+    result = ctx.core.refresh_with_key(profile_group)
+
+    assert result.was_success
+    mock_login.assert_called_once_with(profile_group, mfa_token=None)
+
+
+def test_refresh_key__only_stale_profiles(ctx, mocker):
+    mock_credentials = mocker.patch.object(core_module, "credentials")
+    mock_key = mocker.patch.object(core_module, "key")
+    mock_ensure_session = mocker.patch.object(Core, "_ensure_session", return_value=ctx.success_result)
+    mock_key.get_user_name.return_value = "user"
+    role_result = get_success_result()
+    role_result.add_payload({"readonly": "2099-01-01T00:00:00Z"})
+    mock_key.fetch_key_credentials.return_value = role_result
+
+    profile_group = get_test_profile_group()
+    ctx.core.active_profile_group = profile_group
+    for profile in profile_group.get_profile_list():
+        profile.verified = True
+    ctx.core.refresh_schedule.set_expiration("developer", "2099-01-01T00:00:00Z")
+    ctx.core.refresh_schedule.set_expiration("readonly", "2000-01-01T00:00:00Z")
+
+    result = ctx.core.refresh_with_key(profile_group)
+
+    assert result.was_success
+    mock_credentials.cleanup.assert_not_called()
+    mock_ensure_session.assert_called_once_with(access_key="some-access-key", mfa_token=None)
+    mock_key.fetch_key_credentials.assert_called_once_with("user", profile_group, "default_overwrite",
+                                                          concurrency=4, profile_names=["readonly"])
+    assert [] == ctx.core.refresh_schedule.get_stale_profiles()
+
+
+def test_refresh_key__nothing_to_refresh(ctx, mocker):
+    mock_key = mocker.patch.object(core_module, "key")
+    profile_group = get_test_profile_group()
+    ctx.core.active_profile_group = profile_group
+    for profile in profile_group.get_profile_list():
+        profile.verified = True
+        ctx.core.refresh_schedule.set_expiration(profile.profile, "2099-01-01T00:00:00Z")
+
+    result = ctx.core.refresh_with_key(profile_group)
+
+    assert result.was_success
+    assert [] == mock_key.mock_calls
+
+
+def test_login_key__role_cache_stores_fetched_credentials(ctx, mocker):
+    mocker.patch.object(core_module, "credentials")
+    mock_key = mocker.patch.object(core_module, "key")
+    mock_role_cache = mocker.patch.object(core_module, "role_cache")
+    mocker.patch.object(Core, "_ensure_session", return_value=ctx.success_result)
+    mocker.patch.object(Core, "set_region", return_value=ctx.success_result)
+    mocker.patch.object(Core, "_handle_support_files")
+    mocker.patch.object(Core, "run_script", return_value=ctx.success_result)
+    ctx.core.config.role_credential_cache = True
+
+    mock_role_cache.get_group_credentials.return_value = None
+    mock_key.check_access_key.return_value = ctx.success_result
+    mock_key.get_user_name.return_value = "user"
+    mock_key.get_access_key_id.return_value = "key-id"
+    mock_key.fetch_key_credentials.return_value = ctx.success_result
+    profile_group = get_test_profile_group()
+
+    result = ctx.core.login_with_key(profile_group, None)
+
+    assert result.was_success
+    store = mock_key.fetch_key_credentials.call_args.kwargs["store"]
+    store(profile_group.profiles, {"developer": test_secrets}, None)
+    mock_role_cache.store_group_credentials.assert_called_once_with(profile_group, "key-id", profile_group.profiles,
+                                                                    {"developer": test_secrets})
+
+
+def test_login_key__role_cache_restores_group_without_sts(ctx, mocker):
+    mock_credentials = mocker.patch.object(core_module, "credentials")
+    mock_key = mocker.patch.object(core_module, "key")
+    mock_role_cache = mocker.patch.object(core_module, "role_cache")
+    mocker.patch.object(Core, "set_region", return_value=ctx.success_result)
+    mocker.patch.object(Core, "_handle_support_files")
+    mocker.patch.object(Core, "run_script", return_value=ctx.success_result)
+    mock_ensure_session = mocker.patch.object(Core, "_ensure_session")
+    ctx.core.config.role_credential_cache = True
+
+    cached_secrets = {"developer": {**test_secrets, "Expiration": "2030-01-01T00:00:00+00:00"},
+                      "readonly": {**test_secrets, "Expiration": "2030-01-01T00:00:00+00:00"}}
+    mock_credentials.cleanup.return_value = ctx.success_result
+    mock_key.get_access_key_id.return_value = "key-id"
+    mock_role_cache.get_group_credentials.return_value = cached_secrets
+    profile_group = get_test_profile_group()
+
+    result = ctx.core.login_with_key(profile_group, None)
+
+    assert result.was_success
+    assert [call.get_access_key_id("some-access-key")] == mock_key.mock_calls
+    mock_ensure_session.assert_not_called()
+    mock_role_cache.get_group_credentials.assert_called_once_with(profile_group, "key-id")
+    mock_credentials.write_fetched_credentials.assert_called_once_with(profile_group.profiles, cached_secrets,
+                                                                       "default_overwrite")
+    assert datetime(2030, 1, 1, tzinfo=timezone.utc) == ctx.core.refresh_schedule.get_expiration("developer")
+
+
+def test_login_key__warm_standby_records_group_switch(ctx, mocker):
+    mocker.patch.object(core_module, "credentials")
+    mock_key = mocker.patch.object(core_module, "key")
+    mock_role_cache = mocker.patch.object(core_module, "role_cache")
+    mocker.patch.object(Core, "_ensure_session", return_value=ctx.success_result)
+    mocker.patch.object(Core, "set_region", return_value=ctx.success_result)
+    mocker.patch.object(Core, "_handle_support_files")
+    mocker.patch.object(Core, "run_script", return_value=ctx.success_result)
+    mock_record_group_switch = mocker.patch.object(ctx.core.config, "record_group_switch")
+    ctx.core.config.set_warm_standby_groups("2")
+
+    mock_role_cache.get_group_credentials.return_value = None
+    mock_key.check_access_key.return_value = ctx.success_result
+    mock_key.fetch_key_credentials.return_value = ctx.success_result
+
+    assert ctx.core.login_with_key(ctx.key_profile_group, None).was_success
+    assert ctx.core.login_with_key(ctx.key_profile_group, None).was_success
+
+    mock_record_group_switch.assert_called_once_with("development")
+
+
+def test_prefetch_standby_groups(ctx, mocker):
+    mock_key = mocker.patch.object(core_module, "key")
+    mock_role_cache = mocker.patch.object(core_module, "role_cache")
+    mock_role_cache.min_remaining_seconds = 900
+    ctx.core.config.set_warm_standby_groups("1")
+    ctx.core.active_profile_group = ctx.key_profile_group
+    mocker.patch.object(ctx.core.config, "get_frequent_groups",
+                        return_value=["development", "gcp-project-dev", "live"])
+
+    mock_key.get_access_key_id.return_value = "key-id"
+    mock_key.has_valid_session.return_value = True
+    mock_key.get_user_name.return_value = "user"
+    mock_key.fetch_key_credentials.return_value = ctx.success_result
+    mock_role_cache.get_group_credentials.return_value = None
+
+    result = ctx.core.prefetch_standby_groups()
+
+    assert result.was_success
+    live_group = ctx.core.config.get_group("live")
+    mock_role_cache.get_group_credentials.assert_called_once_with(live_group, "key-id", min_remaining=1200)
+    mock_key.has_valid_session.assert_called_once_with("access-key-123")
+    assert call("user", live_group, None, concurrency=4, store=mocker.ANY,
+                include_service_profile=True) == mock_key.fetch_key_credentials.call_args
+
+    store = mock_key.fetch_key_credentials.call_args.kwargs["store"]
+    store(live_group.profiles, {"admin": test_secrets}, None)
+    mock_role_cache.store_group_credentials.assert_called_once_with(live_group, "key-id", live_group.profiles,
+                                                                    {"admin": test_secrets})
+
+
+def test_prefetch_standby_groups__skips_fresh_groups_and_missing_sessions(ctx, mocker):
+    mock_key = mocker.patch.object(core_module, "key")
+    mock_role_cache = mocker.patch.object(core_module, "role_cache")
+    mock_role_cache.min_remaining_seconds = 900
+    ctx.core.config.set_warm_standby_groups("2")
+    mocker.patch.object(ctx.core.config, "get_frequent_groups", return_value=["development", "live"])
+
+    mock_key.get_access_key_id.return_value = "key-id"
+    mock_key.has_valid_session.return_value = False
+    mock_role_cache.get_group_credentials.side_effect = lambda profile_group, *_, **__: \
+        {"developer": test_secrets} if profile_group.name == "development" else None
+
+    result = ctx.core.prefetch_standby_groups()
+
+    assert result.was_success
+    mock_key.has_valid_session.assert_called_once_with("access-key-123")
+    mock_key.fetch_key_credentials.assert_not_called()
+
+
+def test_prefetch_standby_groups__sts_budget(ctx, mocker):
+    mock_key = mocker.patch.object(core_module, "key")
+    mock_role_cache = mocker.patch.object(core_module, "role_cache")
+    mock_role_cache.min_remaining_seconds = 900
+    ctx.core.config.set_warm_standby_groups("2")
+    ctx.core.config.set_warm_standby_sts_budget("4")
+    mocker.patch.object(ctx.core.config, "get_frequent_groups", return_value=["development", "live"])
+
+    mock_key.has_valid_session.return_value = True
+    mock_key.fetch_key_credentials.return_value = ctx.success_result
+    mock_role_cache.get_group_credentials.return_value = None
+
+    assert ctx.core.prefetch_standby_groups().was_success
+
+    # development needs three calls including its service profile, the remaining call does not cover live
+    assert 1 == mock_key.fetch_key_credentials.call_count
+    assert "development" == mock_key.fetch_key_credentials.call_args.args[1].name
+    assert 1 == ctx.core.sts_budget.get_remaining(4)
+
+
+def test_prefetch_standby_groups__disabled(ctx, mocker):
+    mock_key = mocker.patch.object(core_module, "key")
+
+    assert ctx.core.prefetch_standby_groups().was_success
+
+    assert [] == mock_key.mock_calls
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from datetime import datetime, timezone
 from unittest.mock import call
 
 import pytest
@@ -59,7 +60,8 @@ def test_login_sso__cleanup_error(ctx, mocker):
     result = ctx.core.login_with_sso(ctx.sso_profile_group)
     assert ctx.error_result == result
 
-    assert [call.cleanup()] == mock_credentials.mock_calls
+    mock_credentials.transaction.assert_called_once_with()
+    mock_credentials.cleanup.assert_called_once_with()
     mock_sso.assert_not_called()
     mock_set_region.assert_not_called()
     mock_handle_support_files.assert_not_called()
@@ -79,13 +81,24 @@ def test_login_sso__sso_login_failure(ctx, mocker):
     result = ctx.core.login_with_sso(ctx.sso_profile_group)
     assert ctx.fail_result == result
 
-    assert [call.cleanup()] == mock_credentials.mock_calls
-    assert [call.sso_login(ctx.sso_profile_group)] == mock_sso.mock_calls
+    mock_credentials.transaction.assert_called_once_with()
+    mock_credentials.cleanup.assert_called_once_with()
+    assert [call.sso_login(ctx.sso_profile_group, force=False)] == mock_sso.mock_calls
     mock_set_region.assert_not_called()
     mock_handle_support_files.assert_not_called()
     mock_run_script.assert_not_called()
 
 
+def test_login_sso__forced(ctx, mocker):
+    mocker.patch.object(core_module, "credentials")
+    mock_sso = mocker.patch.object(core_module, "sso")
+    mock_sso.sso_login.return_value = ctx.fail_result
+
+    ctx.core.login_with_sso(ctx.sso_profile_group, force=True)
+
+    assert [call.sso_login(ctx.sso_profile_group, force=True)] == mock_sso.mock_calls
+
+
 def test_login_sso__write_sso_profiles_failure(ctx, mocker):
     mock_credentials = mocker.patch.object(core_module, "credentials")
     mock_sso = mocker.patch.object(core_module, "sso")
@@ -102,7 +115,7 @@ def test_login_sso__write_sso_profiles_failure(ctx, mocker):
 
     mock_credentials.cleanup.assert_called_once_with()
     expected_sso_calls = [
-        call.sso_login(ctx.sso_profile_group),
+        call.sso_login(ctx.sso_profile_group, force=False),
         call.write_sso_profiles(ctx.sso_profile_group, "default_overwrite", False),
     ]
     assert expected_sso_calls == mock_sso.mock_calls
@@ -129,10 +142,8 @@ def test_login_sso__write_sso_as_key_credentials_failure(ctx, mocker):
     assert ctx.fail_result == result
 
     mock_credentials.cleanup.assert_called_once_with()
-    expected_sso_calls = [call.sso_login(profile_group),
-                          call.write_sso_profiles(profile_group, 'default_overwrite', True),
-                          call.write_sso_profiles().was_success.__bool__(),
-                          call.write_sso_as_key_credentials(profile_group, 'default_overwrite')]
+    expected_sso_calls = [call.sso_login(profile_group, force=False),
+                          call.write_sso_as_key_credentials(profile_group, 'default_overwrite', concurrency=4)]
     assert expected_sso_calls == mock_sso.mock_calls
     mock_set_region.assert_not_called()
     mock_handle_support_files.assert_not_called()
@@ -155,8 +166,9 @@ def test_login_sso__set_region_failure(ctx, mocker):
     assert ctx.fail_result == result
 
     mock_set_region.assert_called_once_with(None)
-    assert [call.cleanup()] == mock_credentials.mock_calls
-    expected_sso_calls = [call.sso_login(ctx.sso_profile_group),
+    mock_credentials.transaction.assert_called_once_with()
+    mock_credentials.cleanup.assert_called_once_with()
+    expected_sso_calls = [call.sso_login(ctx.sso_profile_group, force=False),
                           call.write_sso_profiles(ctx.sso_profile_group, 'default_overwrite', False)]
     assert expected_sso_calls == mock_sso.mock_calls
     mock_handle_support_files.assert_not_called()
@@ -182,9 +194,10 @@ def test_login_sso__run_script_failure(ctx, mocker):
     mock_set_region.assert_called_once_with(None)
     assert [call(ctx.sso_profile_group)] == mock_handle_support_files.mock_calls
     assert [call(ctx.sso_profile_group)] == mock_run_script.mock_calls
-    assert [call.cleanup()] == mock_credentials.mock_calls
+    mock_credentials.transaction.assert_called_once_with()
+    mock_credentials.cleanup.assert_called_once_with()
     expected_sso_calls = [
-        call.sso_login(ctx.sso_profile_group),
+        call.sso_login(ctx.sso_profile_group, force=False),
         call.write_sso_profiles(ctx.sso_profile_group, "default_overwrite", False),
     ]
     assert expected_sso_calls == mock_sso.mock_calls
@@ -211,9 +224,10 @@ def test_login_sso__successful_login_with_run_script_disabled(ctx, mocker):
     mock_set_region.assert_called_once_with(None)
     assert [call(ctx.sso_profile_group)] == mock_handle_support_files.mock_calls
     assert 0 == mock_run_script.call_count
-    assert [call.cleanup()] == mock_credentials.mock_calls
+    mock_credentials.transaction.assert_called_once_with()
+    mock_credentials.cleanup.assert_called_once_with()
     expected_sso_calls = [
-        call.sso_login(ctx.sso_profile_group),
+        call.sso_login(ctx.sso_profile_group, force=False),
         call.write_sso_profiles(ctx.sso_profile_group, "default_overwrite", False),
     ]
     assert expected_sso_calls == mock_sso.mock_calls
@@ -239,9 +253,10 @@ def test_login_sso__successful_login(ctx, mocker):
     mock_set_region.assert_called_once_with(None)
     mock_handle_support_files.assert_called_once_with(ctx.sso_profile_group)
     mock_run_script.assert_called_once_with(ctx.sso_profile_group)
-    assert [call.cleanup()] == mock_credentials.mock_calls
+    mock_credentials.transaction.assert_called_once_with()
+    mock_credentials.cleanup.assert_called_once_with()
     expected_sso_calls = [
-        call.sso_login(ctx.sso_profile_group),
+        call.sso_login(ctx.sso_profile_group, force=False),
         call.write_sso_profiles(ctx.sso_profile_group, "default_overwrite", False),
     ]
     assert expected_sso_calls == mock_sso.mock_calls
@@ -284,12 +299,13 @@ def test_login_sso__fetch_service_role_failure(ctx, mocker):
     assert ctx.fail_result == result
 
     expected_sso_calls = [
-        call.sso_login(profile_group),
+        call.sso_login(profile_group, force=False),
         call.write_sso_profiles(profile_group, "default_overwrite", False),
         call.write_sso_service_profile(profile_group, "default_overwrite", False),
     ]
     assert expected_sso_calls == mock_sso.mock_calls
-    assert [call.cleanup()] == mock_credentials.mock_calls
+    mock_credentials.transaction.assert_called_once_with()
+    mock_credentials.cleanup.assert_called_once_with()
     mock_set_region.assert_not_called()
     mock_handle_support_files.assert_not_called()
     mock_run_script.assert_not_called()
@@ -317,10 +333,28 @@ def test_login_sso__successfull_login_with_service_role(ctx, mocker):
     mock_set_region.assert_called_once_with(None)
     mock_handle_support_files.assert_called_once_with(profile_group)
     mock_run_script.assert_called_once_with(profile_group)
-    assert [call.cleanup()] == mock_credentials.mock_calls
+    mock_credentials.transaction.assert_called_once_with()
+    mock_credentials.cleanup.assert_called_once_with()
     expected_sso_calls = [
-        call.sso_login(profile_group),
+        call.sso_login(profile_group, force=False),
         call.write_sso_profiles(profile_group, "default_overwrite", False),
         call.write_sso_service_profile(profile_group, "default_overwrite", False),
     ]
     assert expected_sso_calls == mock_sso.mock_calls
+
+
+def test_login_sso_write_key__records_expirations(ctx, mocker):
+    mocker.patch.object(core_module, "credentials")
+    mock_sso = mocker.patch.object(core_module, "sso")
+    expiration = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    fetch_result = get_success_result()
+    fetch_result.add_payload({"developer": expiration})
+    mock_sso.write_sso_as_key_credentials.return_value = fetch_result
+
+    profile_group = get_test_profile_group_sso()
+    profile_group.write_mode = "key"
+
+    result = ctx.core.login_with_sso_write_key(profile_group)
+
+    assert result.was_success
+    assert expiration == ctx.core.refresh_schedule.get_expiration("developer")
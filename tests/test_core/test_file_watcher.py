@@ -0,0 +1,126 @@
+import os
+import threading
+
+import pytest
+
+from app.core.file_watcher import FileWatcher, _Inotify
+
+#######################
+# Fixures
+
+
+@pytest.fixture(params=[False, True], ids=["polling", "inotify"])
+def use_inotify(request):
+    if request.param:
+        inotify = _Inotify.create()
+        if inotify is None:
+            pytest.skip("inotify is not available")
+        inotify.close()
+    return request.param
+
+
+@pytest.fixture
+def file_watcher(use_inotify):
+    file_watcher = FileWatcher(debounce_seconds=0.1, poll_interval_seconds=0.05, use_inotify=use_inotify)
+    yield file_watcher
+    file_watcher.stop()
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = 0
+        self.called = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.called.set()
+
+#######################
+# Tests
+
+
+def test_watch__file_changed(file_watcher, tmp_path):
+    path = tmp_path / "accounts.yaml"
+    path.write_text("first")
+    recorder = Recorder()
+    file_watcher.watch(str(path), recorder)
+    file_watcher.start()
+
+    path.write_text("second version")
+
+    assert recorder.called.wait(timeout=5)
+
+
+def test_watch__file_replaced_atomically(file_watcher, tmp_path):
+    path = tmp_path / "config.yaml"
+    path.write_text("first")
+    recorder = Recorder()
+    file_watcher.watch(str(path), recorder)
+    file_watcher.start()
+
+    (tmp_path / "config.yaml.tmp").write_text("second version")
+    os.replace(tmp_path / "config.yaml.tmp", path)
+
+    assert recorder.called.wait(timeout=5)
+
+
+def test_watch__other_file_in_directory_is_ignored(file_watcher, tmp_path):
+    (tmp_path / "accounts.yaml").write_text("first")
+    recorder = Recorder()
+    file_watcher.watch(str(tmp_path / "accounts.yaml"), recorder)
+    file_watcher.start()
+
+    (tmp_path / "logsmith.log").write_text("some log line")
+
+    assert not recorder.called.wait(timeout=0.5)
+
+
+def test_watch__directory_created_later(file_watcher, tmp_path):
+    cache_path = tmp_path / "sso" / "cache"
+    recorder = Recorder()
+    file_watcher.watch(str(cache_path), recorder, directory=True)
+    file_watcher.start()
+
+    cache_path.mkdir(parents=True)
+    (cache_path / "token.json").write_text("{}")
+
+    assert recorder.called.wait(timeout=5)
+
+
+def test_watch__burst_of_changes_is_debounced(file_watcher, tmp_path):
+    path = tmp_path / "service_roles.yaml"
+    path.write_text("0")
+    recorder = Recorder()
+    file_watcher.watch(str(path), recorder)
+    file_watcher.debounce_seconds = 0.5
+    file_watcher.start()
+
+    for i in range(5):
+        path.write_text(str(i + 1) * (i + 2))
+
+    assert recorder.called.wait(timeout=5)
+    recorder.called.clear()
+    assert not recorder.called.wait(timeout=1)
+    assert 1 == recorder.calls
+
+
+def test_watch__failing_callback_keeps_watching(file_watcher, tmp_path):
+    path = tmp_path / "accounts.yaml"
+    path.write_text("first")
+    recorder = Recorder()
+
+    def callback():
+        recorder()
+        if recorder.calls == 1:
+            raise ValueError("broken yaml")
+
+    file_watcher.watch(str(path), callback)
+    file_watcher.start()
+
+    path.write_text("second version")
+    assert recorder.called.wait(timeout=5)
+    recorder.called.clear()
+    path.write_text("third version!")
+
+    assert recorder.called.wait(timeout=5)
+    assert 2 == recorder.calls
@@ -1,4 +1,6 @@
+import json
 import os
+import threading
 import pytest
 from unittest.mock import call
 from pathlib import Path
@@ -19,6 +21,8 @@ test_home = f'{script_dir}/../test_resources'
 def before_after_each_test(mocker, monkeypatch):
     # before each test
     mocker.patch.object(Path, "home", return_value='home')
+    files.clear_yaml_cache()
+    files.set_yaml_cache_sidecar(False)
     yield
     # after each test
 
@@ -225,3 +229,197 @@ def test__load_file_window__middle():
     text, position = files._load_file_window(test_file_positions, 10)
     assert 20 == position
     assert '6\n7\n8\n9\n10' == text
+
+
+def test_write_atomic(mocker, tmp_path):
+    mocker.patch.object(files, "get_app_path", return_value=str(tmp_path / '.logsmith'))
+    target = tmp_path / 'credentials'
+    target.write_text('old')
+    os.chmod(target, 0o600)
+
+    files.write_atomic(str(target), 'new')
+
+    assert 'new' == target.read_text()
+    assert 0o600 == os.stat(target).st_mode & 0o777
+    assert ['credentials'] == [path.name for path in tmp_path.iterdir() if path.is_file()]
+
+
+def test_write_atomic__keeps_symlink(mocker, tmp_path):
+    mocker.patch.object(files, "get_app_path", return_value=str(tmp_path / '.logsmith'))
+    target = tmp_path / 'dotfiles-credentials'
+    target.write_text('old')
+    link = tmp_path / 'credentials'
+    link.symlink_to(target)
+
+    files.write_atomic(str(link), 'new')
+
+    assert link.is_symlink()
+    assert 'new' == target.read_text()
+
+
+def test_write_lock__is_reentrant(mocker, tmp_path):
+    mocker.patch.object(files, "get_app_path", return_value=str(tmp_path / '.logsmith'))
+
+    with files.write_lock():
+        with files.write_lock():
+            files.write_atomic(str(tmp_path / 'config'), 'content')
+
+    assert 0 == files._write_lock_state['depth']
+    assert None is files._write_lock_state['file']
+
+
+def test_write_atomic__concurrent_readers_never_see_partial_files(mocker, tmp_path):
+    mocker.patch.object(files, "get_app_path", return_value=str(tmp_path / '.logsmith'))
+    target = str(tmp_path / 'credentials')
+    versions = [f'[profile-{i}]\n' + f'aws_session_token = {str(i) * 20000}\n' + '# end\n' for i in range(10)]
+    files.write_atomic(target, versions[0])
+
+    stop = threading.Event()
+    partial_reads = []
+    read_count = [0]
+
+    def reader():
+        while not stop.is_set():
+            with open(target) as file:
+                content = file.read()
+            read_count[0] += 1
+            if content not in versions:
+                partial_reads.append(len(content))
+
+    readers = [threading.Thread(target=reader) for _ in range(8)]
+    for thread in readers:
+        thread.start()
+    for i in range(200):
+        files.write_atomic(target, versions[i % len(versions)])
+    stop.set()
+    for thread in readers:
+        thread.join()
+
+    assert [] == partial_reads
+    assert read_count[0] > 0
+
+
+def _write_accounts(path, group_count: int = 2, profile_count: int = 2):
+    lines = []
+    for group in range(group_count):
+        lines += [f'group-{group}:', '  color: "#388E3C"', '  team: test', '  region: eu-central-1', '  profiles:']
+        for profile in range(profile_count):
+            lines += [f'    - profile: profile-{group}-{profile}',
+                      f'      account: "{group:06d}{profile:06d}"',
+                      '      role: developer']
+    path.write_text('\n'.join(lines) + '\n')
+
+
+def test_load_yaml_file__is_cached_until_the_file_changes(tmp_path):
+    accounts_path = tmp_path / 'accounts.yaml'
+    _write_accounts(accounts_path)
+
+    first = files.load_yaml_file(str(accounts_path))
+    second = files.load_yaml_file(str(accounts_path))
+    assert first == second
+    assert 1 == files.get_yaml_cache_stats()['parsed']
+    assert 1 <= files.get_yaml_cache_stats()['memory_hits']
+
+    _write_accounts(accounts_path, group_count=3)
+    third = files.load_yaml_file(str(accounts_path))
+    assert 'group-2' in third
+
+
+def test_load_yaml_file__returns_independent_copies(tmp_path):
+    accounts_path = tmp_path / 'accounts.yaml'
+    _write_accounts(accounts_path)
+
+    first = files.load_yaml_file(str(accounts_path))
+    first['group-0']['profiles'].append({'profile': 'changed'})
+
+    second = files.load_yaml_file(str(accounts_path))
+    assert 2 == len(second['group-0']['profiles'])
+
+
+def test_load_yaml_file__write_file_invalidates_cache(mocker, tmp_path):
+    mocker.patch.object(files, "get_app_path", return_value=str(tmp_path / '.logsmith'))
+    config_path = str(tmp_path / 'config.yaml')
+    files._write_file(config_path, 'key: old\n')
+    assert {'key': 'old'} == files.load_yaml_file(config_path)
+
+    files._write_file(config_path, 'key: new\n')
+    assert {'key': 'new'} == files.load_yaml_file(config_path)
+
+
+def test_load_yaml_file__sidecar(mocker, tmp_path):
+    mocker.patch.object(files, "get_app_path", return_value=str(tmp_path / '.logsmith'))
+    accounts_path = tmp_path / 'accounts.yaml'
+    _write_accounts(accounts_path)
+
+    expected = files.load_yaml_file(str(accounts_path), sidecar=True)
+    assert os.path.exists(files._get_yaml_sidecar_path(str(accounts_path)))
+
+    # a new process starts with an empty memory cache
+    files.clear_yaml_cache()
+    mock_parse_yaml = mocker.spy(files, "parse_yaml")
+    assert expected == files.load_yaml_file(str(accounts_path), sidecar=True)
+    assert 0 == mock_parse_yaml.call_count
+
+
+def test_load_yaml_file__stale_sidecar_is_ignored(mocker, tmp_path):
+    mocker.patch.object(files, "get_app_path", return_value=str(tmp_path / '.logsmith'))
+    accounts_path = tmp_path / 'accounts.yaml'
+    _write_accounts(accounts_path)
+    files.load_yaml_file(str(accounts_path), sidecar=True)
+
+    files.clear_yaml_cache()
+    _write_accounts(accounts_path, group_count=3)
+    assert 'group-2' in files.load_yaml_file(str(accounts_path), sidecar=True)
+
+
+def test_load_yaml_file__file_does_not_exist(tmp_path):
+    assert {} == files.load_yaml_file(str(tmp_path / 'accounts.yaml'))
+
+
+def test_load_yaml_file__cached_loads_skip_the_parser(mocker, tmp_path):
+    mocker.patch.object(files, "get_app_path", return_value=str(tmp_path / '.logsmith'))
+    parse_yaml = mocker.patch.object(files, "parse_yaml", wraps=files.parse_yaml)
+    accounts_path = tmp_path / 'accounts.yaml'
+    _write_accounts(accounts_path)
+
+    expected = files.load_yaml_file(str(accounts_path), sidecar=True)
+    assert expected == files.load_yaml_file(str(accounts_path))
+    files.clear_yaml_cache()
+    assert expected == files.load_yaml_file(str(accounts_path), sidecar=True)
+
+    assert 1 == parse_yaml.call_count
+    assert 1 == files.get_yaml_cache_stats()['sidecar_hits']
+
+
+def test_load_sso_token(mocker, tmp_path):
+    mocker.patch.object(files, "get_aws_cache_path", return_value=str(tmp_path))
+    token = {"accessToken": "sso-token", "expiresAt": "2099-01-01T00:00:00Z", "region": "eu-central-1"}
+    # the aws cli names the token file after the sha1 of the sso session name
+    (tmp_path / "afb9d1dcf212fa33d079a070ab90f0bef03c324b.json").write_text(json.dumps(token))
+    (tmp_path / "broken.json").write_text("{")
+
+    assert token == files.load_sso_token("sso")
+    assert None is files.load_sso_token("other")
+
+
+def test_assumable_roles_cache(mocker, tmp_path):
+    mocker.patch.object(files, "get_app_path", return_value=str(tmp_path))
+    cache = {"123456789012": {"arn:aws:iam::123456789012:role/developer": {"fetched_at": 1000, "roles": ["pipeline"]}}}
+
+    assert {} == files.load_assumable_roles_cache()
+    files.save_assumable_roles_cache(cache)
+
+    assert cache == files.load_assumable_roles_cache()
+    assert not (tmp_path / "service_roles.yaml").exists()
+
+
+def test_group_usage(mocker, tmp_path):
+    mocker.patch.object(files, "get_app_path", return_value=str(tmp_path))
+    usage = {"development": {"score": 1.5, "last_used": 1000}}
+
+    assert {} == files.load_group_usage()
+    files.save_group_usage(usage)
+
+    assert usage == files.load_group_usage()
+    assert (tmp_path / "group_usage.json").exists()
+    assert not (tmp_path / "service_roles.yaml").exists()
@@ -101,3 +101,8 @@ def test_to_dict__with_source():
     result = profile.to_dict()
     expected = {'account': '123456789012', 'profile': 'readonly', 'role': 'readonly-role', 'source': 'some-source'}
     assert expected == result
+
+
+def test_profile__is_slotted(profile):
+    with pytest.raises(AttributeError):
+        profile.unknown = 'value'
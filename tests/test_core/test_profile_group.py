@@ -117,7 +117,7 @@ def test_validate__write_mode_malformed(profile_group):
     profile_group.write_mode = 'no-write-mode'
     result = profile_group.validate()
 
-    expected = (False, 'test has an invalid write_mode (either key or sso)')
+    expected = (False, 'test has an invalid write_mode (either key, sso or process)')
     assert expected == result
 
 def test_validate__write_mode_incompatible_with_auth_mode(profile_group):
@@ -128,6 +128,14 @@ def test_validate__write_mode_incompatible_with_auth_mode(profile_group):
     expected = (False, "test has auth_mode 'key' and write_mode 'sso', \nwhich are not compatible")
     assert expected == result
     
+def test_validate__write_mode_process_requires_key_auth_mode(profile_group):
+    profile_group.auth_mode = 'sso'
+    profile_group.write_mode = 'process'
+    result = profile_group.validate()
+
+    expected = (False, "test has write_mode 'process', which requires auth_mode 'key'")
+    assert expected == result
+
 def test_validate__access_key_malformed(profile_group):
     profile_group.access_key = 'no-key'
     result = profile_group.validate()
@@ -450,3 +458,33 @@ def test_get_profile():
 def test_get_profile__non_existent_profile():
     profile_group = get_test_profile_group()
     assert None == profile_group.get_profile('dog')
+
+def test_get_profile__after_profiles_are_replaced():
+    profile_group = get_test_profile_group()
+    profile_group.profiles = [profile_group.profiles[1]]
+
+    assert None == profile_group.get_profile('developer')
+    assert 'readonly' == profile_group.get_profile('readonly').profile
+    assert 'readonly' == profile_group.get_default_profile().profile
+
+def test_get_profiles_by_account():
+    profile_group = get_test_profile_group()
+
+    result = profile_group.get_profiles_by_account('123456789012')
+
+    assert [profile_group.profiles[0]] == result
+    assert [] == profile_group.get_profiles_by_account('999999999999')
+
+def test_get_profiles_by_account__follows_service_profile():
+    profile_group = get_test_profile_group()
+    profile_group.set_service_role_profile(source_profile_name='developer', role_name='pipeline')
+
+    result = profile_group.get_profiles_by_account('123456789012')
+    assert [profile_group.profiles[0], profile_group.service_profile] == result
+
+    profile_group.set_service_role_profile(source_profile_name='readonly', role_name='pipeline')
+    assert [profile_group.profiles[0]] == profile_group.get_profiles_by_account('123456789012')
+    assert [profile_group.profiles[1], profile_group.service_profile] == profile_group.get_profiles_by_account('012345678901')
+
+    profile_group.set_service_role_profile(source_profile_name='non-existent', role_name='pipeline')
+    assert [profile_group.profiles[1]] == profile_group.get_profiles_by_account('012345678901')
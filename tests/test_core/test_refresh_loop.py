@@ -0,0 +1,115 @@
+import threading
+
+from app.core import refresh_loop as refresh_loop_module
+from app.core.refresh_loop import RefreshLoop, get_backoff_delay
+from tests.test_data.test_results import get_error_result, get_failed_result, get_success_result
+
+
+def start(refresh_loop: RefreshLoop) -> threading.Thread:
+    thread = threading.Thread(target=refresh_loop.run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_run__refreshes_until_stopped():
+    calls = []
+
+    def refresh():
+        calls.append(1)
+        if len(calls) == 3:
+            refresh_loop.stop()
+        return get_success_result()
+
+    refresh_loop = RefreshLoop(refresh=refresh, get_delay=lambda: 0)
+    refresh_loop.run()
+
+    assert 3 == len(calls)
+    assert 0 == refresh_loop.failures
+
+
+def test_run__deadline_uses_given_clock():
+    clock_values = iter([0, 1000])
+    calls = []
+
+    def refresh():
+        calls.append(1)
+        refresh_loop.stop()
+        return get_success_result()
+
+    refresh_loop = RefreshLoop(refresh=refresh, get_delay=lambda: 600, clock=lambda: next(clock_values))
+    refresh_loop.run()
+
+    assert 1 == len(calls)
+
+
+def test_run__failures_use_backoff(mocker):
+    results = [get_error_result(), get_failed_result(), get_success_result()]
+    delays = []
+
+    def refresh():
+        result = results.pop(0)
+        if not results:
+            refresh_loop.stop()
+        return result
+
+    refresh_loop = RefreshLoop(refresh=refresh, get_delay=lambda: 0)
+    mocker.patch.object(refresh_loop_module, "get_backoff_delay", side_effect=lambda failures: delays.append(failures) or 0)
+    refresh_loop.run()
+
+    assert [1, 2] == delays
+    assert 0 == refresh_loop.failures
+
+
+def test_run__exception_counts_as_failure():
+    def refresh():
+        refresh_loop.stop()
+        raise ValueError("boom")
+
+    refresh_loop = RefreshLoop(refresh=refresh, get_delay=lambda: 0)
+    refresh_loop.run()
+
+    assert 1 == refresh_loop.failures
+
+
+def test_reschedule__computes_delay_again_without_refresh(mocker):
+    refresh = mocker.Mock(return_value=get_success_result())
+    delay_computed = threading.Semaphore(0)
+
+    def get_delay():
+        delay_computed.release()
+        return 1000
+
+    refresh_loop = RefreshLoop(refresh=refresh, get_delay=get_delay)
+    thread = start(refresh_loop)
+    assert delay_computed.acquire(timeout=5)
+
+    refresh_loop.reschedule()
+    assert delay_computed.acquire(timeout=5)
+    refresh_loop.stop()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    refresh.assert_not_called()
+
+
+def test_trigger__refreshes_immediately():
+    refreshed = threading.Event()
+
+    def refresh():
+        refreshed.set()
+        return get_success_result()
+
+    refresh_loop = RefreshLoop(refresh=refresh, get_delay=lambda: 1000)
+    thread = start(refresh_loop)
+    refresh_loop.trigger()
+
+    assert refreshed.wait(timeout=5)
+    refresh_loop.stop()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+
+def test_get_backoff_delay():
+    assert 15 <= get_backoff_delay(1) <= 30
+    assert 30 <= get_backoff_delay(2) <= 60
+    assert 450 <= get_backoff_delay(20) <= 900
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta, timezone
+
+from app.core import refresh_schedule
+from app.core.refresh_schedule import RefreshSchedule
+
+now = datetime(2026, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+
+
+def test_to_datetime():
+    expected = datetime(2026, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+    assert expected == refresh_schedule.to_datetime(expected)
+    assert expected == refresh_schedule.to_datetime(datetime(2026, 1, 1, 12, 0, 0))
+    assert expected == refresh_schedule.to_datetime("2026-01-01T12:00:00Z")
+    assert expected == refresh_schedule.to_datetime(int(expected.timestamp() * 1000))
+    assert None is refresh_schedule.to_datetime(None)
+
+
+def test_get_next_delay__without_expirations_uses_fallback():
+    schedule = RefreshSchedule()
+    assert refresh_schedule.fallback_interval_seconds == schedule.get_next_delay(now)
+
+
+def test_get_next_delay__refreshes_before_expiry_with_jitter(mocker):
+    mocker.patch.object(refresh_schedule.random, "uniform", return_value=60)
+    mocker.patch.object(refresh_schedule, "max_check_interval_seconds", 24 * 60 * 60)
+    schedule = RefreshSchedule()
+    schedule.set_expiration("developer", now + timedelta(hours=1))
+    schedule.set_expiration("readonly", now + timedelta(minutes=30))
+
+    expected = 30 * 60 - refresh_schedule.refresh_lead_seconds - 60
+    assert expected == schedule.get_next_delay(now)
+
+
+def test_get_next_delay__is_bounded():
+    schedule = RefreshSchedule()
+    schedule.set_expiration("developer", now + timedelta(hours=12))
+    assert refresh_schedule.max_check_interval_seconds == schedule.get_next_delay(now)
+
+    schedule.set_expiration("readonly", now)
+    assert refresh_schedule.min_delay_seconds == schedule.get_next_delay(now)
+
+
+def test_get_stale_profiles():
+    schedule = RefreshSchedule()
+    schedule.update({
+        "developer": now + timedelta(hours=1),
+        "readonly": now + timedelta(seconds=refresh_schedule.refresh_lead_seconds - 1),
+        "unknown": None,
+    })
+
+    assert ["readonly"] == schedule.get_stale_profiles(now)
+    assert ["developer", "readonly"] == sorted(schedule.get_stale_profiles(now + timedelta(hours=1)))
+    assert None is schedule.get_expiration("unknown")
+
+
+def test_clear():
+    schedule = RefreshSchedule()
+    schedule.set_expiration("developer", now)
+    schedule.clear()
+
+    assert not schedule.has_expirations()
+    assert [] == schedule.get_stale_profiles(now)
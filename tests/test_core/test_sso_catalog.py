@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta, timezone
+
+from app.core import sso_catalog
+
+now = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def get_test_catalog() -> dict:
+    return {"sessions": {"sso": {"generation": 1, "accounts": {
+        "111111111111": {"name": "team-a-dev", "email": "aws+dev@team-a.example.com",
+                         "roles": ["developer", "readonly"], "roles_updated_at": now.isoformat()},
+        "222222222222": {"name": "team-a-live", "email": "aws+live@team-a.example.com",
+                         "roles": ["readonly"], "roles_updated_at": (now - timedelta(days=2)).isoformat()},
+        "333333333333": {"name": "team-b-dev", "email": "aws@team-b.example.com",
+                         "roles": ["developer"], "roles_updated_at": now.isoformat()},
+    }}}}
+
+#######################
+# Tests
+
+
+def test_select_profiles():
+    session_entry = sso_catalog.get_session_entry(get_test_catalog(), "sso")
+
+    profiles = sso_catalog.select_profiles(session_entry, {"account_name": "team-a-*",
+                                                           "default": "team-a-dev-developer"})
+
+    assert [
+        {"profile": "team-a-dev-developer", "account": "111111111111", "role": "developer", "default": True},
+        {"profile": "team-a-dev-readonly", "account": "111111111111", "role": "readonly", "default": False},
+        {"profile": "team-a-live-readonly", "account": "222222222222", "role": "readonly", "default": False},
+    ] == profiles
+
+
+def test_select_profiles__role_email_and_template():
+    session_entry = sso_catalog.get_session_entry(get_test_catalog(), "sso")
+
+    profiles = sso_catalog.select_profiles(session_entry, {"account_email": "*@team-a.example.com",
+                                                           "role": "read*",
+                                                           "profile": "{account_id}-{role}"})
+
+    assert ["111111111111-readonly", "222222222222-readonly"] == [profile["profile"] for profile in profiles]
+
+
+def test_select_profiles__unknown_session():
+    assert [] == sso_catalog.select_profiles(sso_catalog.get_session_entry(get_test_catalog(), "other"), {})
+
+
+def test_select_profiles__invalid_template():
+    session_entry = sso_catalog.get_session_entry(get_test_catalog(), "sso")
+
+    for profile_template in ["{team}-{role}", "{}", "{0}", "{role:d}", 42]:
+        assert not sso_catalog.is_valid_profile_template(profile_template)
+        assert [] == sso_catalog.select_profiles(session_entry, {"profile": profile_template})
+    assert sso_catalog.is_valid_profile_template(sso_catalog.default_profile_template)
+
+
+def test_get_stale_account_ids():
+    session_entry = sso_catalog.get_session_entry(get_test_catalog(), "sso")
+
+    stale_account_ids = sso_catalog.get_stale_account_ids(
+        session_entry, ["111111111111", "222222222222", "444444444444"], max_age_seconds=24 * 60 * 60, now=now)
+
+    assert ["222222222222", "444444444444"] == stale_account_ids
+
+
+def test_update_session_entry():
+    catalog = get_test_catalog()
+    accounts = {"111111111111": {"name": "team-a-dev", "email": "aws+dev@team-a.example.com"},
+                "222222222222": {"name": "team-a-live", "email": "aws+live@team-a.example.com"},
+                "444444444444": {"name": "team-c-dev", "email": "aws@team-c.example.com"}}
+
+    changed = sso_catalog.update_session_entry(catalog, "sso", accounts,
+                                               {"222222222222": ["readonly", "admin"], "444444444444": []}, now)
+
+    assert changed
+    assert 2 == sso_catalog.get_generation(catalog, "sso")
+    session_accounts = sso_catalog.get_session_entry(catalog, "sso")["accounts"]
+    assert ["111111111111", "222222222222", "444444444444"] == sorted(session_accounts)
+    assert ["developer", "readonly"] == session_accounts["111111111111"]["roles"]
+    assert ["admin", "readonly"] == session_accounts["222222222222"]["roles"]
+    assert now.isoformat() == session_accounts["222222222222"]["roles_updated_at"]
+
+
+def test_update_session_entry__same_roles_keep_generation():
+    catalog = get_test_catalog()
+    accounts = {account_id: {"name": account["name"], "email": account["email"]}
+                for account_id, account in sso_catalog.get_session_entry(catalog, "sso")["accounts"].items()}
+
+    changed = sso_catalog.update_session_entry(catalog, "sso", accounts, {"222222222222": ["readonly"]}, now)
+
+    assert not changed
+    assert 1 == sso_catalog.get_generation(catalog, "sso")
+    assert now.isoformat() == sso_catalog.get_session_entry(catalog, "sso")["accounts"]["222222222222"]["roles_updated_at"]
+
+
+def test_update_session_entry__new_session():
+    catalog = {}
+
+    changed = sso_catalog.update_session_entry(catalog, "sso", {"111111111111": {"name": "dev"}},
+                                               {"111111111111": ["developer"]}, now)
+
+    assert changed
+    assert 1 == sso_catalog.get_generation(catalog, "sso")
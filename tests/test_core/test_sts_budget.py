@@ -0,0 +1,39 @@
+from app.core.sts_budget import StsBudget
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_try_spend():
+    budget = StsBudget(clock=Clock())
+
+    assert budget.try_spend(2, calls_per_hour=5)
+    assert budget.try_spend(3, calls_per_hour=5)
+    assert not budget.try_spend(1, calls_per_hour=5)
+    assert 0 == budget.get_remaining(calls_per_hour=5)
+
+
+def test_try_spend__calls_older_than_an_hour_are_released():
+    clock = Clock()
+    budget = StsBudget(clock=clock)
+    budget.try_spend(4, calls_per_hour=5)
+    clock.now += 1800
+    budget.try_spend(1, calls_per_hour=5)
+
+    clock.now += 1800
+    assert 4 == budget.get_remaining(calls_per_hour=5)
+    assert not budget.try_spend(5, calls_per_hour=5)
+    assert budget.try_spend(4, calls_per_hour=5)
+
+
+def test_try_spend__a_smaller_budget_applies_immediately():
+    budget = StsBudget(clock=Clock())
+    budget.try_spend(4, calls_per_hour=10)
+
+    assert not budget.try_spend(1, calls_per_hour=4)
+    assert 0 == budget.get_remaining(calls_per_hour=2)
@@ -0,0 +1,36 @@
+from app.core import files
+from app.daemon import client
+from tests.test_data.test_results import get_error_result, get_success_result
+
+
+def test_result_round_trip():
+    result = get_success_result()
+    result.add_payload({"group": "test"})
+
+    decoded = client.result_from_dict(client.decode(client.encode(client.result_to_dict(result))))
+
+    assert decoded.was_success
+    assert not decoded.was_error
+    assert {"group": "test"} == decoded.payload
+
+
+def test_result_round_trip__error():
+    decoded = client.result_from_dict(client.result_to_dict(get_error_result()))
+
+    assert not decoded.was_success
+    assert decoded.was_error
+    assert "some error" == decoded.error_message
+
+
+def test_is_running__no_socket(mocker, tmp_path):
+    mocker.patch.object(files, "get_app_path", return_value=str(tmp_path))
+    assert not client.is_running()
+
+
+def test_send__not_running(mocker, tmp_path):
+    mocker.patch.object(files, "get_app_path", return_value=str(tmp_path))
+
+    result = client.send("status")
+
+    assert result.was_error
+    assert client.not_running_message == result.error_message
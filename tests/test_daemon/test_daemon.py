@@ -0,0 +1,213 @@
+import os
+import shutil
+import stat
+import tempfile
+
+import pytest
+
+from app.core.refresh_schedule import RefreshSchedule
+from app.daemon import client
+from app.daemon.daemon import Daemon
+from tests.test_data.test_accounts import get_test_profile_group, get_test_profile_group_sso
+from tests.test_data.test_results import get_error_result, get_failed_result, get_success_result
+
+
+@pytest.fixture
+def core(mocker):
+    core = mocker.Mock()
+    core.active_profile_group = None
+    core.default_profile_override = None
+    core.refresh_schedule = RefreshSchedule()
+    core.get_next_refresh_delay.return_value = 600
+    core.get_next_standby_delay.return_value = 600
+    core.credential_server.get_url.return_value = None
+    core.get_region.return_value = "eu-central-1"
+    core.config.get_group.side_effect = lambda name: {
+        "test": get_test_profile_group(),
+        "sso": get_test_profile_group_sso(),
+    }.get(name)
+    return core
+
+
+@pytest.fixture
+def daemon(core):
+    return Daemon(core=core)
+
+
+@pytest.fixture
+def socket_path():
+    # unix socket paths are limited to about 100 characters, pytest's tmp_path can be longer
+    directory = tempfile.mkdtemp(prefix="logsmith-")
+    yield os.path.join(directory, "daemon.sock")
+    shutil.rmtree(directory)
+
+
+def test_handle__unknown_command(daemon):
+    result = daemon.handle({"command": "dance"})
+
+    assert result.was_error
+    assert "unknown command dance" == result.error_message
+
+
+def test_handle__invalid_arguments(daemon):
+    result = daemon.handle({"command": "logout", "arguments": {"group": "test"}})
+
+    assert result.was_error
+    assert "invalid arguments for logout" == result.error_message
+
+
+def test_login__key(daemon, core):
+    def login_with_key(profile_group, mfa_token):
+        core.active_profile_group = profile_group
+        return get_success_result()
+
+    core.login_with_key.side_effect = login_with_key
+    core.set_region.return_value = get_success_result()
+
+    result = daemon.handle({"command": "login", "arguments": {"group": "test", "region": "eu-west-1"}})
+
+    assert result.was_success
+    assert "test" == core.login_with_key.call_args.kwargs["profile_group"].name
+    assert None is core.login_with_key.call_args.kwargs["mfa_token"]
+    core.set_region.assert_called_once_with("eu-west-1")
+    core.verify.assert_called_once_with()
+
+
+def test_login__key_needs_mfa_token(daemon, core):
+    core.login_with_key.return_value = get_failed_result()
+
+    result = daemon.login(group="test")
+
+    assert not result.was_success
+    assert not result.was_error
+    core.verify.assert_not_called()
+
+
+def test_login__sso(daemon, core):
+    core.login_with_sso.return_value = get_success_result()
+
+    result = daemon.login(group="sso")
+
+    assert result.was_success
+    core.login_with_key.assert_not_called()
+    core.login_with_sso.assert_called_once()
+
+
+def test_login__unknown_group(daemon, core):
+    result = daemon.login(group="unknown")
+
+    assert result.was_error
+    assert "profile group unknown not found" == result.error_message
+    core.login_with_key.assert_not_called()
+
+
+def test_login__invalid_region(daemon, core):
+    result = daemon.login(group="test", region="moon-1")
+
+    assert result.was_error
+    assert "invalid region: moon-1" == result.error_message
+    core.login_with_key.assert_not_called()
+
+
+def test_verify__not_logged_in(daemon, core):
+    result = daemon.verify()
+
+    assert result.was_error
+    core.verify.assert_not_called()
+
+
+def test_status(daemon, core):
+    profile_group = get_test_profile_group()
+    profile_group.get_profile("developer").verified = True
+    core.active_profile_group = profile_group
+    core.refresh_schedule.set_expiration("developer", "2026-01-01T12:00:00Z")
+
+    result = daemon.status()
+
+    assert result.was_success
+    assert "test" == result.payload["group"]
+    assert "eu-central-1" == result.payload["region"]
+    developer = next(profile for profile in result.payload["profiles"] if profile["profile"] == "developer")
+    assert {"profile": "developer", "verified": True, "expiration": "2026-01-01T12:00:00+00:00"} == developer
+
+
+def test_refresh(daemon, core):
+    core.active_profile_group = get_test_profile_group()
+    core.refresh.return_value = get_success_result()
+
+    result = daemon.refresh()
+
+    assert result.was_success
+    core.refresh.assert_called_once_with()
+    core.verify.assert_called_once_with()
+
+
+def test_refresh__failure_skips_verify(daemon, core):
+    core.active_profile_group = get_test_profile_group()
+    core.refresh.return_value = get_error_result()
+
+    result = daemon.refresh()
+
+    assert result.was_error
+    core.verify.assert_not_called()
+
+
+def test_socket_round_trip(daemon, core, socket_path):
+    core.logout.return_value = get_error_result()
+    daemon.start(socket_path)
+    try:
+        assert client.is_running(socket_path)
+        assert 0o600 == stat.S_IMODE(os.stat(socket_path).st_mode)
+
+        status_result = client.send("status", socket_path=socket_path)
+        logout_result = client.send("logout", socket_path=socket_path)
+    finally:
+        daemon.stop()
+
+    assert status_result.was_success
+    assert None is status_result.payload["group"]
+    assert logout_result.was_error
+    assert "some error" == logout_result.error_message
+    assert not os.path.exists(socket_path)
+
+
+def test_start__already_running(core, socket_path):
+    daemon = Daemon(core=core)
+    daemon.start(socket_path)
+    try:
+        with pytest.raises(RuntimeError):
+            Daemon(core=core).start(socket_path)
+    finally:
+        daemon.stop()
+
+
+def test_start__removes_stale_socket(daemon, socket_path):
+    open(socket_path, "w").close()
+
+    daemon.start(socket_path)
+    try:
+        assert client.is_running(socket_path)
+    finally:
+        daemon.stop()
+
+
+def test_reload(daemon, core):
+    core.is_active_sso_group.return_value = True
+
+    daemon.reload("accounts")
+    daemon.reload("config")
+    daemon.reload("service_roles")
+    daemon.reload("sso_token")
+
+    core.reload_accounts.assert_called_once_with()
+    core.reload_config.assert_called_once_with()
+    core.reload_service_roles.assert_called_once_with()
+    core.verify.assert_called_once_with()
+
+
+def test_reload__sso_token_of_key_group(daemon, core):
+    core.is_active_sso_group.return_value = False
+
+    daemon.reload("sso_token")
+
+    core.verify.assert_not_called()
@@ -5,4 +5,5 @@ def get_test_config() -> dict:
         'default_access_key': 'some-access-key',
         'default_sso_session': 'some-sso-session',
         'default_sso_interval': 'some-sso-interval',
+        'request_concurrency': '4',
     }
@@ -0,0 +1,28 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+repository_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_loaded_modules(module: str) -> set:
+    code = f"import sys, {module}; print('\\n'.join(sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code], env={**os.environ, "PYTHONPATH": repository_path},
+                            capture_output=True, text=True, check=True).stdout
+    return set(output.splitlines())
+
+
+@pytest.mark.parametrize("module", ["app.core.core", "app.aws.credential_process", "app.daemon.daemon"])
+def test_boto3_is_imported_on_first_aws_call(module):
+    loaded_modules = get_loaded_modules(module)
+    assert "boto3" not in loaded_modules
+    assert "botocore.session" not in loaded_modules
+    assert "PyQt6" not in loaded_modules
+
+
+def test_daemon_client_does_not_import_core():
+    loaded_modules = get_loaded_modules("app.cli.main")
+    assert "app.core.core" not in loaded_modules
+    assert "ruamel.yaml" not in loaded_modules
@@ -1,7 +1,9 @@
 import os
 import subprocess
 from unittest import TestCase
-from unittest.mock import patch
+from unittest.mock import call, patch
+
+import pytest
 
 from app.shell import shell
 
@@ -48,4 +50,69 @@ def test_login_shell_env__extends_path_when_requested():
             env = shell.login_shell_env(path_extension='/custom/bin')
 
     assert '/custom/bin:/usr/local/bin' == env['PATH']
-    assert 'value' == env['OTHER']
\ No newline at end of file
+    assert 'value' == env['OTHER']
+
+@pytest.fixture
+def empty_env_cache(mocker):
+    shell.refresh_env()
+    mocker.patch.dict(shell._stats, {'env_loads': 0, 'env_hits': 0, 'env_load_seconds': 0.0})
+    yield
+    shell.refresh_env()
+
+
+def test_get_env__cached(empty_env_cache, mocker):
+    mocker.patch('app.shell.shell.load_config', return_value={})
+    login_shell_env = mocker.patch('app.shell.shell.login_shell_env', return_value={'PATH': '/usr/bin'})
+
+    assert {'PATH': '/usr/bin'} == shell.get_env()
+    assert {'PATH': '/usr/bin'} == shell.get_env()
+    assert 1 == login_shell_env.call_count
+
+
+def test_get_env__ttl_expired(empty_env_cache, mocker):
+    mocker.patch('app.shell.shell.load_config', return_value={})
+    mocker.patch.object(shell, 'env_ttl_seconds', 0)
+    login_shell_env = mocker.patch('app.shell.shell.login_shell_env', return_value={'PATH': '/usr/bin'})
+
+    shell.get_env()
+    shell.get_env()
+    assert 2 == login_shell_env.call_count
+
+
+def test_get_env__path_extension_changed(empty_env_cache, mocker):
+    load_config = mocker.patch('app.shell.shell.load_config', return_value={'shell_path_extension': '/a'})
+    signature = mocker.patch('app.shell.shell._get_config_signature', return_value=(1, 1, 1))
+    login_shell_env = mocker.patch('app.shell.shell.login_shell_env', return_value={'PATH': '/usr/bin'})
+
+    shell.get_env()
+    shell.get_env()
+    assert 1 == load_config.call_count
+
+    load_config.return_value = {'shell_path_extension': '/b'}
+    signature.return_value = (2, 1, 1)
+    shell.get_env()
+
+    assert [call('/a'), call('/b')] == login_shell_env.call_args_list
+
+
+def test_refresh_env(empty_env_cache, mocker):
+    mocker.patch('app.shell.shell.load_config', return_value={})
+    login_shell_env = mocker.patch('app.shell.shell.login_shell_env', return_value={'PATH': '/usr/bin'})
+
+    shell.get_env()
+    shell.refresh_env()
+    shell.get_env()
+    assert 2 == login_shell_env.call_count
+
+
+def test_run__commands_of_a_gcp_login_share_one_login_shell_env(empty_env_cache, mocker):
+    # a gcp login runs five gcloud commands
+    mocker.patch('app.shell.shell.load_config', return_value={})
+    login_shell_env = mocker.patch('app.shell.shell.login_shell_env', return_value=dict(os.environ))
+    for _ in range(5):
+        assert shell.run('true').was_success
+
+    stats = shell.get_env_stats()
+    assert 1 == login_shell_env.call_count
+    assert 1 == stats['env_loads']
+    assert 4 == stats['env_hits']